@@ -0,0 +1,141 @@
+"""
+Unit Tests for the compact album response encoding
+"""
+
+import gzip
+import json
+import unittest
+import zlib
+from datetime import datetime
+
+from album_encoding import (
+    split_cloudinary_url,
+    compact_album,
+    encode_compact,
+    iter_ndjson,
+    expand_photo,
+    negotiate_encoding,
+    compress,
+    iter_compressed,
+    album_response,
+    brotli,
+    FORMAT_COMPACT,
+    FORMAT_NDJSON,
+)
+from schemas import Album, PhotoOutput
+
+BASE = "https://res.cloudinary.com/demo/image/upload/"
+
+
+def make_album(n=3, album_id="a1"):
+    photos = [
+        PhotoOutput(
+            id=f"IMG_{i}.jpg", filename=f"IMG_{i}.jpg",
+            timestamp=datetime(2024, 1, 1, 10, i),
+            score=0.5, image_url=f"{BASE}v123{i}/smart_albums/p{i}.jpg",
+            lat=21.0, lon=105.8,
+        )
+        for i in range(n)
+    ]
+    return Album(id=album_id, user_id="u1", title="2024-01-01 10:00", method="st_dbscan", photos=photos)
+
+
+class TestUrlTemplating(unittest.TestCase):
+
+    def test_split_cloudinary_url(self):
+        self.assertEqual(
+            split_cloudinary_url(f"{BASE}v1712/smart_albums/abc.png"),
+            (BASE, "1712", "smart_albums/abc", "png"),
+        )
+
+    def test_non_cloudinary_urls_are_kept(self):
+        self.assertIsNone(split_cloudinary_url("/images/abc.jpg"))
+        self.assertIsNone(split_cloudinary_url(None))
+
+    def test_compact_round_trip(self):
+        album = make_album()
+        compact, base = compact_album(album, None)
+
+        self.assertEqual(base, BASE)
+        for original, photo in zip(album.photos, compact["photos"]):
+            self.assertNotIn("image_url", photo)
+            self.assertNotIn("filename", photo)  # equal to id
+            expanded = expand_photo(photo, base)
+            self.assertEqual(expanded["image_url"], original.image_url)
+            self.assertEqual(expanded["filename"], original.filename)
+
+    def test_mongo_docs_drop_duplicate_id(self):
+        doc = make_album().model_dump()
+        doc["_id"] = doc["id"]
+        compact, _ = compact_album(doc, None)
+        self.assertNotIn("_id", compact)
+        self.assertEqual(compact["id"], "a1")
+
+    def test_photo_without_id_or_filename(self):
+        doc = make_album(1).model_dump()
+        doc["photos"][0] = {"image_url": "/images/x.jpg"}
+        compact, _ = compact_album(doc, None)
+        self.assertEqual(compact["photos"][0], {"image_url": "/images/x.jpg"})
+
+    def test_local_urls_untouched(self):
+        doc = make_album(1).model_dump()
+        doc["photos"][0]["image_url"] = "/images/x.jpg"
+        compact, base = compact_album(doc, None)
+        self.assertIsNone(base)
+        self.assertEqual(compact["photos"][0]["image_url"], "/images/x.jpg")
+
+    def test_compact_is_smaller(self):
+        albums = [make_album(50)]
+        legacy = json.dumps([a.model_dump(mode="json") for a in albums]).encode()
+        self.assertLess(len(encode_compact(albums)), len(legacy))
+
+
+class TestNdjson(unittest.TestCase):
+
+    def test_header_then_one_album_per_line(self):
+        lines = b"".join(iter_ndjson([make_album(album_id="a1"), make_album(album_id="a2")])).splitlines()
+        header = json.loads(lines[0])
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(header["url_base"], BASE)
+        self.assertEqual([json.loads(l)["id"] for l in lines[1:]], ["a1", "a2"])
+
+    def test_empty(self):
+        lines = list(iter_ndjson([]))
+        self.assertEqual(len(lines), 1)
+        self.assertIsNone(json.loads(lines[0])["url_base"])
+
+
+class TestContentEncoding(unittest.TestCase):
+
+    def test_negotiation(self):
+        self.assertIsNone(negotiate_encoding(None))
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertEqual(negotiate_encoding("*"), "br" if brotli else "gzip")
+        expected = "br" if brotli else "gzip"
+        self.assertEqual(negotiate_encoding("gzip;q=0.5, br;q=1.0"), expected)
+
+    def test_gzip_round_trip(self):
+        body = encode_compact([make_album()])
+        self.assertEqual(gzip.decompress(compress(body, "gzip")), body)
+
+    def test_streaming_gzip_round_trip(self):
+        chunks = list(iter_ndjson([make_album(), make_album()]))
+        stream = b"".join(iter_compressed(chunks, "gzip"))
+        self.assertEqual(zlib.decompress(stream, 16 + zlib.MAX_WBITS), b"".join(chunks))
+
+    def test_album_response_headers(self):
+        resp = album_response([make_album()], FORMAT_COMPACT, "gzip")
+        self.assertEqual(resp.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resp.headers["vary"])
+        self.assertEqual(json.loads(gzip.decompress(resp.body))["albums"][0]["id"], "a1")
+
+    def test_ndjson_response_media_type(self):
+        resp = album_response([make_album()], FORMAT_NDJSON, None)
+        self.assertEqual(resp.media_type, "application/x-ndjson")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+"""
+Unit Tests for the album repositories (keyset pagination, photo pages, Photos collection + migration)
+"""
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+from album_repository import (
+    AlbumRepository, AsyncAlbumRepository, InvalidCursor, encode_cursor, MAX_PAGE_SIZE,
+    STORAGE_COLLECTION, STORAGE_EMBEDDED, is_normalised,
+)
+from benchmarks.fakes import AsyncInMemoryCollection, InMemoryCollection
+from migrate_photos import migrate
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_repo(albums, photos=None, storage=STORAGE_EMBEDDED):
+    """AsyncAlbumRepository over in-memory collections; tests inspect them through .sync."""
+    return AsyncAlbumRepository(AsyncInMemoryCollection("Albums", sync=albums),
+                                AsyncInMemoryCollection("Photos", sync=photos) if photos is not None else None,
+                                storage=storage)
+
+
+def make_album(i, user_id="u1", created_at=None, n_photos=3):
+    start = datetime(2024, 1, 1) + timedelta(days=i)
+    photos = [
+        {"id": f"a{i}_p{j}", "filename": f"a{i}_p{j}", "timestamp": start + timedelta(minutes=j),
+         "score": 0.5, "image_url": None}
+        for j in range(n_photos)
+    ]
+    return {
+        "_id": f"album-{i:03d}",
+        "id": f"album-{i:03d}",
+        "user_id": user_id,
+        "title": f"Album {i}",
+        "method": "st_dbscan",
+        "cover_photo_url": None,
+        "photos": photos,
+        "created_at": created_at or start,
+        "needs_manual_location": False,
+    }
+
+
+class TestAlbumSummaries(unittest.TestCase):
+
+    def setUp(self):
+        self.col = InMemoryCollection("Albums")
+        self.repo = make_repo(self.col)
+        run(self.repo.ensure_indexes())
+
+    def _walk(self, user_id, limit):
+        ids, cursor = [], None
+        while True:
+            page, cursor = run(self.repo.list_album_summaries(user_id, limit, cursor))
+            ids.extend(a["id"] for a in page)
+            if not cursor:
+                return ids
+
+    def test_pages_cover_all_albums_newest_first(self):
+        run(self.repo.insert_albums([make_album(i) for i in range(7)]))
+        ids = self._walk("u1", 3)
+        self.assertEqual(ids, [f"album-{i:03d}" for i in reversed(range(7))])
+
+    def test_ties_on_created_at_broken_by_id(self):
+        same = datetime(2024, 5, 1)
+        run(self.repo.insert_albums([make_album(i, created_at=same) for i in range(5)]))
+        ids = self._walk("u1", 2)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_summary_has_count_and_date_range_but_no_photos(self):
+        run(self.repo.insert_albums([make_album(0, n_photos=4)]))
+        page, cursor = run(self.repo.list_album_summaries("u1", 10))
+        summary = page[0]
+        self.assertIsNone(cursor)
+        self.assertNotIn("photos", summary)
+        self.assertEqual(summary["photo_count"], 4)
+        self.assertEqual(summary["start_time"], datetime(2024, 1, 1))
+        self.assertEqual(summary["end_time"], datetime(2024, 1, 1, 0, 3))
+
+    def test_other_users_albums_hidden(self):
+        run(self.repo.insert_albums([make_album(0), make_album(1, user_id="u2")]))
+        self.assertEqual(self._walk("u1", 10), ["album-000"])
+
+    def test_legacy_album_is_backfilled(self):
+        self.col.insert_one(make_album(0, n_photos=2))     # no summary fields
+        page, _ = run(self.repo.list_album_summaries("u1", 10))
+        self.assertEqual(page[0]["photo_count"], 2)
+        self.assertEqual(self.col.find_one({"_id": "album-000"})["photo_count"], 2)
+
+    def test_invalidate_summary_recomputes_after_photo_delete(self):
+        run(self.repo.insert_albums([make_album(0, n_photos=3)]))
+        self.col.update_one({"_id": "album-000"}, {"$pull": {"photos": {"id": "a0_p2"}}})
+        run(self.repo.invalidate_summary("album-000"))
+        page, _ = run(self.repo.list_album_summaries("u1", 10))
+        self.assertEqual(page[0]["photo_count"], 2)
+        self.assertEqual(page[0]["end_time"], datetime(2024, 1, 1, 0, 1))
+
+    def test_invalid_cursor(self):
+        for bad in ["not-base64!!", encode_cursor({"x": 1}), encode_cursor({"c": "nope", "i": "a"})]:
+            with self.assertRaises(InvalidCursor):
+                run(self.repo.list_album_summaries("u1", 10, bad))
+
+    def test_limit_is_clamped(self):
+        run(self.repo.insert_albums([make_album(i) for i in range(MAX_PAGE_SIZE + 5)]))
+        page, cursor = run(self.repo.list_album_summaries("u1", 10_000))
+        self.assertEqual(len(page), MAX_PAGE_SIZE)
+        self.assertIsNotNone(cursor)
+
+
+class TestAlbumPhotos(unittest.TestCase):
+
+    def setUp(self):
+        self.col = InMemoryCollection("Albums")
+        self.repo = make_repo(self.col)
+        run(self.repo.insert_albums([make_album(0, n_photos=7)]))
+
+    def test_photo_pages(self):
+        seen, cursor = [], None
+        while True:
+            photos, cursor, total = run(self.repo.list_album_photos("album-000", "u1", 3, cursor))
+            self.assertEqual(total, 7)
+            seen.extend(p["id"] for p in photos)
+            if not cursor:
+                break
+        self.assertEqual(seen, [f"a0_p{j}" for j in range(7)])
+
+    def test_only_requested_slice_is_read(self):
+        doc = self.col.find_one({"_id": "album-000"}, {"photos": {"$slice": [2, 2]}, "photo_count": 1})
+        self.assertEqual([p["id"] for p in doc["photos"]], ["a0_p2", "a0_p3"])
+        self.assertNotIn("title", doc)
+
+    def test_not_owner_returns_none(self):
+        self.assertIsNone(run(self.repo.list_album_photos("album-000", "someone-else")))
+
+    def test_bad_offset_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            run(self.repo.list_album_photos("album-000", "u1", 3, encode_cursor({"o": -1})))
+
+
+class TestNormalisedPhotos(unittest.TestCase):
+
+    def setUp(self):
+        self.albums = InMemoryCollection("Albums")
+        self.photos = InMemoryCollection("Photos")
+        self.repo = make_repo(self.albums, self.photos, storage=STORAGE_COLLECTION)
+        run(self.repo.ensure_indexes())
+        run(self.repo.insert_albums([make_album(0, n_photos=5), make_album(1, n_photos=2)]))
+
+    def test_photos_moved_out_of_album(self):
+        album = self.albums.find_one({"_id": "album-000"})
+        self.assertNotIn("photos", album)
+        self.assertTrue(is_normalised(album))
+        self.assertEqual(self.photos.count_documents({"album_id": "album-000"}), 5)
+
+    def test_hydrate_keeps_order(self):
+        albums = run(self.repo.hydrate_many(self.albums.find({"user_id": "u1"})))
+        by_id = {a["_id"]: a for a in albums}
+        self.assertEqual([p["id"] for p in by_id["album-000"]["photos"]], [f"a0_p{j}" for j in range(5)])
+        self.assertEqual(len(by_id["album-001"]["photos"]), 2)
+
+    def test_photo_pages(self):
+        seen, cursor = [], None
+        while True:
+            photos, cursor, total = run(self.repo.list_album_photos("album-000", "u1", 2, cursor))
+            self.assertEqual(total, 5)
+            seen.extend(p["id"] for p in photos)
+            if not cursor:
+                break
+        self.assertEqual(seen, [f"a0_p{j}" for j in range(5)])
+
+    def test_delete_photo_updates_count_and_range(self):
+        album = run(self.repo.get_album("album-000", "u1"))
+        run(self.repo.delete_photo(album, run(self.repo.find_photo(album, "a0_p4"))))
+        page, _ = run(self.repo.list_album_summaries("u1", 10))
+        summary = next(a for a in page if a["id"] == "album-000")
+        self.assertEqual(summary["photo_count"], 4)
+        self.assertEqual(summary["end_time"], datetime(2024, 1, 1, 0, 3))
+
+    def test_delete_photo_does_not_rewrite_album(self):
+        album = run(self.repo.get_album("album-000", "u1"))
+        before = self.albums.op_counts.get("update_one", 0)
+        run(self.repo.delete_photo(album, run(self.repo.find_photo(album, "a0_p2"))))
+        self.assertEqual(self.albums.op_counts["update_one"] - before, 1)
+        self.assertIsNone(run(self.repo.find_photo(album, "a0_p2")))
+
+    def test_delete_album_removes_photos(self):
+        run(self.repo.delete_album(run(self.repo.get_album("album-000", "u1"))))
+        self.assertEqual(self.photos.count_documents({"album_id": "album-000"}), 0)
+        self.assertEqual(self.photos.count_documents({"album_id": "album-001"}), 2)
+
+    def test_zip_checksums_survive_the_move(self):
+        run(self.repo.insert_albums([{**make_album(2, n_photos=1), "photos": [
+            {"id": "z", "filename": "z", "timestamp": None, "score": 0, "size": 1234, "crc32": 0xDEADBEEF}]}]))
+        album = run(self.repo.get_album("album-002", "u1", with_photos=True))
+        self.assertEqual((album["photos"][0]["size"], album["photos"][0]["crc32"]), (1234, 0xDEADBEEF))
+
+    def test_geo_point(self):
+        run(self.repo.insert_albums([{**make_album(2, n_photos=1), "photos": [
+            {"id": "g", "filename": "g", "timestamp": None, "score": 0, "lat": 21.0, "lon": 105.8}]}]))
+        self.assertEqual(self.photos.find_one({"_id": "album-002:g"})["geo"]["coordinates"], [105.8, 21.0])
+
+
+class TestPhotoMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.albums = InMemoryCollection("Albums")
+        self.photos = InMemoryCollection("Photos")
+        # Legacy data written by the embedded layout
+        run(make_repo(self.albums, self.photos, storage=STORAGE_EMBEDDED).insert_albums(
+            [make_album(i, n_photos=4) for i in range(5)]
+        ))
+        # migrate_photos runs on the sync repository, the service reads through the async one
+        self.repo = AlbumRepository(self.albums, self.photos, storage=STORAGE_COLLECTION)
+        self.repo.ensure_indexes()
+        self.reader = make_repo(self.albums, self.photos, storage=STORAGE_COLLECTION)
+
+    def test_dual_read_before_and_after(self):
+        before = run(self.reader.list_album_photos("album-001", "u1", 10))
+        migrate(self.repo, batch_size=2)
+        after = run(self.reader.list_album_photos("album-001", "u1", 10))
+        self.assertEqual([(p["id"], p["timestamp"]) for p in before[0]],
+                         [(p["id"], p["timestamp"]) for p in after[0]])
+        self.assertEqual(before[2], after[2])
+
+    def test_migration_is_batched_and_idempotent(self):
+        stats = migrate(self.repo, batch_size=2)
+        self.assertEqual((stats["albums"], stats["photos"], stats["batches"]), (5, 20, 3))
+        self.assertEqual(self.albums.count_documents({"photos": {"$exists": True}}), 0)
+        self.assertEqual(migrate(self.repo, batch_size=2)["albums"], 0)
+        self.assertEqual(self.photos.count_documents({}), 20)
+
+    def test_keep_embedded_and_dry_run(self):
+        self.assertEqual(migrate(self.repo, dry_run=True)["albums"], 5)
+        self.assertEqual(self.photos.count_documents({}), 0)
+        migrate(self.repo, keep_embedded=True)
+        album = self.albums.find_one({"_id": "album-000"})
+        self.assertTrue(is_normalised(album))
+        self.assertEqual(len(album["photos"]), 4)
+
+    def test_delete_racing_with_migration(self):
+        # Photo removed from the array after the copy, before the flip
+        original_update = self.albums.find_one_and_update
+
+        def delete_then_flip(query, update, **kwargs):
+            self.albums.update_one({"_id": "album-000"}, {"$pull": {"photos": {"id": "a0_p1"}}})
+            return original_update(query, update, **kwargs)
+
+        self.albums.find_one_and_update = delete_then_flip
+        self.assertEqual(self.repo.migrate_album("album-000"), 3)
+        self.assertIsNone(self.photos.find_one({"_id": "album-000:a0_p1"}))
+        self.assertEqual(run(self.reader.list_album_photos("album-000", "u1", 10))[2], 3)
+
+    def test_delete_after_migrate_keeps_count(self):
+        # Migration clears the summary; a delete must not $inc the missing count to -1
+        migrate(self.repo, batch_size=2)
+        album = run(self.reader.get_album("album-001", "u1"))
+        run(self.reader.delete_photo(album, run(self.reader.find_photo(album, "a1_p2"))))
+        self.assertEqual(run(self.reader.list_album_photos("album-001", "u1", 10))[2], 3)
+        self.assertEqual(self.albums.find_one({"_id": "album-001"})["photo_count"], 3)
+
+        # Once recomputed, later deletes update it in place
+        run(self.reader.delete_photo(album, run(self.reader.find_photo(album, "a1_p0"))))
+        self.assertEqual(run(self.reader.list_album_photos("album-001", "u1", 10))[2], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Unit Tests for the async Mongo data layer (both photo layouts read the same, share lookups, summaries)
+"""
+
+import asyncio
+import unittest
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from album_repository import AsyncAlbumRepository, STORAGE_COLLECTION, STORAGE_EMBEDDED
+from benchmarks.fakes import AsyncInMemoryCollection
+from summary_repository import SummaryRepository
+from Tests.test_album_repository import make_album
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestAsyncAlbumRepository(unittest.TestCase):
+
+    def make(self, storage):
+        albums, photos = AsyncInMemoryCollection("Albums"), AsyncInMemoryCollection("Photos")
+        repo = AsyncAlbumRepository(albums, photos, storage=storage)
+        run(repo.ensure_indexes())
+        run(repo.insert_albums([make_album(i, n_photos=5) for i in range(4)]))
+        return repo
+
+    def walk_photos(self, repo, album_id):
+        pages, cursor = [], None
+        while True:
+            photos, cursor, total = run(repo.list_album_photos(album_id, "u1", 2, cursor))
+            pages.append(([p["id"] for p in photos], total))
+            if not cursor:
+                return pages
+
+    def test_reads_match_for_both_layouts(self):
+        embedded = self.make(STORAGE_EMBEDDED)
+        for storage in (STORAGE_EMBEDDED, STORAGE_COLLECTION):
+            with self.subTest(storage=storage):
+                repo = self.make(storage)
+                page, cursor = run(repo.list_album_summaries("u1", 2))
+                self.assertEqual((page, cursor), run(embedded.list_album_summaries("u1", 2)))
+                self.assertEqual(run(repo.list_album_summaries("u1", 2, cursor)),
+                                 run(embedded.list_album_summaries("u1", 2, cursor)))
+                # Cursors differ per layout (offset vs order key); the pages they walk do not
+                self.assertEqual(self.walk_photos(repo, "album-001"), self.walk_photos(embedded, "album-001"))
+                album = run(repo.get_album("album-002", "u1", with_photos=True))
+                self.assertEqual([p["id"] for p in album["photos"]], [f"a2_p{j}" for j in range(5)])
+                self.assertEqual(len(run(repo.list_albums("u1"))), 4)
+                self.assertIsNone(run(repo.get_album("album-002", "someone-else")))
+
+    def test_delete_photo_and_soft_delete(self):
+        repo = self.make(STORAGE_COLLECTION)
+        album = run(repo.get_album("album-000", "u1"))
+        photo = run(repo.find_photo(album, "a0_p4"))
+        run(repo.delete_photo(album, photo))
+        self.assertIsNone(run(repo.find_photo(album, "a0_p4")))
+        self.assertEqual(run(repo.list_album_photos("album-000", "u1"))[2], 4)
+
+        self.assertTrue(run(repo.mark_deleted("album-000", "u1")))
+        self.assertIsNone(run(repo.get_album("album-000", "u1")))
+        self.assertFalse(run(repo.rename("album-000", "u1", "New")))
+        self.assertTrue(run(repo.rename("album-001", "u1", "New")))
+
+    def test_share_lifecycle(self):
+        repo = self.make(STORAGE_COLLECTION)
+        self.assertEqual(run(repo.get_share_token("album-001", "u1")), (True, None))
+        self.assertEqual(run(repo.get_share_token("album-001", "intruder")), (False, None))
+
+        run(repo.enable_share("album-001", "tok"))
+        self.assertEqual(run(repo.get_share_token("album-001", "u1")), (True, "tok"))
+        shared = run(repo.find_shared("tok"))
+        self.assertEqual(shared["_id"], "album-001")
+        self.assertEqual(len(run(repo.get_photos(shared))), 5)
+
+        self.assertFalse(run(repo.revoke_share("album-001", "intruder")))
+        self.assertTrue(run(repo.revoke_share("album-001", "u1")))
+        self.assertIsNone(run(repo.find_shared("tok")))
+
+
+class TestSummaryRepository(unittest.TestCase):
+
+    def test_history_newest_first_and_owner_only_delete(self):
+        repo = SummaryRepository(AsyncInMemoryCollection("TripSummaries"))
+        ids = [ObjectId() for _ in range(3)]
+        for i, oid in enumerate(ids):
+            run(repo.insert({"_id": oid, "user_id": "u1", "created_at": datetime(2024, 1, i + 1), "n": i}))
+        run(repo.insert({"_id": ObjectId(), "user_id": "u2", "created_at": datetime(2024, 2, 1), "n": 9}))
+
+        history = run(repo.history("u1"))
+        self.assertEqual([h["n"] for h in history], [2, 1, 0])
+        self.assertNotIn("_id", history[0])
+
+        self.assertFalse(run(repo.delete(str(ids[0]), "u2")))
+        self.assertTrue(run(repo.delete(str(ids[0]), "u1")))
+        with self.assertRaises(InvalidId):
+            run(repo.delete("not-an-id", "u1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
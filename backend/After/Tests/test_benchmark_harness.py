@@ -0,0 +1,122 @@
+"""
+Unit Tests for the benchmark harness (synthetic corpus + fakes)
+"""
+
+import io
+import unittest
+
+from PIL import Image
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+from benchmarks.fakes import FakeCloudinaryService, InMemoryCollection
+from metadata import MetadataExtractor
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.spec = CorpusSpec(count=20, n_events=2, blur_fraction=0.1, dark_fraction=0.1,
+                               screenshot_fraction=0.1, size=(128, 96), seed=1)
+        self.photos = generate_corpus(self.spec)
+
+    def test_count_and_mix(self):
+        kinds = [p.kind for p in self.photos]
+        self.assertEqual(len(self.photos), 20)
+        self.assertEqual(kinds.count("blur"), 2)
+        self.assertEqual(kinds.count("dark"), 2)
+        self.assertEqual(kinds.count("screenshot"), 2)
+
+    def test_exif_round_trips_through_extractor(self):
+        extractor = MetadataExtractor()
+        photo = next(p for p in self.photos if p.kind == "good")
+        meta = extractor.get_metadata_from_image(Image.open(io.BytesIO(photo.content)))
+
+        self.assertEqual(meta["timestamp"], photo.timestamp)
+        self.assertAlmostEqual(meta["latitude"], photo.lat, places=4)
+        self.assertAlmostEqual(meta["longitude"], photo.lon, places=4)
+
+    def test_screenshots_have_no_camera_or_gps(self):
+        shot = next(p for p in self.photos if p.kind == "screenshot")
+        exif = Image.open(io.BytesIO(shot.content)).getexif()
+
+        self.assertIsNone(exif.get(272))
+        self.assertIsNone(shot.lat)
+
+    def test_deterministic_for_seed(self):
+        again = generate_corpus(self.spec)
+        self.assertEqual([p.content for p in again], [p.content for p in self.photos])
+
+
+class TestFakeCloudinary(unittest.TestCase):
+
+    def test_upload_tag_delete(self):
+        cloud = FakeCloudinaryService()
+        data = cloud.upload_photo("/tmp/a.jpg", "temp")
+        cloud.add_tags([data["public_id"]], "album")
+
+        self.assertEqual(cloud.get_public_id_from_url(data["url"]), data["public_id"])
+        self.assertIn("album", cloud.uploaded[data["public_id"]]["tags"])
+
+        cloud.delete_resources([data["public_id"]])
+        self.assertEqual(cloud.deleted, [data["public_id"]])
+
+    def test_derived_images_are_untagged(self):
+        cloud = FakeCloudinaryService()
+        data = cloud.upload_derived("/tmp/ab-123-grid.webp", "smart_albums/renditions")
+        self.assertTrue(data["public_id"].startswith("smart_albums/renditions/"))
+        self.assertTrue(data["url"].endswith(".webp"))
+        self.assertEqual(cloud.get_public_id_from_url(data["url"]), data["public_id"])
+        self.assertEqual(cloud.uploaded[data["public_id"]]["tags"], set())
+
+    def test_failures_return_none(self):
+        cloud = FakeCloudinaryService(failure_rate=1.0)
+        self.assertIsNone(cloud.upload_photo("/tmp/a.jpg", "t"))
+
+
+class TestInMemoryCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.col = InMemoryCollection()
+        self.col.insert_many([
+            {"_id": "a1", "user_id": "u1", "created_at": 3, "photos": [{"id": "p1"}, {"id": "p2"}]},
+            {"_id": "a2", "user_id": "u1", "created_at": 1, "photos": []},
+            {"_id": "a3", "user_id": "u2", "created_at": 2, "photos": []},
+        ])
+
+    def test_find_sort_limit(self):
+        docs = list(self.col.find({"user_id": "u1"}).sort("created_at", -1).limit(1))
+        self.assertEqual([d["_id"] for d in docs], ["a1"])
+
+    def test_query_operators(self):
+        self.assertEqual(self.col.count_documents({"created_at": {"$gte": 2}}), 2)
+        self.assertEqual(self.col.count_documents({"user_id": {"$in": ["u2"]}}), 1)
+        self.assertEqual(self.col.count_documents({"photos.id": "p2"}), 1)
+
+    def test_projection(self):
+        doc = self.col.find_one({"_id": "a1"}, {"photos": 0})
+        self.assertNotIn("photos", doc)
+        doc = self.col.find_one({"_id": "a1"}, {"user_id": 1})
+        self.assertEqual(set(doc), {"_id", "user_id"})
+
+    def test_update_set_unset_pull(self):
+        self.col.update_one({"_id": "a1"}, {"$set": {"title": "x"}, "$pull": {"photos": {"id": "p1"}}})
+        self.col.update_one({"_id": "a1"}, {"$unset": {"title": ""}})
+        doc = self.col.find_one({"_id": "a1"})
+
+        self.assertNotIn("title", doc)
+        self.assertEqual(doc["photos"], [{"id": "p2"}])
+
+    def test_unique_index(self):
+        self.col.create_index("share_token", unique=True, sparse=True)
+        self.col.update_one({"_id": "a1"}, {"$set": {"share_token": "t"}})
+        with self.assertRaises(ValueError):
+            self.col.update_one({"_id": "a2"}, {"$set": {"share_token": "t"}})
+
+    def test_returned_docs_are_copies(self):
+        doc = self.col.find_one({"_id": "a1"})
+        doc["user_id"] = "hacked"
+        self.assertEqual(self.col.find_one({"_id": "a1"})["user_id"], "u1")
+
+
+if __name__ == "__main__":
+    unittest.main()
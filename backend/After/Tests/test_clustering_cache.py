@@ -0,0 +1,125 @@
+"""
+Unit Tests for the clustering result cache (input fingerprint, memory LRU + Mongo tier, rebuilt groups, hit rates)
+"""
+
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from benchmarks.fakes import InMemoryCollection
+from clustering.algorithms import cluster_jenks_time
+from clustering.batch import PhotoBatch
+from clustering.service import ClusteringService
+from clustering_cache import ClusteringCache
+from metrics import CACHE_REQUESTS
+from schemas import PhotoInput
+
+
+def make_photos(n=60, prefix="p", with_gps=True):
+    base = datetime(2024, 9, 1, 8, 0)
+    return [
+        PhotoInput(id=f"{prefix}{i}", filename=f"{prefix}{i}.jpg", local_path=f"{prefix}{i}.jpg",
+                   timestamp=base + timedelta(hours=(i // 15) * 5, minutes=i % 15),
+                   latitude=10.0 + (i // 15) * 0.2 if with_gps else None,
+                   longitude=106.0 if with_gps else None, score=(i * 37 % 100) / 100)
+        for i in range(n)
+    ]
+
+
+def summary(groups, photos):
+    """Albums as (title, method, filenames in order), independent of input positions."""
+    return [(g.title, g.method, [photos[i].filename for i in g.index]) for g in groups]
+
+
+def renamed(photos, prefix):
+    return [p.model_copy(update={"id": prefix + p.id, "filename": prefix + p.filename}) for p in photos]
+
+
+class TestClusteringCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ClusteringCache(max_entries=4)
+        self.calls = 0
+
+    def compute(self, batch):
+        def run():
+            self.calls += 1
+            return ClusteringService.dispatch_batch(batch)
+        return run
+
+    def test_same_photos_in_any_order_hit(self):
+        photos = make_photos()
+        batch = PhotoBatch.from_inputs(photos)
+        first = self.cache.get_or_compute(batch, {"a": 1}, self.compute(batch))
+
+        shuffled = photos[:]
+        random.Random(3).shuffle(shuffled)
+        again = PhotoBatch.from_inputs(shuffled)
+        second = self.cache.get_or_compute(again, {"a": 1}, self.compute(again))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(summary(first, photos), summary(second, shuffled))
+
+    def test_other_params_or_superset_miss(self):
+        photos = make_photos()
+        for params, inputs in (({"a": 1}, photos), ({"a": 2}, photos), ({"a": 1}, photos + make_photos(3, "x"))):
+            batch = PhotoBatch.from_inputs(inputs)
+            self.cache.get_or_compute(batch, params, self.compute(batch))
+        self.assertEqual(self.calls, 3)
+
+    def test_lru_bound(self):
+        for i in range(6):
+            batch = PhotoBatch.from_inputs(make_photos(10 + i))
+            self.cache.get_or_compute(batch, {}, self.compute(batch))
+        self.assertEqual(self.cache.stats()["entries"], 4)
+        self.assertEqual(self.cache.stats()["evictions"], 2)
+
+
+class TestMongoTier(unittest.TestCase):
+
+    def test_shared_across_instances_and_expires(self):
+        now = [1000.0]
+        collection = InMemoryCollection("ClusteringCache")
+        photos = make_photos()
+        batch = PhotoBatch.from_inputs(photos)
+        expected = ClusteringService.dispatch_batch(batch)
+        ClusteringCache(collection=collection, ttl_seconds=60, clock=lambda: now[0]).get_or_compute(batch, {}, lambda: expected)
+
+        hits_before = CACHE_REQUESTS.get(cache="clustering_mongo", result="hit")
+        other = ClusteringCache(collection=collection, ttl_seconds=60, clock=lambda: now[0])
+        copy = renamed(photos, "again_")
+        got = other.get_or_compute(PhotoBatch.from_inputs(copy), {}, self.fail)
+        self.assertEqual(summary(got, copy), summary(expected, renamed(photos, "again_")))
+        self.assertEqual(CACHE_REQUESTS.get(cache="clustering_mongo", result="hit"), hits_before + 1)
+
+        now[0] += 120
+        computed = []
+        ClusteringCache(collection=collection, ttl_seconds=60, clock=lambda: now[0]).get_or_compute(
+            batch, {}, lambda: computed.append(1) or expected)
+        self.assertEqual(computed, [1])
+
+    def test_mongo_errors_fall_back_to_computing(self):
+        broken = mock.Mock()
+        broken.find_one.side_effect = RuntimeError("down")
+        broken.update_one.side_effect = RuntimeError("down")
+        batch = PhotoBatch.from_inputs(make_photos())
+        groups = ClusteringCache(collection=broken).get_or_compute(batch, {}, lambda: ClusteringService.dispatch_batch(batch))
+        self.assertTrue(groups)
+
+
+class TestDispatchWithCache(unittest.TestCase):
+
+    def test_repeat_dispatch_skips_the_algorithm(self):
+        cache = ClusteringCache()
+        photos = make_photos(with_gps=False)
+        with mock.patch("clustering.service.cluster_jenks_time", wraps=cluster_jenks_time) as jenks:
+            first = ClusteringService.dispatch_batch(PhotoBatch.from_inputs(photos), cache)
+            copy = renamed(photos, "b_")
+            second = ClusteringService.dispatch_batch(PhotoBatch.from_inputs(copy), cache)
+        self.assertEqual(jenks.call_count, 1)
+        self.assertEqual(summary(first, renamed(photos, "b_")), summary(second, copy))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Unit Tests for WebSocket fan-out (concurrent sends, slow-client drops) and the cross-worker pub/sub backends
+"""
+
+import asyncio
+import time
+import unittest
+
+from connection_manager import ConnectionManager, WS_DROPPED
+from pubsub import InMemoryPubSub, SocketBroker, SocketPubSub, make_pubsub
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0, block: bool = False):
+        self.delay = delay
+        self.block = block
+        self.sent = []
+        self.sent_at = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.block:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+        self.sent_at.append(time.perf_counter())
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+async def settle(seconds: float = 0.05):
+    await asyncio.sleep(seconds)
+
+
+class TestConnectionManager(unittest.TestCase):
+
+    def test_slow_client_does_not_delay_fast_one(self):
+        async def scenario():
+            manager = ConnectionManager(InMemoryPubSub(), send_timeout=5)
+            await manager.start()
+            slow, fast = FakeWebSocket(delay=0.5), FakeWebSocket()
+            await manager.connect(slow, "u1")
+            await manager.connect(fast, "u1")
+            start = time.perf_counter()
+            await manager.send_personal_message({"n": 1}, "u1")
+            await settle()
+            fast_after = fast.sent_at[0] - start
+            await manager.stop()
+            return fast, fast_after
+
+        fast, fast_after = asyncio.run(scenario())
+        self.assertEqual(fast.sent, [{"n": 1}])
+        self.assertLess(fast_after, 0.2)
+
+    def test_send_timeout_drops_client(self):
+        async def scenario():
+            manager = ConnectionManager(InMemoryPubSub(), send_timeout=0.05)
+            await manager.start()
+            stuck, ok = FakeWebSocket(block=True), FakeWebSocket()
+            await manager.connect(stuck, "u1")
+            await manager.connect(ok, "u1")
+            before = WS_DROPPED.get(reason="timeout")
+            await manager.send_personal_message({"n": 1}, "u1")
+            await settle(0.2)
+            await manager.send_personal_message({"n": 2}, "u1")
+            await settle()
+            return manager, stuck, ok, WS_DROPPED.get(reason="timeout") - before
+
+        manager, stuck, ok, dropped = asyncio.run(scenario())
+        self.assertEqual(dropped, 1)
+        self.assertEqual(stuck.closed_with, 1013)
+        self.assertEqual(manager.active_connections["u1"], [ok])
+        self.assertEqual(ok.sent, [{"n": 1}, {"n": 2}])
+
+    def test_full_queue_drops_client(self):
+        async def scenario():
+            manager = ConnectionManager(InMemoryPubSub(), send_timeout=5, queue_size=2)
+            await manager.start()
+            stuck = FakeWebSocket(block=True)
+            await manager.connect(stuck, "u1")
+            accepted = [manager.deliver_local("u1", {"n": i}) for i in range(4)]
+            await settle()
+            return manager, stuck, accepted
+
+        manager, stuck, accepted = asyncio.run(scenario())
+        # two messages fill the queue, the third overflows and drops the socket
+        self.assertEqual(accepted, [1, 1, 0, 0])
+        self.assertNotIn("u1", manager.active_connections)
+        self.assertEqual(stuck.closed_with, 1013)
+
+    def test_only_target_user_receives(self):
+        async def scenario():
+            manager = ConnectionManager(InMemoryPubSub())
+            await manager.start()
+            mine, other = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(mine, "u1")
+            await manager.connect(other, "u2")
+            await manager.send_personal_message({"n": 1}, "u1")
+            await settle()
+            manager.disconnect(mine, "u1")
+            await manager.send_personal_message({"n": 2}, "u1")
+            await settle()
+            return mine, other
+
+        mine, other = asyncio.run(scenario())
+        self.assertEqual(mine.sent, [{"n": 1}])
+        self.assertEqual(other.sent, [])
+
+
+class TestPubSub(unittest.TestCase):
+
+    def test_socket_broker_routes_between_workers(self):
+        async def scenario():
+            broker = SocketBroker("127.0.0.1", 0)
+            await broker.start()
+            worker_a = ConnectionManager(SocketPubSub("127.0.0.1", broker.port))
+            worker_b = ConnectionManager(SocketPubSub("127.0.0.1", broker.port))
+            await worker_a.start()
+            await worker_b.start()
+            await asyncio.wait_for(worker_a.pubsub.connected.wait(), 5)
+            await asyncio.wait_for(worker_b.pubsub.connected.wait(), 5)
+            tab_a, tab_b = FakeWebSocket(), FakeWebSocket()
+            await worker_a.connect(tab_a, "u1")
+            await worker_b.connect(tab_b, "u1")
+
+            await worker_a.send_personal_message({"title": "Đà Lạt"}, "u1")
+            await settle(0.2)
+            await worker_a.stop()
+            await worker_b.stop()
+            await broker.stop()
+            return tab_a, tab_b
+
+        tab_a, tab_b = asyncio.run(scenario())
+        self.assertEqual(tab_a.sent, [{"title": "Đà Lạt"}])
+        self.assertEqual(tab_b.sent, [{"title": "Đà Lạt"}])
+
+    def test_socket_backend_delivers_locally_without_broker(self):
+        async def scenario():
+            received = []
+            pubsub = SocketPubSub("127.0.0.1", 1, reconnect_delay=0.05)
+            await pubsub.start(lambda channel, message: received.append((channel, message)))
+            await pubsub.publish("u1", {"n": 1})
+            await pubsub.stop()
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), [("u1", {"n": 1})])
+
+    def test_make_pubsub(self):
+        self.assertIsInstance(make_pubsub("memory"), InMemoryPubSub)
+        self.assertIsInstance(make_pubsub("socket"), SocketPubSub)
+        with self.assertRaises(ValueError):
+            make_pubsub("kafka")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+Unit Tests for album contact sheets (sprite layout, offset map, incremental removal)
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from contact_sheets import ContactSheetStore, offset_map
+
+ALBUM = "3f2a9c1e-0000-4000-8000-000000000001"
+
+
+def colour(i: int):
+    return ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256)
+
+
+class TestContactSheets(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.photos = []
+        for i in range(25):
+            path = os.path.join(self.dir, f"src{i}.jpg")
+            Image.new("RGB", (400 + i, 300), colour(i)).save(path, quality=95)
+            self.photos.append((f"IMG_{i:04d}.jpg", path))
+        self.root = os.path.join(self.dir, "sheets")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _store(self, **kwargs):
+        defaults = dict(root=self.root, tile=16, columns=4, rows=3, fmt="jpeg", quality=95)
+        defaults.update(kwargs)
+        return ContactSheetStore(**defaults)
+
+    def _sprites(self, store, meta, photo_ids):
+        """What the service fetches from Cloudinary before remove(): the affected sprites' bytes."""
+        sprites = {}
+        for url in store.affected(meta, photo_ids):
+            with open(store.local_path(url), "rb") as f:
+                sprites[url] = f.read()
+        return sprites
+
+    def _remove(self, store, meta, photo_ids):
+        return store.remove(ALBUM, meta, photo_ids, self._sprites(store, meta, photo_ids))
+
+    def _tile_colour(self, view, photo_id):
+        s, x, y = view["tiles"][photo_id]
+        url = view["sheets"][s]["url"]
+        with Image.open(os.path.join(self.root, url.split("/contact-sheets/", 1)[1])) as im:
+            return im.convert("RGB").getpixel((x + 8, y + 8))
+
+    def assertColour(self, actual, expected):
+        self.assertTrue(all(abs(a - e) <= 12 for a, e in zip(actual, expected)), (actual, expected))
+
+    def test_layout_and_offsets(self):
+        meta = self._store().build(ALBUM, self.photos)
+        self.assertEqual([len(s["photos"]) for s in meta["sheets"]], [12, 12, 1])
+        self.assertEqual((meta["sheets"][0]["width"], meta["sheets"][0]["height"]), (64, 48))
+        self.assertEqual((meta["sheets"][2]["width"], meta["sheets"][2]["height"]), (16, 16))
+
+        view = offset_map(meta)
+        self.assertEqual(view["tiles"]["IMG_0000.jpg"], [0, 0, 0])
+        self.assertEqual(view["tiles"]["IMG_0005.jpg"], [0, 16, 16])
+        self.assertEqual(view["tiles"]["IMG_0013.jpg"], [1, 16, 0])
+        self.assertEqual(view["tiles"]["IMG_0024.jpg"], [2, 0, 0])
+        for i in (0, 5, 13, 24):
+            self.assertColour(self._tile_colour(view, f"IMG_{i:04d}.jpg"), colour(i))
+
+    def test_unreadable_photos_are_left_out(self):
+        sources = self.photos[:3] + [("missing.jpg", os.path.join(self.dir, "nope.jpg")), ("no-path.jpg", None)]
+        view = offset_map(self._store().build(ALBUM, sources))
+        self.assertEqual(set(view["tiles"]), {p for p, _ in self.photos[:3]})
+        self.assertEqual(self._store().build(ALBUM, [("x", None)]), {})
+
+    def test_exif_orientation_and_square_crop(self):
+        path = os.path.join(self.dir, "rotated.jpg")
+        img = Image.new("RGB", (600, 300), (0, 0, 255))
+        img.paste((255, 0, 0), (0, 0, 300, 300))       # left half red
+        exif = Image.Exif()
+        exif[0x0112] = 6                                 # 90° clockwise -> red on top
+        img.save(path, exif=exif.tobytes())
+        store = self._store(tile=32)
+        view = offset_map(store.build(ALBUM, [("r", path)]))
+        with Image.open(os.path.join(self.root, view["sheets"][0]["url"].split("/contact-sheets/", 1)[1])) as im:
+            self.assertEqual(im.size, (32, 32))
+            self.assertColour(im.convert("RGB").getpixel((16, 2)), (255, 0, 0))
+            self.assertColour(im.convert("RGB").getpixel((16, 29)), (0, 0, 255))
+
+    def test_removal_rewrites_only_affected_sheet(self):
+        store = self._store()
+        meta = store.build(ALBUM, self.photos)
+        before = [s["url"] for s in meta["sheets"]]
+
+        self.assertEqual(store.affected(meta, ["IMG_0014.jpg"]), [before[1]])
+        after = self._remove(store, meta, ["IMG_0014.jpg"])
+        urls = [s["url"] for s in after["sheets"]]
+        self.assertEqual(urls[0], before[0])
+        self.assertEqual(urls[2], before[2])
+        self.assertNotEqual(urls[1], before[1])
+
+        view = offset_map(after)
+        self.assertNotIn("IMG_0014.jpg", view["tiles"])
+        self.assertEqual(view["tiles"]["IMG_0015.jpg"], [1, 32, 0])    # shifted left into the gap
+        for i in (12, 13, 15, 23):
+            self.assertColour(self._tile_colour(view, f"IMG_{i:04d}.jpg"), colour(i))
+
+    def test_removing_whole_sheet_and_everything(self):
+        store = self._store()
+        meta = store.build(ALBUM, self.photos)
+        after = self._remove(store, meta, ["IMG_0024.jpg"])
+        self.assertEqual(len(after["sheets"]), 2)
+        self.assertEqual(self._remove(store, after, [p for p, _ in self.photos]), {})
+        self.assertEqual(store.remove(ALBUM, {}, ["x"], {}), {})
+
+    def test_unavailable_sprite_is_dropped(self):
+        store = self._store()
+        meta = store.build(ALBUM, self.photos)
+        for sprites in ({}, {meta["sheets"][0]["url"]: b"not an image"}):
+            after = store.remove(ALBUM, meta, ["IMG_0001.jpg"], sprites)
+            self.assertEqual([s["url"] for s in after["sheets"]], [s["url"] for s in meta["sheets"][1:]])
+
+    def test_local_path(self):
+        store = self._store()
+        meta = store.build(ALBUM, self.photos[:2])
+        self.assertTrue(os.path.isfile(store.local_path(meta["sheets"][0]["url"])))
+        self.assertIsNone(store.local_path("https://res.cloudinary.com/x/image/upload/v1/s.webp"))
+
+    def test_urls_follow_members_and_settings(self):
+        a = self._store().build(ALBUM, self.photos)
+        self.assertEqual(self._store().build(ALBUM, self.photos), a)
+        b = self._store(tile=24).build(ALBUM, self.photos)
+        self.assertNotEqual(a["sheets"][0]["url"], b["sheets"][0]["url"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Unit Tests for burst deduplication before clustering (unique GPS fixes, weights, labels expanded back to photos)
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from clustering.algorithms import run_location_hdbscan, run_spatiotemporal
+from clustering.dedup import collapse_coordinates, expand_labels
+from schemas import PhotoInput
+
+
+def burst(prefix, lat, lon, n, start, jitter=0.0):
+    return [
+        PhotoInput(id=f"{prefix}{i}", filename=f"{prefix}{i}.jpg", local_path=f"{prefix}{i}.jpg",
+                   latitude=lat + (jitter if i % 2 else 0.0), longitude=lon,
+                   timestamp=start + timedelta(seconds=i), score=i / n)
+        for i in range(n)
+    ]
+
+
+class TestCollapseCoordinates(unittest.TestCase):
+
+    def test_identical_and_jittered_fixes_merge(self):
+        lat = np.array([10.123451, 10.123452, 10.123451, 10.2, 10.2])
+        lon = np.array([106.5, 106.5, 106.5, 106.7, 106.7])
+        points = collapse_coordinates(lat, lon, decimals=5)
+        self.assertEqual(len(points.coords), 2)
+        self.assertEqual(sorted(points.counts.tolist()), [2, 3])
+        np.testing.assert_array_equal(points.coords[points.inverse][:, 1], lon)
+
+    def test_expand_labels_gives_one_label_per_photo(self):
+        points = collapse_coordinates(np.array([1.0, 2.0, 1.0]), np.array([3.0, 4.0, 3.0]), decimals=5)
+        labels = expand_labels(np.array([7, 9]), points)
+        self.assertEqual(labels.tolist(), [7, 9, 7])
+
+
+class TestClusteringWithBursts(unittest.TestCase):
+
+    def test_st_dbscan_keeps_every_burst_photo(self):
+        start = datetime(2024, 8, 1, 9, 0)
+        photos = burst("a", 10.77, 106.70, 200, start, jitter=0.000002) + burst("b", 10.85, 106.80, 50, start + timedelta(hours=1))
+        albums = run_spatiotemporal(photos, dist_m=700, gap_min=120, engine="dbscan")
+        self.assertEqual(sorted(len(a.photos) for a in albums), [50, 200])
+        self.assertEqual(albums[0].photos[0].score, max(p.score for p in albums[0].photos))
+
+    def test_hdbscan_burst_forms_a_cluster(self):
+        start = datetime(2024, 8, 1, 9, 0)
+        photos = burst("a", 10.77, 106.70, 40, start) + burst("b", 11.50, 107.30, 30, start)
+        albums = run_location_hdbscan(photos)
+        clusters = [a for a in albums if a.method == "gps_hdbscan"]
+        self.assertEqual(sorted(len(a.photos) for a in clusters), [30, 40])
+
+
+if __name__ == "__main__":
+    unittest.main()
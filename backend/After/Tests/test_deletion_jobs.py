@@ -0,0 +1,175 @@
+"""
+Unit Tests for background Cloudinary deletion jobs (FakeCloudinaryService)
+"""
+
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from album_repository import AsyncAlbumRepository, STORAGE_COLLECTION
+from benchmarks.fakes import AsyncInMemoryCollection, FakeCloudinaryService
+from deletion_jobs import (
+    DeletionJobQueue, job_progress, KIND_ALBUM, KIND_PHOTOS,
+    JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING,
+)
+from Tests.test_album_repository import make_album
+
+
+class FlakyCloud(FakeCloudinaryService):
+    """Fails the first `failures` delete calls, then behaves."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._flight_lock = threading.Lock()
+
+    def delete_resources(self, public_ids: list, wait: bool = False):
+        with self._flight_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            with self._flight_lock:
+                if self.failures > 0:
+                    self.failures -= 1
+                    raise ConnectionError("transient")
+            return super().delete_resources(public_ids, wait)
+        finally:
+            with self._flight_lock:
+                self.in_flight -= 1
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestDeletionJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.clock_now = 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=8)
+        self.jobs = AsyncInMemoryCollection("DeletionJobs")
+        self.albums = AsyncInMemoryCollection("Albums")
+        self.photos = AsyncInMemoryCollection("Photos")
+        self.repo = AsyncAlbumRepository(self.albums, self.photos, storage=STORAGE_COLLECTION)
+        run(self.repo.insert_albums([make_album(0, n_photos=3)]))
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def _queue(self, cloud, **kwargs):
+        defaults = dict(chunk_size=100, concurrency=3, max_attempts=3, retry_base_delay=0,
+                        executor=self.executor, clock=lambda: self.clock_now)
+        defaults.update(kwargs)
+        return DeletionJobQueue(self.jobs, cloud, self.repo, **defaults)
+
+    def _upload(self, cloud, n):
+        return [cloud.upload_photo(f"/tmp/p{i}.jpg", "t")["public_id"] for i in range(n)]
+
+    def test_album_job_deletes_in_100_id_chunks_and_purges_album(self):
+        cloud = FlakyCloud(failures=0)
+        ids = self._upload(cloud, 250)
+        queue = self._queue(cloud)
+        self.assertTrue(run(self.repo.mark_deleted("album-000", "u1")))
+        job_id = run(queue.enqueue(KIND_ALBUM, "u1", ids, album_id="album-000"))
+
+        self.assertEqual(run(queue.run_pending()), 1)
+
+        self.assertEqual(cloud.calls["delete_resources"], 3)
+        self.assertEqual(sorted(cloud.deleted), sorted(ids))
+        self.assertEqual(cloud.uploaded, {})
+        self.assertIsNone(self.albums.sync.find_one({"_id": "album-000"}))
+        self.assertEqual(self.photos.sync.count_documents({"album_id": "album-000"}), 0)
+
+        progress = job_progress(run(queue.get(job_id, "u1")))
+        self.assertEqual(progress["status"], JOB_DONE)
+        self.assertEqual((progress["deleted"], progress["total"], progress["percent"]), (250, 250, 100.0))
+        self.assertEqual((progress["chunks_done"], progress["chunks_total"]), (3, 3))
+
+    def test_marked_album_is_hidden_immediately(self):
+        run(self.repo.mark_deleted("album-000", "u1"))
+        self.assertIsNone(run(self.repo.get_album("album-000", "u1")))
+        self.assertEqual(run(self.repo.list_album_summaries("u1"))[0], [])
+        self.assertFalse(run(self.repo.mark_deleted("album-000", "u1")))
+
+    def test_transient_failures_are_retried_within_the_job(self):
+        cloud = FlakyCloud(failures=2)
+        ids = self._upload(cloud, 50)
+        queue = self._queue(cloud)
+        job_id = run(queue.enqueue(KIND_PHOTOS, "u1", ids))
+        run(queue.run_pending())
+        self.assertEqual(run(queue.get(job_id))["status"], JOB_DONE)
+        self.assertEqual(sorted(cloud.deleted), sorted(ids))
+
+    def test_exhausted_chunk_requeues_then_resumes_only_missing_chunks(self):
+        cloud = FlakyCloud(failures=0)
+        ids = self._upload(cloud, 300)
+        queue = self._queue(cloud, concurrency=1, max_attempts=2)
+        job_id = run(queue.enqueue(KIND_PHOTOS, "u1", ids))
+
+        # First chunk succeeds, second exhausts its 2 tries, third succeeds
+        original = cloud.delete_resources
+
+        def fail_second_chunk(public_ids, wait=False):
+            if public_ids[0] == ids[100]:
+                raise ConnectionError("down")
+            return original(public_ids, wait)
+
+        cloud.delete_resources = fail_second_chunk
+        job = run(queue.claim())
+        self.assertEqual(run(queue.run_job(job)), JOB_PENDING)
+        stored = self.jobs.sync.find_one({"_id": job_id})
+        self.assertEqual(sorted(stored["done_chunks"]), [0, 2])
+        self.assertEqual(stored["deleted"], 200)
+        self.assertEqual(stored["status"], JOB_PENDING)
+
+        cloud.delete_resources = original
+        self.clock_now += 60
+        run(queue.run_pending())
+        self.assertEqual(run(queue.get(job_id))["status"], JOB_DONE)
+        self.assertEqual(len(cloud.deleted), 300)
+        self.assertEqual(len(set(cloud.deleted)), 300)   # nothing resent
+
+    def test_job_fails_after_max_attempts(self):
+        cloud = FlakyCloud(failures=10_000)
+        queue = self._queue(cloud, max_attempts=2)
+        job_id = run(queue.enqueue(KIND_PHOTOS, "u1", ["a", "b"]))
+        for _ in range(3):
+            run(queue.run_pending())
+            self.clock_now += 60
+        job = run(queue.get(job_id))
+        self.assertEqual(job["status"], JOB_FAILED)
+        self.assertEqual(job["attempts"], 2)
+        self.assertIn("transient", job["error"])
+
+    def test_concurrency_is_bounded(self):
+        cloud = FlakyCloud(failures=0)
+        ids = self._upload(cloud, 1000)
+        cloud.latency_s = 0.02
+        queue = self._queue(cloud, concurrency=3)
+        run(queue.enqueue(KIND_PHOTOS, "u1", ids))
+        run(queue.run_pending())
+        self.assertEqual(cloud.calls["delete_resources"], 10)
+        self.assertLessEqual(cloud.max_in_flight, 3)
+        self.assertGreater(cloud.max_in_flight, 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        cloud = FlakyCloud(failures=0)
+        queue = self._queue(cloud, lease_seconds=30)
+        job_id = run(queue.enqueue(KIND_PHOTOS, "u1", ["x"]))
+        self.assertEqual(run(queue.claim())["status"], JOB_RUNNING)   # worker "crashes" here
+        self.assertIsNone(run(queue.claim()))
+        self.clock_now += 31
+        self.assertEqual(run(queue.claim())["_id"], job_id)
+
+    def test_other_users_cannot_read_job(self):
+        queue = self._queue(FlakyCloud(failures=0))
+        job_id = run(queue.enqueue(KIND_PHOTOS, "u1", ["x"]))
+        self.assertIsNone(run(queue.get(job_id, "someone-else")))
+        self.assertIsNotNone(run(queue.get(job_id, "u1")))
+
+
+if __name__ == "__main__":
+    unittest.main()
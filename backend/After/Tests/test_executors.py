@@ -0,0 +1,112 @@
+"""
+Unit Tests for the bulkhead executors and thread budget
+"""
+
+import os
+import threading
+import unittest
+
+import executors
+from executors import BoundedExecutor, get_pool, pool_stats, configure_thread_budget
+
+
+class TestBoundedExecutor(unittest.TestCase):
+
+    def test_stats_count_completed_and_failed(self):
+        pool = BoundedExecutor("test", 2)
+        try:
+            pool.submit(lambda: 1).result()
+
+            def boom():
+                raise RuntimeError("fail")
+
+            with self.assertRaises(RuntimeError):
+                pool.submit(boom).result()
+
+            stats = pool.stats()
+            self.assertEqual(stats["submitted"], 2)
+            self.assertEqual(stats["completed"], 2)
+            self.assertEqual(stats["failed"], 1)
+            self.assertEqual(stats["active"], 0)
+            self.assertEqual(stats["queued"], 0)
+        finally:
+            pool.shutdown()
+
+    def test_queue_depth_when_saturated(self):
+        """Jobs beyond max_workers are reported as queued"""
+        pool = BoundedExecutor("test", 1)
+        gate = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            gate.wait(5)
+
+        try:
+            futures = [pool.submit(blocker) for _ in range(3)]
+            started.wait(5)
+
+            stats = pool.stats()
+            self.assertEqual(stats["active"], 1)
+            self.assertEqual(stats["queued"], 2)
+
+            gate.set()
+            for f in futures:
+                f.result()
+        finally:
+            gate.set()
+            pool.shutdown()
+
+    def test_works_with_run_in_executor(self):
+        import asyncio
+
+        pool = BoundedExecutor("test", 2)
+        try:
+            async def main():
+                loop = asyncio.get_event_loop()
+                return await loop.run_in_executor(pool, sum, [1, 2, 3])
+
+            self.assertEqual(asyncio.run(main()), 6)
+        finally:
+            pool.shutdown()
+
+
+class TestPoolRegistry(unittest.TestCase):
+
+    def tearDown(self):
+        executors.shutdown_pools()
+
+    def test_get_pool_is_singleton_per_class(self):
+        self.assertIs(get_pool(executors.IO), get_pool(executors.IO))
+        self.assertIsNot(get_pool(executors.IO), get_pool(executors.CPU))
+
+    def test_pool_sizes_come_from_config(self):
+        for name, size in executors.POOL_SIZES.items():
+            self.assertEqual(get_pool(name).max_workers, max(1, size))
+
+    def test_unknown_pool_rejected(self):
+        with self.assertRaises(ValueError):
+            get_pool("gpu")
+
+    def test_pool_stats_lists_created_pools(self):
+        get_pool(executors.NETWORK)
+        self.assertIn(executors.NETWORK, pool_stats())
+
+
+class TestThreadBudget(unittest.TestCase):
+
+    def test_configure_pins_omp_and_opencv(self):
+        applied = configure_thread_budget()
+
+        self.assertEqual(os.environ["OMP_NUM_THREADS"], str(executors.OMP_THREADS))
+        self.assertEqual(applied["budget"], executors.THREAD_BUDGET)
+
+        try:
+            import cv2
+        except ImportError:
+            self.skipTest("OpenCV not installed")
+        self.assertEqual(cv2.getNumThreads(), executors.OPENCV_THREADS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+"""
+Unit Tests for the OSM geocoding proxy against a local Nominatim stand-in
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from geocoding import (
+    GeocoderUnavailable, OSMGeocoder, PersistentLRUCache, TokenBucket,
+    grid_point, normalise_address,
+)
+
+
+class FakeNominatim:
+    """Tiny threaded HTTP server answering /search and /reverse like Nominatim."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.fail = False
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                fake.requests.append((url.path, params, self.headers.get("User-Agent")))
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake.fail:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if url.path == "/search":
+                    body = [] if "nowhere" in params["q"] else [
+                        {"lat": "21.0285", "lon": "105.8542", "display_name": f"Result for {params['q']}"}
+                    ]
+                else:
+                    body = {"lat": params["lat"], "lon": params["lon"], "display_name": "Hoàn Kiếm, Hà Nội",
+                            "address": {"city": "Hà Nội"}}
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestGeocodingHelpers(unittest.TestCase):
+
+    def test_normalise_address(self):
+        self.assertEqual(normalise_address("  Hồ  Gươm,\tHÀ NỘI "), "hồ gươm, hà nội")
+
+    def test_grid_point(self):
+        self.assertEqual(grid_point(21.02851, 105.85419), (21.029, 105.854))
+
+
+class TestPersistentLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "geo.sqlite3")
+        self.now = 1000.0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_ttl_and_stale(self):
+        cache = PersistentLRUCache(self.path, 10, clock=lambda: self.now)
+        cache.set("k", {"v": 1}, ttl=10)
+        self.assertEqual(cache.get("k"), {"v": 1})
+        self.now += 11
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.get_stale("k"), {"v": 1})
+
+    def test_lru_eviction(self):
+        cache = PersistentLRUCache(self.path, 2, clock=lambda: self.now, touch_interval=0)
+        cache.set("a", 1, 100)
+        self.now += 1
+        cache.set("b", 2, 100)
+        self.now += 1
+        cache.get("a")
+        self.now += 1
+        cache.set("c", 3, 100)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get_stale("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_hits_touch_at_most_once_per_interval(self):
+        cache = PersistentLRUCache(self.path, 10, clock=lambda: self.now, touch_interval=60)
+        cache.set("k", 1, 1000)
+        writes = cache._conn.total_changes
+        for _ in range(5):
+            self.now += 10
+            self.assertEqual(cache.get("k"), 1)
+        self.assertEqual(cache._conn.total_changes, writes)
+        self.now += 10
+        cache.get("k")
+        self.assertEqual(cache._conn.total_changes, writes + 1)
+
+    def test_survives_reopen(self):
+        PersistentLRUCache(self.path, 10).set("k", [1, 2], 100)
+        self.assertEqual(PersistentLRUCache(self.path, 10).get("k"), [1, 2])
+
+
+class TestOSMGeocoder(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.server = FakeNominatim()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _geocoder(self, rate=1000.0, capacity=1000, ttl=3600.0):
+        cache = PersistentLRUCache(os.path.join(self.dir, "geo.sqlite3"), 100)
+        return OSMGeocoder(self.server.url, cache=cache, limiter=TokenBucket(rate, capacity), ttl=ttl)
+
+    def _run(self, geocoder, coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await geocoder.aclose()
+        return asyncio.run(main())
+
+    def test_search_is_cached_and_normalised(self):
+        geo = self._geocoder()
+
+        async def go():
+            first = await geo.search("Hồ Gươm")
+            second = await geo.search("  hồ   GƯƠM ")
+            return first, second
+
+        first, second = self._run(geo, go())
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]["lat"], 21.0285)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(self.server.requests[0][2].startswith("photo-trip-app"))
+
+    def test_cache_runs_off_the_event_loop(self):
+        geo = self._geocoder()
+        threads = []
+        original_read = geo.cache._read
+
+        def read(key):
+            threads.append(threading.get_ident())
+            return original_read(key)
+
+        geo.cache._read = read
+
+        async def go():
+            await geo.search("Hồ Gươm")
+            await geo.search("Hồ Gươm")
+            return threading.get_ident()
+
+        loop_thread = self._run(geo, go())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_not_found_is_cached(self):
+        geo = self._geocoder()
+
+        async def go():
+            return await geo.search("nowhere"), await geo.search("nowhere")
+
+        self.assertEqual(self._run(geo, go()), ([], []))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_reverse_uses_grid(self):
+        geo = self._geocoder()
+
+        async def go():
+            a = await geo.reverse(21.02851, 105.85419)
+            b = await geo.reverse(21.02861, 105.85441)   # same ~110 m cell
+            return a, b
+
+        a, b = self._run(geo, go())
+        self.assertEqual(a, b)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][1]["lat"], "21.029")
+
+    def test_identical_inflight_lookups_are_coalesced(self):
+        self.server.delay = 0.2
+        geo = self._geocoder()
+
+        async def go():
+            return await asyncio.gather(*[geo.search("Hội An") for _ in range(10)])
+
+        results = self._run(geo, go())
+        self.assertEqual(len({json.dumps(r) for r in results}), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_token_bucket_spaces_upstream_calls(self):
+        geo = self._geocoder(rate=10.0, capacity=1)
+
+        async def go():
+            start = time.perf_counter()
+            await asyncio.gather(*[geo.search(f"place {i}") for i in range(4)])
+            return time.perf_counter() - start
+
+        elapsed = self._run(geo, go())
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertGreaterEqual(elapsed, 0.28)    # 3 waits of 0.1 s after the first token
+
+    def test_stale_on_error(self):
+        geo = self._geocoder(ttl=0.0)
+
+        async def go():
+            first = await geo.search("Đà Lạt")
+            self.server.fail = True
+            return first, await geo.search("Đà Lạt")
+
+        first, second = self._run(geo, go())
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_error_without_cache_raises(self):
+        self.server.fail = True
+        geo = self._geocoder()
+        with self.assertRaises(GeocoderUnavailable):
+            self._run(geo, geo.search("Huế"))
+
+    def test_cache_survives_restart(self):
+        geo = self._geocoder()
+        self._run(geo, geo.search("Sa Pa"))
+        geo2 = self._geocoder()
+        self._run(geo2, geo2.search("Sa Pa"))
+        self.assertEqual(len(self.server.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
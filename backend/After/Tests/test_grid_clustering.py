@@ -0,0 +1,99 @@
+"""
+Unit Tests for the grid + union-find spatiotemporal engine (label agreement with ST-DBSCAN, union-find, antimeridian, dense cells)
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+from clustering.algorithms import run_spatiotemporal
+from clustering.grid import EARTH_RADIUS_M, grid_st_labels, spatial_labels, union_find
+from schemas import PhotoInput
+
+
+def partition(labels):
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+    return sorted(map(tuple, groups.values()))
+
+
+def dbscan_labels(lat, lon, dist_m):
+    coords = np.radians(np.column_stack((lat, lon)))
+    return DBSCAN(eps=dist_m / EARTH_RADIUS_M, min_samples=1, metric="haversine", algorithm="ball_tree").fit(coords).labels_
+
+
+def random_trip(rng, n):
+    centers = rng.uniform([10.0, 105.0], [11.0, 106.5], size=(rng.integers(1, 25), 2))
+    pts = centers[rng.integers(0, len(centers), n)] + rng.normal(0, rng.uniform(0.001, 0.03), size=(n, 2))
+    return pts[:, 0], pts[:, 1]
+
+
+class TestUnionFind(unittest.TestCase):
+
+    def test_long_chain_and_separate_components(self):
+        n = 1000
+        a = np.arange(n - 2, 0, -1)
+        root = union_find(n, a, a + 1)        # 1..n-1 chained, listed backwards; 0 alone
+        self.assertEqual(root[0], 0)
+        self.assertTrue(np.all(root[1:] == 1))
+
+    def test_no_edges(self):
+        np.testing.assert_array_equal(union_find(4, [], []), np.arange(4))
+
+
+class TestSpatialLabels(unittest.TestCase):
+
+    def test_same_partition_as_dbscan(self):
+        rng = np.random.default_rng(7)
+        for trial in range(15):
+            lat, lon = random_trip(rng, int(rng.integers(50, 2000)))
+            if trial % 3 == 0:
+                lat[:200], lon[:200] = lat[0], lon[0]     # many photos taken from one spot
+            dist_m = float(rng.choice([100, 700, 3000]))
+            with self.subTest(trial=trial, dist_m=dist_m):
+                self.assertEqual(partition(spatial_labels(lat, lon, dist_m)), partition(dbscan_labels(lat, lon, dist_m)))
+
+    def test_joins_across_the_antimeridian(self):
+        lat = np.array([0.0, 0.0, 0.0])
+        lon = np.array([179.999, -179.999, 90.0])     # first two ~220 m apart
+        self.assertEqual(partition(spatial_labels(lat, lon, 700)), [(0, 1), (2,)])
+
+    def test_dense_single_spot(self):
+        rng = np.random.default_rng(1)
+        lat = 10.77 + rng.normal(0, 0.002, size=50000)
+        lon = 106.70 + rng.normal(0, 0.002, size=50000)
+        self.assertEqual(len(np.unique(spatial_labels(lat, lon, 700))), 1)
+
+
+class TestGridSpatiotemporal(unittest.TestCase):
+
+    def test_time_gaps_split_a_place(self):
+        lat = np.full(6, 10.0)
+        lon = np.full(6, 106.0)
+        seconds = np.array([0, 60, 120, 10000, 10060, 20000], dtype=float)
+        self.assertEqual(partition(grid_st_labels(lat, lon, seconds, 700, 3600)), [(0, 1, 2), (3, 4), (5,)])
+
+    def test_albums_match_dbscan_engine(self):
+        rng = np.random.default_rng(3)
+        lat, lon = random_trip(rng, 600)
+        base = datetime(2024, 5, 1, 8, 0)
+        minutes = np.sort(rng.uniform(0, 24 * 60, size=600))
+        photos = [
+            PhotoInput(id=str(i), filename=f"{i}.jpg", local_path=f"{i}.jpg", latitude=float(lat[i]),
+                       longitude=float(lon[i]), timestamp=base + timedelta(minutes=float(minutes[i])), score=0.5)
+            for i in range(600)
+        ]
+        grid = run_spatiotemporal(photos, dist_m=700, gap_min=120, engine="grid")
+        dbscan = run_spatiotemporal(photos, dist_m=700, gap_min=120, engine="dbscan")
+
+        def as_sets(albums):
+            return sorted((a.method.replace("st_grid", "st_dbscan"), tuple(sorted(p.id for p in a.photos))) for a in albums)
+        self.assertEqual(as_sets(grid), as_sets(dbscan))
+        self.assertIn("st_grid", {a.method for a in grid})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Unit Tests for the all-k Fisher–Jenks dynamic program (equivalence with jenkspy, GVF, precision on epoch timestamps, no downsampling)
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from clustering.algorithms import _find_optimal_breaks_gvf, _optimal_jenks_split, run_jenks_time
+from clustering.jenks import breaks_from_splits, jenks_all_k
+from schemas import PhotoInput
+
+
+def ssd(values):
+    return float(((values - values.mean()) ** 2).sum()) if len(values) else 0.0
+
+
+class TestJenksAllK(unittest.TestCase):
+
+    def test_breaks_match_jenkspy_for_every_k(self):
+        import jenkspy
+
+        rng = np.random.default_rng(3)
+        for trial in range(25):
+            centers = rng.uniform(0, 1000, size=4)
+            x = np.sort(np.concatenate([rng.normal(c, rng.uniform(1, 30), size=rng.integers(5, 60)) for c in centers]))
+            splits, _ = jenks_all_k(x, 8)
+            for k in range(2, 9):
+                with self.subTest(trial=trial, k=k):
+                    np.testing.assert_allclose(breaks_from_splits(x, splits[k]), jenkspy.jenks_breaks(x, n_classes=k))
+
+    def test_gvf_is_one_minus_within_class_ssd_ratio(self):
+        x = np.sort(np.random.default_rng(5).uniform(0, 100, size=300))
+        splits, gvf = jenks_all_k(x, 6)
+        for k in range(1, 7):
+            within = sum(ssd(x[a:b]) for a, b in zip(splits[k][:-1], splits[k][1:]))
+            self.assertAlmostEqual(gvf[k], 1 - within / ssd(x), places=9)
+        self.assertTrue(np.all(np.diff(gvf[1:]) >= -1e-12))
+
+    def test_epoch_timestamps_keep_precision(self):
+        # Bursts a few seconds apart, hours between them, at ~1.7e9 s since epoch
+        base = datetime(2025, 3, 1, 8, 0).timestamp()
+        x = np.sort(np.concatenate([base + h * 3600 * 5 + np.arange(40) * 3.0 for h in range(4)]))
+        splits, gvf = jenks_all_k(x, 6)
+        np.testing.assert_array_equal(splits[4], [0, 40, 80, 120, 160])
+        self.assertGreater(gvf[4], 0.9999)
+
+    def test_k_is_capped_by_point_count(self):
+        splits, gvf = jenks_all_k(np.array([1.0, 2.0, 9.0]), 10)
+        self.assertEqual(len(gvf), 4)
+        np.testing.assert_array_equal(splits[3], [0, 1, 2, 3])
+
+
+class TestJenksTimeWithoutDownsampling(unittest.TestCase):
+
+    def test_gvf_choice_matches_previous_jenkspy_loop(self):
+        data = np.array([1.0, 1.1, 1.2, 1.3, 1.4, 5.0, 5.1, 5.2, 5.3, 5.4, 10.0, 10.1, 10.2, 10.3])
+        self.assertEqual(_find_optimal_breaks_gvf(data, max_k=5), [1.0, 1.4, 5.4, 10.3])
+
+    def test_large_album_split_on_every_photo(self):
+        base = datetime(2024, 7, 1, 9, 0)
+        sizes = [1000, 2500, 1500]
+        photos, i = [], 0
+        for day, size in enumerate(sizes):
+            for j in range(size):
+                photos.append(PhotoInput(id=str(i), filename=f"{i}.jpg", local_path=f"{i}.jpg",
+                                         timestamp=base + timedelta(days=day, seconds=j * 5), score=0.5))
+                i += 1
+        albums = run_jenks_time(photos, max_events=10)
+        # Every photo is placed by the exact partition, not snapped to a 1-in-10 sample
+        self.assertEqual(sorted(len(a.photos) for a in albums), sorted(sizes))
+
+    def test_split_indices_cover_all_points(self):
+        x = np.sort(np.random.default_rng(9).uniform(0, 1e6, size=2000))
+        split = _optimal_jenks_split(x, max_k=10)
+        self.assertEqual((split[0], split[-1]), (0, 2000))
+        self.assertTrue(np.all(np.diff(split) > 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
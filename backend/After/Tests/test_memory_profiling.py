@@ -0,0 +1,83 @@
+"""
+Unit Tests for the opt-in memory profiling mode
+"""
+
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+import memory_profiling
+from memory_profiling import RequestMemoryProfile, start_profile, load_latest_reports, load_report
+
+
+class TestRequestMemoryProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.report_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.report_dir, ignore_errors=True)
+        tracemalloc.stop()
+
+    def test_stage_peak_and_retained(self):
+        profile = RequestMemoryProfile("unit", report_dir=self.report_dir)
+
+        kept = bytearray(4 * 1024 * 1024)        # retained after the stage
+        profile.checkpoint("allocate")
+
+        temp = bytearray(8 * 1024 * 1024)        # freed before the checkpoint
+        del temp
+        profile.checkpoint("transient")
+
+        report = profile.finish(photos=1)
+        allocate, transient = report["stages"]
+
+        self.assertEqual(allocate["stage"], "allocate")
+        self.assertGreaterEqual(allocate["retained_mb"], 3.9)
+        self.assertGreaterEqual(transient["peak_over_start_mb"], 7.9)
+        self.assertLess(abs(transient["retained_mb"]), 0.5)
+        self.assertGreaterEqual(report["peak_mb"], 11.9)
+        self.assertEqual(report["photos"], 1)
+        del kept
+
+    def test_top_sites_point_at_allocation(self):
+        profile = RequestMemoryProfile("unit", report_dir=self.report_dir)
+        blob = [bytes(1024) for _ in range(2000)]  # noqa: F841
+        profile.checkpoint("alloc")
+        report = profile.finish()
+
+        sites = report["stages"][0]["top_sites"]
+        self.assertTrue(sites)
+        self.assertIn("test_memory_profiling.py", sites[0]["site"])
+
+    def test_report_persisted_and_loadable(self):
+        profile = RequestMemoryProfile("unit", report_dir=self.report_dir)
+        profile.checkpoint("noop")
+        report = profile.finish()
+
+        latest = load_latest_reports(5, report_dir=self.report_dir)
+        self.assertEqual(latest[0]["request_id"], report["request_id"])
+        self.assertEqual(load_report(report["request_id"], report_dir=self.report_dir)["label"], "unit")
+
+    def test_load_report_rejects_path_traversal(self):
+        self.assertIsNone(load_report("../../etc/passwd", report_dir=self.report_dir))
+
+
+class TestDisabledProfile(unittest.TestCase):
+
+    def test_disabled_profile_is_noop(self):
+        profile = start_profile("unit", enabled=False)
+        profile.checkpoint("stage")
+        self.assertIsNone(profile.finish())
+        self.assertIsNone(profile.request_id)
+
+    def test_default_follows_config(self):
+        profile = start_profile("unit")
+        self.assertEqual(isinstance(profile, RequestMemoryProfile), memory_profiling.MEMORY_PROFILING)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
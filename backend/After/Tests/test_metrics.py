@@ -0,0 +1,127 @@
+"""
+Unit Tests for the local metrics collector (/metrics)
+"""
+
+import unittest
+
+from metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    REGISTRY,
+    STAGE_LATENCY,
+    CACHE_REQUESTS,
+    stage_timer,
+    record_cache,
+    cache_hit_rates,
+    rejection_reason_label,
+)
+
+
+class TestMetricTypes(unittest.TestCase):
+
+    def test_counter_with_labels(self):
+        c = Counter("test_total", "help", ("reason",))
+        c.inc(reason="dark")
+        c.inc(2, reason="dark")
+        c.inc(reason="glare")
+
+        self.assertEqual(c.get(reason="dark"), 3)
+        self.assertEqual(c.get(reason="glare"), 1)
+
+    def test_counter_rejects_negative_and_wrong_labels(self):
+        c = Counter("test_total", "help", ("reason",))
+        with self.assertRaises(ValueError):
+            c.inc(-1, reason="x")
+        with self.assertRaises(ValueError):
+            c.inc(stage="x")
+
+    def test_gauge_inc_dec(self):
+        g = Gauge("test_gauge", "help")
+        g.inc()
+        g.inc()
+        g.dec()
+        self.assertEqual(g.get(), 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        h = Histogram("test_seconds", "help", ("stage",), buckets=(0.1, 1.0))
+        h.observe(0.05, stage="a")
+        h.observe(0.5, stage="a")
+        h.observe(5.0, stage="a")
+
+        text = "\n".join(h.render())
+        self.assertIn('test_seconds_bucket{stage="a",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="a",le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{stage="a",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{stage="a"} 3', text)
+
+    def test_histogram_boundary_value_lands_in_bucket(self):
+        """Prometheus buckets are 'less than or equal'"""
+        h = Histogram("test_seconds", "help", buckets=(1.0,))
+        h.observe(1.0)
+        self.assertIn('test_seconds_bucket{le="1"} 1', "\n".join(h.render()))
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_render_includes_help_and_type(self):
+        reg = Registry()
+        reg.register(Counter("x_total", "Things counted"))
+        text = reg.render()
+
+        self.assertIn("# HELP x_total Things counted", text)
+        self.assertIn("# TYPE x_total counter", text)
+
+    def test_duplicate_names_rejected(self):
+        reg = Registry()
+        reg.register(Counter("x_total", "a"))
+        with self.assertRaises(ValueError):
+            reg.register(Counter("x_total", "b"))
+
+    def test_collectors_run_before_scrape(self):
+        reg = Registry()
+        g = reg.register(Gauge("depth", "queue depth"))
+        reg.add_collector(lambda: g.set(7))
+
+        self.assertIn("depth 7", reg.render())
+
+    def test_label_values_are_escaped(self):
+        reg = Registry()
+        c = reg.register(Counter("x_total", "a", ("reason",)))
+        c.inc(reason='say "hi"')
+        self.assertIn('reason="say \\"hi\\""', reg.render())
+
+
+class TestPipelineHelpers(unittest.TestCase):
+
+    def test_stage_timer_records_observation(self):
+        before = STAGE_LATENCY.snapshot().get("unit_test_stage", {}).get("count", 0)
+        with stage_timer("unit_test_stage"):
+            pass
+        after = STAGE_LATENCY.snapshot()["unit_test_stage"]["count"]
+        self.assertEqual(after, before + 1)
+
+    def test_cache_hit_rate(self):
+        CACHE_REQUESTS.clear()
+        record_cache("unit", True)
+        record_cache("unit", True)
+        record_cache("unit", False)
+        record_cache("unit", True)
+
+        self.assertEqual(cache_hit_rates()["unit"], 0.75)
+
+    def test_rejection_reason_label(self):
+        self.assertEqual(rejection_reason_label("Glare Detected (42%)"), "Glare Detected")
+        self.assertEqual(rejection_reason_label("AI Detected Junk"), "AI Detected Junk")
+        self.assertEqual(rejection_reason_label(""), "Unknown")
+
+    def test_global_registry_exports_pipeline_metrics(self):
+        text = REGISTRY.render()
+        self.assertIn("album_stage_duration_seconds", text)
+        self.assertIn("album_photos_rejected_total", text)
+        self.assertIn("album_http_requests_in_flight", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Unit Tests for the offline reverse geocoder used in album titles
+"""
+
+import time
+import unittest
+
+import numpy as np
+
+from offline_geocoder import (
+    OfflineReverseGeocoder, Place, album_centroid, load_place_table, place_title,
+    KIND_DISTRICT, KIND_POI, KIND_PROVINCE,
+)
+
+
+class TestPlaceTable(unittest.TestCase):
+
+    def test_bundled_table(self):
+        places = load_place_table()
+        kinds = {p.kind for p in places}
+        self.assertEqual(kinds, {KIND_POI, KIND_DISTRICT, KIND_PROVINCE})
+        self.assertEqual(sum(p.kind == KIND_PROVINCE for p in places), 63)
+        for p in places:
+            self.assertTrue(8.0 < p.lat < 23.5 and 102.0 < p.lon < 110.0, p)
+        # POIs that are Before destinations keep their landmark id
+        ho_guom = next(p for p in places if p.name == "Hồ Hoàn Kiếm")
+        self.assertIsNotNone(ho_guom.landmark_id)
+
+
+class TestOfflineReverseGeocoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.geo = OfflineReverseGeocoder().load()
+
+    def test_poi_accuracy(self):
+        cases = {
+            (21.0290, 105.8522): "Hồ Hoàn Kiếm",
+            (16.4700, 107.5790): "Kinh thành Huế",
+            (15.8775, 108.3270): "Phố cổ Hội An",
+            (10.7727, 106.6982): "Chợ Bến Thành",
+            (20.2185, 105.9365): "Tam Cốc - Bích Động",
+            (22.8548, 106.7228): "Thác Bản Giốc",
+        }
+        for (lat, lon), name in cases.items():
+            match = self.geo.resolve(lat, lon)
+            self.assertEqual(match.label, name, (lat, lon))
+            self.assertLess(match.distance_km, 1.0)
+
+    def test_falls_back_to_district_then_province(self):
+        district = self.geo.resolve(21.0058, 105.8600)           # residential Hai Bà Trưng, no POI nearby
+        self.assertEqual(district.place.kind, KIND_DISTRICT)
+        self.assertEqual(district.label, "Hai Bà Trưng, Hà Nội")
+
+        province = self.geo.resolve(21.3000, 104.5000)           # countryside between Sơn La and Mộc Châu
+        self.assertEqual(province.place.kind, KIND_PROVINCE)
+        self.assertEqual(province.label, "Sơn La")
+
+    def test_far_from_everything_is_none(self):
+        self.assertIsNone(self.geo.resolve(12.0, 112.0))        # open sea
+        self.assertIsNone(self.geo.resolve(48.8566, 2.3522))    # Paris
+
+    def test_batch_keeps_order_and_skips_missing(self):
+        results = self.geo.resolve_many([(21.0290, 105.8522), None, (12.0, 112.0), (16.4700, 107.5790)])
+        self.assertEqual([r.label if r else None for r in results],
+                         ["Hồ Hoàn Kiếm", None, None, "Kinh thành Huế"])
+        self.assertEqual(self.geo.resolve_many([]), [])
+
+    def test_batch_latency(self):
+        rng = np.random.default_rng(0)
+        points = list(zip(rng.uniform(8.5, 23.3, 5000), rng.uniform(102.2, 109.5, 5000)))
+        self.geo.resolve_many(points[:10])    # warm-up
+        start = time.perf_counter()
+        results = self.geo.resolve_many(points)
+        per_point_us = (time.perf_counter() - start) / len(points) * 1e6
+        self.assertEqual(len(results), len(points))
+        self.assertLess(per_point_us, 100.0)
+
+    def test_in_memory_table_and_radii(self):
+        geo = OfflineReverseGeocoder(places=[
+            Place("A", KIND_POI, "P", 10.0, 106.0),
+            Place("P", KIND_PROVINCE, "P", 10.5, 106.0),
+        ], radii_km={KIND_POI: 1.0, KIND_DISTRICT: 5.0, KIND_PROVINCE: 100.0})
+        self.assertEqual(geo.resolve(10.005, 106.0).label, "A")    # ~0.56 km
+        self.assertEqual(geo.resolve(10.02, 106.0).label, "P")     # ~2.2 km: too far for the POI
+        self.assertEqual(len(geo), 2)
+
+
+class TestTitleHelpers(unittest.TestCase):
+
+    def test_album_centroid_ignores_missing_gps(self):
+        self.assertEqual(album_centroid([(10.0, 106.0), (None, None), (12.0, 108.0)]), (11.0, 107.0))
+        self.assertIsNone(album_centroid([(None, 106.0)]))
+
+    def test_place_title(self):
+        self.assertEqual(place_title("2025-02-17 14:30", "Hồ Hoàn Kiếm"), "Hồ Hoàn Kiếm · 2025-02-17 14:30")
+        self.assertEqual(place_title("Undated Event", None), "Undated Event")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Unit Tests for the columnar PhotoBatch used by the clustering layer (columns, sub-batches, groups, parity with the model-based dispatch)
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from clustering.batch import PhotoBatch, make_group, time_title, to_albums
+from clustering.service import ClusteringService
+from schemas import PhotoInput
+
+
+def photo(i, **kwargs):
+    return PhotoInput(id=f"p{i}", filename=f"p{i}.jpg", local_path=f"p{i}.jpg", **kwargs)
+
+
+class TestPhotoBatch(unittest.TestCase):
+
+    def test_columns_and_missing_values(self):
+        photos = [
+            photo(0, timestamp=datetime(2024, 1, 1, 8, 0), latitude=10.5, longitude=106.1, score=0.9),
+            photo(1, score=0.2, is_rejected=True),
+            photo(2, timestamp=datetime(2024, 1, 1, 8, 0, tzinfo=timezone(timedelta(hours=7)))),
+        ]
+        batch = PhotoBatch.from_inputs(photos)
+        self.assertEqual(batch.index.tolist(), [0, 1, 2])
+        self.assertEqual(batch.timestamp[0] - batch.timestamp[2], 7 * 3600)     # aware -> UTC
+        self.assertTrue(np.isnan(batch.timestamp[1]) and np.isnan(batch.lat[1]))
+        self.assertEqual(batch.rejected.tolist(), [False, True, False])
+        self.assertFalse(batch.has_time)
+
+        clean = batch.take(~batch.rejected)
+        self.assertEqual(clean.index.tolist(), [0, 2])
+        self.assertTrue(clean.has_time)
+        self.assertFalse(clean.has_gps)
+
+    def test_groups_order_by_score_then_time_and_title_from_earliest(self):
+        base = datetime(2024, 3, 2, 9, 30)
+        photos = [photo(i, timestamp=base + timedelta(minutes=10 - i), score=s) for i, s in enumerate([0.5, 0.9, 0.5, 0.1])]
+        batch = PhotoBatch.from_inputs(photos)
+        group = make_group(batch, np.arange(4), time_title(batch, np.arange(4)), "jenks_gvf")
+        self.assertEqual(group.index.tolist(), [1, 2, 0, 3])
+        self.assertEqual(group.title, "2024-03-02 09:37")
+        self.assertEqual([p.id for p in group.photos(photos)], ["p1", "p2", "p0", "p3"])
+
+        album = to_albums([group], photos)[0]
+        self.assertEqual(album.photos[0].score, 0.9)
+        self.assertEqual(album.photos[0].timestamp, photos[1].timestamp)
+
+
+class TestDispatchBatch(unittest.TestCase):
+
+    def make_library(self, with_gps, with_time=True):
+        rng = np.random.default_rng(4)
+        base = datetime(2024, 6, 1, 8, 0)
+        return [
+            photo(i, timestamp=base + timedelta(hours=(i // 20) * 6, minutes=i % 20) if with_time else None,
+                  latitude=10.0 + (i // 20) * 0.1 if with_gps else None,
+                  longitude=106.0 if with_gps else None,
+                  score=float(rng.random()), is_rejected=i % 17 == 0)
+            for i in range(120)
+        ]
+
+    def test_groups_match_dispatched_albums(self):
+        for with_gps, with_time in ((True, True), (False, True), (True, False), (False, False)):
+            with self.subTest(gps=with_gps, time=with_time):
+                photos = self.make_library(with_gps, with_time)
+                groups = ClusteringService.dispatch_batch(PhotoBatch.from_inputs(photos))
+                albums = ClusteringService.dispatch(photos)
+                self.assertEqual([(g.title, g.method, [photos[i].id for i in g.index]) for g in groups],
+                                 [(a.title, a.method, [p.id for p in a.photos]) for a in albums])
+                self.assertEqual(sum(len(g.index) for g in groups), len(photos))
+                self.assertEqual(groups[-1].method, "filters_rejected")
+
+    def test_empty_batch(self):
+        self.assertEqual(ClusteringService.dispatch_batch(PhotoBatch.from_inputs([])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
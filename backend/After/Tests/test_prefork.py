@@ -0,0 +1,60 @@
+"""
+Unit Tests for pre-fork sharing (gunicorn master preload + gc.freeze) and the memory report parser
+"""
+
+import gc
+import unittest
+
+from benchmarks.measure_prefork_memory import parse_smaps_rollup
+from prefork import freeze, preload_shared_state
+from warmup import WarmUp
+
+
+class FakePlaceIndex:
+    def __init__(self):
+        self.loaded = 0
+
+    def load(self):
+        self.loaded += 1
+
+
+class TestPrefork(unittest.TestCase):
+
+    def test_preload_shares_imports_but_builds_no_models(self):
+        import filters.junk_detector as junk_detector
+        before = junk_detector._junk_model
+        index, w = FakePlaceIndex(), WarmUp()
+
+        preload_shared_state(index, w)
+
+        self.assertEqual(index.loaded, 1)
+        self.assertEqual(set(w.timings), {"prefork_imports", "prefork_thread_budget", "prefork_place_index"})
+        # Building the model before fork would deadlock the workers
+        self.assertIs(junk_detector._junk_model, before)
+
+    def test_freeze_moves_objects_to_permanent_generation(self):
+        try:
+            freeze()
+            self.assertGreater(gc.get_freeze_count(), 0)
+        finally:
+            gc.unfreeze()
+
+    def test_parse_smaps_rollup(self):
+        text = (
+            "55d0c0000000-7ffd00000000 ---p 00000000 00:00 0   [rollup]\n"
+            "Rss:              204800 kB\n"
+            "Pss:              102400 kB\n"
+            "Shared_Clean:      51200 kB\n"
+            "Shared_Dirty:      51200 kB\n"
+            "Private_Clean:         0 kB\n"
+            "Private_Dirty:    102400 kB\n"
+            "Swap:                  0 kB\n"
+        )
+        self.assertEqual(parse_smaps_rollup(text), {
+            "rss": 200.0, "pss": 100.0, "shared_clean": 50.0,
+            "shared_dirty": 50.0, "private_clean": 0.0, "private_dirty": 100.0,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
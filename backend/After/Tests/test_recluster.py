@@ -0,0 +1,111 @@
+"""
+Unit Tests for multi-resolution re-clustering (single-linkage hierarchy vs direct ST-DBSCAN, hierarchy cache, degenerate inputs)
+"""
+
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.fakes import InMemoryCollection
+from clustering.algorithms import cluster_spatiotemporal
+from clustering.batch import PhotoBatch
+from clustering.dedup import collapse_coordinates
+from clustering.hierarchy import build_spatial_hierarchy
+from clustering.service import ClusteringService
+from clustering_cache import HierarchyCache
+from schemas import PhotoInput
+
+
+def make_trip(seed, n=300):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([10.0, 105.0], [10.3, 105.4], size=(12, 2))
+    pick = rng.integers(0, len(centers), n)
+    spread = rng.choice([0.00005, 0.002, 0.01], size=n)[:, None]
+    pts = np.round(centers[pick] + rng.normal(0, 1, size=(n, 2)) * spread, 5)
+    base = datetime(2024, 6, 1, 7, 0)
+    minutes = np.sort(rng.uniform(0, 4 * 24 * 60, n))
+    return [
+        PhotoInput(id=f"p{i}", filename=f"p{i}.jpg", timestamp=base + timedelta(minutes=float(minutes[i])),
+                   latitude=float(pts[i, 0]), longitude=float(pts[i, 1]), score=float(rng.uniform()))
+        for i in range(n)
+    ]
+
+
+def summary(groups, photos):
+    return [(g.title, g.method.replace("st_hierarchy", "st_dbscan"), [photos[i].filename for i in g.index]) for g in groups]
+
+
+class TestMatchesDirectRuns(unittest.TestCase):
+
+    def test_every_resolution_matches_st_dbscan(self):
+        for seed in range(3):
+            photos = make_trip(seed)
+            batch = PhotoBatch.from_inputs(photos)
+            cache = HierarchyCache()
+            for dist_m, gap_min in ((10, 30), (150, 60), (700, 120), (3000, 240), (40000, 1440)):
+                with self.subTest(seed=seed, dist_m=dist_m, gap_min=gap_min):
+                    direct = cluster_spatiotemporal(batch, dist_m, gap_min, engine="dbscan")
+                    got = ClusteringService.recluster(batch, dist_m, gap_min, cache)
+                    self.assertEqual(summary(got, photos), summary(direct, photos))
+            self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_coarser_distance_only_merges(self):
+        points = collapse_coordinates(*np.array([[p.latitude, p.longitude] for p in make_trip(7)]).T, 5)
+        hierarchy = build_spatial_hierarchy(points.coords)
+        self.assertEqual(len(hierarchy.length), hierarchy.n_points - 1)
+        fine, coarse = hierarchy.labels_at(1e-5), hierarchy.labels_at(1e-4)
+        for label in np.unique(fine):
+            self.assertEqual(len(np.unique(coarse[fine == label])), 1)
+
+
+class TestHierarchyCache(unittest.TestCase):
+
+    def test_built_once_for_shuffled_or_renamed_upload(self):
+        photos = make_trip(1)
+        cache = HierarchyCache(collection=InMemoryCollection("ClusteringCache"))
+        first = ClusteringService.recluster(PhotoBatch.from_inputs(photos), 500, 90, cache)
+
+        shuffled = [p.model_copy(update={"filename": "x" + p.filename}) for p in photos]
+        random.Random(5).shuffle(shuffled)
+        fresh = HierarchyCache(collection=cache.collection)
+        with mock.patch("clustering_cache.build_spatial_hierarchy") as build:
+            again = ClusteringService.recluster(PhotoBatch.from_inputs(shuffled), 500, 90, fresh)
+        build.assert_not_called()
+        self.assertEqual(sorted(len(g.index) for g in first), sorted(len(g.index) for g in again))
+
+
+class TestDegenerateInputs(unittest.TestCase):
+
+    def test_small_and_partial_sets(self):
+        base = datetime(2024, 1, 1, 9, 0)
+        photos = [
+            PhotoInput(id="a", filename="a.jpg", timestamp=base, latitude=10.0, longitude=106.0),
+            PhotoInput(id="b", filename="b.jpg", timestamp=base, latitude=10.0, longitude=106.0),
+            PhotoInput(id="c", filename="c.jpg", timestamp=base + timedelta(minutes=5), latitude=10.0001, longitude=106.0),
+            PhotoInput(id="d", filename="d.jpg", timestamp=None, latitude=10.0, longitude=106.0),
+            PhotoInput(id="e", filename="e.jpg", timestamp=base, is_rejected=True),
+        ]
+        batch = PhotoBatch.from_inputs(photos)
+        self.assertEqual(ClusteringService.recluster(PhotoBatch.from_inputs([]), 700, 120), [])
+        groups = ClusteringService.recluster(batch, 700, 120)
+        self.assertEqual([(g.method, sorted(photos[i].id for i in g.index)) for g in groups], [
+            ("st_hierarchy", ["a", "b", "c"]),
+            ("no_metadata_fallback", ["d"]),
+            ("filters_rejected", ["e"]),
+        ])
+        # Two photos ~11 m apart stay apart at 5 m and fall into the low-density album
+        self.assertEqual(ClusteringService.recluster(batch.take(np.array([0, 2])), 5, 120)[0].method, "cleanup_collection")
+
+    def test_collinear_fixes_use_the_exact_fallback(self):
+        lat = np.full(40, 10.0)
+        lon = 106.0 + np.arange(40) * 0.001
+        hierarchy = build_spatial_hierarchy(np.column_stack((lat, lon)))
+        self.assertEqual(len(hierarchy.length), 39)
+        self.assertEqual(len(np.unique(hierarchy.labels_at(hierarchy.length.max()))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
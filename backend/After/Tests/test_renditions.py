@@ -0,0 +1,146 @@
+"""
+Unit Tests for photo renditions (WebP/AVIF sizes, orientation, reuse) and BlurHash
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from renditions import (
+    RenditionStore, blurhash_decode, blurhash_encode, parse_formats, parse_sizes, photo_fields,
+)
+
+
+def gradient(width=24, height=32) -> Image.Image:
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    return Image.fromarray(np.tile(row[None, :, None], (height, 1, 3)), "RGB")
+
+
+def photo(width=1600, height=1200, orientation=None) -> Image.Image:
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    arr[: height // 2, : width // 2] = (255, 0, 0)     # red top-left quadrant, to check orientation
+    img = Image.fromarray(arr, "RGB")
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.info["exif"] = exif.tobytes()
+    return img
+
+
+class TestBlurHash(unittest.TestCase):
+
+    def test_matches_reference_encoder(self):
+        # Value produced by the reference (woltapp) implementation for the same pixels
+        self.assertEqual(blurhash_encode(gradient(), 4, 3), "L$HoI600xuayofWBj[fQfQfQfQfQ")
+
+    def test_decode_reproduces_average_colour(self):
+        img = Image.new("RGB", (40, 30), (200, 120, 40))
+        placeholder = blurhash_decode(blurhash_encode(img), 32, 24)
+        self.assertEqual(placeholder.shape, (24, 32, 3))
+        mean = placeholder.reshape(-1, 3).mean(axis=0)
+        self.assertTrue(np.all(np.abs(mean - (200, 120, 40)) <= 2), mean)
+
+    def test_component_count_is_encoded(self):
+        self.assertEqual(len(blurhash_encode(gradient(), 4, 3)), 6 + 2 * (4 * 3 - 1))
+        self.assertEqual(len(blurhash_encode(gradient(), 1, 1)), 6)
+
+
+class TestRenditionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _store(self, **kwargs):
+        defaults = dict(root=self.dir, sizes="grid:128,preview:512,full:1024", formats="webp")
+        defaults.update(kwargs)
+        return RenditionStore(**defaults)
+
+    def _open(self, url):
+        return Image.open(os.path.join(self.dir, url.split("/renditions/", 1)[1]))
+
+    def test_generates_each_size_and_format(self):
+        meta = self._store(formats="webp,avif").generate(photo(), "abcdef0123")
+        self.assertEqual((meta["width"], meta["height"]), (1600, 1200))
+        self.assertEqual(set(meta["renditions"]), {"grid", "preview", "full", "grid_avif", "preview_avif", "full_avif"})
+        for key, edge in (("grid", 128), ("preview", 512), ("full", 1024)):
+            self.assertTrue(meta["renditions"][key].startswith("/renditions/ab/abcdef0123-"))
+            with self._open(meta["renditions"][key]) as im:
+                self.assertEqual(im.format, "WEBP")
+                self.assertEqual(max(im.size), edge)
+            with self._open(meta["renditions"][f"{key}_avif"]) as im:
+                self.assertEqual(im.format, "AVIF")
+        self.assertLess(meta["bytes"]["grid"], meta["bytes"]["preview"])
+        self.assertTrue(meta["blurhash"])
+
+    def test_small_images_are_not_upscaled(self):
+        meta = self._store().generate(photo(300, 200), "small")
+        with self._open(meta["renditions"]["full"]) as im:
+            self.assertEqual(im.size, (300, 200))
+
+    def test_exif_orientation_is_applied(self):
+        meta = self._store().generate(photo(orientation=6), "rotated")
+        self.assertEqual((meta["width"], meta["height"]), (1200, 1600))
+        with self._open(meta["renditions"]["preview"]) as im:
+            self.assertEqual(im.size, (384, 512))
+            # rotated 90° clockwise: the red quadrant moves to the top-right
+            r, g, b = im.convert("RGB").getpixel((im.width * 3 // 4, im.height // 4))
+            self.assertGreater(r, 200)
+            self.assertLess(g, 60)
+
+    def test_existing_renditions_are_reused(self):
+        store = self._store()
+        first = store.generate(photo(), "same-hash")
+        self.assertEqual(store.generate(None, "same-hash"), first)     # no decode needed
+
+    def test_settings_change_gives_new_urls(self):
+        a = self._store().generate(photo(), "k")
+        b = self._store(sizes="grid:200").generate(photo(), "k")
+        self.assertNotEqual(a["renditions"]["grid"], b["renditions"]["grid"])
+
+    def test_concurrent_writers_of_one_key(self):
+        store = self._store()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store._generate(photo(), "race")))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len({json.dumps(r, sort_keys=True) for r in results}), 1)
+        leftovers = [n for _, _, names in os.walk(self.dir) for n in names if n.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+    def test_broken_image_returns_nothing(self):
+        self.assertEqual(self._store().generate(None, "broken"), {})
+
+    def test_local_path(self):
+        store = self._store()
+        meta = store.generate(photo(), "abcdef")
+        self.assertTrue(os.path.isfile(store.local_path(meta["renditions"]["grid"])))
+        self.assertIsNone(store.local_path("https://res.cloudinary.com/x.jpg"))
+        self.assertIsNone(store.local_path(None))
+
+    def test_photo_fields(self):
+        meta = {"width": 1, "height": 2, "blurhash": "x", "renditions": {}, "bytes": {}}
+        self.assertEqual(set(photo_fields(meta)), {"width", "height", "blurhash", "renditions"})
+        self.assertEqual(photo_fields({}), {})
+        self.assertEqual(photo_fields(None), {})
+
+    def test_parsers(self):
+        self.assertEqual(parse_sizes("grid:256, full:2048"), {"grid": 256, "full": 2048})
+        self.assertEqual(parse_formats("WebP, avif, gif"), ["webp", "avif"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Unit Tests for the shared-album payload cache and ETag helpers
+"""
+
+import asyncio
+import unittest
+
+from album_repository import AsyncAlbumRepository
+from benchmarks.fakes import AsyncInMemoryCollection
+from shared_album_cache import SharedAlbumCache, etag_matches, make_etag
+from Tests.test_album_repository import make_album
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSharedAlbumCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = SharedAlbumCache(max_entries=2, ttl_seconds=30, clock=self.clock)
+        # token -> album the link opens, standing in for the repository lookup
+        self.links = {"tok": "album-1", "a": "album-a", "b": "album-b", "c": "album-c"}
+
+    def get(self, token, cache=None):
+        async def shared_album_id(t):
+            return self.links.get(t)
+        return asyncio.run((cache or self.cache).get_verified(token, shared_album_id))
+
+    def test_hit_returns_same_bytes_and_etag(self):
+        put = self.cache.put("tok", "album-1", b'{"title":"A"}')
+        got = self.get("tok")
+        self.assertEqual(got.body, b'{"title":"A"}')
+        self.assertEqual(got.etag, put.etag)
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.put("tok", "album-1", b"x")
+        self.clock.now += 29
+        self.assertIsNotNone(self.get("tok"))
+        self.clock.now += 2
+        self.assertIsNone(self.get("tok"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_lru_eviction_keeps_recently_used(self):
+        self.cache.put("a", "album-a", b"a")
+        self.cache.put("b", "album-b", b"b")
+        self.get("a")
+        self.cache.put("c", "album-c", b"c")
+        self.assertIsNotNone(self.get("a"))
+        self.assertIsNone(self.get("b"))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_invalidate_album_drops_its_tokens_only(self):
+        self.cache.put("a", "album-a", b"a")
+        self.cache.put("b", "album-b", b"b")
+        self.cache.invalidate_album("album-a")
+        self.assertIsNone(self.get("a"))
+        self.assertIsNotNone(self.get("b"))
+
+    def test_revoke_on_another_worker_is_not_served(self):
+        albums = AsyncInMemoryCollection("Albums")
+        repo = AsyncAlbumRepository(albums)
+        asyncio.run(repo.insert_albums([make_album(0)]))
+        asyncio.run(repo.enable_share("album-000", "tok"))
+        worker_a = SharedAlbumCache(ttl_seconds=60, clock=self.clock)
+        worker_b = SharedAlbumCache(ttl_seconds=60, clock=self.clock)
+        for cache in (worker_a, worker_b):
+            cache.put("tok", "album-000", b"body")
+        self.assertIsNotNone(asyncio.run(worker_b.get_verified("tok", repo.shared_album_id)))
+
+        # Worker A handles the revoke; worker B never hears about it
+        asyncio.run(repo.revoke_share("album-000", "u1"))
+        worker_a.invalidate_album("album-000")
+        self.assertIsNone(asyncio.run(worker_b.get_verified("tok", repo.shared_album_id)))
+        self.assertEqual(worker_b.stats()["entries"], 0)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = SharedAlbumCache(max_entries=0, ttl_seconds=30)
+        entry = cache.put("tok", "album", b"body")
+        self.assertEqual(entry.etag, make_etag(b"body"))
+        self.assertIsNone(self.get("tok", cache))
+
+
+class TestEtags(unittest.TestCase):
+
+    def test_strong_etag_changes_with_body(self):
+        self.assertTrue(make_etag(b"a").startswith('"'))
+        self.assertNotEqual(make_etag(b"a"), make_etag(b"b"))
+        self.assertEqual(make_etag(b"a"), make_etag(b"a"))
+
+    def test_if_none_match(self):
+        etag = make_etag(b"a")
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", {etag}', etag))
+        self.assertTrue(etag_matches(f"W/{etag}", etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches('"other"', etag))
+
+
+if __name__ == "__main__":
+    unittest.main()
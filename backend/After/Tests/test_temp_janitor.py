@@ -0,0 +1,127 @@
+"""
+Unit Tests for the PROCESSED_DIR janitor (workspaces, TTL, high-water eviction, metrics)
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from collections import namedtuple
+
+from temp_janitor import (
+    ACTIVE_MARKER, TEMP_BYTES_FREED, TEMP_DIR_BYTES, TEMP_FILES_REMOVED, TempJanitor,
+)
+
+Usage = namedtuple("Usage", "total used free")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+class TestTempJanitor(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.disk = Usage(100, 10, 90)
+        TEMP_FILES_REMOVED.clear()
+        TEMP_BYTES_FREED.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _janitor(self, **kwargs):
+        defaults = dict(root=self.dir, ttl=600, max_bytes=10_000, low_water=0.5, disk_high_water=0.9,
+                        clock=self.clock, disk_usage=lambda _: self.disk)
+        defaults.update(kwargs)
+        return TempJanitor(**defaults)
+
+    def _fill(self, workspace, n_files=2, size=1000, age=0):
+        for i in range(n_files):
+            with open(os.path.join(workspace, f"{i}.jpg"), "wb") as f:
+                f.write(b"x" * size)
+        past = self.clock.now - age
+        os.utime(workspace, (past, past))
+        marker = os.path.join(workspace, ACTIVE_MARKER)
+        if os.path.exists(marker):
+            os.utime(marker, (past, past))
+
+    def test_finish_removes_workspace_and_counts(self):
+        janitor = self._janitor()
+        ws = janitor.open_workspace()
+        self.assertTrue(os.path.exists(os.path.join(ws, ACTIVE_MARKER)))
+        self._fill(ws, n_files=3, size=500)
+        janitor.finish(ws)
+        self.assertFalse(os.path.exists(ws))
+        self.assertEqual(TEMP_FILES_REMOVED.get(reason="finished"), 3)
+        self.assertEqual(TEMP_BYTES_FREED.get(reason="finished"), 1500)
+        janitor.finish(ws)    # idempotent
+
+    def test_sweep_keeps_active_and_removes_finished_and_expired(self):
+        janitor = self._janitor()
+        active = janitor.open_workspace()
+        self._fill(active, age=30)
+        crashed = janitor.open_workspace()
+        self._fill(crashed, age=3600)                      # marker older than TTL
+        finished = janitor.open_workspace()
+        self._fill(finished)
+        os.remove(os.path.join(finished, ACTIVE_MARKER))   # finish() could not delete it
+        old_loose = os.path.join(self.dir, "legacy-old.jpg")
+        new_loose = os.path.join(self.dir, "legacy-new.jpg")
+        for path, age in ((old_loose, 3600), (new_loose, 10)):
+            with open(path, "wb") as f:
+                f.write(b"y" * 100)
+            os.utime(path, (self.clock.now - age,) * 2)
+
+        report = janitor.sweep()
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted([os.path.basename(active), "legacy-new.jpg"]))
+        self.assertEqual(report["files_removed"], {"ttl": 3, "finished": 2})
+        self.assertEqual(report["bytes_freed"], {"ttl": 2100, "finished": 2000})
+        self.assertEqual(report["bytes"], 2100)
+        self.assertEqual(TEMP_DIR_BYTES.get(), 2100)
+
+    def test_high_water_evicts_oldest_first_never_active(self):
+        janitor = self._janitor(ttl=10_000)
+        for age in (300, 200, 100):
+            path = os.path.join(self.dir, f"loose-{age}")
+            os.makedirs(path)
+            self._fill(path, n_files=4, size=1000, age=age)     # 4000 bytes each
+        active = janitor.open_workspace()
+        self._fill(active, n_files=1, size=1000, age=500)
+
+        report = janitor.sweep()    # 13000 > 10000 -> evict down to 5000
+        self.assertEqual(report["files_removed"], {"high_water": 8})
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted(["loose-100", os.path.basename(active)]))
+        self.assertEqual(report["bytes"], 5000)
+
+    def test_disk_high_water_triggers_eviction(self):
+        janitor = self._janitor(ttl=10_000)
+        for age in (300, 100):
+            path = os.path.join(self.dir, f"loose-{age}.jpg")
+            with open(path, "wb") as f:
+                f.write(b"z" * 10)
+            os.utime(path, (self.clock.now - age,) * 2)
+        calls = iter([Usage(100, 95, 5), Usage(100, 95, 5), Usage(100, 80, 20)])
+        janitor._disk_usage = lambda _: next(calls, Usage(100, 80, 20))
+        report = janitor.sweep()
+        self.assertEqual(report["files_removed"], {"high_water": 1})
+        self.assertEqual(os.listdir(self.dir), ["loose-100.jpg"])
+
+    def test_purge_skips_running_requests(self):
+        janitor = self._janitor()
+        active = janitor.open_workspace()
+        self._fill(active)
+        other = os.path.join(self.dir, "stray.jpg")
+        open(other, "wb").close()
+        self.assertEqual(janitor.purge(), 1)
+        self.assertEqual(os.listdir(self.dir), [os.path.basename(active)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Unit Tests for startup warm-up (readiness, step ordering, failures) and lazy heavy imports
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+from warmup import STARTUP_STEP_SECONDS, WarmUp
+
+AFTER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def test_ready_only_after_background_steps(self):
+        release = threading.Event()
+        order = []
+
+        async def scenario():
+            w = WarmUp()
+            with w.step("inline"):
+                order.append("inline")
+            w.add("slow", lambda: (release.wait(5), order.append("slow")))
+            w.add("dependent", lambda: order.append("dependent"), after="slow")
+            w.add("independent", lambda: order.append("independent"))
+            w.start()
+            await asyncio.sleep(0.05)
+            self.assertFalse(w.ready)
+            self.assertEqual(set(w.status()["pending"]), {"slow", "dependent"})
+            release.set()
+            await asyncio.wait_for(w.wait(), 5)
+            return w
+
+        w = asyncio.run(scenario())
+        self.assertTrue(w.ready)
+        self.assertLess(order.index("slow"), order.index("dependent"))
+        self.assertEqual(set(w.timings), {"inline", "slow", "dependent", "independent"})
+        self.assertIsNotNone(w.status()["ready_after_s"])
+        self.assertGreater(STARTUP_STEP_SECONDS.get(step="slow"), 0)
+
+    def test_failed_step_is_reported_but_does_not_block(self):
+        def boom():
+            raise RuntimeError("model missing")
+
+        async def scenario():
+            w = WarmUp()
+            w.add("broken", boom)
+            w.add("after_broken", lambda: None, after="broken")
+            w.start()
+            await asyncio.wait_for(w.wait(), 5)
+            return w
+
+        status = asyncio.run(scenario()).status()
+        self.assertTrue(status["ready"])
+        self.assertEqual(status["errors"], {"broken": "model missing"})
+        self.assertIn("after_broken", status["steps_ms"])
+
+    def test_failed_required_step_keeps_service_unready(self):
+        def boom():
+            raise RuntimeError("mediapipe missing")
+
+        async def scenario():
+            w = WarmUp()
+            w.add("curator", boom, required=True)
+            w.add("optional", lambda: None)
+            w.start()
+            await asyncio.wait_for(w.wait(), 5)
+            return w
+
+        status = asyncio.run(scenario()).status()
+        self.assertFalse(status["ready"])
+        self.assertEqual(status["pending"], [])
+        self.assertEqual(status["errors"], {"curator": "mediapipe missing"})
+
+    def test_wait_without_start_returns(self):
+        asyncio.run(asyncio.wait_for(WarmUp().wait(), 1))
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_heavy_frameworks_not_imported_at_module_load(self):
+        code = (
+            "import sys\n"
+            "import clustering.service, filters.junk_detector, filters.lighting, curation_service, lighting_filter, offline_geocoder\n"
+            "heavy = ('tensorflow', 'tf_keras', 'mediapipe', 'cv2', 'sklearn', 'hdbscan', 'jenkspy')\n"
+            "print('HEAVY=' + ','.join(m for m in heavy if m in sys.modules))\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=AFTER_DIR, capture_output=True, text=True, timeout=120)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertIn("HEAVY=\n", out.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
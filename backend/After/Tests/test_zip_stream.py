@@ -0,0 +1,343 @@
+"""
+Unit Tests for the streamed stored-mode ZIP export (layout, Range, data descriptor entries, sources)
+"""
+
+import io
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from zip_stream import (
+    HttpSource, LocalFileSource, MemberUnavailable, RangeNotSatisfiable, StreamedZip, ZipEntry,
+    build_album_zip, content_disposition, member_name, parse_range,
+)
+
+
+class MemorySource:
+    """name -> bytes; counts reads so tests can check what was (not) fetched."""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.reads = []
+
+    def read(self, ref, offset, length):
+        self.reads.append((ref, offset, length))
+        yield self.blobs[ref][offset:offset + length]
+
+    def read_all(self, ref):
+        self.reads.append((ref, 0, None))
+        if ref not in self.blobs:
+            raise MemberUnavailable(f"{ref} is gone")
+        yield self.blobs[ref]
+
+
+class ZeroSource:
+    """Huge members without the memory: every byte is 0."""
+
+    def read(self, ref, offset, length):
+        while length > 0:
+            n = min(length, 1 << 20)
+            length -= n
+            yield bytes(n)
+
+
+class RangeFile(io.RawIOBase):
+    """Seekable read-only view of a StreamedZip, so zipfile can parse it without materialising it."""
+
+    def __init__(self, archive: StreamedZip):
+        self.archive = archive
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.archive.content_length}[whence]
+        self.pos = base + offset
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def readinto(self, buf):
+        data = b"".join(self.archive.iter_range(self.pos, self.pos + len(buf)))
+        buf[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+
+def entry(source, ref, name=None, **kwargs):
+    data = source.blobs[ref]
+    return ZipEntry(name or ref, source, ref, len(data), zlib.crc32(data), **kwargs)
+
+
+class Unseekable(io.RawIOBase):
+    """Write-only stream: zipfile falls back to data descriptors on it."""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buf += b
+        return len(b)
+
+
+class TestStreamedZip(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.source = MemorySource({
+            "a.jpg": rng.randbytes(5000),
+            "b.jpg": rng.randbytes(1),
+            "empty.jpg": b"",
+            "Ảnh Hồ Gươm.jpg": rng.randbytes(3000),
+        })
+        self.archive = StreamedZip([entry(self.source, ref) for ref in self.source.blobs])
+        self.full = b"".join(self.archive)
+
+    def test_valid_archive_with_exact_length(self):
+        self.assertEqual(len(self.full), self.archive.content_length)
+        with zipfile.ZipFile(io.BytesIO(self.full)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), list(self.source.blobs))
+            for info in zf.infolist():
+                self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(zf.read(info), self.source.blobs[info.filename])
+
+    def test_same_bytes_as_zipfile(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for name, data in self.source.blobs.items():
+                info = zipfile.ZipInfo(name, (1980, 1, 1, 0, 0, 0))
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+        self.assertEqual(self.full, buf.getvalue())
+
+    def test_any_range_matches_full_archive(self):
+        rng = random.Random(1)
+        total = self.archive.content_length
+        for _ in range(300):
+            start = rng.randrange(total)
+            end = rng.randrange(start, total + 1)
+            self.assertEqual(b"".join(self.archive.iter_range(start, end)), self.full[start:end])
+
+    def test_resume_reads_only_remaining_members(self):
+        resume_at = self.full.index(b"b.jpg")    # inside the second local header
+        self.source.reads.clear()
+        tail = b"".join(self.archive.iter_range(resume_at))
+        self.assertEqual(tail, self.full[resume_at:])
+        self.assertNotIn("a.jpg", [ref for ref, _, _ in self.source.reads])
+
+    def test_etag_follows_content(self):
+        same = StreamedZip([entry(self.source, ref) for ref in self.source.blobs])
+        self.assertEqual(same.etag, self.archive.etag)
+        self.source.blobs["b.jpg"] = b"x"
+        changed = StreamedZip([entry(self.source, ref) for ref in self.source.blobs])
+        self.assertNotEqual(changed.etag, self.archive.etag)
+
+    def test_zip64_layout_past_4gib(self):
+        zeros = ZeroSource()
+        big = 0xFFFFFFFF + 10
+        archive = StreamedZip([
+            ZipEntry("big.bin", zeros, "big", big, 0),
+            ZipEntry("after.jpg", self.source, "a.jpg", 5000, zlib.crc32(self.source.blobs["a.jpg"])),
+        ])
+        self.assertGreater(archive.content_length, big)
+        with zipfile.ZipFile(RangeFile(archive)) as zf:
+            infos = {i.filename: i for i in zf.infolist()}
+            self.assertEqual(infos["big.bin"].file_size, big)
+            self.assertGreater(infos["after.jpg"].header_offset, 0xFFFFFFFF)
+            self.assertEqual(zf.read("after.jpg"), self.source.blobs["a.jpg"])
+
+
+class TestDataDescriptorEntries(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(2)
+        self.source = MemorySource({"a.jpg": rng.randbytes(5000), "empty.jpg": b"", "Ảnh.jpg": rng.randbytes(700)})
+
+    def unknown(self, ref):
+        return ZipEntry(ref, self.source, ref, None, None)
+
+    def test_same_bytes_as_zipfile_on_unseekable_output(self):
+        archive = StreamedZip([self.unknown(ref) for ref in self.source.blobs])
+        self.assertIsNone(archive.content_length)
+        self.assertIsNone(archive.etag)
+        out = Unseekable()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+            for name, data in self.source.blobs.items():
+                info = zipfile.ZipInfo(name, (1980, 1, 1, 0, 0, 0))
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+        self.assertEqual(b"".join(archive), bytes(out.buf))
+
+    def test_mixed_entries_and_missing_member(self):
+        entries = [entry(self.source, "a.jpg"), self.unknown("gone.jpg"), self.unknown("Ảnh.jpg")]
+        archive = StreamedZip(entries)
+        with zipfile.ZipFile(io.BytesIO(b"".join(archive))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), ["a.jpg", "Ảnh.jpg"])
+            self.assertEqual(zf.getinfo("a.jpg").flag_bits & 0x08, 0)
+            self.assertEqual(zf.getinfo("Ảnh.jpg").flag_bits & 0x08, 0x08)
+            self.assertEqual(zf.read("Ảnh.jpg"), self.source.blobs["Ảnh.jpg"])
+        with self.assertRaises(ValueError):
+            list(archive.iter_range(0, 10))
+
+
+class TestHttpHelpers(unittest.TestCase):
+
+    def test_parse_range(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 10))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 100))
+        self.assertEqual(parse_range("bytes=90-500", 100), (90, 100))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 100))
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 100))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))     # multi-range: whole body
+        self.assertIsNone(parse_range("items=0-1", 100))
+        for bad in ("bytes=100-", "bytes=5-4", "bytes=-0"):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(bad, 100)
+
+    def test_content_disposition(self):
+        header = content_disposition("Hồ Gươm · Đà Lạt.zip")
+        self.assertIn('filename="Ho Guom _ Da Lat.zip"', header)
+        self.assertIn("filename*=UTF-8''H%E1%BB%93", header)
+
+    def test_member_names(self):
+        taken = set()
+        self.assertEqual(member_name("../../etc/passwd", "x.jpg", taken), "passwd")
+        self.assertEqual(member_name("C:\\photos\\a.jpg", "x.jpg", taken), "a.jpg")
+        self.assertEqual(member_name("a.jpg", "x.jpg", taken), "a (2).jpg")
+        self.assertEqual(member_name("a.jpg", "x.jpg", taken), "a (3).jpg")
+        self.assertEqual(member_name("", "x.jpg", taken), "x.jpg")
+
+
+class TestSources(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.blobs = {f"p{i}.jpg": os.urandom(20_000 + i) for i in range(3)}
+        for name, data in self.blobs.items():
+            with open(os.path.join(self.dir, name), "wb") as f:
+                f.write(data)
+        self.requests = []
+        blobs, requests = self.blobs, self.requests
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = self.path.rsplit("/", 1)[-1]
+                requests.append((name, self.headers.get("Range")))
+                data = blobs.get(name)
+                if data is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                m = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range") or "")
+                if m:
+                    start, end = int(m.group(1)), int(m.group(2)) + 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+                    data = data[start:end]
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_local_source(self):
+        local = LocalFileSource(self.dir, chunk_size=4096)
+        self.assertEqual(b"".join(local.read_all("p0.jpg")), self.blobs["p0.jpg"])
+        self.assertEqual(b"".join(local.read("p1.jpg", 100, 5000)), self.blobs["p1.jpg"][100:5100])
+        self.assertFalse(local.exists("../p0.jpg/../../etc/passwd"))
+        os.makedirs(os.path.join(self.dir, "req-1"))
+        shutil.copy(os.path.join(self.dir, "p0.jpg"), os.path.join(self.dir, "req-1", "a.jpg"))
+        self.assertTrue(local.exists("req-1/a.jpg"))     # per-request workspace
+        with self.assertRaises(MemberUnavailable):
+            list(local.read_all("missing.jpg"))
+
+    def test_http_source_uses_range(self):
+        remote = HttpSource(chunk_size=4096)
+        try:
+            url = f"{self.base}/v1/p2.jpg"
+            self.assertEqual(b"".join(remote.read(url, 1000, 3000)), self.blobs["p2.jpg"][1000:4000])
+            self.assertEqual(self.requests[-1], ("p2.jpg", "bytes=1000-3999"))
+            self.assertEqual(b"".join(remote.read_all(url)), self.blobs["p2.jpg"])
+            self.assertEqual(self.requests[-1], ("p2.jpg", None))
+            with self.assertRaises(MemberUnavailable):
+                list(remote.read_all(f"{self.base}/v1/missing.jpg"))
+        finally:
+            remote.close()
+
+    def stored(self, name):
+        return {"size": len(self.blobs[name]), "crc32": zlib.crc32(self.blobs[name])}
+
+    def test_build_album_zip_from_stored_checksums_reads_nothing_up_front(self):
+        local = LocalFileSource(self.dir)
+        remote = HttpSource()
+        photos = [
+            {"id": "1", "filename": "one.jpg", "image_url": "/images/p0.jpg", **self.stored("p0.jpg")},
+            {"id": "2", "filename": "two.jpg", "image_url": f"{self.base}/v1/p1.jpg", **self.stored("p1.jpg")},
+        ]
+        try:
+            archive = build_album_zip(photos, local, remote)
+            self.assertEqual(self.requests, [])
+            self.assertIsNotNone(archive.content_length)
+            with zipfile.ZipFile(RangeFile(archive)) as zf:
+                self.assertEqual(zf.read("two.jpg"), self.blobs["p1.jpg"])
+        finally:
+            remote.close()
+
+    def test_build_album_zip_mixes_sources_and_skips_missing(self):
+        local = LocalFileSource(self.dir)
+        remote = HttpSource()
+        photos = [
+            {"id": "1", "filename": "one.jpg", "image_url": "/images/p0.jpg",
+             "timestamp": datetime(2025, 2, 17, 14, 30, 10)},
+            {"id": "2", "filename": "one.jpg", "image_url": f"{self.base}/v1/p1.jpg"},
+            {"id": "3", "filename": "gone.jpg", "image_url": f"{self.base}/v1/missing.jpg"},
+            {"id": "4", "filename": "nowhere.jpg", "image_url": None},
+        ]
+        try:
+            # No recorded size / CRC: streamed with data descriptors, no Range
+            archive = build_album_zip(photos, local, remote)
+            self.assertIsNone(archive.content_length)
+            with zipfile.ZipFile(io.BytesIO(b"".join(archive))) as zf:
+                self.assertEqual(zf.namelist(), ["one.jpg", "one (2).jpg"])
+                self.assertEqual(zf.read("one.jpg"), self.blobs["p0.jpg"])
+                self.assertEqual(zf.read("one (2).jpg"), self.blobs["p1.jpg"])
+                self.assertEqual(zf.getinfo("one.jpg").date_time, (2025, 2, 17, 14, 30, 10))
+        finally:
+            remote.close()
+        # the local copy was preferred: only p1 (and the missing one) went over HTTP
+        self.assertNotIn("p0.jpg", [name for name, _ in self.requests])
+
+
+if __name__ == "__main__":
+    unittest.main()
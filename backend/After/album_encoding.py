@@ -0,0 +1,237 @@
+import gzip
+import re
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # optional: br is simply not offered
+    brotli = None
+
+# Response formats accepted via ?format=
+FORMAT_JSON = "json"          # legacy Pydantic/FastAPI encoding
+FORMAT_COMPACT = "compact"    # orjson + URL templating
+FORMAT_NDJSON = "ndjson"      # compact, streamed one album per line
+FORMATS = (FORMAT_JSON, FORMAT_COMPACT, FORMAT_NDJSON)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# https://res.cloudinary.com/<cloud>/image/upload/v<version>/<public_id>.<ext>
+_CLOUDINARY_URL = re.compile(
+    r"^(?P<base>https?://res\.cloudinary\.com/[^/]+/image/upload/)"
+    r"(?:v(?P<version>\d+)/)?"
+    r"(?P<public_id>.+?)"
+    r"(?:\.(?P<format>[A-Za-z0-9]+))?$"
+)
+
+# Clients rebuild photo URLs with this template
+URL_TEMPLATE = "{url_base}v{version}/{public_id}.{format}"
+
+# Omitted per photo when equal to these; "filename" is omitted when equal to "id"
+PHOTO_DEFAULTS = {"format": "jpg"}
+
+_GZIP_LEVEL = 5
+_BROTLI_QUALITY = 5
+
+
+def split_cloudinary_url(url: Optional[str]) -> Optional[Tuple[str, str, str, str]]:
+    """Returns (base, version, public_id, format) or None for non-Cloudinary URLs."""
+    if not url:
+        return None
+    m = _CLOUDINARY_URL.match(url)
+    if not m or not m.group("version") or not m.group("format"):
+        return None
+    return m.group("base"), m.group("version"), m.group("public_id"), m.group("format")
+
+
+def _as_dict(album: Any) -> dict:
+    if isinstance(album, dict):
+        return album
+    if hasattr(album, "model_dump"):
+        return album.model_dump()
+    return album.dict()
+
+
+def _drop_none(d: dict) -> dict:
+    return {k: v for k, v in d.items() if v is not None}
+
+
+def compact_album(album: Any, url_base: Optional[str]) -> Tuple[dict, Optional[str]]:
+    """
+    Rewrites one album for the compact format:
+    - photo image_url -> public_id / version / format when it matches url_base
+    - None fields, the duplicated Mongo _id and values equal to
+      PHOTO_DEFAULTS (or filename == id) are dropped
+    Returns (compact_album, url_base) - url_base is picked from the first
+    Cloudinary URL seen when the caller has none yet.
+    """
+    album = _as_dict(album)
+    out = _drop_none({k: v for k, v in album.items() if k not in ("_id", "photos")})
+    if "id" not in out and "_id" in album:
+        out["id"] = album["_id"]
+
+    photos = []
+    for photo in album.get("photos", []):
+        p = _drop_none(_as_dict(photo))
+        parts = split_cloudinary_url(p.get("image_url"))
+        if parts:
+            base, version, public_id, fmt = parts
+            if url_base is None:
+                url_base = base
+            if base == url_base:
+                del p["image_url"]
+                p["public_id"] = public_id
+                p["version"] = version
+                if fmt != PHOTO_DEFAULTS["format"]:
+                    p["format"] = fmt
+        if "filename" in p and p["filename"] == p.get("id"):
+            del p["filename"]
+        photos.append(p)
+    out["photos"] = photos
+    return out, url_base
+
+
+def _orjson_default(obj):
+    # Mongo ObjectId and anything else exotic
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode_compact(albums: Iterable[Any], extra: Optional[dict] = None) -> bytes:
+    url_base = None
+    compact = []
+    for album in albums:
+        c, url_base = compact_album(album, url_base)
+        compact.append(c)
+    body = {"url_base": url_base, "url_template": URL_TEMPLATE, "defaults": PHOTO_DEFAULTS, "albums": compact}
+    if extra:
+        body.update(extra)
+    return dumps(body)
+
+
+def iter_ndjson(albums: Iterable[Any], extra: Optional[dict] = None) -> Iterator[bytes]:
+    """
+    First line is a header ({"url_base", "url_template", "defaults", ...extra}), then one
+    album per line. The header's url_base is taken from the first album, so
+    later albums with another Cloudinary base keep their full URLs.
+    """
+    albums = iter(albums)
+    first = next(albums, None)
+    url_base = None
+    first_line = None
+    if first is not None:
+        first_compact, url_base = compact_album(first, None)
+        first_line = dumps(first_compact) + b"\n"
+
+    header = {"url_base": url_base, "url_template": URL_TEMPLATE, "defaults": PHOTO_DEFAULTS}
+    if extra:
+        header.update(extra)
+    yield dumps(header) + b"\n"
+
+    if first_line is not None:
+        yield first_line
+    for album in albums:
+        c, _ = compact_album(album, url_base)
+        yield dumps(c) + b"\n"
+
+
+# ---------------------------------------------------------
+# Content-Encoding negotiation
+# ---------------------------------------------------------
+def _parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    prefs = {}
+    for item in (header or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, params = item.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[name.strip().lower()] = q
+    return prefs
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Picks 'br', 'gzip' or None (identity), honouring q-values and '*'."""
+    prefs = _parse_accept_encoding(accept_encoding)
+    supported = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for enc in supported:
+        q = prefs.get(enc, prefs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=_BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0)
+    return body
+
+
+def iter_compressed(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Streaming compression; flushes per chunk so each NDJSON line reaches the client."""
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=_BROTLI_QUALITY)
+        for chunk in chunks:
+            out = compressor.process(chunk) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def album_response(albums: List[Any], fmt: str, accept_encoding: Optional[str],
+                   extra: Optional[dict] = None) -> Response:
+    """Builds the compact or NDJSON response for a list of albums."""
+    encoding = negotiate_encoding(accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if fmt == FORMAT_NDJSON:
+        return StreamingResponse(
+            iter_compressed(iter_ndjson(albums, extra), encoding),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    body = compress(encode_compact(albums, extra), encoding)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def expand_photo(photo: dict, url_base: Optional[str]) -> dict:
+    """Inverse of compact_album for one photo (for tests and Python clients)."""
+    p = dict(photo)
+    p.setdefault("filename", p.get("id"))
+    if "public_id" in p and url_base:
+        p["image_url"] = URL_TEMPLATE.format(
+            url_base=url_base,
+            version=p.pop("version"),
+            public_id=p.pop("public_id"),
+            format=p.pop("format", PHOTO_DEFAULTS["format"]),
+        )
+    return p
@@ -0,0 +1,510 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import PHOTO_STORAGE
+from logger_config import logger
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Denormalised on each album document so listings never read the photo array
+SUMMARY_FIELDS = ("photo_count", "start_time", "end_time")
+
+# /my-albums summary projection
+SUMMARY_PROJECTION = {
+    "_id": 1, "id": 1, "title": 1, "method": 1, "cover_photo_url": 1,
+    "created_at": 1, "needs_manual_location": 1, "is_public": 1,
+    "photo_count": 1, "start_time": 1, "end_time": 1, "photo_storage": 1,
+}
+
+SUMMARY_SORT = [("created_at", -1), ("_id", -1)]
+
+# Album layouts (album["photo_storage"]; missing = embedded)
+STORAGE_EMBEDDED = "embedded"
+STORAGE_COLLECTION = "collection"
+
+# Albums waiting for their background deletion job are hidden from every read
+NOT_DELETED = {"deleted": {"$ne": True}}
+
+# (keys, create_index options)
+ALBUM_INDEXES = [
+    ([("user_id", 1), ("created_at", -1), ("_id", -1)], {"name": "user_created_id"}),
+    # Public link lookups; sparse so albums that were never shared don't collide
+    ("share_token", {"unique": True, "sparse": True, "name": "share_token_unique"}),
+]
+PHOTO_INDEXES = [
+    ([("album_id", 1), ("order", 1)], {"unique": True, "name": "album_order"}),
+    ([("album_id", 1), ("timestamp", 1)], {"name": "album_timestamp"}),
+    ([("user_id", 1), ("timestamp", -1)], {"name": "user_timestamp"}),
+    ([("geo", "2dsphere")], {"name": "geo_2dsphere"}),
+]
+
+# Fields copied from PhotoOutput into a Photos document
+PHOTO_FIELDS = ("id", "filename", "timestamp", "score", "image_url", "lat", "lon",
+                "width", "height", "blurhash", "renditions", "size", "crc32")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# ---------------------------------------------------------
+# Opaque cursors (base64url JSON)
+# ---------------------------------------------------------
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, dict):
+            raise ValueError("cursor is not an object")
+        return payload
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def summary_fields(photos: List[dict]) -> Dict[str, Any]:
+    """photo_count / start_time / end_time for an album's photo list."""
+    timestamps = [p.get("timestamp") for p in photos if p.get("timestamp")]
+    return {
+        "photo_count": len(photos),
+        "start_time": min(timestamps) if timestamps else None,
+        "end_time": max(timestamps) if timestamps else None,
+    }
+
+
+# ---------------------------------------------------------
+# Photos collection documents
+# ---------------------------------------------------------
+def photo_doc_id(album_id: str, photo_id: str) -> str:
+    return f"{album_id}:{photo_id}"
+
+
+def to_photo_doc(photo: dict, album_id: str, user_id: Optional[str], order: int) -> dict:
+    doc = {f: photo.get(f) for f in PHOTO_FIELDS}
+    doc.update({
+        "_id": photo_doc_id(album_id, photo["id"]),
+        "album_id": album_id,
+        "user_id": user_id,
+        "order": order,
+    })
+    if photo.get("lat") is not None and photo.get("lon") is not None:
+        # GeoJSON for the 2dsphere index (lon first)
+        doc["geo"] = {"type": "Point", "coordinates": [photo["lon"], photo["lat"]]}
+    return doc
+
+
+def from_photo_doc(doc: dict) -> dict:
+    """Photos document -> the embedded/PhotoOutput shape clients already use."""
+    return {f: doc.get(f) for f in PHOTO_FIELDS}
+
+
+def is_normalised(album: dict) -> bool:
+    return album.get("photo_storage") == STORAGE_COLLECTION
+
+
+# ---------------------------------------------------------
+# Query building / result shaping (repositories only add the round trips)
+# ---------------------------------------------------------
+def prepare_albums(docs: List[dict], storage: str) -> List[dict]:
+    """Adds summary fields; for the collection layout moves photos out and returns their documents."""
+    photo_docs = []
+    for doc in docs:
+        doc.update(summary_fields(doc.get("photos", [])))
+        if storage == STORAGE_COLLECTION:
+            photos = doc.pop("photos", [])
+            photo_docs.extend(
+                to_photo_doc(p, doc["_id"], doc.get("user_id"), i) for i, p in enumerate(photos)
+            )
+            doc["photo_storage"] = STORAGE_COLLECTION
+    return photo_docs
+
+
+def photo_removed_query(album_id: str) -> Dict[str, Any]:
+    """
+    Filter for photo_removed_update: only albums whose summary is present.
+    Summary fields are set and unset together, so a missing photo_count
+    means the next read recomputes all of them; $inc would create it as -1.
+    """
+    return {"_id": album_id, "photo_count": {"$exists": True}}
+
+
+def photo_removed_update(album: dict, photo: dict) -> Dict[str, Any]:
+    """Album update after one of its Photos documents was deleted."""
+    update: Dict[str, Any] = {"$inc": {"photo_count": -1}}
+    ts = photo.get("timestamp")
+    if ts is not None and ts in (album.get("start_time"), album.get("end_time")):
+        # Date range boundary removed -> recompute lazily on next listing
+        update["$unset"] = {"start_time": "", "end_time": ""}
+    return update
+
+
+def summary_page_query(user_id: str, cursor: Optional[str]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"user_id": user_id, **NOT_DELETED}
+    if cursor:
+        c = decode_cursor(cursor)
+        try:
+            created_at = datetime.fromisoformat(c["c"])
+            last_id = c["i"]
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidCursor(f"Invalid cursor: {e}")
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+    return query
+
+
+def summary_page(docs: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """docs were read with limit + 1; returns the page and the cursor of the next one."""
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = None
+    if has_more and docs:
+        last = docs[-1]
+        next_cursor = encode_cursor({"c": last["created_at"].isoformat(), "i": last["_id"]})
+    return docs, next_cursor
+
+
+def to_summary(doc: dict) -> dict:
+    return {
+        "id": doc.get("id") or doc["_id"],
+        "title": doc.get("title"),
+        "method": doc.get("method"),
+        "cover_photo_url": doc.get("cover_photo_url"),
+        "photo_count": doc.get("photo_count", 0),
+        "start_time": doc.get("start_time"),
+        "end_time": doc.get("end_time"),
+        "created_at": doc.get("created_at"),
+        "needs_manual_location": doc.get("needs_manual_location", False),
+        "is_public": doc.get("is_public", False),
+    }
+
+
+def decode_photo_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    """(offset into an embedded array, last order read from Photos)."""
+    c = decode_cursor(cursor) if cursor else {}
+    try:
+        offset = int(c.get("o", 0))
+        after = int(c.get("k", -1))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    if offset < 0:
+        raise InvalidCursor("Invalid cursor: negative offset")
+    return offset, after
+
+
+def photo_page_projection(offset: int, limit: int) -> Dict[str, Any]:
+    return {"photos": {"$slice": [offset, limit]}, "photo_count": 1, "photo_storage": 1}
+
+
+def collection_photo_page(docs: List[dict], limit: int, total: int) -> Tuple[List[dict], Optional[str], int]:
+    next_cursor = encode_cursor({"k": docs[limit - 1]["order"]}) if len(docs) > limit else None
+    return [from_photo_doc(d) for d in docs[:limit]], next_cursor, total
+
+
+def embedded_photo_page(album: dict, offset: int, total: int) -> Tuple[List[dict], Optional[str], int]:
+    photos = album.get("photos", [])
+    next_offset = offset + len(photos)
+    next_cursor = encode_cursor({"o": next_offset}) if next_offset < total else None
+    return photos, next_cursor, total
+
+
+class AlbumRepository:
+    """
+    Synchronous album store for offline scripts: the embedded -> Photos
+    collection migration (migrate_photos.py) runs outside the event loop
+    on pymongo's MongoClient. The service reads and writes albums through
+    AsyncAlbumRepository; both share the layouts and query helpers above.
+    """
+
+    def __init__(self, collection, photo_collection=None, storage: str = PHOTO_STORAGE):
+        self.albums = collection
+        self.photos = photo_collection
+        self.storage = storage if photo_collection is not None else STORAGE_EMBEDDED
+
+    def ensure_indexes(self):
+        try:
+            for keys, options in ALBUM_INDEXES:
+                self.albums.create_index(keys, **options)
+            if self.photos is not None:
+                for keys, options in PHOTO_INDEXES:
+                    self.photos.create_index(keys, **options)
+        except Exception as e:
+            logger.warning(f"Album index creation failed: {e}")
+
+    def invalidate_summary(self, album_id: str):
+        """Forces the next listing to recompute count / date range."""
+        self.albums.update_one({"_id": album_id}, {"$unset": {f: "" for f in SUMMARY_FIELDS}})
+
+    # --- migration (embedded -> collection) ---
+    def migrate_album(self, album_id: str, keep_embedded: bool = False) -> Optional[int]:
+        """
+        Moves one album's photos to the Photos collection while the service keeps running:
+        1. upsert every embedded photo (idempotent, _id = album_id:photo_id)
+        2. atomically flip photo_storage and drop the array, reading the array as of the flip
+        3. delete copied photos that were removed between 1 and 2
+        Returns the number of photos moved, or None if the album was already migrated.
+        """
+        album = self.albums.find_one({"_id": album_id})
+        if not album or is_normalised(album):
+            return None
+
+        user_id = album.get("user_id")
+        for i, p in enumerate(album.get("photos", [])):
+            doc = to_photo_doc(p, album_id, user_id, i)
+            self.photos.update_one({"_id": doc["_id"]}, {"$set": doc}, upsert=True)
+
+        update: Dict[str, Any] = {"$set": {"photo_storage": STORAGE_COLLECTION}}
+        if not keep_embedded:
+            update["$unset"] = {"photos": ""}
+        before = self.albums.find_one_and_update(
+            {"_id": album_id, "photo_storage": {"$ne": STORAGE_COLLECTION}}, update
+        )
+        if before is None:
+            return None
+
+        kept = {p["id"] for p in before.get("photos", [])}
+        removed = [p["id"] for p in album.get("photos", []) if p["id"] not in kept]
+        if removed:
+            self.photos.delete_many({"_id": {"$in": [photo_doc_id(album_id, pid) for pid in removed]}})
+        self.invalidate_summary(album_id)
+        return len(kept)
+
+
+class AsyncAlbumRepository:
+    """
+    Album persistence for the After service, on pymongo's AsyncMongoClient
+    (db.async_album_collection / db.async_photo_collection): every round
+    trip is awaited, so a slow query never stalls the event loop and every
+    other request with it. Used by the request handlers and the deletion
+    job worker; also owns the share-link lookups.
+
+    Listings use keyset pagination on (created_at, _id) backed by the
+    compound index {user_id: 1, created_at: -1, _id: -1}. Photos live either
+    inside the album (legacy) or in the Photos collection
+    (photo_storage="collection"); every read goes through here and handles both.
+    """
+
+    def __init__(self, collection, photo_collection=None, storage: str = PHOTO_STORAGE):
+        self.albums = collection
+        self.photos = photo_collection
+        self.storage = storage if photo_collection is not None else STORAGE_EMBEDDED
+
+    async def ensure_indexes(self):
+        try:
+            for keys, options in ALBUM_INDEXES:
+                await self.albums.create_index(keys, **options)
+            if self.photos is not None:
+                for keys, options in PHOTO_INDEXES:
+                    await self.photos.create_index(keys, **options)
+        except Exception as e:
+            logger.warning(f"Album index creation failed: {e}")
+
+    # --- writes ---
+    async def insert_albums(self, docs: List[dict]):
+        photo_docs = prepare_albums(docs, self.storage)
+        # Photos first: an album is only visible once its photos are in place
+        if photo_docs:
+            await self.photos.insert_many(photo_docs, ordered=False)
+        return await self.albums.insert_many(docs)
+
+    async def delete_album(self, album: dict):
+        if is_normalised(album):
+            await self.photos.delete_many({"album_id": album["_id"]})
+        await self.albums.delete_one({"_id": album["_id"]})
+
+    async def purge_album(self, album_id: str):
+        album = await self.albums.find_one({"_id": album_id}, {"photo_storage": 1})
+        if album:
+            await self.delete_album(album)
+
+    async def mark_deleted(self, album_id: str, user_id: str) -> bool:
+        """Soft delete: the album disappears at once, the deletion job purges it later."""
+        result = await self.albums.update_one(
+            {"_id": album_id, "user_id": user_id, **NOT_DELETED},
+            {"$set": {"deleted": True, "deleted_at": datetime.utcnow(), "is_public": False}},
+        )
+        return result.matched_count > 0
+
+    async def rename(self, album_id: str, user_id: str, title: str) -> bool:
+        result = await self.albums.update_one(
+            {"_id": album_id, "user_id": user_id, **NOT_DELETED}, {"$set": {"title": title}}
+        )
+        return result.matched_count > 0
+
+    async def delete_photo(self, album: dict, photo: dict):
+        """
+        Embedded: $pull rewrites the whole album document.
+        Normalised: one delete by _id plus a small $inc on the album.
+        """
+        album_id = album["_id"]
+        if not is_normalised(album):
+            await self.albums.update_one({"_id": album_id}, {"$pull": {"photos": {"id": photo["id"]}}})
+            await self.invalidate_summary(album_id)
+            if self.photos is not None:
+                # Album may be mid-migration: drop the copy too
+                await self.photos.delete_one({"_id": photo_doc_id(album_id, photo["id"])})
+            return
+
+        result = await self.photos.delete_one({"_id": photo_doc_id(album_id, photo["id"])})
+        if not result.deleted_count:
+            return
+        await self.albums.update_one(photo_removed_query(album_id), photo_removed_update(album, photo))
+
+    async def set_contact_sheets(self, album_id: str, sheets: dict):
+        if sheets:
+            await self.albums.update_one({"_id": album_id}, {"$set": {"contact_sheets": sheets}})
+        else:
+            await self.albums.update_one({"_id": album_id}, {"$unset": {"contact_sheets": ""}})
+
+    async def invalidate_summary(self, album_id: str):
+        """Forces the next listing to recompute count / date range."""
+        await self.albums.update_one({"_id": album_id}, {"$unset": {f: "" for f in SUMMARY_FIELDS}})
+
+    # --- album listing ---
+    async def list_album_summaries(self, user_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                   cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        limit = clamp_limit(limit)
+        docs = await (
+            self.albums.find(summary_page_query(user_id, cursor), SUMMARY_PROJECTION)
+            .sort(SUMMARY_SORT)
+            .limit(limit + 1)
+            .to_list()
+        )
+        docs, next_cursor = summary_page(docs, limit)
+        for doc in docs:
+            if any(f not in doc for f in SUMMARY_FIELDS):
+                doc.update(await self._backfill_summary(doc))
+        return [to_summary(doc) for doc in docs], next_cursor
+
+    async def list_albums(self, user_id: str) -> List[dict]:
+        """Every album of the user with its photos (legacy /my-albums without pagination)."""
+        albums = await self.albums.find({"user_id": user_id, **NOT_DELETED}).sort("created_at", -1).to_list()
+        return await self.hydrate_many(albums)
+
+    async def _backfill_summary(self, album: dict) -> Dict[str, Any]:
+        """Albums written before summary fields existed (or after a photo delete)."""
+        album_id = album["_id"]
+        if is_normalised(album):
+            q = {"album_id": album_id, "timestamp": {"$ne": None}}
+            first = await self.photos.find(q, {"timestamp": 1}).sort("timestamp", 1).limit(1).to_list()
+            last = await self.photos.find(q, {"timestamp": 1}).sort("timestamp", -1).limit(1).to_list()
+            fields = {
+                "photo_count": await self.photos.count_documents({"album_id": album_id}),
+                "start_time": first[0]["timestamp"] if first else None,
+                "end_time": last[0]["timestamp"] if last else None,
+            }
+        else:
+            doc = await self.albums.find_one({"_id": album_id}, {"photos.timestamp": 1})
+            fields = summary_fields((doc or {}).get("photos", []))
+        await self.albums.update_one({"_id": album_id}, {"$set": fields})
+        return fields
+
+    # --- photos (dual-read) ---
+    async def get_album(self, album_id: str, user_id: str, with_photos: bool = False) -> Optional[dict]:
+        """Album owned by user_id; with_photos also loads the photos array for either layout."""
+        projection = None if with_photos else {"photos": 0}
+        album = await self.albums.find_one({"_id": album_id, "user_id": user_id, **NOT_DELETED}, projection)
+        if album and with_photos:
+            await self.hydrate_many([album])
+        return album
+
+    async def get_photos(self, album: dict) -> List[dict]:
+        if not is_normalised(album):
+            return album.get("photos", [])
+        docs = await self.photos.find({"album_id": album["_id"]}).sort("order", 1).to_list()
+        return [from_photo_doc(d) for d in docs]
+
+    async def find_photo(self, album: dict, photo_id: str) -> Optional[dict]:
+        if not is_normalised(album):
+            if "photos" not in album:
+                album = await self.albums.find_one({"_id": album["_id"]}, {"photos": 1}) or {}
+            return next((p for p in album.get("photos", []) if p.get("id") == photo_id), None)
+        doc = await self.photos.find_one({"_id": photo_doc_id(album["_id"], photo_id)})
+        return from_photo_doc(doc) if doc else None
+
+    async def hydrate_many(self, albums: Iterable[dict]) -> List[dict]:
+        """Fills album["photos"] for normalised albums with a single query."""
+        albums = list(albums)
+        normalised = {a["_id"]: a for a in albums if is_normalised(a)}
+        if normalised:
+            for a in normalised.values():
+                a["photos"] = []
+            docs = await (
+                self.photos.find({"album_id": {"$in": list(normalised)}})
+                .sort([("album_id", 1), ("order", 1)])
+                .to_list()
+            )
+            for doc in docs:
+                normalised[doc["album_id"]]["photos"].append(from_photo_doc(doc))
+        return albums
+
+    async def list_album_photos(self, album_id: str, user_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None) -> Optional[Tuple[List[dict], Optional[str], int]]:
+        """
+        Returns (photos, next_cursor, total) or None when the album does not
+        belong to the user. Only the requested page is read from Mongo
+        ($slice projection, or an (album_id, order) range on Photos).
+        """
+        limit = clamp_limit(limit)
+        offset, after = decode_photo_cursor(cursor)
+
+        # Normalised albums have no array, so the $slice costs nothing there
+        album = await self.albums.find_one(
+            {"_id": album_id, "user_id": user_id, **NOT_DELETED}, photo_page_projection(offset, limit)
+        )
+        if not album:
+            return None
+        total = album.get("photo_count")
+        if total is None:
+            total = (await self._backfill_summary(album))["photo_count"]
+
+        if is_normalised(album):
+            docs = await (
+                self.photos.find({"album_id": album_id, "order": {"$gt": after}})
+                .sort("order", 1)
+                .limit(limit + 1)
+                .to_list()
+            )
+            return collection_photo_page(docs, limit, total)
+        return embedded_photo_page(album, offset, total)
+
+    # --- share links ---
+    async def get_share_token(self, album_id: str, user_id: str) -> Tuple[bool, Optional[str]]:
+        """(album exists for this user, its current share token)."""
+        album = await self.albums.find_one({"_id": album_id, "user_id": user_id, **NOT_DELETED}, {"share_token": 1})
+        return album is not None, (album or {}).get("share_token")
+
+    async def enable_share(self, album_id: str, share_token: str):
+        await self.albums.update_one({"_id": album_id}, {"$set": {"share_token": share_token, "is_public": True}})
+
+    async def revoke_share(self, album_id: str, user_id: str) -> bool:
+        result = await self.albums.update_one(
+            {"_id": album_id, "user_id": user_id},
+            {"$unset": {"share_token": ""}, "$set": {"is_public": False}},
+        )
+        return result.matched_count > 0
+
+    async def find_shared(self, share_token: str) -> Optional[dict]:
+        return await self.albums.find_one({"share_token": share_token, "is_public": True})
+
+    async def shared_album_id(self, share_token: str) -> Optional[str]:
+        """
+        _id of the album the token currently opens, for cached views: one
+        lookup on the unique share_token index, projected down to _id.
+        """
+        album = await self.albums.find_one({"share_token": share_token, "is_public": True}, {"_id": 1})
+        return album["_id"] if album else None
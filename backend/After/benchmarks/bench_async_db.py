@@ -0,0 +1,114 @@
+"""
+Concurrency benchmark: blocking pymongo calls vs the async repository.
+
+Drives the real FastAPI app (httpx ASGI transport, no network) with a
+mix of GET /my-albums?limit=20 and GET /albums/{id}/photos?limit=50 at a
+chosen concurrency, against an in-process Mongo that takes --db-latency
+per round trip:
+    blocking  - the latency is a time.sleep inside the coroutine, like a sync
+                pymongo call from an async endpoint (what they did before):
+                every round trip holds the event loop, so requests run one
+                at a time
+    async     - AsyncAlbumRepository on AsyncInMemoryCollection: the latency
+                is awaited and other requests proceed meanwhile
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_async_db --albums 20 --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from album_repository import AsyncAlbumRepository
+from benchmarks.bench_encoding import make_album_docs
+from benchmarks.fakes import AsyncInMemoryCollection
+
+USER_ID = "user-123"
+
+
+async def make_repo(mode: str, docs, latency: float):
+    repo = AsyncAlbumRepository(AsyncInMemoryCollection("Albums"), AsyncInMemoryCollection("Photos"))
+    await repo.insert_albums(docs)
+    if mode == "blocking":
+        # The underlying InMemoryCollection sleeps: each round trip blocks the loop
+        repo.albums.sync.latency_s = repo.photos.sync.latency_s = latency
+    else:
+        repo.albums.latency_s = repo.photos.latency_s = latency
+    return repo
+
+
+async def run_mode(main, mode: str, docs, args) -> dict:
+    import httpx
+
+    main.album_repo = await make_repo(mode, docs, args.db_latency)
+    album_ids = [d["_id"] for d in docs]
+    paths = ["/my-albums?limit=20"] + [f"/albums/{a}/photos?limit=50" for a in album_ids]
+
+    latencies, statuses = [], {}
+    sem = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - t0)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(args.requests)])
+        wall = time.perf_counter() - wall_start
+
+    arr = np.asarray(latencies) * 1000
+    return {
+        "requests_per_second": round(args.requests / wall, 1),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "statuses": statuses,
+    }
+
+
+async def run(args) -> dict:
+    import main
+    from deps import get_current_user_id
+
+    if not args.verbose:
+        logging.getLogger("album_gen").setLevel(logging.WARNING)
+    main.app.dependency_overrides[get_current_user_id] = lambda: USER_ID
+
+    docs = make_album_docs(args.albums, args.photos)
+    results = {}
+    for mode in ("blocking", "async"):
+        results[mode] = await run_mode(main, mode, [dict(d) for d in docs], args)
+    main.app.dependency_overrides.pop(get_current_user_id, None)
+    results["speedup"] = round(results["async"]["requests_per_second"] / results["blocking"]["requests_per_second"], 2)
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Blocking vs async Mongo access under concurrent requests")
+    parser.add_argument("--albums", type=int, default=20)
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per Mongo round trip")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(asyncio.run(run(parse_args(argv))), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Clustering cache benchmark: re-running album creation on the same photos.
+
+For each size, a GPS + time and a time-only library are dispatched:
+    cold    - ClusteringService.dispatch_batch with an empty cache (clusters)
+    memory  - same photos, reshuffled and renamed, in-memory hit
+    mongo   - a fresh cache instance (another worker / after restart) over the
+              same InMemoryCollection, i.e. the Mongo tier minus the network
+Prints the time of each and the hit rates from the metrics registry.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_clustering_cache --sizes 1000 10000 50000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_photo_batch import make_photos
+from benchmarks.fakes import InMemoryCollection
+from clustering.batch import PhotoBatch
+from clustering.service import ClusteringService
+from clustering_cache import ClusteringCache
+from metrics import cache_hit_rates
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - t0, 4)
+
+
+def run(args) -> dict:
+    logging.getLogger("album_gen").setLevel(logging.WARNING)
+    results = []
+    for library in ("gps_time", "time_only"):
+        for n in args.sizes:
+            photos = make_photos(n, with_gps=library == "gps_time")
+            again = photos[:]
+            random.Random(1).shuffle(again)
+            again = [p.model_copy(update={"id": "r" + p.id, "filename": "r" + p.filename}) for p in again]
+
+            collection = InMemoryCollection("ClusteringCache")
+            cache = ClusteringCache(collection=collection)
+            ClusteringService.dispatch_batch(PhotoBatch.from_inputs(photos[:50]))     # warm imports
+            row = {"library": library, "photos": n}
+            row["cold_s"] = timed(lambda: ClusteringService.dispatch_batch(PhotoBatch.from_inputs(photos), cache))
+            row["memory_hit_s"] = timed(lambda: ClusteringService.dispatch_batch(PhotoBatch.from_inputs(again), cache))
+            fresh = ClusteringCache(collection=collection)
+            row["mongo_hit_s"] = timed(lambda: ClusteringService.dispatch_batch(PhotoBatch.from_inputs(again), fresh))
+            row["speedup_memory"] = round(row["cold_s"] / row["memory_hit_s"], 1)
+            results.append(row)
+    rates = cache_hit_rates()
+    return {"config": vars(args), "results": results,
+            "hit_rates": {k: v for k, v in rates.items() if k.startswith("clustering")}}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clustering cache: cold vs memory vs Mongo-tier hits")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(run(parse_args(argv)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
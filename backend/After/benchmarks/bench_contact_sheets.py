@@ -0,0 +1,95 @@
+"""
+Requests and bytes to paint one album grid: grid renditions vs contact sheets.
+
+Builds grid renditions for a synthetic album, packs them into contact
+sheets, then reports:
+- requests / bytes for the whole grid, one image per photo vs sprites
+- time to build the sheets for the album
+- time to remove one photo (only its sheet is re-encoded)
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_contact_sheets --photos 500
+    python -m benchmarks.bench_contact_sheets --photos 200 --tile 128 --format jpeg --out sheets.json
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+from contact_sheets import ContactSheetStore
+from renditions import RenditionStore
+
+
+def run(n_photos: int, width: int, height: int, tile: int, columns: int, rows: int, fmt: str) -> dict:
+    spec = CorpusSpec(count=n_photos, n_events=1, blur_fraction=0, dark_fraction=0,
+                      screenshot_fraction=0, size=(width, height))
+    photos = generate_corpus(spec)
+    root = tempfile.mkdtemp(prefix="bench-sheets-")
+    try:
+        renditions = RenditionStore(root=os.path.join(root, "r"), sizes="grid:256", formats="webp")
+        sources, grid_bytes = [], 0
+        for i, p in enumerate(photos):
+            meta = renditions.generate(Image.open(io.BytesIO(p.content)), f"{i:032x}")
+            sources.append((p.filename, renditions.local_path(meta["renditions"]["grid"])))
+            grid_bytes += meta["bytes"]["grid"]
+
+        store = ContactSheetStore(root=os.path.join(root, "s"), tile=tile, columns=columns, rows=rows, fmt=fmt)
+        t0 = time.perf_counter()
+        meta = store.build("bench-album", sources)
+        build_s = time.perf_counter() - t0
+        sheet_bytes = sum(os.path.getsize(store.local_path(s["url"])) for s in meta["sheets"])
+
+        removed = [sources[len(sources) // 2][0]]
+        sprites = {}
+        for url in store.affected(meta, removed):
+            with open(store.local_path(url), "rb") as f:
+                sprites[url] = f.read()
+        t0 = time.perf_counter()
+        after = store.remove("bench-album", meta, removed, sprites)
+        remove_s = time.perf_counter() - t0
+        changed = sum(a["url"] != b["url"] for a, b in zip(meta["sheets"], after["sheets"]))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "photos": n_photos,
+        "sheet": {"tile": tile, "columns": columns, "rows": rows, "format": fmt},
+        "grid_renditions": {"requests": n_photos, "bytes": grid_bytes},
+        "contact_sheets": {"requests": len(meta["sheets"]), "bytes": sheet_bytes},
+        "build_ms": round(build_s * 1000, 1),
+        "remove_one": {"ms": round(remove_s * 1000, 1), "sheets_rewritten": changed,
+                       "sheets_total": len(after["sheets"])},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark contact-sheet sprites for album grids")
+    parser.add_argument("--photos", type=int, default=500)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    parser.add_argument("--tile", type=int, default=96)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--format", default="webp", choices=["webp", "jpeg"])
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    report = run(args.photos, args.width, args.height, args.tile, args.columns, args.rows, args.format)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
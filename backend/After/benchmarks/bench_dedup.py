@@ -0,0 +1,115 @@
+"""
+Burst deduplication benchmark: clustering every photo vs unique GPS fixes.
+
+Synthetic burst-heavy library: each spot gets a few bursts of --burst photos
+sharing one fix, plus some receiver jitter (--jitter-m) on a share of them.
+    full   - DBSCAN / HDBSCAN on one point per photo (before)
+    dedup  - clustering.dedup.collapse_coordinates, DBSCAN with sample_weight,
+             HDBSCAN on capped copies, labels expanded back to photos
+Same parameters as run_spatiotemporal / run_location_hdbscan. Reports time
+and agreement with the full run (same partition for DBSCAN, adjusted Rand
+index for HDBSCAN).
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_dedup --photos 5000 20000 --burst 40
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clustering.dedup import collapse_coordinates, expand_labels
+from clustering.grid import EARTH_RADIUS_M
+
+
+def make_bursts(n: int, burst: int, jitter_m: float, jitter_share: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n_bursts = max(1, n // burst)
+    spots = rng.uniform([10.0, 105.5], [11.0, 107.0], size=(max(1, n_bursts // 3), 2))
+    fixes = spots[rng.integers(0, len(spots), n_bursts)] + rng.normal(0, 0.003, size=(n_bursts, 2))
+    pts = np.repeat(fixes, burst, axis=0)[:n]
+    jitter = rng.random(len(pts)) < jitter_share
+    pts[jitter] += rng.normal(0, jitter_m / 111_000, size=(int(jitter.sum()), 2))
+    return pts[:, 0], pts[:, 1]
+
+
+def dbscan(coords_deg, weights=None, dist_m=700):
+    from sklearn.cluster import DBSCAN
+
+    return DBSCAN(eps=dist_m / EARTH_RADIUS_M, min_samples=1, metric="haversine", n_jobs=-1,
+                  algorithm="ball_tree").fit(np.radians(coords_deg), sample_weight=weights).labels_
+
+
+def hdbscan_labels(coords_deg, min_cluster_size=3):
+    import hdbscan
+
+    return hdbscan.HDBSCAN(min_cluster_size=min_cluster_size, min_samples=1, metric="haversine",
+                           cluster_selection_epsilon=300 / EARTH_RADIUS_M, core_dist_n_jobs=-1,
+                           algorithm="best", approx_min_span_tree=True).fit_predict(np.radians(coords_deg))
+
+
+def same_partition(a, b) -> bool:
+    pairs = np.unique(np.column_stack((a, b)), axis=0)
+    return len(pairs) == len(np.unique(a)) == len(np.unique(b))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return round(time.perf_counter() - t0, 3), out
+
+
+def run(args) -> dict:
+    from sklearn.metrics import adjusted_rand_score
+
+    results = []
+    for n in args.photos:
+        lat, lon = make_bursts(n, args.burst, args.jitter_m, args.jitter_share)
+        coords = np.column_stack((lat, lon))
+        row = {"photos": n}
+
+        def dedup_dbscan():
+            points = collapse_coordinates(lat, lon, args.decimals)
+            return expand_labels(dbscan(points.coords, points.counts), points), len(points.counts)
+
+        def dedup_hdbscan():
+            points = collapse_coordinates(lat, lon, args.decimals)
+            copies = np.minimum(points.counts, 3)
+            labels = hdbscan_labels(np.repeat(points.coords, copies, axis=0))
+            return expand_labels(labels[np.cumsum(copies) - copies], points)
+
+        row["dbscan_full_s"], full = timed(dbscan, coords)
+        row["dbscan_dedup_s"], (fast, unique) = timed(dedup_dbscan)
+        row["unique_fixes"] = unique
+        row["dbscan_same_partition"] = same_partition(full, fast)
+        if n <= args.hdbscan_limit:
+            row["hdbscan_full_s"], full = timed(hdbscan_labels, coords)
+            row["hdbscan_dedup_s"], fast = timed(dedup_hdbscan)
+            row["hdbscan_ari"] = round(float(adjusted_rand_score(full, fast)), 4)
+        results.append(row)
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clustering every photo vs unique GPS fixes")
+    parser.add_argument("--photos", type=int, nargs="+", default=[2000, 10000, 30000])
+    parser.add_argument("--burst", type=int, default=40, help="photos per burst sharing one fix")
+    parser.add_argument("--jitter-m", type=float, default=0.3)
+    parser.add_argument("--jitter-share", type=float, default=0.2)
+    parser.add_argument("--decimals", type=int, default=5)
+    parser.add_argument("--hdbscan-limit", type=int, default=30000)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(run(parse_args(argv)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Payload size and serialisation time: legacy album JSON vs compact encodings.
+
+Legacy mirrors what FastAPI does today for /my-albums (response_model
+validation + JSON dump) and /create-album (jsonable_encoder + JSON dump).
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_encoding --albums 5 --photos 500
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from album_encoding import brotli, compress, encode_compact, iter_ndjson
+from schemas import Album
+
+CLOUD_BASE = "https://res.cloudinary.com/dxyz123abc/image/upload/"
+
+
+def make_album_docs(n_albums: int, n_photos: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    start = datetime(2024, 6, 1, 8, 0)
+    docs = []
+    for a in range(n_albums):
+        album_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        photos = []
+        for i in range(n_photos):
+            ts = start + timedelta(minutes=a * 600 + i)
+            public_id = f"smart_albums/{uuid.UUID(int=rng.getrandbits(128)).hex[:20]}"
+            photos.append({
+                "id": f"IMG_{a:02d}{i:05d}.jpg",
+                "filename": f"IMG_{a:02d}{i:05d}.jpg",
+                "timestamp": ts,
+                "score": round(rng.random(), 4),
+                "image_url": f"{CLOUD_BASE}v17{rng.randint(10000000, 99999999)}/{public_id}.jpg",
+                "lat": 21.0 + rng.random() / 100,
+                "lon": 105.8 + rng.random() / 100,
+            })
+        docs.append({
+            "_id": album_id,
+            "id": album_id,
+            "user_id": "user-123",
+            "title": (start + timedelta(days=a)).strftime("%Y-%m-%d %H:%M"),
+            "method": "st_dbscan",
+            "download_zip_url": f"https://api.cloudinary.com/v1_1/dxyz123abc/image/download_tag.zip?tag=t{a}",
+            "cover_photo_url": photos[0]["image_url"],
+            "photos": photos,
+            "created_at": start,
+            "needs_manual_location": False,
+        })
+    return docs
+
+
+def _time(fn, repeat: int):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def run(n_albums: int, n_photos: int, repeat: int) -> dict:
+    docs = make_album_docs(n_albums, n_photos)
+    adapter = TypeAdapter(List[Album])
+    models = adapter.validate_python(docs)
+
+    def legacy_my_albums():
+        validated = adapter.validate_python(docs)
+        return json.dumps(adapter.dump_python(validated, mode="json"),
+                          ensure_ascii=False, separators=(",", ":")).encode()
+
+    def legacy_create_album():
+        return json.dumps(jsonable_encoder({"albums": models}),
+                          ensure_ascii=False, separators=(",", ":")).encode()
+
+    def compact_from_docs():
+        return encode_compact(docs)
+
+    def ndjson_from_docs():
+        return b"".join(iter_ndjson(docs))
+
+    results = {}
+    for name, fn in [
+        ("legacy_my_albums", legacy_my_albums),
+        ("legacy_create_album", legacy_create_album),
+        ("compact", compact_from_docs),
+        ("ndjson", ndjson_from_docs),
+    ]:
+        body, seconds = _time(fn, repeat)
+        row = {"bytes": len(body), "serialise_ms": round(seconds * 1000, 2)}
+        for enc in ("gzip", "br"):
+            if enc == "br" and brotli is None:
+                continue
+            compressed, c_seconds = _time(lambda: compress(body, enc), repeat)
+            row[f"{enc}_bytes"] = len(compressed)
+            row[f"{enc}_ms"] = round(c_seconds * 1000, 2)
+        results[name] = row
+
+    baseline = results["legacy_my_albums"]
+    for row in results.values():
+        row["size_vs_legacy"] = round(row["bytes"] / baseline["bytes"], 3)
+        row["speedup_vs_legacy"] = round(baseline["serialise_ms"] / max(row["serialise_ms"], 1e-6), 2)
+
+    return {"albums": n_albums, "photos_per_album": n_photos, "repeat": repeat, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark album response encodings")
+    parser.add_argument("--albums", type=int, default=5)
+    parser.add_argument("--photos", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.albums, args.photos, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Time-clustering benchmark: jenkspy once per k vs the all-k dynamic program.
+
+Sorted synthetic timestamps (a few bursty events over some days):
+    per_k  - the old _find_optimal_breaks_gvf loop: jenkspy.jenks_breaks for
+             k = 2..max_k, an O(k * n^2) table rebuilt for every k
+    all_k  - clustering.jenks.jenks_all_k: one DP gives every k at once
+Sizes above --per-k-limit run the all-k program only.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_jenks --sizes 500 2000 5000 20000 100000 --max-k 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clustering.jenks import breaks_from_splits, jenks_all_k
+
+
+def make_timestamps(n: int, events: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.uniform(0, 7 * 86400, size=events)) + 1.7e9
+    which = rng.integers(0, events, size=n)
+    return np.sort(starts[which] + rng.exponential(1200, size=n))
+
+
+def per_k(data: np.ndarray, max_k: int):
+    import jenkspy
+
+    return [jenkspy.jenks_breaks(data, n_classes=k) for k in range(2, max_k + 1)]
+
+
+def all_k(data: np.ndarray, max_k: int):
+    splits, _ = jenks_all_k(data, max_k)
+    return [breaks_from_splits(data, splits[k]) for k in range(2, max_k + 1)]
+
+
+def timed(fn, *args) -> tuple:
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def run(args) -> dict:
+    results = []
+    for n in args.sizes:
+        data = make_timestamps(n, args.events)
+        row = {"n": n}
+        row["all_k_s"], fast = timed(all_k, data, args.max_k)
+        if n <= args.per_k_limit:
+            row["per_k_s"], slow = timed(per_k, data, args.max_k)
+            row["speedup"] = round(row["per_k_s"] / row["all_k_s"], 1)
+            row["same_breaks"] = all(np.allclose(a, b) for a, b in zip(fast, slow))
+        results.append({k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()})
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="jenkspy per k vs all-k Fisher–Jenks DP")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 5000, 20000, 100000])
+    parser.add_argument("--max-k", type=int, default=10)
+    parser.add_argument("--events", type=int, default=8)
+    parser.add_argument("--per-k-limit", type=int, default=5000, help="largest n to run jenkspy on")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(run(parse_args(argv)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Clustering-layer overhead benchmark: Pydantic models vs the columnar PhotoBatch.
+
+For GPS + time and time-only libraries of each size:
+    models   - ClusteringService.dispatch(list of PhotoInput) -> Album / PhotoOutput
+               models for every photo (the clustering layer's old contract)
+    batch    - PhotoBatch.from_inputs + ClusteringService.dispatch_batch ->
+               PhotoGroups of input positions (what create_album now uses)
+    core     - dispatch_batch alone, columns already built
+Reports wall time and the per-photo overhead (models - core) in microseconds.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_photo_batch --sizes 1000 10000 50000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clustering.batch import PhotoBatch
+from clustering.service import ClusteringService
+from schemas import PhotoInput
+
+
+def make_photos(n: int, with_gps: bool, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    base = datetime(2024, 1, 1, 8, 0)
+    spots = rng.uniform([10.0, 105.5], [11.0, 107.0], size=(max(1, n // 50), 2))
+    which = rng.integers(0, len(spots), size=n)
+    minutes = np.sort(which * 600 + rng.exponential(20, size=n))
+    latlon = spots[which] + rng.normal(0, 0.001, size=(n, 2))
+    return [
+        PhotoInput(id=f"p{i}", filename=f"p{i}.jpg", local_path=f"/tmp/p{i}.jpg",
+                   timestamp=base + timedelta(minutes=float(minutes[i])),
+                   latitude=float(latlon[i, 0]) if with_gps else None,
+                   longitude=float(latlon[i, 1]) if with_gps else None,
+                   score=float(rng.random()), is_rejected=bool(rng.random() < 0.05))
+        for i in range(n)
+    ]
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(args) -> dict:
+    logging.getLogger("album_gen").setLevel(logging.WARNING)
+    results = []
+    for library in ("gps_time", "time_only"):
+        for n in args.sizes:
+            photos = make_photos(n, with_gps=library == "gps_time")
+            batch = PhotoBatch.from_inputs(photos)
+            ClusteringService.dispatch_batch(batch)              # warm imports / thread pools
+            models = best_of(lambda: ClusteringService.dispatch(photos), args.repeat)
+            columnar = best_of(lambda: ClusteringService.dispatch_batch(PhotoBatch.from_inputs(photos)), args.repeat)
+            core = best_of(lambda: ClusteringService.dispatch_batch(batch), args.repeat)
+            results.append({
+                "library": library,
+                "photos": n,
+                "models_s": round(models, 4),
+                "batch_s": round(columnar, 4),
+                "core_s": round(core, 4),
+                "speedup": round(models / columnar, 2),
+                "model_overhead_us_per_photo": round((models - core) / n * 1e6, 2),
+                "batch_overhead_us_per_photo": round((columnar - core) / n * 1e6, 2),
+            })
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pydantic models vs columnar PhotoBatch in the clustering layer")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(run(parse_args(argv)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
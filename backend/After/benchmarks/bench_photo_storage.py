@@ -0,0 +1,88 @@
+"""
+Single-photo delete latency: embedded photo array vs Photos collection.
+
+Runs the same steps as DELETE /albums/{id}/photos/{photo_id} (load album,
+find photo, delete) for growing album sizes. Embedded deletes grow with
+the album; normalised deletes should stay flat.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_photo_storage --sizes 100 1000 5000 --deletes 50
+    python -m benchmarks.bench_photo_storage --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from album_repository import AsyncAlbumRepository, STORAGE_COLLECTION, STORAGE_EMBEDDED
+from benchmarks.bench_encoding import make_album_docs
+from benchmarks.fakes import AsyncInMemoryCollection
+
+
+def _collections(mongo_uri, tag):
+    if not mongo_uri:
+        return AsyncInMemoryCollection(f"Albums_{tag}"), AsyncInMemoryCollection(f"Photos_{tag}")
+    from pymongo import AsyncMongoClient
+
+    db = AsyncMongoClient(mongo_uri)[f"bench_photo_storage_{uuid.uuid4().hex[:6]}"]
+    return db["Albums"], db["Photos"]
+
+
+async def bench_layout(storage: str, n_photos: int, n_deletes: int, mongo_uri=None) -> dict:
+    albums, photos = _collections(mongo_uri, storage)
+    repo = AsyncAlbumRepository(albums, photos, storage=storage)
+    await repo.ensure_indexes()
+
+    doc = make_album_docs(1, n_photos)[0]
+    album_id, user_id = doc["_id"], doc["user_id"]
+    photo_ids = [p["id"] for p in doc["photos"]]
+    await repo.insert_albums([doc])
+
+    timings = []
+    for photo_id in photo_ids[:n_deletes]:
+        t0 = time.perf_counter()
+        album = await repo.get_album(album_id, user_id)
+        photo = await repo.find_photo(album, photo_id)
+        await repo.delete_photo(album, photo)
+        timings.append(time.perf_counter() - t0)
+
+    remaining = (await repo.list_album_photos(album_id, user_id, 1))[2]
+    if mongo_uri:
+        await albums.database.client.drop_database(albums.database.name)
+        await albums.database.client.close()
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1] * 1000, 3),
+        "remaining_photos": remaining,
+    }
+
+
+async def run(sizes, n_deletes, mongo_uri=None) -> dict:
+    results = {}
+    for size in sizes:
+        deletes = min(n_deletes, size)
+        results[size] = {
+            STORAGE_EMBEDDED: await bench_layout(STORAGE_EMBEDDED, size, deletes, mongo_uri),
+            STORAGE_COLLECTION: await bench_layout(STORAGE_COLLECTION, size, deletes, mongo_uri),
+        }
+    return {"backend": "mongodb" if mongo_uri else "in-memory", "deletes_per_size": n_deletes, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark single-photo deletes per storage layout")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--deletes", type=int, default=50)
+    parser.add_argument("--mongo-uri", help="benchmark against a real MongoDB (uses a throwaway database)")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.sizes, args.deletes, args.mongo_uri)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
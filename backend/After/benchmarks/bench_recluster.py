@@ -0,0 +1,84 @@
+"""
+Multi-resolution re-clustering benchmark: one photo set, many (dist_m, gap_min).
+
+For each size, a GPS + time library is clustered at every --resolutions pair:
+    direct    - cluster_spatiotemporal(engine="dbscan") per resolution (before)
+    build     - build_spatial_hierarchy once on the unique fixes
+    extract   - ClusteringService.recluster per resolution from the cached hierarchy
+Checks every extracted partition against the direct run and prints the totals.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_recluster --sizes 1000 10000 50000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_photo_batch import make_photos
+from clustering.algorithms import cluster_spatiotemporal
+from clustering.batch import PhotoBatch
+from clustering.dedup import collapse_coordinates
+from clustering.service import ClusteringService
+from clustering_cache import HierarchyCache
+from config import CLUSTER_COORD_DECIMALS
+
+
+def partition(groups) -> list:
+    return sorted(sorted(g.index.tolist()) for g in groups)
+
+
+def run(args) -> dict:
+    logging.getLogger("album_gen").setLevel(logging.WARNING)
+    resolutions = [tuple(map(int, r.split(":"))) for r in args.resolutions]
+    results = []
+    for n in args.sizes:
+        batch = PhotoBatch.from_inputs(make_photos(n, with_gps=True))
+        batch = batch.take(~batch.rejected)       # recluster keeps rejected photos apart, like dispatch
+        cluster_spatiotemporal(batch.take(slice(0, 50)), 700, 120, engine="dbscan")     # warm imports
+
+        t0 = time.perf_counter()
+        direct = [cluster_spatiotemporal(batch, d, g, engine="dbscan") for d, g in resolutions]
+        direct_s = time.perf_counter() - t0
+
+        cache = HierarchyCache()
+        t0 = time.perf_counter()
+        cache.get_or_build(collapse_coordinates(batch.lat, batch.lon, CLUSTER_COORD_DECIMALS))
+        build_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        extracted = [ClusteringService.recluster(batch, d, g, cache) for d, g in resolutions]
+        extract_s = time.perf_counter() - t0
+
+        results.append({
+            "photos": n,
+            "resolutions": len(resolutions),
+            "direct_s": round(direct_s, 4),
+            "build_s": round(build_s, 4),
+            "extract_s": round(extract_s, 4),
+            "extract_per_resolution_s": round(extract_s / len(resolutions), 4),
+            "speedup": round(direct_s / (build_s + extract_s), 1),
+            "same_partitions": all(partition(a) == partition(b) for a, b in zip(direct, extracted)),
+        })
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-clustering from a cached hierarchy vs direct ST-DBSCAN runs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--resolutions", nargs="+", default=["100:30", "300:60", "700:120", "2000:240", "10000:720"],
+                        help="dist_m:gap_min pairs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(run(parse_args(argv)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Rendition cost per photo and bytes saved per album view.
+
+Decodes a synthetic corpus the way process_image_job does, then times
+RenditionStore.generate (grid / preview / full + BlurHash) per format set
+and compares what a client downloads for one album view:
+- grid view: every photo as originals vs grid renditions
+- lightbox:  one photo as original vs preview rendition
+
+The corpus has per-pixel sensor noise, so WebP/AVIF sizes here are
+pessimistic compared to real photos.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_renditions --photos 20 --width 4032 --height 3024
+    python -m benchmarks.bench_renditions --formats webp webp,avif --out renditions.json
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+from renditions import RenditionStore
+
+
+def bench_formats(photos, formats: str, sizes: str) -> dict:
+    root = tempfile.mkdtemp(prefix="bench-renditions-")
+    store = RenditionStore(root=root, sizes=sizes, formats=formats)
+    timings, metas = [], []
+    try:
+        for i, p in enumerate(photos):
+            img = Image.open(io.BytesIO(p.content))
+            img.load()                      # already decoded in the pipeline; not part of the cost
+            t0 = time.perf_counter()
+            metas.append(store.generate(img, f"{i:032x}"))
+            timings.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        store.generate(None, f"{0:032x}")   # second upload of the same bytes
+        reuse = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    originals = sum(len(p.content) for p in photos)
+    per_key = {k: sum(m["bytes"][k] for m in metas) for k in metas[0]["bytes"]}
+    primary = formats.split(",")[0]
+    grid_key = "grid"
+    preview_key = "preview"
+    return {
+        "formats": formats,
+        "ms_per_photo": {
+            "median": round(statistics.median(timings) * 1000, 1),
+            "p95": round(sorted(timings)[max(0, int(len(timings) * 0.95) - 1)] * 1000, 1),
+        },
+        "reuse_ms": round(reuse * 1000, 3),
+        "avg_bytes": {"original": originals // len(photos), **{k: v // len(photos) for k, v in per_key.items()}},
+        "grid_view": {
+            "originals_bytes": originals,
+            f"{primary}_bytes": per_key[grid_key],
+            "saved_percent": round(100 * (1 - per_key[grid_key] / originals), 1),
+        },
+        "lightbox": {
+            "original_bytes": originals // len(photos),
+            f"{primary}_bytes": per_key[preview_key] // len(photos),
+            "saved_percent": round(100 * (1 - per_key[preview_key] / originals), 1),
+        },
+        "blurhash_chars": len(metas[0]["blurhash"]),
+    }
+
+
+def run(n_photos: int, width: int, height: int, format_sets, sizes: str) -> dict:
+    spec = CorpusSpec(count=n_photos, n_events=1, blur_fraction=0, dark_fraction=0,
+                      screenshot_fraction=0, size=(width, height))
+    photos = generate_corpus(spec)
+    return {
+        "photos": n_photos,
+        "size": [width, height],
+        "sizes": sizes,
+        "results": [bench_formats(photos, f, sizes) for f in format_sets],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rendition generation and bytes per album view")
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--formats", nargs="+", default=["webp", "webp,avif"])
+    parser.add_argument("--sizes", default="grid:256,preview:1024,full:2048")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    report = run(args.photos, args.width, args.height, args.formats, args.sizes)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Spatiotemporal clustering benchmark: ST-DBSCAN vs grid cells + union-find.
+
+Synthetic GPS + time library (many trips, bursts of photos around each spot):
+    dbscan - sklearn DBSCAN(haversine, ball_tree, min_samples=1), then the
+             per-component time-gap split (what run_spatiotemporal does)
+    grid   - clustering.grid.grid_st_labels
+Reports wall time, peak traced memory and whether both give the same events.
+Sizes above --dbscan-limit run the grid engine only.
+
+Usage (from the After/ directory):
+    python -m benchmarks.bench_st_grid --sizes 10000 100000 1000000 --dist-m 700 --gap-min 120
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clustering.grid import EARTH_RADIUS_M, grid_st_labels, split_by_time
+
+
+def make_library(n: int, spots: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([8.5, 102.5], [23.0, 109.5], size=(spots, 2))     # Vietnam-sized spread
+    which = rng.integers(0, spots, size=n)
+    pts = centers[which] + rng.normal(0, 0.01, size=(n, 2))
+    seconds = rng.uniform(0, 3 * 365 * 86400, size=spots)[which] + rng.exponential(3600, size=n)
+    return pts[:, 0], pts[:, 1], seconds
+
+
+def dbscan(lat, lon, seconds, dist_m, gap_s):
+    from sklearn.cluster import DBSCAN
+
+    coords = np.radians(np.column_stack((lat, lon)))
+    labels = DBSCAN(eps=dist_m / EARTH_RADIUS_M, min_samples=1, metric="haversine",
+                    n_jobs=-1, algorithm="ball_tree").fit(coords).labels_
+    return split_by_time(labels, seconds, gap_s)
+
+
+def measure(fn, *args) -> tuple:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    wall = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(wall, 3), round(peak / 2 ** 20, 1), out
+
+
+def same_events(a, b) -> bool:
+    # Same partition <=> the (a, b) label pairs are a bijection
+    pairs = np.unique(np.column_stack((a, b)), axis=0)
+    return len(pairs) == len(np.unique(a)) == len(np.unique(b))
+
+
+def run(args) -> dict:
+    from sklearn.cluster import DBSCAN  # noqa: F401  (import cost not timed)
+
+    results = []
+    for n in args.sizes:
+        lat, lon, seconds = make_library(n, args.spots)
+        row = {"n": n}
+        row["grid_s"], row["grid_peak_mb"], grid = measure(grid_st_labels, lat, lon, seconds, args.dist_m, args.gap_min * 60)
+        row["events"] = int(grid.max()) + 1
+        if n <= args.dbscan_limit:
+            row["dbscan_s"], row["dbscan_peak_mb"], ref = measure(dbscan, lat, lon, seconds, args.dist_m, args.gap_min * 60)
+            row["speedup"] = round(row["dbscan_s"] / row["grid_s"], 1)
+            row["same_events"] = same_events(grid, ref)
+        results.append(row)
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ST-DBSCAN vs grid + union-find clustering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000, 1000000])
+    parser.add_argument("--spots", type=int, default=2000)
+    parser.add_argument("--dist-m", type=float, default=700)
+    parser.add_argument("--gap-min", type=float, default=120)
+    parser.add_argument("--dbscan-limit", type=int, default=300000, help="largest n to run DBSCAN on")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(run(parse_args(argv)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Synthetic photo corpus for the After-pipeline benchmarks.
+
+Produces realistic-enough uploads: EXIF timestamps grouped into events,
+GPS tracks (random walks around Vietnamese landmarks), and configurable
+fractions of blurry, dark and screenshot images in JPEG or HEIC.
+"""
+
+import io
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+# Event anchors (lat, lon) so GPS tracks look like a real trip
+EVENT_ANCHORS = [
+    (21.0285, 105.8542),   # Hà Nội - Hồ Gươm
+    (20.9101, 107.1839),   # Hạ Long
+    (16.4637, 107.5909),   # Huế - Đại Nội
+    (16.0544, 108.2022),   # Đà Nẵng
+    (15.8801, 108.3380),   # Hội An
+    (11.9404, 108.4583),   # Đà Lạt
+    (10.7769, 106.7009),   # TP. Hồ Chí Minh
+    (10.0452, 105.7469),   # Cần Thơ
+]
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+
+@dataclass
+class CorpusSpec:
+    count: int = 100
+    n_events: int = 5
+    blur_fraction: float = 0.1
+    dark_fraction: float = 0.1
+    screenshot_fraction: float = 0.05
+    heic_fraction: float = 0.0
+    gps_fraction: float = 1.0
+    size: Tuple[int, int] = (1024, 768)
+    start: datetime = field(default_factory=lambda: datetime(2024, 6, 1, 8, 0, 0))
+    seed: int = 42
+
+
+@dataclass
+class SyntheticPhoto:
+    filename: str
+    content: bytes
+    kind: str                      # good | blur | dark | screenshot
+    timestamp: Optional[datetime]
+    lat: Optional[float]
+    lon: Optional[float]
+
+
+def _to_dms(value: float) -> Tuple[float, float, float]:
+    value = abs(value)
+    d = int(value)
+    m = int((value - d) * 60)
+    s = round((value - d - m / 60) * 3600, 4)
+    return (float(d), float(m), s)
+
+
+def _build_exif(ts: Optional[datetime], lat: Optional[float], lon: Optional[float], camera: bool) -> Image.Exif:
+    exif = Image.Exif()
+    if camera:
+        exif[271] = "SyntheticCam"
+        exif[272] = "Bench-1"
+    if ts is not None:
+        stamp = ts.strftime("%Y:%m:%d %H:%M:%S")
+        exif[306] = stamp
+        exif.get_ifd(EXIF_IFD)[36867] = stamp
+    if lat is not None and lon is not None:
+        gps = exif.get_ifd(GPS_IFD)
+        gps[1] = "N" if lat >= 0 else "S"
+        gps[2] = _to_dms(lat)
+        gps[3] = "E" if lon >= 0 else "W"
+        gps[4] = _to_dms(lon)
+    return exif
+
+
+def _render_pixels(rng: np.random.Generator, size: Tuple[int, int], kind: str) -> Image.Image:
+    w, h = size
+    if kind == "screenshot":
+        # Flat UI-like blocks, no camera noise
+        arr = np.full((h, w, 3), 245, dtype=np.uint8)
+        for _ in range(6):
+            y0, x0 = rng.integers(0, h - 40), rng.integers(0, w - 80)
+            arr[y0:y0 + 40, x0:x0 + 80] = rng.integers(0, 255, 3)
+        return Image.fromarray(arr, "RGB")
+
+    # Gradient sky + textured ground, with sensor noise
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None, None]
+    base = np.concatenate([
+        90 + 100 * (1 - y) * np.ones((h, w, 1), np.float32),
+        110 + 80 * (1 - y) * np.ones((h, w, 1), np.float32),
+        140 + 90 * (1 - y) * np.ones((h, w, 1), np.float32),
+    ], axis=2)
+    noise = rng.normal(0, 25, (h, w, 3)).astype(np.float32)
+    arr = np.clip(base + noise, 0, 255).astype(np.uint8)
+    img = Image.fromarray(arr, "RGB")
+
+    if kind == "blur":
+        img = img.filter(ImageFilter.GaussianBlur(radius=12))
+    elif kind == "dark":
+        img = Image.fromarray((np.asarray(img) * 0.12).astype(np.uint8), "RGB")
+    return img
+
+
+def _encode(img: Image.Image, exif: Image.Exif, heic: bool) -> Tuple[bytes, str]:
+    buf = io.BytesIO()
+    if heic:
+        try:
+            from pillow_heif import register_heif_opener
+            register_heif_opener()
+            img.save(buf, "HEIF", exif=exif.tobytes(), quality=80)
+            return buf.getvalue(), "heic"
+        except Exception:
+            buf = io.BytesIO()  # HEIF encoder unavailable -> JPEG
+    img.save(buf, "JPEG", exif=exif.tobytes(), quality=88)
+    return buf.getvalue(), "jpg"
+
+
+def generate_corpus(spec: CorpusSpec) -> List[SyntheticPhoto]:
+    rng = np.random.default_rng(spec.seed)
+    pyrng = random.Random(spec.seed)
+
+    kinds = (
+        ["blur"] * int(spec.count * spec.blur_fraction)
+        + ["dark"] * int(spec.count * spec.dark_fraction)
+        + ["screenshot"] * int(spec.count * spec.screenshot_fraction)
+    )
+    kinds += ["good"] * (spec.count - len(kinds))
+    pyrng.shuffle(kinds)
+
+    n_events = max(1, min(spec.n_events, spec.count))
+    per_event = np.array_split(np.arange(spec.count), n_events)
+
+    photos = []
+    ts = spec.start
+    for event_idx, indices in enumerate(per_event):
+        anchor_lat, anchor_lon = EVENT_ANCHORS[event_idx % len(EVENT_ANCHORS)]
+        lat, lon = anchor_lat, anchor_lon
+        for i in indices:
+            kind = kinds[i]
+            # Walk ~0-40 m per shot, 10 s - 2 min apart
+            lat += rng.normal(0, 0.0002)
+            lon += rng.normal(0, 0.0002)
+            ts += timedelta(seconds=int(rng.integers(10, 120)))
+
+            has_gps = kind != "screenshot" and pyrng.random() < spec.gps_fraction
+            p_ts = ts if kind != "screenshot" else None
+            p_lat, p_lon = (round(lat, 6), round(lon, 6)) if has_gps else (None, None)
+
+            img = _render_pixels(rng, spec.size, kind)
+            exif = _build_exif(p_ts, p_lat, p_lon, camera=kind != "screenshot")
+            heic = kind != "screenshot" and pyrng.random() < spec.heic_fraction
+            content, ext = _encode(img, exif, heic)
+
+            photos.append(SyntheticPhoto(
+                filename=f"IMG_{int(i):05d}.{ext}",
+                content=content,
+                kind=kind,
+                timestamp=p_ts,
+                lat=p_lat,
+                lon=p_lon,
+            ))
+        # Next event starts hours later
+        ts += timedelta(hours=int(rng.integers(3, 20)))
+
+    return photos
+
+
+def write_corpus(photos: List[SyntheticPhoto], out_dir: str) -> List[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for p in photos:
+        path = os.path.join(out_dir, p.filename)
+        with open(path, "wb") as f:
+            f.write(p.content)
+        paths.append(path)
+    return paths
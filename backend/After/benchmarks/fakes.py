@@ -0,0 +1,508 @@
+"""
+In-process stand-ins for Cloudinary and MongoDB.
+
+Both mimic the subset of the real APIs the After service uses and add
+configurable per-call latency, so the pipeline can be benchmarked and
+tested without network access. AsyncInMemoryCollection is the
+AsyncMongoClient counterpart: its latency is awaited, not slept.
+"""
+
+import asyncio
+import copy
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# ---------------------------------------------------------
+# Cloudinary
+# ---------------------------------------------------------
+class FakeCloudinaryService:
+    """Drop-in for CloudinaryService (same method names and return shapes)."""
+
+    BASE_URL = "https://res.cloudinary.com/fake/image/upload"
+
+    def __init__(self, latency_s: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        import random
+
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.uploaded: Dict[str, dict] = {}     # public_id -> {path, tags}
+        self.deleted: List[str] = []
+        self.calls: Dict[str, int] = {}
+
+    def _call(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            fail = self.failure_rate and self._rng.random() < self.failure_rate
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if fail:
+            raise ConnectionError(f"Fake Cloudinary transient failure in {name}")
+
+    def upload_photo(self, file_path: str, temp_tag: str) -> dict:
+        try:
+            self._call("upload_photo")
+        except ConnectionError:
+            return None
+        public_id = f"smart_albums/{uuid.uuid4().hex}"
+        with self._lock:
+            self.uploaded[public_id] = {"path": file_path, "tags": {temp_tag}}
+        return {"url": f"{self.BASE_URL}/v1/{public_id}.jpg", "public_id": public_id}
+
+    def upload_derived(self, file_path: str, folder: str) -> dict:
+        try:
+            self._call("upload_derived")
+        except ConnectionError:
+            return None
+        public_id = f"{folder}/{uuid.uuid4().hex}"
+        with self._lock:
+            self.uploaded[public_id] = {"path": file_path, "tags": set()}
+        ext = file_path.rsplit(".", 1)[-1]
+        return {"url": f"{self.BASE_URL}/v1/{public_id}.{ext}", "public_id": public_id}
+
+    def add_tags(self, public_ids: list, new_tag: str):
+        self._call("add_tags")
+        with self._lock:
+            for pid in public_ids:
+                if pid in self.uploaded:
+                    self.uploaded[pid]["tags"].add(new_tag)
+
+    def create_album_zip_link(self, album_tag: str) -> str:
+        self._call("create_album_zip_link")
+        return f"https://api.cloudinary.com/fake/image/download_tag.zip?tag={album_tag}"
+
+    def get_public_id_from_url(self, url: str) -> Optional[str]:
+        if not url or "cloudinary" not in url:
+            return None
+        path_part = url.split("/upload/", 1)[-1]
+        if path_part.startswith("v"):
+            path_part = path_part.split("/", 1)[1]
+        return path_part.rsplit(".", 1)[0]
+
+    def delete_resources(self, public_ids: list, wait: bool = False):
+        if not public_ids:
+            return
+        if len(public_ids) > 100:
+            raise ValueError("Cloudinary delete_resources accepts at most 100 public ids")
+        self._call("delete_resources")
+        with self._lock:
+            statuses = {}
+            for pid in public_ids:
+                statuses[pid] = "deleted" if self.uploaded.pop(pid, None) else "not_found"
+                self.deleted.append(pid)
+        return {"deleted": statuses}
+
+
+# ---------------------------------------------------------
+# MongoDB
+# ---------------------------------------------------------
+_MISSING = object()
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    parts = path.split(".")
+    for i, part in enumerate(parts):
+        if isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        elif isinstance(doc, list) and part.isdigit() and int(part) < len(doc):
+            doc = doc[int(part)]
+        elif isinstance(doc, list):
+            # "photos.id" on an array of sub-documents -> list of their values
+            rest = ".".join(parts[i:])
+            values = [_get_path(item, rest) for item in doc]
+            return [v for v in values if v is not _MISSING]
+        else:
+            return _MISSING
+    return doc
+
+
+def _compare(op: str, value: Any, arg: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$ne":
+        return not _compare("$eq", value, arg)
+    if op == "$nin":
+        return not _compare("$in", value, arg)
+
+    values = value if isinstance(value, list) else [value]
+    for v in values:
+        if v is _MISSING:
+            v = None
+        try:
+            if op == "$eq" and v == arg:
+                return True
+            if op == "$in" and v in arg:
+                return True
+            if op == "$gt" and v is not None and v > arg:
+                return True
+            if op == "$gte" and v is not None and v >= arg:
+                return True
+            if op == "$lt" and v is not None and v < arg:
+                return True
+            if op == "$lte" and v is not None and v <= arg:
+                return True
+            if op == "$regex" and isinstance(v, str) and re.search(arg, v):
+                return True
+        except TypeError:
+            continue
+    if op == "$eq" and isinstance(value, list) and value == arg:
+        return True
+    return False
+
+
+def match(doc: dict, query: Optional[dict]) -> bool:
+    """Evaluates the subset of the MongoDB query language used by the service."""
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(match(doc, q) for q in cond):
+                return False
+            continue
+        if key == "$and":
+            if not all(match(doc, q) for q in cond):
+                return False
+            continue
+
+        value = _get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$elemMatch":
+                    if not (isinstance(value, list) and any(match(v, arg) for v in value)):
+                        return False
+                elif not _compare(op, value, arg):
+                    return False
+        elif not _compare("$eq", value, cond):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return doc
+    slices = {k: v["$slice"] for k, v in projection.items() if isinstance(v, dict) and "$slice" in v}
+    projection = {k: v for k, v in projection.items() if k not in slices}
+
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {}
+        for path in include:
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                head = path.split(".")[0]
+                out[head] = copy.deepcopy(doc[head]) if "." in path else value
+        for path in slices:
+            if path in doc:
+                out[path] = doc[path]
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+    else:
+        out = {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+    for path, spec in slices.items():
+        if isinstance(out.get(path), list):
+            if isinstance(spec, list):
+                skip, n = spec
+                out[path] = out[path][skip:skip + n]
+            elif spec >= 0:
+                out[path] = out[path][:spec]
+            else:
+                out[path] = out[path][spec:]
+    return out
+
+
+class FakeCursor:
+    def __init__(self, docs: List[dict], projection: Optional[dict]):
+        self._docs = docs
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1):
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        for key, d in reversed(keys):
+            self._docs.sort(key=lambda doc: _sort_key(_get_path(doc, key)), reverse=d < 0)
+        return self
+
+    def skip(self, n: int):
+        self._skip = n
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        docs = self._docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        for doc in docs:
+            yield _project(copy.deepcopy(doc), self._projection)
+
+    def to_list(self, length: Optional[int] = None) -> List[dict]:
+        docs = list(self)
+        return docs if length is None else docs[:length]
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # Mongo orders missing/None before numbers before strings; enough for our fields
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+class InMemoryCollection:
+    """Thread-safe stand-in for a pymongo Collection."""
+
+    def __init__(self, name: str = "collection", latency_s: float = 0.0):
+        self.name = name
+        self.latency_s = latency_s
+        self._docs: Dict[Any, dict] = {}
+        self._lock = threading.RLock()
+        self.indexes: List[Tuple[Tuple[Tuple[str, int], ...], dict]] = []
+        self.op_counts: Dict[str, int] = {}
+
+    # --- helpers ---
+    def _op(self, name: str):
+        with self._lock:
+            self.op_counts[name] = self.op_counts.get(name, 0) + 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _check_unique(self, doc: dict, ignore_id: Any = _MISSING):
+        for keys, opts in self.indexes:
+            if not opts.get("unique"):
+                continue
+            fields = [k for k, _ in keys]
+            values = tuple(_get_path(doc, f) for f in fields)
+            if opts.get("sparse") and all(v is _MISSING for v in values):
+                continue
+            for other_id, other in self._docs.items():
+                if other_id == ignore_id:
+                    continue
+                if tuple(_get_path(other, f) for f in fields) == values:
+                    raise ValueError(f"E11000 duplicate key error on {fields}: {values}")
+
+    def _matching(self, query: Optional[dict]) -> List[dict]:
+        # Equality on _id is a primary-key lookup, like the real _id index
+        if query and "_id" in query and not isinstance(query["_id"], dict):
+            doc = self._docs.get(query["_id"])
+            return [doc] if doc is not None and match(doc, query) else []
+        return [d for d in self._docs.values() if match(d, query)]
+
+    # --- indexes ---
+    def create_index(self, keys, unique: bool = False, sparse: bool = False, name: Optional[str] = None, **kwargs):
+        self._op("create_index")
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        spec = (tuple((k, d) for k, d in keys), {"unique": unique, "sparse": sparse, **kwargs})
+        with self._lock:
+            if spec not in self.indexes:
+                self.indexes.append(spec)
+        return name or "_".join(f"{k}_{d}" for k, d in keys)
+
+    # --- writes ---
+    def insert_one(self, doc: dict):
+        self._op("insert_one")
+        with self._lock:
+            doc = copy.deepcopy(doc)
+            doc.setdefault("_id", uuid.uuid4().hex)
+            if doc["_id"] in self._docs:
+                raise ValueError(f"E11000 duplicate key error on _id: {doc['_id']}")
+            self._check_unique(doc)
+            self._docs[doc["_id"]] = doc
+        return SimpleNamespace(inserted_id=doc["_id"], acknowledged=True)
+
+    def insert_many(self, docs: Iterable[dict], ordered: bool = True):
+        self._op("insert_many")
+        ids = []
+        with self._lock:
+            for doc in docs:
+                doc = copy.deepcopy(doc)
+                doc.setdefault("_id", uuid.uuid4().hex)
+                if doc["_id"] in self._docs:
+                    raise ValueError(f"E11000 duplicate key error on _id: {doc['_id']}")
+                self._check_unique(doc)
+                self._docs[doc["_id"]] = doc
+                ids.append(doc["_id"])
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def _apply_update(self, doc: dict, update: dict):
+        for op, fields in update.items():
+            for path, arg in fields.items():
+                parts = path.split(".")
+                target = doc
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                leaf = parts[-1]
+                if op == "$set":
+                    target[leaf] = copy.deepcopy(arg)
+                elif op == "$unset":
+                    target.pop(leaf, None)
+                elif op == "$inc":
+                    target[leaf] = target.get(leaf, 0) + arg
+                elif op == "$push":
+                    items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                    target.setdefault(leaf, []).extend(copy.deepcopy(items))
+                elif op == "$pull":
+                    current = target.get(leaf, [])
+                    if isinstance(arg, dict):
+                        target[leaf] = [v for v in current if not (isinstance(v, dict) and match(v, arg))]
+                    else:
+                        target[leaf] = [v for v in current if v != arg]
+                else:
+                    raise NotImplementedError(f"Unsupported update operator: {op}")
+
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool):
+        with self._lock:
+            docs = self._matching(query)
+            if not many:
+                docs = docs[:1]
+            modified = 0
+            for doc in docs:
+                before = copy.deepcopy(doc)
+                self._apply_update(doc, update)
+                try:
+                    self._check_unique(doc, ignore_id=doc["_id"])
+                except ValueError:
+                    doc.clear()
+                    doc.update(before)
+                    raise
+                modified += int(doc != before)
+            upserted_id = None
+            if not docs and upsert:
+                new_doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+                self._apply_update(new_doc, update)
+                new_doc.setdefault("_id", uuid.uuid4().hex)
+                self._check_unique(new_doc)
+                self._docs[new_doc["_id"]] = new_doc
+                upserted_id = new_doc["_id"]
+        return SimpleNamespace(matched_count=len(docs), modified_count=modified,
+                               upserted_id=upserted_id, acknowledged=True)
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False):
+        self._op("update_one")
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query: dict, update: dict, upsert: bool = False):
+        self._op("update_many")
+        return self._update(query, update, upsert, many=True)
+
+    def find_one_and_update(self, query: dict, update: dict, return_document: bool = False, **kwargs):
+        self._op("find_one_and_update")
+        with self._lock:
+            docs = self._matching(query)
+            if "sort" in kwargs and docs:
+                docs = list(FakeCursor(docs, None).sort(kwargs["sort"])._docs)
+            if not docs:
+                return None
+            doc = docs[0]
+            before = copy.deepcopy(doc)
+            self._apply_update(doc, update)
+            return copy.deepcopy(doc if return_document else before)
+
+    def delete_one(self, query: dict):
+        self._op("delete_one")
+        with self._lock:
+            docs = self._matching(query)[:1]
+            for doc in docs:
+                del self._docs[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(docs), acknowledged=True)
+
+    def delete_many(self, query: dict):
+        self._op("delete_many")
+        with self._lock:
+            docs = self._matching(query)
+            for doc in docs:
+                del self._docs[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(docs), acknowledged=True)
+
+    # --- reads ---
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None):
+        self._op("find")
+        with self._lock:
+            return FakeCursor(self._matching(query), projection)
+
+    def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None):
+        self._op("find_one")
+        with self._lock:
+            docs = self._matching(query)
+            return _project(copy.deepcopy(docs[0]), projection) if docs else None
+
+    def count_documents(self, query: Optional[dict] = None) -> int:
+        self._op("count_documents")
+        with self._lock:
+            return len(self._matching(query))
+
+
+class AsyncFakeCursor:
+    """pymongo AsyncCursor subset: sync sort/skip/limit chaining, awaited to_list()."""
+
+    def __init__(self, cursor: FakeCursor, latency_s: float):
+        self._cursor = cursor
+        self._latency_s = latency_s
+
+    def sort(self, key_or_list, direction: int = 1):
+        self._cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, n: int):
+        self._cursor.skip(n)
+        return self
+
+    def limit(self, n: int):
+        self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        if self._latency_s:
+            await asyncio.sleep(self._latency_s)
+        return self._cursor.to_list(length)
+
+    def __aiter__(self):
+        async def gen():
+            for doc in await self.to_list():
+                yield doc
+        return gen()
+
+
+class AsyncInMemoryCollection:
+    """
+    Stand-in for a pymongo AsyncCollection. Documents live in `sync`, an
+    InMemoryCollection without latency, which tests can also use to seed or
+    inspect data; each call here awaits latency_s first.
+    """
+
+    def __init__(self, name: str = "collection", latency_s: float = 0.0, sync: Optional[InMemoryCollection] = None):
+        self.name = name
+        self.latency_s = latency_s
+        self.sync = sync if sync is not None else InMemoryCollection(name)
+
+    @property
+    def op_counts(self) -> Dict[str, int]:
+        return self.sync.op_counts
+
+    async def _wait(self):
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> AsyncFakeCursor:
+        return AsyncFakeCursor(self.sync.find(query, projection), self.latency_s)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.sync, name)
+        if not callable(method) or name.startswith("_"):
+            return method
+
+        async def call(*args, **kwargs):
+            await self._wait()
+            return method(*args, **kwargs)
+        return call
@@ -0,0 +1,111 @@
+"""
+Load test for a hot public share link (GET /shared-albums/{token}).
+
+Sends requests through the real FastAPI app (httpx ASGI transport, no
+network) with an in-memory async Mongo that awaits --db-latency per call, and
+compares three client behaviours:
+    uncached     - cache disabled, every view reads Mongo and re-serialises
+    cached       - server-side TTL/LRU cache, full body each time
+    conditional  - cached + If-None-Match, so repeat views get 304
+
+Usage (from the After/ directory):
+    python -m benchmarks.load_shared_album --photos 500 --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from album_repository import AsyncAlbumRepository
+from benchmarks.bench_encoding import make_album_docs
+from benchmarks.fakes import AsyncInMemoryCollection
+from shared_album_cache import SharedAlbumCache
+
+SHARE_TOKEN = "hot-share-token"
+
+
+async def run_mode(main, mode: str, args) -> dict:
+    import httpx
+
+    albums = AsyncInMemoryCollection("Albums", latency_s=args.db_latency)
+    photos = AsyncInMemoryCollection("Photos", latency_s=args.db_latency)
+    main.album_repo = AsyncAlbumRepository(albums, photos)
+    main.shared_album_cache = SharedAlbumCache(max_entries=0 if mode == "uncached" else 128, ttl_seconds=args.ttl)
+
+    doc = make_album_docs(1, args.photos)[0]
+    await main.album_repo.insert_albums([doc])
+    albums.sync.update_one({"_id": doc["_id"]}, {"$set": {"share_token": SHARE_TOKEN, "is_public": True}})
+    albums.op_counts.clear()
+
+    latencies, statuses, body_bytes = [], {}, 0
+    sem = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etag = None
+        if mode == "conditional":
+            etag = (await client.get(f"/shared-albums/{SHARE_TOKEN}")).headers["etag"]
+
+        async def one():
+            nonlocal body_bytes
+            headers = {"If-None-Match": etag} if etag else {}
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(f"/shared-albums/{SHARE_TOKEN}", headers=headers)
+                latencies.append(time.perf_counter() - t0)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            body_bytes += len(r.content)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(args.requests)])
+        wall = time.perf_counter() - wall_start
+
+    arr = np.asarray(latencies) * 1000
+    return {
+        "requests_per_second": round(args.requests / wall, 1),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "statuses": statuses,
+        "response_bytes": body_bytes,
+        "mongo_album_reads": albums.op_counts.get("find_one", 0),
+    }
+
+
+async def run(args) -> dict:
+    import main
+
+    if not args.verbose:
+        logging.getLogger("album_gen").setLevel(logging.WARNING)
+
+    results = {}
+    for mode in ("uncached", "cached", "conditional"):
+        results[mode] = await run_mode(main, mode, args)
+    return {"config": vars(args), "results": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a hot shared-album link")
+    parser.add_argument("--photos", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per Mongo call")
+    parser.add_argument("--ttl", type=float, default=60.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    print(json.dumps(asyncio.run(run(parse_args(argv))), indent=2))
+
+
+if __name__ == "__main__":
+    main()
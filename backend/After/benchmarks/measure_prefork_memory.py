@@ -0,0 +1,119 @@
+"""
+Memory of a multi-worker After deployment, with and without pre-fork sharing.
+
+Starts `gunicorn -c gunicorn.conf.py main:app` once with PREFORK=1 and once
+with PREFORK=0, waits until every worker answers /ready (models loaded),
+then reads /proc/<pid>/smaps_rollup of the master and each worker:
+    rss  - resident pages, shared ones counted in every process
+    pss  - proportional share: a page shared by 3 processes counts 1/3
+The sum of PSS is what the deployment really costs; compare it across modes.
+
+Linux only. MongoDB is not needed: point MONGO_URI at a closed port.
+
+Usage (from the After/ directory):
+    MONGO_URI="mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=300" \
+        python -m benchmarks.measure_prefork_memory --workers 2 --out prefork.json
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+AFTER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def parse_smaps_rollup(text: str) -> dict:
+    """kB values of /proc/<pid>/smaps_rollup -> {field: MB}."""
+    out = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(":")
+        if key in SMAPS_FIELDS:
+            out[key.lower()] = round(int(rest.split()[0]) / 1024, 1)
+    return out
+
+
+def read_memory(pid: int) -> dict:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        return parse_smaps_rollup(f.read())
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_ready(port: int, workers: int, timeout: float) -> float:
+    """Until /ready answers 200 enough times in a row that every worker has likely been hit."""
+    start = time.perf_counter()
+    streak = 0
+    while streak < 4 * workers:
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f"workers not ready after {timeout:.0f} s")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=2) as resp:
+                streak = streak + 1 if resp.status == 200 else 0
+        except Exception:
+            streak = 0
+            time.sleep(0.5)
+    return time.perf_counter() - start
+
+
+def measure(prefork: bool, args) -> dict:
+    env = dict(os.environ, PREFORK="1" if prefork else "0", WEB_CONCURRENCY=str(args.workers), PORT=str(args.port))
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=AFTER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready_s = wait_ready(args.port, args.workers, args.timeout)
+        time.sleep(args.settle)
+        workers = [read_memory(pid) for pid in children(master.pid)]
+        master_mem = read_memory(master.pid)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+    return {
+        "prefork": prefork,
+        "ready_s": round(ready_s, 1),
+        "master": master_mem,
+        "workers": workers,
+        "total_rss_mb": round(master_mem["rss"] + sum(w["rss"] for w in workers), 1),
+        "total_pss_mb": round(master_mem["pss"] + sum(w["pss"] for w in workers), 1),
+        "worker_private_mb": [round(w["private_clean"] + w["private_dirty"], 1) for w in workers],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the server")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to wait after ready before sampling")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    report = {"workers": args.workers, "modes": [measure(True, args), measure(False, args)]}
+    shared, separate = report["modes"]
+    report["pss_saved_mb"] = round(separate["total_pss_mb"] - shared["total_pss_mb"], 1)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
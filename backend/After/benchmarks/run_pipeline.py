@@ -0,0 +1,177 @@
+"""
+End-to-end benchmark for POST /create-album.
+
+Drives main.create_album directly (no HTTP layer) with a synthetic corpus,
+a fake Cloudinary and an in-memory Mongo collection, then prints a JSON
+report suitable for regression tracking.
+
+Usage (from the After/ directory):
+    python -m benchmarks.run_pipeline --photos 100 --requests 8 --concurrency 4 \
+        --cloud-latency 0.05 --db-latency 0.005 --out bench.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+from benchmarks.fakes import FakeCloudinaryService, AsyncInMemoryCollection, InMemoryCollection
+from album_repository import AsyncAlbumRepository
+from clustering_cache import ClusteringCache, HierarchyCache
+from deletion_jobs import DeletionJobQueue
+from summary_repository import SummaryRepository
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    arr = np.asarray(values)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 4),
+        "p95": round(float(np.percentile(arr, 95)), 4),
+        "p99": round(float(np.percentile(arr, 99)), 4),
+        "mean": round(float(arr.mean()), 4),
+    }
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+async def run_benchmark(args) -> dict:
+    from fastapi import UploadFile
+
+    import main
+    from metrics import STAGE_LATENCY
+
+    # logger_config sets INFO when main is imported, so quieten it afterwards
+    if not args.verbose:
+        logging.getLogger("album_gen").setLevel(logging.WARNING)
+
+    fake_cloud = FakeCloudinaryService(latency_s=args.cloud_latency)
+    fake_albums = AsyncInMemoryCollection("Albums", latency_s=args.db_latency)
+    main.cloud_service = fake_cloud
+    fake_photos = AsyncInMemoryCollection("Photos", latency_s=args.db_latency)
+    main.album_repo = AsyncAlbumRepository(fake_albums, fake_photos)
+    # Every store the lifespan touches is faked: no Mongo needed, no server-selection stalls
+    main.summary_repo = SummaryRepository(AsyncInMemoryCollection("TripSummaries", latency_s=args.db_latency))
+    main.deletion_jobs = DeletionJobQueue(AsyncInMemoryCollection("DeletionJobs", latency_s=args.db_latency),
+                                          fake_cloud, main.album_repo)
+    main.clustering_cache = ClusteringCache(collection=InMemoryCollection("ClusteringCache"))
+    main.hierarchy_cache = HierarchyCache(collection=main.clustering_cache.collection)
+
+    # One corpus per request (different seeds) so the analysis cache stays cold
+    corpora = []
+    gen_start = time.perf_counter()
+    for i in range(args.requests):
+        spec = CorpusSpec(
+            count=args.photos,
+            n_events=args.events,
+            blur_fraction=args.blur,
+            dark_fraction=args.dark,
+            screenshot_fraction=args.screenshots,
+            heic_fraction=args.heic,
+            size=(args.width, args.height),
+            seed=args.seed + (0 if args.warm_cache else i),
+        )
+        corpora.append(generate_corpus(spec))
+    gen_seconds = time.perf_counter() - gen_start
+
+    STAGE_LATENCY.clear()
+    main._processed_cache.clear()
+
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one_request(i: int):
+        nonlocal errors
+        async with sem:
+            files = [
+                UploadFile(file=io.BytesIO(p.content), filename=p.filename)
+                for p in corpora[i]
+            ]
+            start = time.perf_counter()
+            try:
+                await main.create_album(files=files, current_user_id=f"bench-user-{i}")
+            except Exception as e:
+                errors += 1
+                logging.getLogger("album_gen").error(f"Benchmark request {i} failed: {e}")
+            latencies.append(time.perf_counter() - start)
+
+    async with main.lifespan(main.app):
+        # Models load in the background after startup; time the pipeline, not the warm-up
+        warmup_start = time.perf_counter()
+        await main.warmup.wait()
+        warmup_seconds = time.perf_counter() - warmup_start
+        wall_start = time.perf_counter()
+        await asyncio.gather(*[one_request(i) for i in range(args.requests)])
+        wall = time.perf_counter() - wall_start
+
+    total_photos = args.photos * args.requests
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "corpus_generation_seconds": round(gen_seconds, 3),
+        "warmup_seconds": round(warmup_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "requests": args.requests,
+        "errors": errors,
+        "photos_per_second": round(total_photos / wall, 2) if wall else None,
+        "latency_seconds": _percentiles(latencies),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": STAGE_LATENCY.snapshot(),
+        "fake_cloudinary_calls": dict(fake_cloud.calls),
+        "fake_mongo_ops": dict(fake_albums.op_counts),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the After create_album pipeline")
+    parser.add_argument("--photos", type=int, default=50, help="photos per request")
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--events", type=int, default=5)
+    parser.add_argument("--blur", type=float, default=0.1)
+    parser.add_argument("--dark", type=float, default=0.1)
+    parser.add_argument("--screenshots", type=float, default=0.05)
+    parser.add_argument("--heic", type=float, default=0.0)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument("--cloud-latency", type=float, default=0.05, help="seconds per Cloudinary call")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per Mongo call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warm-cache", action="store_true", help="reuse one corpus so repeats hit the analysis cache")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,9 @@ import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 import cloudinary.utils
-from concurrent.futures import ThreadPoolExecutor
 from config import CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET
 from logger_config import logger
+from executors import get_pool, NETWORK
 
 cloudinary.config(
     cloud_name=CLOUDINARY_CLOUD_NAME,
@@ -14,9 +14,9 @@ cloudinary.config(
 )
 
 class CloudinaryService:
-    def __init__(self):
-        # 🚀 YOURS: Use 8 workers (Stable)
-        self.executor = ThreadPoolExecutor(max_workers=8)
+    def __init__(self, executor=None):
+        # Shares the process-wide NETWORK bulkhead instead of a private pool
+        self.executor = executor or get_pool(NETWORK)
 
     def upload_photo(self, file_path: str, temp_tag: str) -> dict:
         try:
@@ -36,6 +36,25 @@ class CloudinaryService:
             logger.error(f"❌ Upload Failed for {file_path}: {e}") 
             return None
 
+    def upload_derived(self, file_path: str, folder: str) -> dict:
+        """
+        Image derived from uploads (renditions, contact sheets). Untagged, so
+        the album ZIP link (download by tag) only picks up the originals.
+        """
+        try:
+            response = cloudinary.uploader.upload(
+                file_path,
+                folder=folder,
+                resource_type="image"
+            )
+            return {
+                "url": response.get("secure_url"),
+                "public_id": response.get("public_id")
+            }
+        except Exception as e:
+            logger.error(f"❌ Upload Failed for {file_path}: {e}")
+            return None
+
     def add_tags(self, public_ids: list, new_tag: str):
         """
         🚀 YOURS: Apply the tag so the Zip finds the photos
@@ -75,32 +94,6 @@ class CloudinaryService:
             logger.error(f"❌ Zip Link Generation Failed: {e}")
             return None
             
-    def upload_batch(self, photos_with_tags: list) -> dict:
-        """
-        🚀 YOURS: Parallel upload returning public_ids
-        """
-        total = len(photos_with_tags)
-        logger.info(f"☁️ Uploading {total} photos to Cloudinary...")
-        
-        results = {}
-        futures = []
-        
-        for path, tag in photos_with_tags:
-            future = self.executor.submit(self.upload_photo, path, tag)
-            futures.append((future, path))
-        
-        completed = 0
-        for future, path in futures:
-            data = future.result()
-            if data:
-                results[path] = data
-            completed += 1
-            
-            if completed % max(1, total // 5) == 0:
-                logger.info(f"📤 Upload progress: {completed}/{total}")
-        
-        return results
-
     # 🔽 HIS HELPER METHODS (KEPT) 🔽
     
     def get_public_id_from_url(self, url: str) -> str:
@@ -115,6 +108,13 @@ class CloudinaryService:
         except Exception:
             return None
 
-    def delete_resources(self, public_ids: list):
+    def delete_resources(self, public_ids: list, wait: bool = False):
+        """
+        Fire-and-forget by default. wait=True calls the Admin API inline and
+        returns its result ({"deleted": {public_id: status}}), raising on failure;
+        the API accepts at most 100 ids per call.
+        """
         if not public_ids: return
+        if wait:
+            return cloudinary.api.delete_resources(public_ids)
         self.executor.submit(cloudinary.api.delete_resources, public_ids)
\ No newline at end of file
@@ -1,16 +1,43 @@
-from typing import List
-from datetime import timedelta, datetime
-import math
+from typing import List, Optional
+from datetime import datetime
 import numpy as np
-import jenkspy
-import hdbscan
-from sklearn.cluster import DBSCAN
 
-from schemas import PhotoInput, PhotoOutput, Album
+from schemas import PhotoInput, Album
 from logger_config import logger
+from config import ST_ENGINE, ST_GRID_MIN_PHOTOS, CLUSTER_COORD_DECIMALS
+from .batch import PhotoBatch, PhotoGroup, event_groups, make_group, time_title, to_albums
+from .dedup import collapse_coordinates, expand_labels
+from .grid import grid_st_labels, split_by_time
+from .jenks import jenks_all_k, breaks_from_splits
 
 EARTH_RADIUS_KM = 6371.0088
 
+# sklearn / hdbscan are imported inside the algorithms that use them:
+# together they cost ~2 s at import time, paid by warm_up() instead of every import of main.
+
+# Each algorithm has a columnar core (cluster_*: PhotoBatch -> PhotoGroups, used by
+# ClusteringService) and a run_* wrapper taking / returning Pydantic models.
+
+# GVF elbow: stop adding events once the fit is good and one more adds little
+GVF_GOOD_FIT = 0.85
+GVF_MIN_IMPROVEMENT = 0.05
+
+
+def algorithm_settings() -> dict:
+    """Module-level knobs that change clustering output (part of the clustering cache key)."""
+    return {
+        "st_engine": ST_ENGINE,
+        "st_grid_min_photos": ST_GRID_MIN_PHOTOS,
+        "coord_decimals": CLUSTER_COORD_DECIMALS,
+        "gvf": [GVF_GOOD_FIT, GVF_MIN_IMPROVEMENT],
+    }
+
+
+def warm_up():
+    """Imports the clustering backends (called from the startup warm-up)."""
+    import hdbscan
+    from sklearn.cluster import DBSCAN
+
 # ---------------------------------------------------------
 # ✅ HELPER: Standardized Date-Time Title Generator
 # ---------------------------------------------------------
@@ -34,11 +61,28 @@ def generate_time_title(photos: List[PhotoInput]) -> str:
 # ---------------------------------------------------------
 # 1. GPS + TIME: ST-DBSCAN
 # ---------------------------------------------------------
-def run_spatiotemporal(photos: List[PhotoInput], dist_m: int, gap_min: int) -> List[Album]:
-    logger.info(f"Running ST-DBSCAN (Dist={dist_m}m, Gap={gap_min}min) on {len(photos)} photos")
+def run_spatiotemporal(photos: List[PhotoInput], dist_m: int, gap_min: int, engine: Optional[str] = None) -> List[Album]:
+    return to_albums(cluster_spatiotemporal(PhotoBatch.from_inputs(photos), dist_m, gap_min, engine), photos)
+
+
+def cluster_spatiotemporal(batch: PhotoBatch, dist_m: int, gap_min: int, engine: Optional[str] = None) -> List[PhotoGroup]:
+    engine = engine or _pick_st_engine(len(batch))
+    if engine == "grid":
+        logger.info(f"Running grid ST clustering (Dist={dist_m}m, Gap={gap_min}min) on {len(batch)} photos")
+        try:
+            events = grid_st_labels(batch.lat, batch.lon, batch.timestamp, dist_m, gap_min * 60)
+            return event_groups(batch, events, method="st_grid")
+        except ValueError as e:
+            logger.warning(f"Grid clustering unavailable ({e}); falling back to ST-DBSCAN")
+
+    # Bursts share GPS fixes: cluster each unique fix once, weighted by its photo count
+    points = collapse_coordinates(batch.lat, batch.lon, CLUSTER_COORD_DECIMALS)
+    logger.info(f"Running ST-DBSCAN (Dist={dist_m}m, Gap={gap_min}min) on {len(batch)} photos ({len(points.counts)} unique fixes)")
+
+    from sklearn.cluster import DBSCAN
 
     epsilon_rad = (dist_m / 1000.0) / EARTH_RADIUS_KM
-    coords = np.radians([[p.latitude, p.longitude] for p in photos])
+    coords = np.radians(points.coords)
     
     db = DBSCAN(
         eps=epsilon_rad, 
@@ -46,90 +90,38 @@ def run_spatiotemporal(photos: List[PhotoInput], dist_m: int, gap_min: int) -> L
         metric='haversine', 
         n_jobs=-1,
         algorithm='ball_tree'
-    ).fit(coords)
-    
-    spatial_groups = {}
-    for p, label in zip(photos, db.labels_):
-        spatial_groups.setdefault(label, []).append(p)
+    ).fit(coords, sample_weight=points.counts)
 
-    raw_albums = []
-    time_gap = timedelta(minutes=gap_min)
-    
-    for loc_id, group in spatial_groups.items():
-        # Sort by time to detect temporal gaps
-        group.sort(key=lambda x: x.timestamp)
-        
-        current_batch = [group[0]]
-        
-        for i in range(1, len(group)):
-            prev_photo = group[i-1]
-            curr_photo = group[i]
-            
-            if (curr_photo.timestamp - prev_photo.timestamp) > time_gap:
-                raw_albums.append(current_batch)
-                current_batch = []
-            
-            current_batch.append(curr_photo)
-            
-        if current_batch:
-            raw_albums.append(current_batch)
-            
-    final_albums = []
-    misc_photos = []
-
-    for batch in raw_albums:
-        if len(batch) < 3:
-            misc_photos.extend(batch) 
-        else:
-            batch.sort(key=lambda x: x.score, reverse=True)
-
-            out_photos = [PhotoOutput(
-                id=p.id,
-                filename=p.filename,
-                timestamp=p.timestamp,
-                score=p.score
-            ) for p in batch]
+    # Cut each place wherever consecutive photos are more than gap_min apart
+    events = split_by_time(expand_labels(db.labels_, points), batch.timestamp, gap_min * 60)
+    return event_groups(batch, events, method="st_dbscan")
+
+
+def _pick_st_engine(n_photos: int) -> str:
+    if ST_ENGINE != "auto":
+        return ST_ENGINE
+    return "grid" if n_photos >= ST_GRID_MIN_PHOTOS else "dbscan"
 
-            # ✅ NEW: Use consistent Date-Time title
-            album_title = generate_time_title(batch)
-
-            final_albums.append(Album(
-                title=album_title, 
-                method="st_dbscan", 
-                photos=out_photos
-            ))
-
-    if misc_photos:
-        misc_photos.sort(key=lambda x: x.score, reverse=True)
-        out_misc = [PhotoOutput(
-            id=p.id,
-            filename=p.filename,
-            timestamp=p.timestamp,
-            score=p.score
-        ) for p in misc_photos]
-
-        # Keep Miscellaneous distinct, or you can timestamp it too if you prefer
-        final_albums.append(Album(
-            title="Miscellaneous (Low Density)",
-            method="cleanup_collection", 
-            photos=out_misc
-        ))
-
-    # Sort final albums by title (which is now date-based!)
-    final_albums.sort(key=lambda a: a.title, reverse=True)
-    
-    return final_albums
 
 # ---------------------------------------------------------
 # 2. GPS ONLY: HDBSCAN
 # ---------------------------------------------------------
 def run_location_hdbscan(photos: List[PhotoInput], min_cluster_size: int = 3) -> List[Album]:
-    logger.info(f"Running HDBSCAN (Min Cluster Size={min_cluster_size}) on {len(photos)} photos")
+    return to_albums(cluster_location_hdbscan(PhotoBatch.from_inputs(photos), min_cluster_size), photos)
+
+
+def cluster_location_hdbscan(batch: PhotoBatch, min_cluster_size: int = 3) -> List[PhotoGroup]:
+    # hdbscan takes no sample weights: keep up to min_cluster_size copies of each unique
+    # fix, enough for a burst to form a cluster on its own without every duplicate
+    points = collapse_coordinates(batch.lat, batch.lon, CLUSTER_COORD_DECIMALS)
+    copies = np.minimum(points.counts, min_cluster_size)
+    logger.info(f"Running HDBSCAN (Min Cluster Size={min_cluster_size}) on {len(batch)} photos ({int(copies.sum())} weighted points)")
+    import hdbscan
 
     max_dist_meters = 300
     epsilon_rad = (max_dist_meters / 1000.0) / EARTH_RADIUS_KM
     
-    coords = np.radians([[p.latitude, p.longitude] for p in photos])
+    coords = np.radians(np.repeat(points.coords, copies, axis=0))
     
     clusterer = hdbscan.HDBSCAN(
         min_cluster_size=min_cluster_size, 
@@ -140,54 +132,24 @@ def run_location_hdbscan(photos: List[PhotoInput], min_cluster_size: int = 3) ->
         algorithm='best',
         approx_min_span_tree=True
     )
-    labels = clusterer.fit_predict(coords)
-
-    groups = {}
-    noise_photos = []
+    # Copies of one fix always share a label: read it from the first copy
+    labels = expand_labels(clusterer.fit_predict(coords)[np.cumsum(copies) - copies], points)
 
-    for p, label in zip(photos, labels):
-        if label == -1:
-            noise_photos.append(p)
-        else:
-            groups.setdefault(label, []).append(p)
-            
     albums = []
 
-    for label, group in groups.items():
-        group.sort(key=lambda x: x.score, reverse=True)
-        
-        out_photos = [PhotoOutput(
-            id=p.id,
-            filename=p.filename,
-            timestamp=p.timestamp,
-            score=p.score
-        ) for p in group]
-        
+    # Clusters in order of first appearance, like the photos they came from
+    found, first = np.unique(labels[labels != -1], return_index=True)
+    for label in found[np.argsort(first)]:
+        rows = np.flatnonzero(labels == label)
         # ✅ NEW: Try to use Date-Time title if timestamps exist
-        album_title = generate_time_title(group)
+        album_title = time_title(batch, rows)
         if album_title == "Undated Event":
             album_title = f"Location Cluster #{label}"
+        albums.append(make_group(batch, rows, album_title, "gps_hdbscan"))
 
-        albums.append(Album(
-            title=album_title, 
-            method="gps_hdbscan", 
-            photos=out_photos
-        ))
-
-    if noise_photos:
-        noise_photos.sort(key=lambda x: x.score, reverse=True)
-        out_noise = [PhotoOutput(
-            id=p.id,
-            filename=p.filename,
-            timestamp=p.timestamp,
-            score=p.score
-        ) for p in noise_photos]
-        
-        albums.append(Album(
-            title="Miscellaneous", 
-            method="gps_hdbscan_noise", 
-            photos=out_noise
-        ))
+    noise = np.flatnonzero(labels == -1)
+    if noise.size:
+        albums.append(make_group(batch, noise, "Miscellaneous", "gps_hdbscan_noise"))
 
     albums.sort(key=lambda a: a.title, reverse=True)
 
@@ -197,96 +159,59 @@ def run_location_hdbscan(photos: List[PhotoInput], min_cluster_size: int = 3) ->
 # 3. TIME ONLY: JENKS NATURAL BREAKS
 # ---------------------------------------------------------
 def run_jenks_time(photos: List[PhotoInput], max_events: int = 10) -> List[Album]:
-    logger.info(f"Running Jenks Time on {len(photos)} photos")
-    if not photos: return []
-    
-    photos.sort(key=lambda x: x.timestamp)
-    
-    timestamps = np.array([p.timestamp.timestamp() for p in photos])
-    n_photos = len(photos)
+    return to_albums(cluster_jenks_time(PhotoBatch.from_inputs(photos), max_events), photos)
+
 
-    if n_photos > 500:
-        step = n_photos // 500
-        sample_timestamps = timestamps[::step]
-        logger.info(f"Jenks: Downsampling {n_photos} -> {len(sample_timestamps)} points")
-    else:
-        sample_timestamps = timestamps
+def cluster_jenks_time(batch: PhotoBatch, max_events: int = 10) -> List[PhotoGroup]:
+    logger.info(f"Running Jenks Time on {len(batch)} photos")
+    if not len(batch): return []
+    
+    order = np.argsort(batch.timestamp, kind="stable")
+    timestamps = batch.timestamp[order]
+    n_photos = len(batch)
 
-    limit = min(max_events, len(sample_timestamps) - 1)
+    limit = min(max_events, n_photos - 1)
     if limit < 2: limit = 2
         
-    best_breaks = _find_optimal_breaks_gvf(sample_timestamps, max_k=limit)
+    # Exact on every photo: the all-k DP is O(k·n log n), no downsampling needed
+    split_indices = _optimal_jenks_split(timestamps, max_k=limit)
     
-    logger.info(f"Jenks: Optimal split is {len(best_breaks)-1} events.")
+    logger.info(f"Jenks: Optimal split is {len(split_indices)-1} events.")
 
     albums = []
-    
-    internal_breaks = best_breaks[1:-1]
-    split_indices = np.searchsorted(timestamps, internal_breaks, side='right')
-    split_indices = np.concatenate(([0], split_indices, [n_photos]))
 
-    for i in range(len(split_indices) - 1):
-        start_idx = split_indices[i]
-        end_idx = split_indices[i+1]
-        
-        batch = photos[start_idx:end_idx]
-        
-        if batch:
-            batch.sort(key=lambda x: x.score, reverse=True)
-            
-            out_photos = [PhotoOutput(
-                id=p.id,
-                filename=p.filename,
-                timestamp=p.timestamp,
-                score=p.score
-            ) for p in batch]
-            
+    for start_idx, end_idx in zip(split_indices[:-1], split_indices[1:]):
+        rows = order[start_idx:end_idx]
+        if rows.size:
             # ✅ NEW: Use consistent Date-Time title
-            album_title = generate_time_title(batch)
-            
-            albums.append(Album(
-                title=album_title, 
-                method="jenks_gvf", 
-                photos=out_photos
-            ))
+            albums.append(make_group(batch, rows, time_title(batch, rows), "jenks_gvf"))
 
     albums.sort(key=lambda a: a.title, reverse=True)
     return albums
 
-def _find_optimal_breaks_gvf(data: np.array, max_k: int) -> List[float]:
-    sdam = np.var(data) * len(data)
-    if sdam == 0: return [data[0], data[-1]]
-
-    best_breaks = []
+def _choose_k(gvf: np.ndarray, max_k: int) -> int:
+    """Last k before the first one whose GVF is above GVF_GOOD_FIT but gains < GVF_MIN_IMPROVEMENT."""
+    best_k = 1
     previous_gvf = 0.0
-    
     for k in range(2, max_k + 1):
-        try:
-            current_breaks = jenkspy.jenks_breaks(data, n_classes=k)
-            
-            cut_points = current_breaks[1:-1]
-            indices = np.searchsorted(data, cut_points, side='right')
-            indices = np.concatenate(([0], indices, [len(data)]))
-            
-            sdcm = 0.0
-            for i in range(len(indices) - 1):
-                start, end = indices[i], indices[i+1]
-                if end > start:
-                    group = data[start:end]
-                    sdcm += np.var(group) * len(group)
-            
-            gvf = 1.0 - (sdcm / sdam)
-            
-            improvement = gvf - previous_gvf
-            
-            if gvf > 0.85 and improvement < 0.05:
-                return best_breaks if best_breaks else current_breaks
-            
-            best_breaks = current_breaks
-            previous_gvf = gvf
-            
-        except Exception as e:
-            logger.warning(f"Jenks Optimization Warning at k={k}: {e}")
-            continue
-            
-    return best_breaks if best_breaks else [data[0], data[-1]]
\ No newline at end of file
+        if gvf[k] > GVF_GOOD_FIT and gvf[k] - previous_gvf < GVF_MIN_IMPROVEMENT:
+            return best_k if best_k > 1 else k
+        best_k = k
+        previous_gvf = gvf[k]
+    return best_k
+
+
+def _optimal_jenks_split(data: np.ndarray, max_k: int) -> np.ndarray:
+    """Boundary indices [0, ..., n] of the GVF-chosen natural-breaks partition of sorted data."""
+    n = len(data)
+    if n == 0 or np.ptp(data) == 0:
+        return np.array([0, n])
+    splits, gvf = jenks_all_k(data, min(max_k, n))
+    return splits[_choose_k(gvf, len(gvf) - 1)]
+
+
+def _find_optimal_breaks_gvf(data: np.array, max_k: int) -> List[float]:
+    """Break values [min, class upper bounds...] of the GVF-chosen partition, as jenkspy returns them."""
+    if np.ptp(data) == 0:
+        return [data[0], data[-1]]
+    return breaks_from_splits(data, _optimal_jenks_split(data, max_k))
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from schemas import PhotoInput, PhotoOutput, Album
+
+# Struct-of-arrays view of the photos being clustered. Attribute access on the
+# Pydantic inputs happens once, in from_inputs(); the algorithms work on numpy
+# columns and return PhotoGroups of row indices. Album / PhotoOutput models are
+# only built at the API boundary (to_albums, or main.create_album directly).
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(ts: Optional[datetime]) -> float:
+    if ts is None:
+        return np.nan
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return (ts - _EPOCH).total_seconds()
+
+
+@dataclass
+class PhotoBatch:
+    photos: Sequence[PhotoInput]   # the inputs, for ids / filenames at the boundary
+    index: np.ndarray              # row -> position in `photos`
+    timestamp: np.ndarray          # seconds since 1970-01-01 (naive clock, aware -> UTC), NaN if unknown
+    lat: np.ndarray                # degrees, NaN if unknown
+    lon: np.ndarray
+    score: np.ndarray
+    rejected: np.ndarray           # bool
+
+    @classmethod
+    def from_inputs(cls, photos: Sequence[PhotoInput]) -> "PhotoBatch":
+        n = len(photos)
+
+        def column(values, dtype=np.float64):
+            return np.fromiter(values, dtype=dtype, count=n)
+
+        return cls(
+            photos=photos,
+            index=np.arange(n, dtype=np.int64),
+            timestamp=column(_seconds(p.timestamp) for p in photos),
+            lat=column(np.nan if p.latitude is None else p.latitude for p in photos),
+            lon=column(np.nan if p.longitude is None else p.longitude for p in photos),
+            score=column(p.score for p in photos),
+            rejected=column((p.is_rejected for p in photos), dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def take(self, rows: np.ndarray) -> "PhotoBatch":
+        """Sub-batch of the given rows (boolean mask or row numbers)."""
+        return PhotoBatch(self.photos, self.index[rows], self.timestamp[rows], self.lat[rows],
+                          self.lon[rows], self.score[rows], self.rejected[rows])
+
+    @property
+    def has_time(self) -> bool:
+        return not np.isnan(self.timestamp).any()
+
+    @property
+    def has_gps(self) -> bool:
+        return not (np.isnan(self.lat).any() or np.isnan(self.lon).any())
+
+
+@dataclass
+class PhotoGroup:
+    """One clustered album: positions in the input list, best score first."""
+    title: str
+    method: str
+    index: np.ndarray
+
+    def photos(self, inputs: Sequence[PhotoInput]) -> List[PhotoInput]:
+        return [inputs[i] for i in self.index]
+
+
+def as_datetime(seconds: float) -> datetime:
+    return _EPOCH + timedelta(seconds=float(seconds))
+
+
+def time_title(batch: PhotoBatch, rows: np.ndarray) -> str:
+    """generate_time_title() on columns: earliest timestamp as "YYYY-MM-DD HH:mm"."""
+    ts = batch.timestamp[rows]
+    ts = ts[~np.isnan(ts)]
+    if not ts.size:
+        return "Undated Event"
+    return as_datetime(ts.min()).strftime("%Y-%m-%d %H:%M")
+
+
+def make_group(batch: PhotoBatch, rows: np.ndarray, title: str, method: str, by_score: bool = True) -> PhotoGroup:
+    """Group of the given rows; by_score orders them best first (ties: earlier photo, then input order)."""
+    rows = np.asarray(rows)
+    if by_score:
+        rows = rows[np.lexsort((batch.index[rows], batch.timestamp[rows], -batch.score[rows]))]
+    return PhotoGroup(title=title, method=method, index=batch.index[rows])
+
+
+def event_groups(batch: PhotoBatch, events: np.ndarray, method: str) -> List[PhotoGroup]:
+    """One album per spatiotemporal event of 3+ photos; smaller events share a low-density album."""
+    order = np.lexsort((batch.timestamp, events))
+    runs = np.split(order, np.flatnonzero(np.diff(events[order])) + 1) if len(order) else []
+
+    final_albums = []
+    misc_rows = []
+
+    for rows in runs:
+        if len(rows) < 3:
+            misc_rows.append(rows)
+        else:
+            final_albums.append(make_group(batch, rows, time_title(batch, rows), method))
+
+    if misc_rows:
+        # Keep Miscellaneous distinct, or you can timestamp it too if you prefer
+        final_albums.append(make_group(batch, np.concatenate(misc_rows), "Miscellaneous (Low Density)", "cleanup_collection"))
+
+    # Sort final albums by title (which is now date-based!)
+    final_albums.sort(key=lambda a: a.title, reverse=True)
+    return final_albums
+
+
+def to_albums(groups: List[PhotoGroup], photos: Sequence[PhotoInput]) -> List[Album]:
+    """Album models for callers that still want them (tests, the list-based run_* wrappers)."""
+    return [
+        Album(
+            title=g.title,
+            method=g.method,
+            photos=[PhotoOutput(id=p.id, filename=p.filename, timestamp=p.timestamp, score=p.score)
+                    for p in g.photos(photos)],
+        )
+        for g in groups
+    ]
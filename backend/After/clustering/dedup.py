@@ -0,0 +1,31 @@
+from typing import NamedTuple
+
+import numpy as np
+
+# Bursts are shot from one spot: dozens of photos share a GPS fix (or differ
+# only by receiver jitter). Clustering the unique fixes with their counts as
+# weights gives the same labels for a fraction of the neighbour queries.
+
+
+class CollapsedPoints(NamedTuple):
+    coords: np.ndarray      # (m, 2) unique rounded [lat, lon] in degrees
+    counts: np.ndarray      # photos behind each unique point
+    inverse: np.ndarray     # photo index -> unique point index
+
+
+def collapse_coordinates(lat: np.ndarray, lon: np.ndarray, decimals: int) -> CollapsedPoints:
+    """
+    Merges photos whose lat/lon agree to `decimals` places (5 places is ~1.1 m).
+
+    The merged point sits at the rounded position, so a pair of photos can move
+    by at most half a grid step each relative to the clustering radius.
+    """
+    rounded = np.column_stack((np.round(np.asarray(lat, dtype=np.float64), decimals),
+                               np.round(np.asarray(lon, dtype=np.float64), decimals)))
+    coords, inverse, counts = np.unique(rounded, axis=0, return_inverse=True, return_counts=True)
+    return CollapsedPoints(coords, counts, inverse.reshape(-1))
+
+
+def expand_labels(unique_labels: np.ndarray, points: CollapsedPoints) -> np.ndarray:
+    """Per-photo labels from the labels of their unique points."""
+    return np.asarray(unique_labels)[points.inverse]
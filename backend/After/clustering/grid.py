@@ -0,0 +1,231 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+# Spatiotemporal clustering on a uniform 3-D grid, the same partition as the
+# DBSCAN(min_samples=1, haversine) + time-gap split in run_spatiotemporal.
+#
+# Points become unit vectors; two photos are within dist_m along the great
+# circle exactly when their chord is within 2 * sin(eps / 2). Cells are cubes
+# of side chord / sqrt(3), so every cell is a clique and only cells within two
+# steps of each other can touch. Cell pairs are decided by their bounding
+# boxes where possible, otherwise by testing the boundary points; touching
+# cells are merged with a vectorised union-find. Each spatial component is then
+# cut wherever consecutive timestamps are more than gap_s apart.
+#
+# Memory is O(n + cells): no neighbour lists are kept.
+
+EARTH_RADIUS_M = 6371008.8
+_PAIR_BATCH = 1 << 19            # point pairs expanded per numpy pass
+_SMALL_PAIR = 4096               # cell pairs with more point pairs are tested one by one
+_QUICK_POINTS = 4                # points per cell in the first, partial pass over small pairs
+_WITNESS = 32                    # closest points per side tried before a full dense-pair test
+
+
+def unit_vectors(lat_deg: np.ndarray, lon_deg: np.ndarray) -> np.ndarray:
+    lat = np.radians(np.asarray(lat_deg, dtype=np.float64))
+    lon = np.radians(np.asarray(lon_deg, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_for(dist_m: float) -> float:
+    return 2.0 * math.sin(dist_m / EARTH_RADIUS_M / 2.0)
+
+
+def union_find(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Connected components of n nodes joined by edges (a[i], b[i]).
+
+    Vectorised hook-and-compress: every round hooks the larger root of each
+    edge under the smaller one, then jumps pointers until every node points at
+    its root. Returns the root (smallest node id) of each node.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    while a.size:
+        ra, rb = parent[a], parent[b]
+        open_ = ra != rb
+        if not open_.any():
+            break
+        a, b, ra, rb = a[open_], b[open_], ra[open_], rb[open_]
+        np.minimum.at(parent, np.maximum(ra, rb), np.minimum(ra, rb))
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return parent
+
+
+def _cells(xyz: np.ndarray, chord: float) -> Tuple[np.ndarray, int, np.ndarray]:
+    side = chord / math.sqrt(3.0)
+    reach = math.ceil(chord / side)
+    idx = np.floor(xyz / side).astype(np.int64)
+    idx -= idx.min(axis=0) - reach            # room for neighbour offsets on both sides
+    spans = idx.max(axis=0) + reach + 1
+    if math.prod(int(s) for s in spans) >= 1 << 62:
+        raise ValueError("grid too fine for this spread of points; cell keys would overflow int64")
+    strides = np.array([spans[1] * spans[2], spans[2], 1], dtype=np.int64)
+    return idx @ strides, reach, strides
+
+
+def _forward_offsets(reach: int) -> np.ndarray:
+    r = range(-reach, reach + 1)
+    offsets = [(dx, dy, dz) for dx in r for dy in r for dz in r]
+    return np.array([o for o in offsets if o > (0, 0, 0)], dtype=np.int64)
+
+
+def _bbox_gap(lo, hi, a, b) -> Tuple[np.ndarray, np.ndarray]:
+    """Smallest and largest possible squared distance between boxes a and b."""
+    near = np.maximum(0.0, np.maximum(lo[b] - hi[a], lo[a] - hi[b]))
+    far = np.maximum(hi[b] - lo[a], hi[a] - lo[b])
+    return (near * near).sum(axis=1), (far * far).sum(axis=1)
+
+
+def _touching_small(pts, start, count, a, b, chord2, limit=None) -> np.ndarray:
+    """
+    For many small cell pairs at once: does any point pair lie within the chord?
+
+    With `limit`, only the first `limit` points of each cell are tried: a quick
+    pass that finds most touching pairs but may miss some.
+    """
+    touching = np.zeros(a.size, dtype=bool)
+    if limit is not None:
+        count = np.minimum(count, limit)
+    sizes = count[a] * count[b]
+    ends = np.cumsum(sizes)
+    lo = 0
+    while lo < a.size:
+        hi = int(np.searchsorted(ends, ends[lo] - sizes[lo] + _PAIR_BATCH, side="right"))
+        hi = max(hi, lo + 1)
+        sa, sb, sz = a[lo:hi], b[lo:hi], sizes[lo:hi]
+        pair = np.repeat(np.arange(sz.size), sz)
+        k = np.arange(pair.size) - np.repeat(np.cumsum(sz) - sz, sz)
+        pa = start[sa][pair] + k // count[sb][pair]
+        pb = start[sb][pair] + k % count[sb][pair]
+        d = pts[pa] - pts[pb]
+        close = np.einsum("ij,ij->i", d, d) <= chord2
+        touching[lo:hi] = np.logical_or.reduceat(close, np.cumsum(sz) - sz)
+        lo = hi
+    return touching
+
+
+def _touching_large(pts, start, count, lo, hi, a, b, chord2) -> bool:
+    pa = pts[start[a]:start[a] + count[a]]
+    pb = pts[start[b]:start[b] + count[b]]
+    # Only points near the other cell's box can reach it; try the nearest few first
+    gap_a = (np.maximum(0.0, np.maximum(lo[b] - pa, pa - hi[b])) ** 2).sum(axis=1)
+    gap_b = (np.maximum(0.0, np.maximum(lo[a] - pb, pb - hi[a])) ** 2).sum(axis=1)
+    pa, gap_a = pa[gap_a <= chord2], gap_a[gap_a <= chord2]
+    pb, gap_b = pb[gap_b <= chord2], gap_b[gap_b <= chord2]
+    if not len(pa) or not len(pb):
+        return False
+    if len(pa) * len(pb) > _WITNESS ** 2:
+        qa = pa[np.argsort(gap_a)[:_WITNESS]]
+        qb = pb[np.argsort(gap_b)[:_WITNESS]]
+        d = qa[:, None, :] - qb[None, :, :]
+        if (np.einsum("ijk,ijk->ij", d, d) <= chord2).any():
+            return True
+    step = max(1, _PAIR_BATCH // len(pb))
+    for i in range(0, len(pa), step):
+        d = pa[i:i + step, None, :] - pb[None, :, :]
+        if (np.einsum("ijk,ijk->ij", d, d) <= chord2).any():
+            return True
+    return False
+
+
+def _find(parent: list, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def spatial_labels(lat_deg: np.ndarray, lon_deg: np.ndarray, dist_m: float) -> np.ndarray:
+    """Connected components of the 'within dist_m (haversine)' graph; one label per point."""
+    n = len(lat_deg)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    xyz = unit_vectors(lat_deg, lon_deg)
+    chord = chord_for(dist_m)
+    chord2 = chord * chord
+
+    keys, reach, strides = _cells(xyz, chord)
+    order = np.argsort(keys, kind="stable")
+    cells, start, count = np.unique(keys[order], return_index=True, return_counts=True)
+    pts = xyz[order]
+    lo = np.minimum.reduceat(pts, start)
+    hi = np.maximum.reduceat(pts, start)
+
+    edges_a, edges_b, small_a, small_b, large = [], [], [], [], []
+    for offset in _forward_offsets(reach):
+        target = cells + offset @ strides
+        pos = np.minimum(np.searchsorted(cells, target), cells.size - 1)
+        hit = cells[pos] == target
+        a, b = np.flatnonzero(hit), pos[hit]
+        near, far = _bbox_gap(lo, hi, a, b)
+        keep = near <= chord2
+        a, b, far = a[keep], b[keep], far[keep]
+        sure = far <= chord2
+        edges_a.append(a[sure])
+        edges_b.append(b[sure])
+        a, b = a[~sure], b[~sure]
+        small = count[a] * count[b] <= _SMALL_PAIR
+        small_a.append(a[small])
+        small_b.append(b[small])
+        large.extend(zip(a[~small].tolist(), b[~small].tolist()))
+
+    a, b = np.concatenate(small_a), np.concatenate(small_b)
+    quick = _touching_small(pts, start, count, a, b, chord2, limit=_QUICK_POINTS)
+    edges_a.append(a[quick])
+    edges_b.append(b[quick])
+    root = union_find(cells.size, np.concatenate(edges_a), np.concatenate(edges_b))
+
+    # Full test only for pairs the quick pass left apart
+    a, b = a[~quick], b[~quick]
+    a, b = a[root[a] != root[b]], b[root[a] != root[b]]
+    if a.size:
+        touching = _touching_small(pts, start, count, a, b, chord2)
+        root = union_find(cells.size, np.concatenate([np.arange(cells.size), a[touching]]),
+                          np.concatenate([root, b[touching]]))
+
+    if large:
+        # Dense cell pairs are costly to test: skip those already joined through other cells
+        parent = root.tolist()
+        extra_a, extra_b = [], []
+        for a, b in large:
+            ra, rb = _find(parent, a), _find(parent, b)
+            if ra != rb and _touching_large(pts, start, count, lo, hi, a, b, chord2):
+                parent[max(ra, rb)] = min(ra, rb)
+                extra_a.append(a)
+                extra_b.append(b)
+        root = union_find(cells.size, np.concatenate([root, extra_a]), np.concatenate([np.arange(cells.size), extra_b]))
+
+    labels = np.empty(n, dtype=np.int64)
+    labels[order] = np.repeat(root, count)
+    return labels
+
+
+def split_by_time(labels: np.ndarray, seconds: np.ndarray, gap_s: float) -> np.ndarray:
+    """Cuts each spatial label wherever consecutive timestamps are more than gap_s apart."""
+    n = len(labels)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((seconds, labels))
+    lab, sec = labels[order], seconds[order]
+    cut = np.empty(n, dtype=bool)
+    cut[0] = False
+    cut[1:] = (lab[1:] != lab[:-1]) | (np.diff(sec) > gap_s)
+    out = np.empty(n, dtype=np.int64)
+    out[order] = np.cumsum(cut)
+    return out
+
+
+def grid_st_labels(lat_deg: np.ndarray, lon_deg: np.ndarray, seconds: np.ndarray,
+                   dist_m: float, gap_s: float) -> np.ndarray:
+    """Spatiotemporal event label per point (0..n_events-1, numbered by place then time)."""
+    seconds = np.asarray(seconds, dtype=np.float64)
+    return split_by_time(spatial_labels(lat_deg, lon_deg, dist_m), seconds, gap_s)
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from logger_config import logger
+from .batch import PhotoBatch, PhotoGroup, event_groups
+from .dedup import CollapsedPoints, expand_labels
+from .grid import split_by_time, union_find, unit_vectors
+
+# Single-linkage hierarchy of the GPS fixes, built once per photo set.
+#
+# ST-DBSCAN with min_samples=1 joins photos whose fixes are chained by hops of
+# at most eps: the connected components of the minimum spanning tree after
+# dropping edges longer than eps. Keeping the MST edges sorted by length
+# therefore answers every dist_m: a prefix of the edges + one union-find pass,
+# then the usual time-gap split. No neighbour search is repeated.
+#
+# The MST is taken from the convex hull of the fixes as unit vectors: for points
+# on a sphere the hull edges are the spherical Delaunay triangulation, which
+# contains a great-circle MST. That is O(n log n) with qhull, against minutes
+# for an exact Boruvka MST over a ball tree on large sets.
+
+
+@dataclass(frozen=True)
+class SpatialHierarchy:
+    """MST of the unique fixes (indices into their sorted order), edges sorted by haversine length in radians."""
+    n_points: int
+    a: np.ndarray
+    b: np.ndarray
+    length: np.ndarray
+
+    def labels_at(self, eps_rad: float) -> np.ndarray:
+        """Component label of every fix when hops up to eps_rad join places (DBSCAN min_samples=1)."""
+        k = int(np.searchsorted(self.length, eps_rad, side="right"))
+        return union_find(self.n_points, self.a[:k], self.b[:k])
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle angle in radians between points given in radians (same formula as sklearn)."""
+    return 2.0 * np.arcsin(np.sqrt(np.sin((lat2 - lat1) / 2.0) ** 2
+                                   + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2))
+
+
+def _candidate_edges(coords_deg: np.ndarray) -> np.ndarray:
+    n = len(coords_deg)
+    if n <= 4:
+        i, j = np.triu_indices(n, k=1)
+        return np.column_stack((i, j))
+    from scipy.spatial import ConvexHull, QhullError
+
+    try:
+        simplices = ConvexHull(unit_vectors(coords_deg[:, 0], coords_deg[:, 1])).simplices
+    except QhullError as e:
+        # Flat input (every fix on one circle, e.g. a single parallel): the hull has no volume
+        logger.warning(f"Convex hull failed ({str(e).splitlines()[0]}); using the exact Boruvka MST instead")
+        return _boruvka_edges(coords_deg)
+    edges = np.concatenate((simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]))
+    return np.unique(np.sort(edges, axis=1), axis=0)
+
+
+def _boruvka_edges(coords_deg: np.ndarray) -> np.ndarray:
+    from sklearn.neighbors import BallTree
+    from hdbscan._hdbscan_boruvka import BallTreeBoruvkaAlgorithm
+
+    tree = BallTree(np.radians(coords_deg), metric="haversine")
+    mst = BallTreeBoruvkaAlgorithm(tree, min_samples=1, metric="haversine", approx_min_span_tree=False).spanning_tree()
+    return mst[:, :2].astype(np.int64)
+
+
+def build_spatial_hierarchy(coords_deg: np.ndarray) -> SpatialHierarchy:
+    """Hierarchy over distinct [lat, lon] rows (collapse_coordinates output)."""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import minimum_spanning_tree
+
+    n = len(coords_deg)
+    if n < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return SpatialHierarchy(n, empty, empty, np.zeros(0))
+
+    edges = _candidate_edges(coords_deg)
+    rad = np.radians(coords_deg)
+    length = haversine(rad[edges[:, 0], 0], rad[edges[:, 0], 1], rad[edges[:, 1], 0], rad[edges[:, 1], 1])
+    tree = minimum_spanning_tree(coo_matrix((length, (edges[:, 0], edges[:, 1])), shape=(n, n))).tocoo()
+
+    order = np.argsort(tree.data, kind="stable")
+    return SpatialHierarchy(n, tree.row[order].astype(np.int64), tree.col[order].astype(np.int64), tree.data[order])
+
+
+def extract_spatiotemporal(batch: PhotoBatch, points: CollapsedPoints, hierarchy: SpatialHierarchy,
+                           dist_m: float, gap_min: float, earth_radius_km: float) -> List[PhotoGroup]:
+    """cluster_spatiotemporal() at (dist_m, gap_min) from a prebuilt hierarchy of batch's fixes."""
+    places = expand_labels(hierarchy.labels_at((dist_m / 1000.0) / earth_radius_km), points)
+    events = split_by_time(places, batch.timestamp, gap_min * 60)
+    return event_groups(batch, events, method="st_hierarchy")
@@ -0,0 +1,122 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# Fisher–Jenks natural breaks for every k in one dynamic program.
+#
+# D[k][i] = min over j of D[k-1][j] + SSD(x[j:i])   (first i sorted values in k classes)
+#
+# SSD of any run comes from prefix sums of the (shifted, scaled) values in O(1).
+# For sorted 1-D data the best j is non-decreasing in i, so each layer is
+# filled by divide and conquer: solve the middle i of a range, then its left
+# half only looks at j <= that answer and its right half at j >= it. All
+# ranges of one recursion depth are solved together with numpy, which keeps
+# a layer at O(n log n) work in ~log2(n) vectorised passes instead of the
+# O(n^2) table jenkspy rebuilds for each k.
+
+
+def _prefix_sums(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Shift to the first value and scale to [0, 1]: raw epoch seconds squared
+    # (~1e18) would leave no float64 precision for the small within-event spreads
+    x = values - values[0]
+    span = x[-1]
+    if span > 0:
+        x = x / span
+    s1 = np.concatenate(([0.0], np.cumsum(x)))
+    s2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    return s1, s2
+
+
+def _ssd(s1: np.ndarray, s2: np.ndarray, j: np.ndarray, i: np.ndarray) -> np.ndarray:
+    """Sum of squared deviations of x[j:i] (vectorised over index arrays)."""
+    n = i - j
+    total = s1[i] - s1[j]
+    return np.maximum((s2[i] - s2[j]) - total * total / n, 0.0)
+
+
+def _fill_layer(prev: np.ndarray, s1: np.ndarray, s2: np.ndarray, k: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    cur = np.full(n + 1, np.inf)
+    arg = np.zeros(n + 1, dtype=np.int64)
+
+    # Pending ranges: i in [lo, hi], best j known to lie in [opt_lo, opt_hi]
+    lo = np.array([k], dtype=np.int64)
+    hi = np.array([n], dtype=np.int64)
+    opt_lo = np.array([k - 1], dtype=np.int64)
+    opt_hi = np.array([n - 1], dtype=np.int64)
+
+    while lo.size:
+        mid = (lo + hi) // 2
+        first = opt_lo
+        last = np.minimum(opt_hi, mid - 1)
+        counts = last - first + 1
+        starts = np.cumsum(counts) - counts
+
+        owner = np.repeat(np.arange(lo.size), counts)
+        j = first[owner] + (np.arange(counts.sum()) - starts[owner])
+        cost = prev[j] + _ssd(s1, s2, j, mid[owner])
+
+        best = np.minimum.reduceat(cost, starts)
+        # leftmost argmin of each range
+        hits = np.flatnonzero(cost <= best[owner])
+        hit_owner = owner[hits]
+        first_hit = np.flatnonzero(np.concatenate(([True], hit_owner[1:] != hit_owner[:-1])))
+        best_j = j[hits[first_hit]]
+
+        cur[mid] = best
+        arg[mid] = best_j
+
+        left = mid - 1 >= lo
+        right = mid + 1 <= hi
+        lo, hi, opt_lo, opt_hi = (
+            np.concatenate((lo[left], mid[right] + 1)),
+            np.concatenate((mid[left] - 1, hi[right])),
+            np.concatenate((opt_lo[left], best_j[right])),
+            np.concatenate((best_j[left], opt_hi[right])),
+        )
+    return cur, arg
+
+
+def jenks_all_k(values: np.ndarray, k_max: int) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Optimal Fisher–Jenks partitions of sorted `values` for every k = 1..k_max.
+
+    Returns (splits, gvf): splits[k] holds the k + 1 boundary indices
+    [0, ..., n] of the k classes (class c is values[splits[k][c]:splits[k][c + 1]]),
+    gvf[k] its goodness of variance fit. Index 0 of both is unused.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    k_max = max(1, min(k_max, n))
+    s1, s2 = _prefix_sums(values)
+
+    idx = np.arange(n + 1)
+    layer = np.full(n + 1, np.inf)
+    layer[1:] = _ssd(s1, s2, np.zeros(n, dtype=np.int64), idx[1:])
+    sdam = layer[n]
+
+    costs = [None, layer[n]]
+    back = [None, None]
+    for k in range(2, k_max + 1):
+        layer, arg = _fill_layer(layer, s1, s2, k, n)
+        costs.append(layer[n])
+        back.append(arg)
+
+    splits: List[np.ndarray] = [np.array([0, n])] * 2
+    for k in range(2, k_max + 1):
+        cuts = [n]
+        i = n
+        for layer_k in range(k, 1, -1):
+            i = int(back[layer_k][i])
+            cuts.append(i)
+        cuts.append(0)
+        splits.append(np.array(cuts[::-1]))
+
+    gvf = np.zeros(k_max + 1)
+    if sdam > 0:
+        gvf[1:] = 1.0 - np.array(costs[1:]) / sdam
+    return splits, gvf
+
+
+def breaks_from_splits(values: np.ndarray, split: np.ndarray) -> List[float]:
+    """jenkspy-style break values: [min, upper bound of each class...]."""
+    return [float(values[0])] + [float(values[s - 1]) for s in split[1:]]
@@ -1,12 +1,23 @@
-from typing import List
+from typing import TYPE_CHECKING, Callable, List, Optional
 
-from schemas import PhotoInput, PhotoOutput, Album
+import numpy as np
+
+from schemas import PhotoInput, Album
 from logger_config import logger
+from config import CLUSTER_COORD_DECIMALS
+from .batch import PhotoBatch, PhotoGroup, make_group, to_albums
 from .algorithms import (
-    run_spatiotemporal,      # Tier 1
-    run_jenks_time,          # Tier 2
-    run_location_hdbscan,    # Tier 3
+    cluster_spatiotemporal,      # Tier 1
+    cluster_jenks_time,          # Tier 2
+    cluster_location_hdbscan,    # Tier 3
+    algorithm_settings,
+    EARTH_RADIUS_KM,
 )
+from .dedup import collapse_coordinates
+from .hierarchy import build_spatial_hierarchy, extract_spatiotemporal
+
+if TYPE_CHECKING:
+    from clustering_cache import ClusteringCache, HierarchyCache
 
 # NOTE: CLIP model removed - no longer needed
 
@@ -16,83 +27,102 @@ class ClusteringService:
         """
         Decides the best clustering strategy based on available metadata.
         """
-        if not photos: 
+        return to_albums(ClusteringService.dispatch_batch(PhotoBatch.from_inputs(photos)), photos)
+
+    @staticmethod
+    def dispatch_batch(batch: PhotoBatch, cache: Optional["ClusteringCache"] = None) -> List[PhotoGroup]:
+        """
+        dispatch() on a columnar PhotoBatch: returns groups of input positions,
+        leaving the Album / PhotoOutput models to the caller. With a cache, a
+        set of photos clustered before is answered without re-running the tier.
+        """
+        if not len(batch): 
             return []
         
-        clean_photos = [p for p in photos if not p.is_rejected]
-        rejected_photos = [p for p in photos if p.is_rejected]
+        clean_photos = batch.take(~batch.rejected)
+        rejected_photos = batch.take(batch.rejected)
 
         # 1. Cluster the Good Photos
         albums = []
-        if clean_photos:
-            has_time = all(p.timestamp is not None for p in clean_photos)
-            has_gps = all(p.latitude is not None and p.longitude is not None for p in clean_photos)
+        if len(clean_photos):
+            has_time = clean_photos.has_time
+            has_gps = clean_photos.has_gps
             
             logger.info(f"Router: Count={len(clean_photos)}, Time={has_time}, GPS={has_gps}")
 
             if has_gps and has_time:
                 # Best case: GPS + Time
-                albums = run_spatiotemporal(clean_photos, dist_m=700, gap_min=120)
+                albums = ClusteringService._cluster(cache, "spatiotemporal", cluster_spatiotemporal, clean_photos, dist_m=700, gap_min=120)
             elif has_time:
                 # Good case: Time only
-                albums = run_jenks_time(clean_photos)
+                albums = ClusteringService._cluster(cache, "jenks_time", cluster_jenks_time, clean_photos)
             elif has_gps:
                 # OK case: GPS only
-                albums = run_location_hdbscan(clean_photos)
+                albums = ClusteringService._cluster(cache, "location_hdbscan", cluster_location_hdbscan, clean_photos)
             else:
                 # Worst case: No GPS, No Time - Create single unsorted album
                 logger.warning("No GPS or Time metadata - creating unsorted collection")
                 albums = ClusteringService._create_unsorted_album(clean_photos)
 
         # 2. Append the Bad Photos (if any)
-        if rejected_photos:
+        if len(rejected_photos):
             junk_album = ClusteringService._create_rejected_album(rejected_photos)
             albums.extend(junk_album)
         
         return albums
     
     @staticmethod
-    def _create_unsorted_album(photos: List[PhotoInput]) -> List[Album]:
+    def recluster(batch: PhotoBatch, dist_m: float, gap_min: float,
+                  hierarchy_cache: Optional["HierarchyCache"] = None) -> List[PhotoGroup]:
+        """
+        Spatiotemporal albums at a caller-chosen resolution, read off the
+        single-linkage hierarchy of the GPS fixes (built once, then cached).
+        Same partition as cluster_spatiotemporal(dist_m, gap_min); photos
+        without both GPS and time go to the unsorted album.
+        """
+        if not len(batch):
+            return []
+
+        clean = batch.take(~batch.rejected)
+        placed = ~(np.isnan(clean.timestamp) | np.isnan(clean.lat) | np.isnan(clean.lon))
+        located, unplaced = clean.take(placed), clean.take(~placed)
+
+        albums = []
+        if len(located):
+            points = collapse_coordinates(located.lat, located.lon, CLUSTER_COORD_DECIMALS)
+            if hierarchy_cache is not None:
+                hierarchy = hierarchy_cache.get_or_build(points)
+            else:
+                hierarchy = build_spatial_hierarchy(points.coords)
+            logger.info(f"Recluster (Dist={dist_m}m, Gap={gap_min}min) on {len(located)} photos ({hierarchy.n_points} unique fixes)")
+            albums = extract_spatiotemporal(located, points, hierarchy, dist_m, gap_min, EARTH_RADIUS_KM)
+
+        albums.extend(ClusteringService._create_unsorted_album(unplaced))
+        albums.extend(ClusteringService._create_rejected_album(batch.take(batch.rejected)))
+        return albums
+
+    @staticmethod
+    def _cluster(cache, tier: str, algorithm: Callable[..., List[PhotoGroup]], batch: PhotoBatch, **params) -> List[PhotoGroup]:
+        if cache is None:
+            return algorithm(batch, **params)
+        key_params = {"tier": tier, **params, **algorithm_settings()}
+        return cache.get_or_compute(batch, key_params, lambda: algorithm(batch, **params))
+
+    @staticmethod
+    def _create_unsorted_album(batch: PhotoBatch) -> List[PhotoGroup]:
         """
         Create a single album for photos without GPS or Time metadata.
         Sort by quality score.
         """
-        if not photos:
+        if not len(batch):
             return []
         
         # Sort by quality score (best first)
-        photos.sort(key=lambda x: x.score, reverse=True)
-        
-        out_photos = [
-            PhotoOutput(
-                id=p.id, 
-                filename=p.filename, 
-                timestamp=p.timestamp,
-                score=p.score
-            ) for p in photos
-        ]
-        
-        return [Album(
-            title="Unsorted Collection", 
-            method="no_metadata_fallback", 
-            photos=out_photos
-        )]
+        return [make_group(batch, np.arange(len(batch)), "Unsorted Collection", "no_metadata_fallback")]
     
     @staticmethod
-    def _create_rejected_album(photos: List[PhotoInput]) -> List[Album]:
-        if not photos: 
+    def _create_rejected_album(batch: PhotoBatch) -> List[PhotoGroup]:
+        if not len(batch): 
             return []
         
-        out_photos = [
-            PhotoOutput(
-                id=p.id, 
-                filename=p.filename, 
-                timestamp=p.timestamp,
-            ) for p in photos
-        ]
-        
-        return [Album(
-            title="Review Needed (Low Quality)", 
-            method="filters_rejected", 
-            photos=out_photos
-        )]
\ No newline at end of file
+        return [make_group(batch, np.arange(len(batch)), "Review Needed (Low Quality)", "filters_rejected", by_score=False)]
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from clustering.batch import PhotoBatch, PhotoGroup, make_group
+from clustering.dedup import CollapsedPoints
+from clustering.hierarchy import SpatialHierarchy, build_spatial_hierarchy
+from config import CLUSTER_CACHE_SIZE, CLUSTER_CACHE_TTL, CLUSTER_COORD_DECIMALS, HIERARCHY_CACHE_SIZE
+from logger_config import logger
+from metrics import record_cache
+
+# Bump when an algorithm change would make stored partitions stale
+CACHE_VERSION = 1
+# Mongo documents are capped at 16 MB; larger partitions stay in memory only
+MAX_MONGO_BYTES = 12 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CachedGroup:
+    title: str
+    method: str
+    rows: np.ndarray    # positions in the canonical (timestamp, lat, lon) order
+
+
+def canonical_order(batch: PhotoBatch) -> np.ndarray:
+    """Rows sorted by (timestamp, lat, lon): the same photos give the same order in any upload order."""
+    return np.lexsort((batch.lon, batch.lat, batch.timestamp))
+
+
+def fingerprint(batch: PhotoBatch, order: np.ndarray, params: dict) -> str:
+    """sha256 of the sorted columns and the algorithm parameters; scores and ids are not part of it."""
+    h = hashlib.sha256(json.dumps({"v": CACHE_VERSION, **params}, sort_keys=True).encode())
+    h.update(len(order).to_bytes(8, "little"))
+    for column in (batch.timestamp, batch.lat, batch.lon):
+        # NaN payloads may differ bit for bit: hash every missing value the same way
+        h.update(np.nan_to_num(column[order], nan=np.inf).tobytes())
+    return h.hexdigest()
+
+
+class _TieredCache:
+    """
+    Bounded in-memory LRU in front of an optional Mongo collection.
+
+    Subclasses name the cache (metrics "<name>" and "<name>_mongo") and turn
+    entries into Mongo fields and back. Mongo documents expire after
+    ttl_seconds; Mongo errors are logged and treated as misses.
+    """
+    name = "cache"
+
+    def __init__(self, max_entries: int, collection=None,
+                 ttl_seconds: float = CLUSTER_CACHE_TTL, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def ensure_indexes(self):
+        if self.collection is None:
+            return
+        try:
+            self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl_seconds), name="created_at_ttl")
+        except Exception as e:
+            logger.warning(f"{self.name} cache index creation failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "mongo": self.collection is not None,
+            }
+
+    # --- entry <-> Mongo fields ---
+    def _encode(self, entry) -> Optional[dict]:
+        """Fields to store, or None to keep the entry in memory only."""
+        raise NotImplementedError
+
+    def _decode(self, doc: dict):
+        raise NotImplementedError
+
+    # --- tiers ---
+    def _get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.collection is None:
+            return None
+
+        entry = self._mongo_get(key)
+        record_cache(f"{self.name}_mongo", entry is not None)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def _put(self, key: str, entry):
+        self._remember(key, entry)
+        if self.collection is not None:
+            self._mongo_put(key, entry)
+
+    def _remember(self, key: str, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _mongo_get(self, key: str):
+        try:
+            doc = self.collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning(f"{self.name} cache read failed: {e}")
+            return None
+        if not doc or doc.get("expires_at", 0) < self._clock():
+            return None     # the TTL monitor runs about once a minute; don't serve what it hasn't removed yet
+        return self._decode(doc)
+
+    def _mongo_put(self, key: str, entry):
+        fields = self._encode(entry)
+        if fields is None:
+            return
+        try:
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {**fields, "created_at": datetime.now(timezone.utc),
+                          "expires_at": self._clock() + self.ttl_seconds}},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"{self.name} cache write failed: {e}")
+
+
+class ClusteringCache(_TieredCache):
+    """
+    Memo of clustering results keyed by the fingerprint of the input columns.
+
+    Only the partition is stored; on a hit the groups are rebuilt for the
+    current photos, so ids, filenames and score order come from the new request.
+    """
+    name = "clustering"
+
+    def __init__(self, max_entries: int = CLUSTER_CACHE_SIZE, collection=None,
+                 ttl_seconds: float = CLUSTER_CACHE_TTL, clock: Callable[[], float] = time.time):
+        super().__init__(max_entries, collection, ttl_seconds, clock)
+
+    def get_or_compute(self, batch: PhotoBatch, params: dict,
+                       compute: Callable[[], List[PhotoGroup]]) -> List[PhotoGroup]:
+        order = canonical_order(batch)
+        key = fingerprint(batch, order, params)
+
+        cached = self._get(key)
+        record_cache(self.name, cached is not None)
+        if cached is not None:
+            return [make_group(batch, order[g.rows], g.title, g.method) for g in cached]
+
+        groups = compute()
+        self._put(key, self._to_canonical(batch, order, groups))
+        return groups
+
+    def _encode(self, entry: List[CachedGroup]) -> Optional[dict]:
+        groups = [{"title": g.title, "method": g.method, "rows": g.rows.astype(np.int32).tobytes()} for g in entry]
+        if sum(len(g["rows"]) for g in groups) > MAX_MONGO_BYTES:
+            return None
+        return {"groups": groups}
+
+    def _decode(self, doc: dict) -> List[CachedGroup]:
+        return [CachedGroup(g["title"], g["method"], np.frombuffer(g["rows"], dtype=np.int32)) for g in doc["groups"]]
+
+    @staticmethod
+    def _to_canonical(batch: PhotoBatch, order: np.ndarray, groups: List[PhotoGroup]) -> List[CachedGroup]:
+        # PhotoGroup.index holds input positions; map them to batch rows, then to canonical ranks
+        row_of = np.empty(int(batch.index.max()) + 1 if len(batch) else 0, dtype=np.int64)
+        row_of[batch.index] = np.arange(len(batch))
+        rank = np.empty(len(batch), dtype=np.int64)
+        rank[order] = np.arange(len(batch))
+        return [CachedGroup(g.title, g.method, rank[row_of[g.index]]) for g in groups]
+
+
+def hierarchy_key(points: CollapsedPoints) -> str:
+    """sha256 of the distinct fixes (sorted by collapse_coordinates): photo order, times and ids don't matter."""
+    h = hashlib.sha256(f"hierarchy:v{CACHE_VERSION}:{CLUSTER_COORD_DECIMALS}".encode())
+    h.update(np.ascontiguousarray(points.coords, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class HierarchyCache(_TieredCache):
+    """
+    Single-linkage hierarchies of GPS fixes, for re-clustering at new
+    thresholds without another neighbour search. Edges index the sorted
+    distinct fixes, so an entry is valid for any photo set with the same fixes.
+    """
+    name = "hierarchy"
+
+    def __init__(self, max_entries: int = HIERARCHY_CACHE_SIZE, collection=None,
+                 ttl_seconds: float = CLUSTER_CACHE_TTL, clock: Callable[[], float] = time.time):
+        super().__init__(max_entries, collection, ttl_seconds, clock)
+
+    def get_or_build(self, points: CollapsedPoints) -> SpatialHierarchy:
+        key = hierarchy_key(points)
+        cached = self._get(key)
+        record_cache(self.name, cached is not None)
+        if cached is not None:
+            return cached
+
+        hierarchy = build_spatial_hierarchy(points.coords)
+        self._put(key, hierarchy)
+        return hierarchy
+
+    def _encode(self, entry: SpatialHierarchy) -> Optional[dict]:
+        a, b = entry.a.astype(np.int32).tobytes(), entry.b.astype(np.int32).tobytes()
+        length = entry.length.astype(np.float64).tobytes()
+        if len(a) + len(b) + len(length) > MAX_MONGO_BYTES:
+            return None
+        return {"n_points": entry.n_points, "a": a, "b": b, "length": length}
+
+    def _decode(self, doc: dict) -> SpatialHierarchy:
+        return SpatialHierarchy(doc["n_points"], np.frombuffer(doc["a"], dtype=np.int32).astype(np.int64),
+                                np.frombuffer(doc["b"], dtype=np.int32).astype(np.int64),
+                                np.frombuffer(doc["length"], dtype=np.float64))
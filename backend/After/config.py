@@ -16,4 +16,151 @@ GOONG_API_KEY = os.getenv("GOONG_API_KEY")
 
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
 CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
-CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
\ No newline at end of file
+CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
+
+# --- Thread budget (bulkhead executors) ---
+# Total CPU threads the process may keep busy. Defaults to the visible cores so a
+# 4-vCPU pod does not end up with OpenCV, TensorFlow and OpenMP each spawning
+# their own per-core pools on top of our executors.
+THREAD_BUDGET = int(os.getenv("THREAD_BUDGET", os.cpu_count() or 4))
+
+# One bounded pool per workload class
+IO_WORKERS = int(os.getenv("IO_WORKERS", 4))                 # file saves / reads
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", max(1, THREAD_BUDGET - 1)))  # decode, lighting, curation
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 1))   # junk model
+NETWORK_WORKERS = int(os.getenv("NETWORK_WORKERS", 8))       # Cloudinary calls
+
+# Native library threads (per call, inside a pool worker)
+OPENCV_THREADS = int(os.getenv("OPENCV_THREADS", 1))
+TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", max(1, THREAD_BUDGET // 2)))
+TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", 1))
+OMP_THREADS = int(os.getenv("OMP_THREADS", 1))
+
+# OpenMP / BLAS read these once when the shared library loads, so they must be
+# set before numpy, cv2 or TensorFlow are imported (main.py imports config first).
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, str(OMP_THREADS))
+
+# --- Pre-fork deployment (gunicorn -c gunicorn.conf.py main:app) ---
+# PREFORK=1: the master imports the app and the heavy frameworks once, then gc.freeze()s
+# before forking so workers share those pages copy-on-write. PREFORK=0: each worker loads its own.
+PREFORK = os.getenv("PREFORK", "1").lower() in ("1", "true", "yes")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 2))
+
+# --- WebSocket push (/ws/{user_id}) ---
+# memory: one process only. socket: every worker connects to a broker (python pubsub.py) so a
+# message produced in one worker reaches sockets held by the others.
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+PUBSUB_BROKER_HOST = os.getenv("PUBSUB_BROKER_HOST", "127.0.0.1")
+PUBSUB_BROKER_PORT = int(os.getenv("PUBSUB_BROKER_PORT", 7870))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 5))     # a socket slower than this is dropped
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", 32))          # pending messages per socket before it is dropped
+
+# --- MongoDB connection pools (db.py) ---
+# Request handlers use the async client: one pooled connection per in-flight query, so the pool
+# bounds DB concurrency per worker. The sync client serves the clustering cache (from CPU pool threads)
+# and the Photos migration (migrate_photos.py).
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))          # kept warm for bursts
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", 4))        # parallel handshakes when the pool grows
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", 60000))
+MONGO_SYNC_MAX_POOL_SIZE = int(os.getenv("MONGO_SYNC_MAX_POOL_SIZE", 10))
+
+# --- Memory profiling (opt-in, adds noticeable overhead) ---
+MEMORY_PROFILING = os.getenv("MEMORY_PROFILING", "0").lower() in ("1", "true", "yes")
+MEMORY_REPORT_DIR = os.getenv("MEMORY_REPORT_DIR", os.path.join(tempfile.gettempdir(), "smart-album-memreports"))
+MEMORY_REPORT_TOP_N = int(os.getenv("MEMORY_REPORT_TOP_N", 15))
+MEMORY_REPORTS_KEEP = int(os.getenv("MEMORY_REPORTS_KEEP", 50))
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", 1))
+
+# Comma-separated user ids allowed to call /admin/* endpoints
+ADMIN_USER_IDS = {u.strip() for u in os.getenv("ADMIN_USER_IDS", "").split(",") if u.strip()}
+
+# --- Photo storage ---
+# "collection": new albums keep their photos in the Photos collection (one doc per photo)
+# "embedded":   legacy layout, photos array inside the album document
+# Reads handle both layouts, so albums can be migrated online (migrate_photos.py).
+PHOTO_STORAGE = os.getenv("PHOTO_STORAGE", "collection").lower()
+
+# --- PROCESSED_DIR janitor ---
+# Each create_album request works in its own sub-directory; the janitor removes finished or
+# abandoned ones and evicts oldest-first when the directory or its disk runs over the high-water mark.
+TEMP_TTL = float(os.getenv("TEMP_TTL", 3600))                                  # seconds; also the longest request
+TEMP_SWEEP_INTERVAL = float(os.getenv("TEMP_SWEEP_INTERVAL", 60))
+TEMP_MAX_BYTES = int(float(os.getenv("TEMP_MAX_BYTES", 5 * 1024 ** 3)))         # high-water mark for PROCESSED_DIR
+TEMP_LOW_WATER = float(os.getenv("TEMP_LOW_WATER", 0.8))                       # evict down to this fraction of it
+TEMP_DISK_HIGH_WATER = float(os.getenv("TEMP_DISK_HIGH_WATER", 0.9))           # used fraction of the filesystem
+
+# --- Shared album cache (public /shared-albums/{token} views) ---
+# Per-process body cache; edits invalidate locally, other workers refresh content within the TTL.
+# Revocation / deletion is immediate everywhere: each hit re-checks the token in Mongo.
+SHARED_ALBUM_CACHE_SIZE = int(os.getenv("SHARED_ALBUM_CACHE_SIZE", 512))
+SHARED_ALBUM_CACHE_TTL = float(os.getenv("SHARED_ALBUM_CACHE_TTL", 60))
+
+# --- Background Cloudinary deletion jobs ---
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", 100))            # Admin API limit per call
+DELETE_CONCURRENCY = int(os.getenv("DELETE_CONCURRENCY", 4))            # chunks in flight per job
+DELETE_MAX_ATTEMPTS = int(os.getenv("DELETE_MAX_ATTEMPTS", 5))          # per chunk, and per job
+DELETE_RETRY_BASE_DELAY = float(os.getenv("DELETE_RETRY_BASE_DELAY", 1.0))  # seconds, doubles each retry
+DELETE_JOB_LEASE = float(os.getenv("DELETE_JOB_LEASE", 300))            # a crashed worker's job is retaken after this
+DELETE_POLL_INTERVAL = float(os.getenv("DELETE_POLL_INTERVAL", 5))
+
+# --- OSM (Nominatim) geocoding proxy ---
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+# ⚠️ bắt buộc theo rule OSM: identify the app
+NOMINATIM_USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "photo-trip-app/1.0 (contact@yourdomain.com)")
+NOMINATIM_TIMEOUT = float(os.getenv("NOMINATIM_TIMEOUT", 5))
+GEOCODE_RATE_PER_SEC = float(os.getenv("GEOCODE_RATE_PER_SEC", 1.0))    # Nominatim usage policy: max 1 req/s
+GEOCODE_BURST = int(os.getenv("GEOCODE_BURST", 1))
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "smart-album-geocode.sqlite3"))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", 20000))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", 30 * 24 * 3600))       # fresh for 30 days
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", 24 * 3600))      # "not found" for 1 day
+GEOCODE_GRID_DECIMALS = int(os.getenv("GEOCODE_GRID_DECIMALS", 3))              # ~110 m cells for reverse lookups
+GEOCODE_CACHE_TOUCH_INTERVAL = float(os.getenv("GEOCODE_CACHE_TOUCH_INTERVAL", 600))  # a hit rewrites last_used at most this often
+
+# --- Offline reverse geocoder (album titles) ---
+# CSV place table: name,kind(province|district|poi),province,lat,lon[,landmark_id]
+PLACE_TABLE_PATH = os.getenv("PLACE_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vn_places.csv"))
+PLACE_POI_RADIUS_KM = float(os.getenv("PLACE_POI_RADIUS_KM", 1.5))             # album centroid must be this close to name a POI
+PLACE_DISTRICT_RADIUS_KM = float(os.getenv("PLACE_DISTRICT_RADIUS_KM", 10))
+PLACE_PROVINCE_RADIUS_KM = float(os.getenv("PLACE_PROVINCE_RADIUS_KM", 80))    # beyond this the album keeps its time title
+PLACE_TITLES = os.getenv("PLACE_TITLES", "1").lower() in ("1", "true", "yes")
+
+# --- Streamed ZIP export (GET /albums/{id}/download) ---
+ZIP_READ_CHUNK_SIZE = int(os.getenv("ZIP_READ_CHUNK_SIZE", 256 * 1024))     # bytes per read from a member source
+ZIP_FETCH_TIMEOUT = float(os.getenv("ZIP_FETCH_TIMEOUT", 30))
+
+# --- Renditions (grid / preview / full) + BlurHash placeholders ---
+# Generated from the decoded upload during analysis into the request workspace, then uploaded to
+# Cloudinary next to the original; deletion jobs remove them with it
+RENDITIONS_ENABLED = os.getenv("RENDITIONS_ENABLED", "1").lower() in ("1", "true", "yes")
+RENDITION_SIZES = os.getenv("RENDITION_SIZES", "grid:256,preview:1024,full:2048")    # name:longest edge in px
+RENDITION_FORMATS = os.getenv("RENDITION_FORMATS", "webp")                            # e.g. "webp,avif"
+RENDITION_QUALITY = int(os.getenv("RENDITION_QUALITY", 80))
+BLURHASH_COMPONENTS = os.getenv("BLURHASH_COMPONENTS", "4x3")
+
+# --- Contact sheets (album grid sprites) ---
+# columns x rows tiles of CONTACT_SHEET_TILE px per sprite, built from the grid renditions in the request
+# workspace and uploaded to Cloudinary; deletion jobs remove them with the album
+CONTACT_SHEETS_ENABLED = os.getenv("CONTACT_SHEETS_ENABLED", "1").lower() in ("1", "true", "yes")
+CONTACT_SHEET_TILE = int(os.getenv("CONTACT_SHEET_TILE", 96))
+CONTACT_SHEET_COLUMNS = int(os.getenv("CONTACT_SHEET_COLUMNS", 10))
+CONTACT_SHEET_ROWS = int(os.getenv("CONTACT_SHEET_ROWS", 10))
+CONTACT_SHEET_FORMAT = os.getenv("CONTACT_SHEET_FORMAT", "webp")     # webp | jpeg
+CONTACT_SHEET_QUALITY = int(os.getenv("CONTACT_SHEET_QUALITY", 75))
+
+# --- Spatiotemporal clustering engine (GPS + time) ---
+# dbscan: sklearn ball tree; grid: grid cells + union-find, same events in linear memory;
+# auto: grid from ST_GRID_MIN_PHOTOS photos up
+ST_ENGINE = os.getenv("ST_ENGINE", "auto").lower()
+ST_GRID_MIN_PHOTOS = int(os.getenv("ST_GRID_MIN_PHOTOS", 20000))
+# GPS fixes equal to this many decimals (5 ~ 1.1 m) are clustered once, weighted by photo count
+CLUSTER_COORD_DECIMALS = int(os.getenv("CLUSTER_COORD_DECIMALS", 5))
+
+# --- Clustering result cache (same photos -> same albums without re-clustering) ---
+CLUSTER_CACHE_SIZE = int(os.getenv("CLUSTER_CACHE_SIZE", 256))                   # in-memory entries (LRU)
+CLUSTER_CACHE_MONGO = os.getenv("CLUSTER_CACHE_MONGO", "0").lower() in ("1", "true", "yes")   # shared tier across workers
+CLUSTER_CACHE_TTL = float(os.getenv("CLUSTER_CACHE_TTL", 7 * 24 * 3600))         # Mongo documents expire after this
+# Single-linkage hierarchies kept for /albums/recluster (one per distinct set of GPS fixes; same Mongo tier)
+HIERARCHY_CACHE_SIZE = int(os.getenv("HIERARCHY_CACHE_SIZE", 32))
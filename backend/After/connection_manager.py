@@ -1,27 +1,121 @@
+import asyncio
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Dict, List, Optional
+from config import WS_SEND_TIMEOUT, WS_QUEUE_SIZE
 from logger_config import logger
+from metrics import counter, gauge
+from pubsub import PubSubBackend, InMemoryPubSub
+
+WS_CONNECTIONS = gauge("ws_connections", "Open WebSocket connections in this worker")
+WS_MESSAGES_SENT = counter("ws_messages_sent_total", "Messages written to WebSocket clients")
+WS_DROPPED = counter(
+    "ws_dropped_total",
+    "WebSocket clients dropped by the server, by reason (timeout/queue_full/error)",
+    ("reason",),
+)
+
+
+class _Outbox:
+    """Bounded queue of one socket, drained by its own sender task."""
+
+    def __init__(self, websocket: WebSocket, size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.task: Optional[asyncio.Task] = None
+
 
 class ConnectionManager:
-    def __init__(self):
+    """
+    Fan-out of server pushes to every open tab of a user.
+
+    send_personal_message() only publishes on the pub/sub backend; each
+    worker's subscription puts the message on the bounded queue of its own
+    sockets for that user, and a sender task per socket writes it with a
+    timeout. A client that is slower than send_timeout, or lets queue_size
+    messages pile up, is closed instead of holding up everyone else.
+    """
+
+    def __init__(self, pubsub: Optional[PubSubBackend] = None,
+                 send_timeout: float = WS_SEND_TIMEOUT, queue_size: int = WS_QUEUE_SIZE):
+        self.pubsub = pubsub or InMemoryPubSub()
+        self.send_timeout = send_timeout
+        self.queue_size = queue_size
         # Store active connections: user_id -> List[WebSocket]
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        self._outboxes: Dict[int, _Outbox] = {}
+
+    async def start(self):
+        await self.pubsub.start(self.deliver_local)
+
+    async def stop(self):
+        await self.pubsub.stop()
+        for user_id, sockets in list(self.active_connections.items()):
+            for websocket in list(sockets):
+                self.disconnect(websocket, user_id)
 
     async def connect(self, websocket: WebSocket, user_id: str):
         await websocket.accept()
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
         self.active_connections[user_id].append(websocket)
+        outbox = _Outbox(websocket, self.queue_size)
+        outbox.task = asyncio.create_task(self._sender(outbox, user_id))
+        self._outboxes[id(websocket)] = outbox
+        WS_CONNECTIONS.inc()
         logger.info(f"User {user_id} connected via WebSocket")
 
     def disconnect(self, websocket: WebSocket, user_id: str):
-        if user_id in self.active_connections:
+        if user_id in self.active_connections and websocket in self.active_connections[user_id]:
             self.active_connections[user_id].remove(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+        outbox = self._outboxes.pop(id(websocket), None)
+        if outbox is not None:
+            WS_CONNECTIONS.dec()
+            if outbox.task is not None and outbox.task is not asyncio.current_task():
+                outbox.task.cancel()
 
     async def send_personal_message(self, message: dict, user_id: str):
-        # Send data ONLY to this specific user's open tabs
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_json(message)
\ No newline at end of file
+        # Send data ONLY to this specific user's open tabs, whichever worker holds them
+        await self.pubsub.publish(user_id, message)
+
+    def deliver_local(self, user_id: str, message: dict) -> int:
+        """Queues a message for this worker's sockets of user_id; returns how many accepted it."""
+        queued = 0
+        for websocket in list(self.active_connections.get(user_id, ())):
+            outbox = self._outboxes.get(id(websocket))
+            if outbox is None:
+                continue
+            try:
+                outbox.queue.put_nowait(message)
+                queued += 1
+            except asyncio.QueueFull:
+                self._drop(outbox, user_id, "queue_full")
+        return queued
+
+    async def _sender(self, outbox: _Outbox, user_id: str):
+        while True:
+            message = await outbox.queue.get()
+            try:
+                await asyncio.wait_for(outbox.websocket.send_json(message), self.send_timeout)
+                WS_MESSAGES_SENT.inc()
+            except asyncio.TimeoutError:
+                self._drop(outbox, user_id, "timeout")
+                return
+            except (WebSocketDisconnect, RuntimeError, OSError) as e:
+                logger.info(f"WebSocket of user {user_id} gone while sending: {e}")
+                self._drop(outbox, user_id, "error")
+                return
+
+    def _drop(self, outbox: _Outbox, user_id: str, reason: str):
+        WS_DROPPED.inc(reason=reason)
+        logger.warning(f"⚠️ Dropping WebSocket client of user {user_id} ({reason})")
+        self.disconnect(outbox.websocket, user_id)
+        asyncio.create_task(self._close(outbox.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1013 "try again later": the client may reconnect and reload what it missed
+            await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
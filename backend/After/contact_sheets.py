@@ -0,0 +1,205 @@
+import hashlib
+import io
+import json
+import math
+import os
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+from config import (
+    CONTACT_SHEET_TILE, CONTACT_SHEET_COLUMNS, CONTACT_SHEET_ROWS, CONTACT_SHEET_FORMAT, CONTACT_SHEET_QUALITY,
+)
+from logger_config import logger
+from metrics import counter
+
+CONTACT_SHEETS_URL_PREFIX = "/contact-sheets"
+
+_SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "method": 4},
+    "jpeg": {"format": "JPEG", "optimize": True, "progressive": True},
+}
+_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+# Grey behind tiles of partially filled rows
+_BACKGROUND = (238, 238, 238)
+
+CONTACT_SHEETS_WRITTEN = counter(
+    "contact_sheets_written_total",
+    "Contact-sheet sprites encoded, by reason (album/removal)",
+    ("reason",),
+)
+
+
+def load_tile(path: str, tile: int) -> Optional[Image.Image]:
+    """Square, centre-cropped tile of an image file; None if it cannot be read."""
+    try:
+        with Image.open(path) as im:
+            im.draft("RGB", (tile * 2, tile * 2))    # JPEG originals: decode at 1/2..1/8 scale
+            im = ImageOps.exif_transpose(im)
+            return ImageOps.fit(im.convert("RGB"), (tile, tile), Image.Resampling.BICUBIC)
+    except Exception as e:
+        logger.warning(f"⚠️ Contact-sheet tile skipped ({os.path.basename(path)}): {e}")
+        return None
+
+
+def tile_position(index: int, columns: int, tile: int) -> Tuple[int, int]:
+    return (index % columns) * tile, (index // columns) * tile
+
+
+def offset_map(meta: Optional[dict]) -> dict:
+    """
+    Client view of an album's sheets:
+    {"tile": 96, "sheets": [{"url", "width", "height"}], "tiles": {photo_id: [sheet, x, y]}}.
+    Photos missing from "tiles" have no sprite and fall back to their grid rendition.
+    """
+    if not meta or not meta.get("sheets"):
+        return {}
+    tile = meta["tile"]
+    tiles = {}
+    for s, sheet in enumerate(meta["sheets"]):
+        columns = sheet["width"] // tile
+        for i, photo_id in enumerate(sheet["photos"]):
+            tiles[photo_id] = [s, *tile_position(i, columns, tile)]
+    return {
+        "tile": tile,
+        "sheets": [{k: sheet[k] for k in ("url", "width", "height")} for sheet in meta["sheets"]],
+        "tiles": tiles,
+    }
+
+
+class ContactSheetStore:
+    """
+    Packs an album's photos into sprites of columns x rows square tiles, in
+    album order, so a grid of N photos costs ceil(N / (columns*rows)) image
+    requests instead of N.
+
+    The album document keeps {"version", "tile", "columns", "sheets": [{"url",
+    "width", "height", "photos": [ids]}]}; photo ids live in lists rather
+    than as keys because filenames contain dots. Sheet file names hash the
+    settings and their member ids, so an unchanged sheet keeps its URL and
+    can be cached forever.
+
+    Removing photos only re-encodes the sheets that held them, cropping the
+    surviving tiles out of the old sprite (the originals are long gone).
+    Sheets are not re-packed across boundaries, so after removals a sheet
+    may hold fewer than columns*rows tiles; every other URL stays valid.
+
+    root is a staging directory, like RenditionStore's: sheets written there
+    get handle URLs for local_path(), and the service uploads them to
+    Cloudinary and stores those URLs instead. The store does no network I/O;
+    remove() is handed the bytes of the sprites it rebuilds.
+    """
+
+    def __init__(self, root: str, url_prefix: str = CONTACT_SHEETS_URL_PREFIX,
+                 tile: int = CONTACT_SHEET_TILE, columns: int = CONTACT_SHEET_COLUMNS,
+                 rows: int = CONTACT_SHEET_ROWS, fmt: str = CONTACT_SHEET_FORMAT,
+                 quality: int = CONTACT_SHEET_QUALITY):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.tile = tile
+        self.columns = columns
+        self.rows = rows
+        self.format = fmt.lower() if fmt.lower() in _SAVE_OPTIONS else "webp"
+        self.quality = quality
+        fingerprint = json.dumps([tile, columns, rows, self.format, quality])
+        self.version = hashlib.sha1(fingerprint.encode()).hexdigest()[:6]
+
+    @property
+    def per_sheet(self) -> int:
+        return self.columns * self.rows
+
+    def _relpath(self, album_id: str, photo_ids: Sequence[str], version: str) -> str:
+        digest = hashlib.sha1(json.dumps([version, list(photo_ids)]).encode()).hexdigest()[:12]
+        return f"{album_id[:2]}/{album_id}/{digest}.{_EXTENSIONS[self.format]}"
+
+    def local_path(self, url: Optional[str]) -> Optional[str]:
+        """File behind a sheet this store wrote (None for an uploaded sheet's URL)."""
+        if not url or not url.startswith(self.url_prefix + "/"):
+            return None
+        return os.path.join(self.root, url[len(self.url_prefix) + 1:])
+
+    def _write_sheet(self, album_id: str, tiles: List[Tuple[str, Image.Image]], tile: int,
+                     columns: int, version: str, reason: str) -> dict:
+        photo_ids = [pid for pid, _ in tiles]
+        columns = min(columns, len(tiles))
+        width, height = columns * tile, math.ceil(len(tiles) / columns) * tile
+        relpath = self._relpath(album_id, photo_ids, version)
+        path = os.path.join(self.root, relpath)
+        if not os.path.exists(path):
+            sheet = Image.new("RGB", (width, height), _BACKGROUND)
+            for i, (_, img) in enumerate(tiles):
+                sheet.paste(img, tile_position(i, columns, tile))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            options = dict(_SAVE_OPTIONS[self.format])
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+            os.close(fd)
+            try:
+                sheet.save(tmp, options.pop("format"), quality=self.quality, **options)
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            CONTACT_SHEETS_WRITTEN.inc(reason=reason)
+        return {"url": f"{self.url_prefix}/{relpath}", "width": width, "height": height, "photos": photo_ids}
+
+    def build(self, album_id: str, sources: Sequence[Tuple[str, Optional[str]]]) -> dict:
+        """
+        sources: (photo_id, image path) in album order; photos whose path is
+        missing or unreadable are left out. Returns the album's sheet metadata,
+        or {} if no tile could be made.
+        """
+        tiles = []
+        for photo_id, path in sources:
+            img = load_tile(path, self.tile) if path else None
+            if img is not None:
+                tiles.append((photo_id, img))
+        if not tiles:
+            return {}
+        sheets = [
+            self._write_sheet(album_id, tiles[i:i + self.per_sheet], self.tile, self.columns, self.version, "album")
+            for i in range(0, len(tiles), self.per_sheet)
+        ]
+        return {"version": self.version, "tile": self.tile, "columns": self.columns, "sheets": sheets}
+
+    @staticmethod
+    def affected(meta: Optional[dict], photo_ids: Sequence[str]) -> List[str]:
+        """URLs of the sheets holding any of photo_ids: what remove() rebuilds and replaces."""
+        removed = set(photo_ids)
+        return [s["url"] for s in (meta or {}).get("sheets", []) if not removed.isdisjoint(s["photos"])]
+
+    def remove(self, album_id: str, meta: Optional[dict], photo_ids: Sequence[str],
+               sprites: Dict[str, bytes]) -> dict:
+        """
+        Sheet metadata without photo_ids. Untouched sheets are returned as-is;
+        sheets that held a removed photo are rebuilt from their own pixels
+        (sprites: url -> encoded bytes, see affected()) with the geometry they
+        were made with. Deleting the old sprites is up to the caller.
+        """
+        if not meta or not meta.get("sheets"):
+            return meta or {}
+        removed = set(photo_ids)
+        tile, version = meta["tile"], meta["version"]
+        sheets = []
+        for sheet in meta["sheets"]:
+            if removed.isdisjoint(sheet["photos"]):
+                sheets.append(sheet)
+                continue
+            columns = sheet["width"] // tile
+            keep = [(i, pid) for i, pid in enumerate(sheet["photos"]) if pid not in removed]
+            if not keep:
+                continue
+            try:
+                with Image.open(io.BytesIO(sprites[sheet["url"]])) as old:
+                    old = old.convert("RGB")
+                    tiles = []
+                    for i, pid in keep:
+                        x, y = tile_position(i, columns, tile)
+                        tiles.append((pid, old.crop((x, y, x + tile, y + tile))))
+            except (KeyError, OSError) as e:
+                # Sprite could not be fetched or decoded: its photos fall back to grid renditions
+                logger.warning(f"⚠️ Contact sheet {sheet['url']} unreadable, dropping it: {e}")
+                continue
+            sheets.append(self._write_sheet(album_id, tiles, tile, meta["columns"], version, "removal"))
+        return {**meta, "sheets": sheets} if sheets else {}
@@ -1,12 +1,18 @@
-import cv2
 import numpy as np
-import mediapipe as mp
 from PIL import Image
 
+
+def _cv2():
+    """OpenCV, loaded on first use (the warm-up's dummy score) rather than on import."""
+    import cv2
+    return cv2
+
+
 class CurationService:
     def __init__(self):
         try:
             print("init MediaPipe...")
+            import mediapipe as mp     # deferred: only the warm-up / first CurationService pays for it
             self.mp_face_detection = mp.solutions.face_detection
             self.face_detection = self.mp_face_detection.FaceDetection(
                 min_detection_confidence=0.5,
@@ -17,7 +23,12 @@ class CurationService:
             print(f"CRITICAL: MediaPipe failed to load: {e}")
             self.face_detection = None
 
+    def warm_up(self) -> float:
+        """One dummy score so MediaPipe's graph is built before the first upload."""
+        return self.calculate_score(Image.new("RGB", (64, 64), (128, 128, 128)))
+
     def calculate_score(self, image_input) -> float:
+        cv2 = _cv2()
         try:
             image_bgr = None
 
@@ -44,6 +55,7 @@ class CurationService:
         """
         🎨 IMPROVED: Multi-dimensional quality assessment
         """
+        cv2 = _cv2()
         try:
             # Resize for consistent processing
             h, w = image_bgr.shape[:2]
@@ -118,6 +130,7 @@ class CurationService:
         🎨 IMPROVED: Multi-method blur detection
         Combines Laplacian variance with gradient magnitude
         """
+        cv2 = _cv2()
         try:
             # Method 1: Laplacian variance (edge detection)
             laplacian = cv2.Laplacian(gray, cv2.CV_64F)
@@ -206,6 +219,7 @@ class CurationService:
         🎨 NEW: Rule of thirds and visual balance
         Checks if subjects are positioned well
         """
+        cv2 = _cv2()
         try:
             h, w = gray.shape
             
@@ -273,6 +287,7 @@ class CurationService:
         🎨 NEW: Texture and fine detail analysis
         Photos with rich detail are more interesting
         """
+        cv2 = _cv2()
         try:
             # High-frequency content (fine details)
             # Use high-pass filter
@@ -292,6 +307,7 @@ class CurationService:
         🎨 IMPROVED: Sophisticated face scoring
         Considers face size, position, and multiple faces
         """
+        cv2 = _cv2()
         if not self.face_detection:
             return 0.0
         
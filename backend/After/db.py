@@ -1,16 +1,38 @@
 import os
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 from dotenv import load_dotenv
 
+from config import (
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_CONNECTING, MONGO_MAX_IDLE_MS, MONGO_SYNC_MAX_POOL_SIZE,
+)
+
 # Load biến môi trường từ file .env
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "SmartTourismDB") 
 
-client = MongoClient(MONGO_URI)
+# Sync client: worker threads (clustering cache) and migration scripts
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_SYNC_MAX_POOL_SIZE, maxIdleTimeMS=MONGO_MAX_IDLE_MS)
 db = client[DB_NAME]
 
+# Async client: request handlers (không chặn event loop); kết nối lazily ở truy vấn đầu tiên
+async_client = AsyncMongoClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxConnecting=MONGO_MAX_CONNECTING,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+)
+async_db = async_client[DB_NAME]
+
 # Collections
 album_collection = db["Albums"]
-summary_collection = db["TripSummaries"]
\ No newline at end of file
+summary_collection = db["TripSummaries"]
+photo_collection = db["Photos"]
+clustering_cache_collection = db["ClusteringCache"]
+
+async_album_collection = async_db["Albums"]
+async_summary_collection = async_db["TripSummaries"]
+async_photo_collection = async_db["Photos"]
+async_deletion_job_collection = async_db["DeletionJobs"]
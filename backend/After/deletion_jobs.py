@@ -0,0 +1,257 @@
+import asyncio
+import functools
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import (
+    DELETE_CHUNK_SIZE, DELETE_CONCURRENCY, DELETE_MAX_ATTEMPTS,
+    DELETE_RETRY_BASE_DELAY, DELETE_JOB_LEASE, DELETE_POLL_INTERVAL,
+)
+from executors import get_pool, NETWORK
+from logger_config import logger
+from metrics import counter
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+KIND_ALBUM = "album"     # photos of a deleted album; the album document is purged at the end
+KIND_PHOTOS = "photos"   # individual photos already removed from their album
+
+DELETION_CHUNKS = counter(
+    "deletion_chunks_total",
+    "Cloudinary delete_resources calls made by deletion jobs, by result (ok/retry/failed)",
+    ("result",),
+)
+
+
+def chunked(ids: List[str], size: int) -> List[List[str]]:
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def job_progress(job: dict) -> Dict[str, Any]:
+    """Public view of a job for the status endpoint."""
+    total = job.get("total", 0)
+    deleted = job.get("deleted", 0)
+    return {
+        "job_id": job["_id"],
+        "kind": job.get("kind"),
+        "album_id": job.get("album_id"),
+        "status": job.get("status"),
+        "total": total,
+        "deleted": deleted,
+        "percent": round(100.0 * deleted / total, 1) if total else 100.0,
+        "chunks_done": len(job.get("done_chunks", [])),
+        "chunks_total": job.get("chunk_count", 0),
+        "attempts": job.get("attempts", 0),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+    }
+
+
+class DeletionJobQueue:
+    """
+    Durable Cloudinary deletion jobs stored in Mongo.
+
+    A job holds its public ids pre-split into chunks of DELETE_CHUNK_SIZE and
+    records each finished chunk, so a retried or re-claimed job only resends
+    what is left. Jobs are claimed with a lease, so several workers (or a
+    restarted one) never run the same job twice at the same time.
+
+    `collection` is an async (AsyncMongoClient) collection and `album_repo`
+    an AsyncAlbumRepository: the worker runs as a task on the event loop,
+    so every round trip is awaited, never made inline.
+    """
+
+    def __init__(self, collection, cloud_service, album_repo=None,
+                 chunk_size: int = DELETE_CHUNK_SIZE, concurrency: int = DELETE_CONCURRENCY,
+                 max_attempts: int = DELETE_MAX_ATTEMPTS, retry_base_delay: float = DELETE_RETRY_BASE_DELAY,
+                 lease_seconds: float = DELETE_JOB_LEASE, executor=None, clock=time.time):
+        self.jobs = collection
+        self.cloud_service = cloud_service
+        self.album_repo = album_repo
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.lease_seconds = lease_seconds
+        self.executor = executor
+        self._clock = clock
+        self.worker_id = uuid.uuid4().hex[:8]
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        try:
+            await self.jobs.create_index([("status", 1), ("not_before", 1)], name="status_not_before")
+            await self.jobs.create_index([("user_id", 1), ("created_at", -1)], name="user_created")
+        except Exception as e:
+            logger.warning(f"Deletion job index creation failed: {e}")
+
+    # --- producer side ---
+    async def enqueue(self, kind: str, user_id: str, public_ids: List[str], album_id: Optional[str] = None) -> str:
+        now = self._clock()
+        ids = list(dict.fromkeys(pid for pid in public_ids if pid))
+        chunks = chunked(ids, self.chunk_size)
+        job = {
+            "_id": uuid.uuid4().hex,
+            "kind": kind,
+            "user_id": user_id,
+            "album_id": album_id,
+            "chunks": chunks,
+            "chunk_count": len(chunks),
+            "done_chunks": [],
+            "total": len(ids),
+            "deleted": 0,
+            "status": JOB_PENDING,
+            "attempts": 0,
+            "not_before": now,
+            "lease_until": None,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        await self.jobs.insert_one(job)
+        if self._wake is not None:
+            self._wake.set()
+        return job["_id"]
+
+    async def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+        query = {"_id": job_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await self.jobs.find_one(query, {"chunks": 0})
+
+    # --- consumer side ---
+    async def claim(self) -> Optional[dict]:
+        now = self._clock()
+        return await self.jobs.find_one_and_update(
+            {"$or": [
+                {"status": JOB_PENDING, "not_before": {"$lte": now}},
+                {"status": JOB_RUNNING, "lease_until": {"$lt": now}},   # worker died mid-job
+            ]},
+            {
+                "$set": {"status": JOB_RUNNING, "lease_until": now + self.lease_seconds,
+                         "worker": self.worker_id, "updated_at": datetime.utcnow()},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("not_before", 1)],
+            return_document=True,
+        )
+
+    async def _delete_chunk(self, chunk: List[str]) -> Optional[str]:
+        """Returns None on success, otherwise the last error message."""
+        loop = asyncio.get_running_loop()
+        executor = self.executor or get_pool(NETWORK)
+        error = None
+        for attempt in range(self.max_attempts):
+            try:
+                await loop.run_in_executor(
+                    executor, functools.partial(self.cloud_service.delete_resources, chunk, wait=True)
+                )
+                DELETION_CHUNKS.inc(result="ok")
+                return None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                DELETION_CHUNKS.inc(result="retry")
+                if attempt + 1 < self.max_attempts:
+                    await asyncio.sleep(self.retry_base_delay * 2 ** attempt)
+        DELETION_CHUNKS.inc(result="failed")
+        return error
+
+    async def run_job(self, job: dict) -> str:
+        """Deletes the job's remaining chunks with bounded concurrency; returns the new status."""
+        job_id = job["_id"]
+        done = set(job.get("done_chunks", []))
+        todo = [i for i in range(len(job["chunks"])) if i not in done]
+        sem = asyncio.Semaphore(self.concurrency)
+        errors: List[str] = []
+
+        async def one(index: int):
+            chunk = job["chunks"][index]
+            async with sem:
+                error = await self._delete_chunk(chunk)
+            if error:
+                errors.append(error)
+                return
+            await self.jobs.update_one(
+                {"_id": job_id},
+                {
+                    "$push": {"done_chunks": index},
+                    "$inc": {"deleted": len(chunk)},
+                    "$set": {"lease_until": self._clock() + self.lease_seconds, "updated_at": datetime.utcnow()},
+                },
+            )
+
+        logger.info(f"🗑️ Deletion job {job_id}: {len(todo)} chunks left (attempt {job.get('attempts', 1)})")
+        await asyncio.gather(*[one(i) for i in todo])
+
+        if not errors:
+            if job.get("kind") == KIND_ALBUM and job.get("album_id") and self.album_repo is not None:
+                await self.album_repo.purge_album(job["album_id"])
+            await self._finish(job_id, JOB_DONE)
+            logger.info(f"✅ Deletion job {job_id} finished ({job.get('total', 0)} resources)")
+            return JOB_DONE
+
+        if job.get("attempts", 1) >= self.max_attempts:
+            await self._finish(job_id, JOB_FAILED, error=errors[-1])
+            logger.error(f"❌ Deletion job {job_id} failed after {job.get('attempts')} attempts: {errors[-1]}")
+            return JOB_FAILED
+
+        # Back to the queue; only the failed chunks are retried
+        delay = self.retry_base_delay * 2 ** job.get("attempts", 1)
+        await self.jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": JOB_PENDING, "not_before": self._clock() + delay, "lease_until": None,
+                      "error": errors[-1], "updated_at": datetime.utcnow()}},
+        )
+        logger.warning(f"⚠️ Deletion job {job_id}: {len(errors)} chunks failed, retrying in {delay:.0f}s")
+        return JOB_PENDING
+
+    async def _finish(self, job_id: str, status: str, error: Optional[str] = None):
+        await self.jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": status, "error": error, "lease_until": None, "updated_at": datetime.utcnow()}},
+        )
+
+    async def run_pending(self) -> int:
+        """Runs jobs until none is claimable; returns how many were processed."""
+        count = 0
+        while True:
+            job = await self.claim()
+            if job is None:
+                return count
+            await self.run_job(job)
+            count += 1
+
+    # --- background worker (started from the app lifespan) ---
+    async def _worker(self, poll_interval: float):
+        while True:
+            try:
+                await self.run_pending()
+            except Exception as e:
+                logger.error(f"Deletion worker error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, poll_interval: float = DELETE_POLL_INTERVAL):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._worker(poll_interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
@@ -4,6 +4,8 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 
+from config import ADMIN_USER_IDS
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -26,4 +28,10 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
             raise credentials_exception
         return user_id
     except JWTError:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+
+def require_admin(current_user_id: str = Depends(get_current_user_id)) -> str:
+    """Allows only user ids listed in ADMIN_USER_IDS (env)."""
+    if current_user_id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user_id
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from config import (
+    THREAD_BUDGET,
+    IO_WORKERS,
+    CPU_WORKERS,
+    INFERENCE_WORKERS,
+    NETWORK_WORKERS,
+    OPENCV_THREADS,
+    TF_INTRA_OP_THREADS,
+    TF_INTER_OP_THREADS,
+    OMP_THREADS,
+)
+from logger_config import logger
+
+# Workload classes (bulkheads). A slow Cloudinary upload can no longer starve
+# image analysis, and junk inference never competes with file saves.
+IO = "io"
+CPU = "cpu"
+INFERENCE = "inference"
+NETWORK = "network"
+
+POOL_SIZES = {
+    IO: IO_WORKERS,
+    CPU: CPU_WORKERS,
+    INFERENCE: INFERENCE_WORKERS,
+    NETWORK: NETWORK_WORKERS,
+}
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that keeps utilisation counters.
+    Works transparently with loop.run_in_executor().
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._active = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._stats_lock:
+            self._submitted += 1
+        return super().submit(self._run, fn, args, kwargs)
+
+    def _run(self, fn, args, kwargs):
+        with self._stats_lock:
+            self._active += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._active -= 1
+                self._completed += 1
+                self._busy_seconds += elapsed
+                if not ok:
+                    self._failed += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            uptime = max(time.monotonic() - self._started_at, 1e-9)
+            queued = self._submitted - self._completed - self._active
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": max(0, queued),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "busy_seconds": round(self._busy_seconds, 3),
+                # Fraction of worker-seconds spent running jobs since start
+                "utilisation": round(self._busy_seconds / (uptime * self.max_workers), 4),
+            }
+
+
+_pools: Dict[str, BoundedExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str) -> BoundedExecutor:
+    """Returns the shared pool for a workload class, creating it on first use."""
+    if name not in POOL_SIZES:
+        raise ValueError(f"Unknown executor pool: {name}")
+
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = BoundedExecutor(name, max(1, POOL_SIZES[name]))
+            logger.info(f"🧵 Executor '{name}' ready ({POOL_SIZES[name]} workers)")
+        return _pools[name]
+
+
+def pool_stats() -> Dict[str, dict]:
+    return {name: pool.stats() for name, pool in list(_pools.items())}
+
+
+def shutdown_pools(wait: bool = True):
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=wait)
+        _pools.clear()
+
+
+def configure_thread_budget() -> Dict[str, int]:
+    """
+    Pins native thread pools (OpenCV, TensorFlow, OpenMP) so that
+    pool workers x per-call threads stays inside THREAD_BUDGET.
+    Must run before the junk model is loaded: TensorFlow rejects
+    threading changes once its runtime is initialised.
+    """
+    applied = {"budget": THREAD_BUDGET}
+
+    os.environ["OMP_NUM_THREADS"] = str(OMP_THREADS)
+    applied["omp"] = OMP_THREADS
+
+    try:
+        import cv2
+        cv2.setNumThreads(OPENCV_THREADS)
+        applied["opencv"] = OPENCV_THREADS
+    except Exception as e:
+        logger.warning(f"OpenCV thread pinning skipped: {e}")
+
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+        tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+        applied["tf_intra_op"] = TF_INTRA_OP_THREADS
+        applied["tf_inter_op"] = TF_INTER_OP_THREADS
+    except Exception as e:
+        logger.warning(f"TensorFlow thread pinning skipped: {e}")
+
+    committed = CPU_WORKERS * OPENCV_THREADS + INFERENCE_WORKERS * TF_INTRA_OP_THREADS
+    if committed > THREAD_BUDGET:
+        logger.warning(
+            f"⚠️ Thread budget oversubscribed: {committed} CPU threads for budget {THREAD_BUDGET}"
+        )
+
+    logger.info(f"🧵 Thread budget applied: {applied}")
+    return applied
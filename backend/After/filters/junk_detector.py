@@ -2,9 +2,6 @@ import os
 import threading
 
 import numpy as np
-import tf_keras as keras
-from tf_keras.models import load_model
-from tf_keras.preprocessing import image
 from PIL import Image
 
 from logger_config import logger
@@ -31,11 +28,21 @@ def get_model():
             return None
         
         logger.info("Loading Junk Filter Model (TensorFlow)...")
+        # tf_keras pulls in TensorFlow (~5 s): imported here, not when the service starts
+        from tf_keras.models import load_model
         _junk_model = load_model(model_path)
         logger.info("Junk Filter Model Loaded")
         
         return _junk_model
 
+def warm_up() -> bool:
+    """Loads the model and runs one dummy batch so the first real request skips graph tracing."""
+    model = get_model()
+    if model is None:
+        return False
+    model.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0)
+    return True
+
 def has_camera_model(image_path: str) -> bool:
     """
     Check if image has Camera Model Name in EXIF data.
@@ -110,6 +117,8 @@ def is_junk_batch(image_paths: list) -> list:
             return results
         
         try:
+            from tf_keras.preprocessing import image
+
             # Batch load and preprocess
             batch_images = []
             valid_indices = []
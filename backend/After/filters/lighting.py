@@ -1,8 +1,13 @@
-import cv2
 from typing import Tuple, Union
 import numpy as np
 from PIL import Image
 
+
+def _cv2():
+    import cv2    # first analysis pays for OpenCV, not `import filters.lighting`
+    return cv2
+
+
 class LightingFilter:
     def __init__(self):
         self.MIN_BRIGHTNESS = 40.0 
@@ -14,6 +19,7 @@ class LightingFilter:
         Original method: Load from disk
         Returns: (is_good: bool, reason: str)
         """
+        cv2 = _cv2()
         try:
             img = cv2.imread(image_path)
             if img is None:
@@ -27,6 +33,7 @@ class LightingFilter:
         🚀 V2.1: Accept PIL Image directly (avoid disk read)
         Used for thumbnail processing - faster!
         """
+        cv2 = _cv2()
         try:
             # Convert PIL -> OpenCV BGR
             if pil_image.mode != 'RGB':
@@ -41,6 +48,7 @@ class LightingFilter:
     
     def _analyze_internal(self, img_bgr: np.ndarray) -> Tuple[bool, str]:
         """Shared analysis logic"""
+        cv2 = _cv2()
         try:
             hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
             v_channel = hsv[:, :, 2]
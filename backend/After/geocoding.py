@@ -0,0 +1,279 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from config import (
+    NOMINATIM_URL, NOMINATIM_USER_AGENT, NOMINATIM_TIMEOUT,
+    GEOCODE_RATE_PER_SEC, GEOCODE_BURST,
+    GEOCODE_CACHE_PATH, GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL, GEOCODE_NEGATIVE_TTL,
+    GEOCODE_GRID_DECIMALS, GEOCODE_CACHE_TOUCH_INTERVAL,
+)
+from executors import IO, get_pool
+from logger_config import logger
+from metrics import record_cache
+
+
+class GeocoderUnavailable(Exception):
+    """Upstream failed and there is no cached answer to fall back to."""
+
+
+# ---------------------------------------------------------
+# Cache keys
+# ---------------------------------------------------------
+def normalise_address(address: str) -> str:
+    """'  Hồ  Gươm, HÀ NỘI ' -> 'hồ gươm, hà nội' (NFC, casefold, single spaces)."""
+    text = unicodedata.normalize("NFC", address).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def grid_point(lat: float, lon: float, decimals: int = GEOCODE_GRID_DECIMALS) -> Tuple[float, float]:
+    """Snaps a coordinate to the cache grid (3 decimals ~ 110 m)."""
+    return round(lat, decimals), round(lon, decimals)
+
+
+# ---------------------------------------------------------
+# Persistent LRU cache (SQLite)
+# ---------------------------------------------------------
+class PersistentLRUCache:
+    """
+    key -> JSON value with fetched_at / expires_at, kept in a SQLite file so
+    answers survive restarts. Bounded to max_entries by last access.
+    Expired entries are still returned by get_stale() for stale-on-error.
+
+    A hit only rewrites last_used once it is touch_interval old, so hot keys
+    cost a SELECT rather than an UPDATE + commit (WAL fsync) per lookup; the
+    LRU order is exact to within that interval. Calls block on SQLite:
+    OSMGeocoder runs them on the IO pool.
+    """
+
+    def __init__(self, path: str = GEOCODE_CACHE_PATH, max_entries: int = GEOCODE_CACHE_SIZE,
+                 clock: Callable[[], float] = time.time, touch_interval: float = GEOCODE_CACHE_TOUCH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS geocode_cache_lru ON geocode_cache (last_used)")
+        self._conn.commit()
+
+    def _read(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, last_used FROM geocode_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = self._clock()
+            if now - row[2] >= self.touch_interval:
+                self._conn.execute("UPDATE geocode_cache SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Fresh value or None."""
+        hit = self._read(key)
+        if hit is None or hit[1] <= self._clock():
+            return None
+        return hit[0]
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        hit = self._read(key)
+        return hit[0] if hit else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM geocode_cache WHERE key IN ("
+                " SELECT key FROM geocode_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------
+# Token bucket
+# ---------------------------------------------------------
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `capacity` saved up."""
+
+    def __init__(self, rate: float = GEOCODE_RATE_PER_SEC, capacity: int = GEOCODE_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ---------------------------------------------------------
+# Geocoder
+# ---------------------------------------------------------
+class OSMGeocoder:
+    """
+    Nominatim client for the After service:
+    - non-blocking httpx.AsyncClient
+    - persistent LRU cache (addresses normalised, coordinates snapped to a grid),
+      read and written on the IO pool so SQLite never blocks the event loop
+    - token bucket so the whole process stays within Nominatim's 1 req/s
+    - identical in-flight lookups share one upstream request
+    - expired cache entries are served when Nominatim fails
+    """
+
+    def __init__(self, base_url: str = NOMINATIM_URL, cache: Optional[PersistentLRUCache] = None,
+                 limiter: Optional[TokenBucket] = None, timeout: float = NOMINATIM_TIMEOUT,
+                 user_agent: str = NOMINATIM_USER_AGENT, ttl: float = GEOCODE_CACHE_TTL,
+                 negative_ttl: float = GEOCODE_NEGATIVE_TTL, grid_decimals: int = GEOCODE_GRID_DECIMALS):
+        self.base_url = base_url.rstrip("/")
+        self._cache = cache
+        self._cache_lock = threading.Lock()
+        self._limiter = limiter
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.grid_decimals = grid_decimals
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.upstream_calls = 0
+
+    @property
+    def cache(self) -> PersistentLRUCache:
+        # First use may come from several IO threads at once
+        with self._cache_lock:
+            if self._cache is None:
+                self._cache = PersistentLRUCache()
+        return self._cache
+
+    @property
+    def limiter(self) -> TokenBucket:
+        # Created lazily so the asyncio.Lock binds to the running loop
+        if self._limiter is None:
+            self._limiter = TokenBucket()
+        return self._limiter
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers={"User-Agent": self.user_agent},
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- public API ---
+    async def search(self, address: str, limit: int = 5) -> List[dict]:
+        """Forward geocoding, restricted to Vietnam. [] when nothing matches."""
+        query = normalise_address(address)
+        params = {"q": query, "format": "json", "limit": limit, "countrycodes": "vn", "accept-language": "vi"}
+
+        async def fetch():
+            results = await self._request("/search", params)
+            return [
+                {"lat": float(r["lat"]), "lon": float(r["lon"]), "display_name": r["display_name"]}
+                for r in results
+            ]
+
+        return await self._cached(f"search:{limit}:{query}", fetch)
+
+    async def reverse(self, lat: float, lon: float) -> Optional[dict]:
+        """Reverse geocoding of the grid cell containing (lat, lon)."""
+        g_lat, g_lon = grid_point(lat, lon, self.grid_decimals)
+        params = {"lat": g_lat, "lon": g_lon, "format": "json", "zoom": 16, "accept-language": "vi"}
+
+        async def fetch():
+            r = await self._request("/reverse", params)
+            if not r or "error" in r:
+                return None
+            return {
+                "lat": float(r["lat"]),
+                "lon": float(r["lon"]),
+                "display_name": r.get("display_name"),
+                "address": r.get("address", {}),
+            }
+
+        return await self._cached(f"reverse:{g_lat:.{self.grid_decimals}f},{g_lon:.{self.grid_decimals}f}", fetch)
+
+    # --- internals ---
+    async def _cache_call(self, method: str, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            get_pool(IO), lambda: getattr(self.cache, method)(*args)
+        )
+
+    async def _request(self, path: str, params: dict) -> Any:
+        await self.limiter.acquire()
+        self.upstream_calls += 1
+        resp = await self._get_client().get(path, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _cached(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        fresh = await self._cache_call("get", key)
+        record_cache("geocode", fresh is not None)
+        if fresh is not None:
+            return fresh["v"]
+
+        # Coalesce: identical lookups already in flight share one upstream call
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(key, fetch))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            stale = await self._cache_call("get_stale", key)
+            if stale is not None:
+                logger.warning(f"⚠️ Geocoder upstream failed ({e}); serving stale entry for {key}")
+                return stale["v"]
+            raise GeocoderUnavailable(str(e)) from e
+        # Wrapped so a cached "not found" ([] / None) is distinguishable from a miss
+        await self._cache_call("set", key, {"v": value}, self.ttl if value else self.negative_ttl)
+        return value
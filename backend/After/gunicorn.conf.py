@@ -0,0 +1,52 @@
+"""
+Multi-worker deployment of the After service:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+PREFORK=1 (default): the master imports main and the heavy frameworks once,
+keeps the garbage collector off while doing so (this file is read before the
+app is preloaded) and calls gc.freeze() before every fork, so the workers
+share those pages copy-on-write.
+PREFORK=0: plain gunicorn, every worker imports and loads everything itself
+(what `uvicorn --workers N` does).
+
+Compare both with: python -m benchmarks.measure_prefork_memory
+
+WebSocket pushes (/ws/{user_id}) reach tabs held by any worker only with
+PUBSUB_BACKEND=socket and the broker running next to gunicorn:
+
+    python pubsub.py &
+"""
+import gc
+import os
+
+from config import PREFORK, WEB_CONCURRENCY
+
+bind = f"0.0.0.0:{os.getenv('PORT', '7860')}"
+workers = WEB_CONCURRENCY
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = PREFORK
+# Model warm-up happens in the worker's lifespan, before it answers /ready
+timeout = 180
+graceful_timeout = 30
+
+if PREFORK:
+    # Collections in the master would leave freed holes in pages the workers share
+    gc.disable()
+
+
+def when_ready(server):
+    if PREFORK:
+        import main
+        from prefork import preload_shared_state, freeze
+        preload_shared_state(main.place_index, main.warmup)
+        freeze()
+
+
+def pre_fork(server, worker):
+    if PREFORK:
+        gc.freeze()    # also covers workers respawned later
+
+
+def post_fork(server, worker):
+    gc.enable()
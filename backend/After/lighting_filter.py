@@ -1,4 +1,3 @@
-import cv2
 import numpy as np
 import os
 
@@ -20,6 +19,7 @@ class LightingFilter:
         Phân tích ánh sáng của một bức ảnh.
         Trả về: (Trạng thái, Lý do, Giá trị đo được)
         """
+        import cv2
         try:
             # Đọc ảnh
             img = cv2.imread(image_path)
@@ -1,25 +1,28 @@
 import os
 import warnings
-import glob
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 os.environ['TRANSFORMERS_VERBOSITY'] = 'error'
 warnings.filterwarnings('ignore')
 
+# Must be imported before numpy / cv2 / TensorFlow: pins OpenMP & BLAS threads
+import config
+
 import asyncio
 import io   
 import uuid
 import hashlib
+import zlib
 from typing import List, Tuple, Optional, Dict
-from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from datetime import datetime
-from bson import ObjectId
 
 from PIL import Image
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import requests
 from fastapi.security import OAuth2PasswordRequestForm
@@ -28,47 +31,117 @@ from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 from pydantic import BaseModel
 
-from config import TEMP_DIR, PROCESSED_DIR
+from config import (
+    TEMP_DIR, PROCESSED_DIR, PLACE_TITLES, RENDITIONS_ENABLED,
+    CONTACT_SHEETS_ENABLED, CLUSTER_CACHE_MONGO,
+)
 from metadata import MetadataExtractor
 # MERGED IMPORTS: Kept ClusteringService, added AlbumUpdateRequest from friend
 from clustering.service import ClusteringService
-from schemas import PhotoInput, PhotoOutput, Album, TripSummaryRequest, TripSummaryResponse, AlbumUpdateRequest, OSMGeocodeRequest
+from clustering.batch import PhotoBatch
+from clustering_cache import ClusteringCache, HierarchyCache
+from clustering.algorithms import warm_up as warm_up_clustering
+from schemas import PhotoInput, PhotoOutput, Album, AlbumSummaryPage, PhotoPage, TripSummaryRequest, TripSummaryResponse, AlbumUpdateRequest, OSMGeocodeRequest, ReclusterRequest
 from summary_service import SummaryService
 from filters.lighting import LightingFilter
-from filters.junk_detector import is_junk_batch, get_model as get_junk_model
+from filters.junk_detector import is_junk_batch, warm_up as warm_up_junk_model
 from logger_config import logger
 from curation_service import CurationService
 from cloudinary_service import CloudinaryService
-from deps import get_current_user_id
-from db import album_collection, summary_collection
+from deps import get_current_user_id, require_admin
+from db import (
+    clustering_cache_collection,
+    async_client, async_album_collection, async_photo_collection, async_summary_collection, async_deletion_job_collection,
+)
+from album_repository import AsyncAlbumRepository, InvalidCursor
+from summary_repository import SummaryRepository
 from connection_manager import ConnectionManager
+from pubsub import make_pubsub
+from executors import get_pool, pool_stats, shutdown_pools, configure_thread_budget, IO, CPU, INFERENCE, NETWORK
+from metrics import (
+    REGISTRY, REQUESTS_IN_FLIGHT, PHOTOS_PROCESSED, PHOTOS_REJECTED,
+    stage_timer, record_cache, cache_hit_rates, rejection_reason_label
+)
+from memory_profiling import start_profile, load_latest_reports, load_report
+from album_encoding import album_response, dumps, FORMATS, FORMAT_JSON
+from shared_album_cache import SharedAlbumCache, etag_matches
+from deletion_jobs import DeletionJobQueue, job_progress, KIND_ALBUM, KIND_PHOTOS
+from geocoding import OSMGeocoder, GeocoderUnavailable
+from offline_geocoder import OfflineReverseGeocoder, album_centroid, place_title, NO_PLACE_METHODS
+from renditions import RenditionStore, photo_fields
+from temp_janitor import TempJanitor
+from warmup import WarmUp
+from contact_sheets import ContactSheetStore, offset_map
+from zip_stream import (
+    LocalFileSource, HttpSource, MemberUnavailable, build_album_zip, parse_range, content_disposition,
+    RangeNotSatisfiable,
+)
 
 # Simple in-memory cache
 _processed_cache = {}
 
 cloud_service = CloudinaryService()
-manager = ConnectionManager()
+manager = ConnectionManager(make_pubsub())
 _extractor = None
 _lighting_filter = None
 _curator = None
 summary_service = SummaryService()
+album_repo = AsyncAlbumRepository(async_album_collection, async_photo_collection)
+summary_repo = SummaryRepository(async_summary_collection)
+shared_album_cache = SharedAlbumCache()
+clustering_cache = ClusteringCache(collection=clustering_cache_collection if CLUSTER_CACHE_MONGO else None)
+# Cùng collection với clustering_cache (index TTL tạo một lần ở lifespan)
+hierarchy_cache = HierarchyCache(collection=clustering_cache_collection if CLUSTER_CACHE_MONGO else None)
+# Job worker là task asyncio trên event loop -> dùng client async (mọi truy vấn đều await)
+deletion_jobs = DeletionJobQueue(async_deletion_job_collection, cloud_service, album_repo)
+geocoder = OSMGeocoder()
+place_index = OfflineReverseGeocoder()
+zip_local_source = LocalFileSource(PROCESSED_DIR)
+temp_janitor = TempJanitor()
+warmup = WarmUp()
+zip_remote_source = HttpSource()
+
+def init_curator():
+    global _curator
+    curator = CurationService()
+    curator.warm_up()
+    _curator = curator
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _extractor, _lighting_filter, _curator
+    global _extractor, _lighting_filter
     
     logger.info("Starting application...")
-    loop = asyncio.get_event_loop()
-    executor = ThreadPoolExecutor(max_workers=1)
-    
-    await loop.run_in_executor(executor, get_junk_model)
-    
-    _extractor = MetadataExtractor()
-    _lighting_filter = LightingFilter()
-    _curator = CurationService()
+    with warmup.step("indexes"):
+        await album_repo.ensure_indexes()
+        await summary_repo.ensure_indexes()
+        await deletion_jobs.ensure_indexes()
+        clustering_cache.ensure_indexes()
+    deletion_jobs.start()
+    temp_janitor.start()
+    await manager.start()
+    with warmup.step("services"):
+        _extractor = MetadataExtractor()
+        _lighting_filter = LightingFilter()
     logger.info("✅ Services initialized")
+
+    # 🔥 Phần nặng (TensorFlow, MediaPipe, sklearn) chạy nền: /health trả lời ngay, /ready chờ xong
+    # Thread budget phải chạy trước khi TensorFlow khởi tạo runtime
+    warmup.add("thread_budget", configure_thread_budget)
+    warmup.add("junk_model", warm_up_junk_model, pool=INFERENCE, after="thread_budget")
+    warmup.add("mediapipe", init_curator, pool=CPU, required=True)
+    warmup.add("place_index", place_index.load)
+    warmup.add("clustering", warm_up_clustering)
+    warmup.start()
     yield
-    executor.shutdown(wait=True)
+    await warmup.stop()
+    await manager.stop()
+    await deletion_jobs.stop()
+    await temp_janitor.stop()
+    await geocoder.aclose()
+    zip_remote_source.close()
+    shutdown_pools(wait=True)
+    await async_client.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -81,8 +154,13 @@ app.add_middleware(
 
 app.mount("/images", StaticFiles(directory=PROCESSED_DIR), name="images")
 
-# 🚀 YOUR OPTIMIZATION: Use 8 workers to prevent thread explosion
-executor = ThreadPoolExecutor(max_workers=8)
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    REQUESTS_IN_FLIGHT.inc()
+    try:
+        return await call_next(request)
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
 
 MAX_FILES = 500
 
@@ -110,22 +188,31 @@ def process_image_job(file_info: dict) -> dict:
     filename = file_info['filename']
     
     try:
-        # 1. Open Image (Heavy I/O)
-        img = Image.open(path)
-        
-        # 2. Thumbnail (Heavy CPU)
-        img_thumb = img.copy()
-        img_thumb.thumbnail((512, 512), Image.Resampling.BILINEAR)
+        with stage_timer("decode"):
+            # 1. Open Image (Heavy I/O)
+            img = Image.open(path)
+            
+            # 2. Thumbnail (Heavy CPU)
+            img_thumb = img.copy()
+            img_thumb.thumbnail((512, 512), Image.Resampling.BILINEAR)
+            
+            # 3. Analyze
+            # 🚀 FIX: Extract metadata from the ORIGINAL image (img), not the thumbnail
+            metadata = _extractor.get_metadata_from_image(img)
         
-        # 3. Analyze
-        # 🚀 FIX: Extract metadata from the ORIGINAL image (img), not the thumbnail
-        metadata = _extractor.get_metadata_from_image(img)
+        # 4. Renditions (grid/preview/full WebP) + BlurHash từ ảnh đã decode sẵn
+        rendition = {}
+        if file_info.get('renditions') is not None:
+            with stage_timer("renditions"):
+                rendition = file_info['renditions'].generate(img, file_info['img_hash'])
         
         # Lighting & Score still use thumbnail (Faster & Accurate enough)
-        is_good_light, light_reason = _lighting_filter.analyze_from_image(img_thumb)
+        with stage_timer("lighting"):
+            is_good_light, light_reason = _lighting_filter.analyze_from_image(img_thumb)
         score = 0.0
         if is_good_light:
-            score = _curator.calculate_score(img_thumb)
+            with stage_timer("curation"):
+                score = _curator.calculate_score(img_thumb)
             
         return {
             'success': True,
@@ -135,7 +222,8 @@ def process_image_job(file_info: dict) -> dict:
             'metadata': metadata,
             'is_good_light': is_good_light,
             'light_reason': light_reason,
-            'score': score
+            'score': score,
+            'rendition': rendition
         }
     except Exception as e:
         logger.error(f"Error processing {filename}: {e}")
@@ -145,11 +233,129 @@ def process_image_job(file_info: dict) -> dict:
             'error': str(e)
         }
 
+async def upload_to_cloud(paths: List[str], temp_tag: str) -> Dict[str, dict]:
+    """
+    Uploads each file on the NETWORK pool and returns {local_path: {url, public_id}}.
+    Awaiting per-file futures keeps the coordination on the event loop instead
+    of parking a coordinator thread inside the same bounded pool.
+    """
+    loop = asyncio.get_event_loop()
+    logger.info(f"☁️ Uploading {len(paths)} photos to Cloudinary...")
+    with stage_timer("upload"):
+        results = await asyncio.gather(*[
+            loop.run_in_executor(get_pool(NETWORK), cloud_service.upload_photo, path, temp_tag)
+            for path in paths
+        ])
+    return {path: data for path, data in zip(paths, results) if data}
+
+def render_renditions(store: RenditionStore, path: str, key: str) -> dict:
+    """Renditions alone, for analysis-cache hits: their earlier files went with that request's workspace."""
+    try:
+        with stage_timer("renditions"), Image.open(path) as img:
+            return store.generate(img, key)
+    except Exception as e:
+        logger.warning(f"⚠️ Rendition failed for {os.path.basename(path)}: {e}")
+        return {}
+
+async def upload_renditions(store: RenditionStore, photos: List[PhotoInput],
+                            upload_task: "asyncio.Future[Dict[str, dict]]") -> Dict[str, Dict[str, str]]:
+    """
+    Uploads the renditions of every photo whose original reached Cloudinary;
+    returns {local_path: {name: url}}. Renditions that fail to upload are left
+    out, so albums only ever store Cloudinary URLs, which the deletion jobs remove.
+    """
+    uploaded_map = await upload_task
+    loop = asyncio.get_running_loop()
+    files = [
+        (p.local_path, name, store.local_path(url))
+        for p in photos if p.local_path in uploaded_map
+        for name, url in (p.renditions or {}).items()
+    ]
+    files = [f for f in files if f[2]]
+    with stage_timer("rendition_upload"):
+        results = await asyncio.gather(*[
+            loop.run_in_executor(get_pool(NETWORK), cloud_service.upload_derived, path, "smart_albums/renditions")
+            for _, _, path in files
+        ])
+    renditions: Dict[str, Dict[str, str]] = {}
+    for (local_path, name, _), data in zip(files, results):
+        if data:
+            renditions.setdefault(local_path, {})[name] = data["url"]
+    return renditions
+
+def photo_public_ids(photo: dict) -> List[str]:
+    """Cloudinary public ids of a stored photo: the original and its renditions."""
+    urls = [photo.get("image_url"), *(photo.get("renditions") or {}).values()]
+    pids = [cloud_service.get_public_id_from_url(url) for url in urls if url and "cloudinary" in url]
+    return [pid for pid in pids if pid]
+
+def build_contact_sheets(store: ContactSheetStore, album_id: str, sources: List[Tuple[str, Optional[str]]]) -> dict:
+    with stage_timer("contact_sheets"):
+        return store.build(album_id, sources)
+
+async def publish_contact_sheets(store: ContactSheetStore, meta: dict) -> dict:
+    """
+    Uploads the sheets the store wrote and points meta at their Cloudinary URLs;
+    sheets already on Cloudinary are kept as they are. A sheet that fails to
+    upload is dropped: its photos fall back to their grid renditions.
+    """
+    if not meta:
+        return {}
+    loop = asyncio.get_running_loop()
+
+    async def publish(sheet: dict) -> Optional[dict]:
+        path = store.local_path(sheet["url"])
+        if path is None:
+            return sheet
+        data = await loop.run_in_executor(
+            get_pool(NETWORK), cloud_service.upload_derived, path, "smart_albums/contact_sheets"
+        )
+        return {**sheet, "url": data["url"]} if data else None
+
+    with stage_timer("contact_sheet_upload"):
+        sheets = [s for s in await asyncio.gather(*[publish(s) for s in meta["sheets"]]) if s]
+    return {**meta, "sheets": sheets} if sheets else {}
+
+def fetch_sprite(url: str) -> Optional[bytes]:
+    try:
+        return b"".join(zip_remote_source.read_all(url))
+    except MemberUnavailable as e:
+        logger.warning(f"⚠️ Contact sheet fetch failed: {e}")
+        return None
+
+async def remove_from_contact_sheets(album_id: str, meta: dict, photo_ids: List[str]) -> Tuple[dict, List[str]]:
+    """
+    Rebuilds only the sheets that held photo_ids, in a janitor workspace, and
+    uploads them. Returns (new sheet metadata, public ids of the replaced sprites).
+    """
+    loop = asyncio.get_running_loop()
+    stale = ContactSheetStore.affected(meta, photo_ids)
+    sprites = await asyncio.gather(*[loop.run_in_executor(get_pool(NETWORK), fetch_sprite, url) for url in stale])
+    workspace = await loop.run_in_executor(get_pool(IO), temp_janitor.open_workspace)
+    try:
+        store = ContactSheetStore(os.path.join(workspace, "contact-sheets"))
+        sheets = await loop.run_in_executor(
+            get_pool(CPU), store.remove, album_id, meta, photo_ids,
+            {url: data for url, data in zip(stale, sprites) if data is not None}
+        )
+        sheets = await publish_contact_sheets(store, sheets)
+    finally:
+        await loop.run_in_executor(get_pool(IO), temp_janitor.finish, workspace)
+    return sheets, [pid for pid in map(cloud_service.get_public_id_from_url, stale) if pid]
+
+def contact_sheet_source(store: Optional[RenditionStore], photo: PhotoInput) -> Optional[str]:
+    """Grid rendition if there is one (already small and upright), else the saved upload."""
+    grid = store.local_path((photo.renditions or {}).get("grid")) if store else None
+    return grid or photo.local_path
+
 # 🔽 FRIEND'S HELPER (KEPT FOR DELETION FEATURES) 🔽
 def delete_local_file(filename_or_path: str):
     try:
-        filename = os.path.basename(filename_or_path)
-        file_path = os.path.join(PROCESSED_DIR, filename)
+        # "/images/req-xxx/abc.jpg" -> file trong workspace; tên trần -> layout phẳng cũ
+        if filename_or_path.startswith("/images/"):
+            file_path = zip_local_source.path(filename_or_path[len("/images/"):])
+        else:
+            file_path = os.path.join(PROCESSED_DIR, os.path.basename(filename_or_path))
         if os.path.exists(file_path):
             os.remove(file_path)
     except Exception:
@@ -158,136 +364,222 @@ def delete_local_file(filename_or_path: str):
 @app.post("/create-album")
 async def create_album(
     files: List[UploadFile] = File(...),
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    format: str = FORMAT_JSON,
+    request: Request = None
 ):
+    if format not in FORMATS:
+        raise HTTPException(400, f"Unknown format. Use one of: {', '.join(FORMATS)}")
     if len(files) > MAX_FILES:
         raise HTTPException(413, f"Too many files. Max: {MAX_FILES}")
-    
+
+    # Chờ warm-up (model, MediaPipe) nếu request đến trước khi /ready
+    await warmup.wait()
+    if _curator is None:
+        # init_curator lỗi (xem /ready): không trả về album toàn ảnh "Processing Error"
+        raise HTTPException(503, "Dịch vụ chấm điểm ảnh chưa sẵn sàng")
+
+    # 🧹 Mỗi request một thư mục riêng; xóa khi xong dù thành công hay lỗi (crash thì janitor dọn theo TTL)
+    loop = asyncio.get_event_loop()
+    workspace = await loop.run_in_executor(get_pool(IO), temp_janitor.open_workspace)
+    try:
+        return await _create_album_in(workspace, files, current_user_id, format, request)
+    finally:
+        logger.info("🧹 Cleaning up local temp files...")
+        await loop.run_in_executor(get_pool(IO), temp_janitor.finish, workspace)
+
+async def _create_album_in(
+    workspace: str,
+    files: List[UploadFile],
+    current_user_id: str,
+    format: str,
+    request: Optional[Request]
+):
     logger.info(f"📥 Received {len(files)} photos for User {current_user_id}")
     
     loop = asyncio.get_event_loop()
+    mem_profile = start_profile(f"create_album:{current_user_id}:{len(files)}")
+    try:
+        # STEP 0: Save all files to disk (Essential I/O)
+        logger.info("💾 Saving files to disk...")
+        file_contents = []
     
-    # STEP 0: Save all files to disk (Essential I/O)
-    logger.info("💾 Saving files to disk...")
-    file_contents = []
-    
-    saved_paths_map = {}
-    save_futures = []
+        saved_paths_map = {}
+        save_futures = []
     
-    for file in files:
-        content = await file.read()
-        file_contents.append((file.filename, content))
+        for file in files:
+            content = await file.read()
+            file_contents.append((file.filename, content))
         
-        safe_name = f"{uuid.uuid4()}.jpg"
-        temp_path = os.path.join(PROCESSED_DIR, safe_name)
-        saved_paths_map[file.filename] = temp_path
+            safe_name = f"{uuid.uuid4()}.jpg"
+            temp_path = os.path.join(workspace, safe_name)
+            saved_paths_map[file.filename] = temp_path
         
-        save_futures.append(
-            loop.run_in_executor(executor, save_image_to_disk, None, temp_path, content)
-        )
+            save_futures.append(
+                loop.run_in_executor(get_pool(IO), save_image_to_disk, None, temp_path, content)
+            )
     
-    await asyncio.gather(*save_futures)
-    logger.info(f"✅ Saved files to disk")
+        with stage_timer("save"):
+            await asyncio.gather(*save_futures)
+        logger.info(f"✅ Saved files to disk")
+        mem_profile.checkpoint("save")
 
-    # STEP 1: START CLOUDINARY UPLOAD (parallel)
-    logger.info("☁️ Starting Cloudinary upload...")
-    temp_tag = f"user_{current_user_id}_{uuid.uuid4().hex[:8]}"
+        # STEP 1: START CLOUDINARY UPLOAD (parallel)
+        logger.info("☁️ Starting Cloudinary upload...")
+        temp_tag = f"user_{current_user_id}_{uuid.uuid4().hex[:8]}"
     
-    upload_list = []
-    for filename, path in saved_paths_map.items():
-        upload_list.append((path, temp_tag))
-        
-    upload_task = loop.run_in_executor(executor, cloud_service.upload_batch, upload_list)
+        upload_task = asyncio.ensure_future(
+            upload_to_cloud(list(saved_paths_map.values()), temp_tag)
+        )
     
-    # STEP 2: PROCESS PHOTOS (Avoid Main Thread Blocking)
-    logger.info("🔄 Processing photos (metadata, lighting, scoring)...")
+        # STEP 2: PROCESS PHOTOS (Avoid Main Thread Blocking)
+        logger.info("🔄 Processing photos (metadata, lighting, scoring)...")
     
-    jobs = []
-    cached_results = []
+        jobs = []
+        cached_results = []
+        rerender = []
+        # 🖼️ Renditions + contact sheets ghi vào workspace của request (janitor dọn), upload lên Cloudinary
+        renditions = RenditionStore(os.path.join(workspace, "renditions")) if RENDITIONS_ENABLED else None
+        sheet_store = ContactSheetStore(os.path.join(workspace, "contact-sheets"))
+        # 📦 Size + CRC-32 của file gốc (đúng bytes upload lên Cloudinary) -> ZIP export không phải tải lại ảnh
+        checksums = {}
     
-    for filename, content in file_contents:
-        temp_path = saved_paths_map.get(filename)
-        img_hash = compute_image_hash(content) # Fast MD5
+        for filename, content in file_contents:
+            temp_path = saved_paths_map.get(filename)
+            with stage_timer("hash"):
+                img_hash = compute_image_hash(content) # Fast MD5
+                checksums[temp_path] = (len(content), zlib.crc32(content))
         
-        if img_hash in _processed_cache:
-            # Cache Hit
-            cached_photo = _processed_cache[img_hash].model_copy()
-            cached_photo.id = filename
-            cached_photo.filename = filename
-            cached_photo.local_path = temp_path
-            cached_results.append(cached_photo)
-        else:
-            # New Job
-            jobs.append({
-                'filename': filename,
-                'temp_path': temp_path,
-                'img_hash': img_hash
-            })
+            record_cache("image_analysis", img_hash in _processed_cache)
+            if img_hash in _processed_cache:
+                # Cache Hit
+                cached_photo = _processed_cache[img_hash].model_copy()
+                cached_photo.id = filename
+                cached_photo.filename = filename
+                cached_photo.local_path = temp_path
+                cached_photo.renditions = None    # file cũ đã bị xóa cùng workspace trước
+                cached_results.append(cached_photo)
+                if renditions is not None:
+                    rerender.append((cached_photo, img_hash))
+            else:
+                # New Job
+                jobs.append({
+                    'filename': filename,
+                    'temp_path': temp_path,
+                    'img_hash': img_hash,
+                    'renditions': renditions
+                })
             
-    # Process batches
-    BATCH_SIZE = 20
-    processed_inputs = []
+        # Process batches (concurrently, bounded by the CPU pool size)
+        BATCH_SIZE = 20
+        processed_inputs = []
     
-    for i in range(0, len(jobs), BATCH_SIZE):
-        batch = jobs[i:i+BATCH_SIZE]
-        
-        # 🚀 YOUR FIX: Run image loading & analysis in executor
-        results = await loop.run_in_executor(
-            executor,
-            lambda b: [process_image_job(j) for j in b],
-            batch
-        )
-        
-        for res in results:
-            if not res['success']:
-                processed_inputs.append(PhotoInput(
-                     id=res['filename'], filename=res['filename'],
-                     local_path=res.get('temp_path'), is_rejected=True, 
-                     rejected_reason="Processing Error", score=0
-                ))
-                continue
-
-            if not res['is_good_light']:
-                p_in = PhotoInput(
-                    id=res['filename'], filename=res['filename'],
-                    local_path=res['temp_path'], is_rejected=True,
-                    rejected_reason=res['light_reason'], score=0.0,
-                    **res['metadata']
-                )
-            else:
-                p_in = PhotoInput(
-                    id=res['filename'], filename=res['filename'],
-                    local_path=res['temp_path'], is_rejected=False,
-                    score=res['score'],
-                    **res['metadata']
-                )
+        batch_futures = [
+            loop.run_in_executor(
+                get_pool(CPU),
+                lambda b: [process_image_job(j) for j in b],
+                jobs[i:i+BATCH_SIZE]
+            )
+            for i in range(0, len(jobs), BATCH_SIZE)
+        ]
+        rerender_futures = [
+            loop.run_in_executor(get_pool(CPU), render_renditions, renditions, p.local_path, img_hash)
+            for p, img_hash in rerender
+        ]
+        for (p, _), meta in zip(rerender, await asyncio.gather(*rerender_futures)):
+            p.renditions = meta.get("renditions")
+    
+        for results in await asyncio.gather(*batch_futures):
+            for res in results:
+                if not res['success']:
+                    processed_inputs.append(PhotoInput(
+                         id=res['filename'], filename=res['filename'],
+                         local_path=res.get('temp_path'), is_rejected=True, 
+                         rejected_reason="Processing Error", score=0
+                    ))
+                    continue
+
+                if not res['is_good_light']:
+                    p_in = PhotoInput(
+                        id=res['filename'], filename=res['filename'],
+                        local_path=res['temp_path'], is_rejected=True,
+                        rejected_reason=res['light_reason'], score=0.0,
+                        **res['metadata'], **photo_fields(res['rendition'])
+                    )
+                else:
+                    p_in = PhotoInput(
+                        id=res['filename'], filename=res['filename'],
+                        local_path=res['temp_path'], is_rejected=False,
+                        score=res['score'],
+                        **res['metadata'], **photo_fields(res['rendition'])
+                    )
             
-            _processed_cache[res['img_hash']] = p_in
-            processed_inputs.append(p_in)
+                _processed_cache[res['img_hash']] = p_in
+                processed_inputs.append(p_in)
             
-    all_inputs = processed_inputs + cached_results
-    valid_inputs = [p for p in all_inputs if p]
+        all_inputs = processed_inputs + cached_results
+        valid_inputs = [p for p in all_inputs if p]
+        mem_profile.checkpoint("analysis")
+        rendition_upload = asyncio.ensure_future(
+            upload_renditions(renditions, valid_inputs, upload_task)
+        ) if renditions is not None else None
     
-    # STEP 3: Junk Detection
-    clean_photos = [p for p in valid_inputs if not p.is_rejected]
-    if clean_photos:
-        paths = [p.local_path for p in clean_photos]
-        junk_res = await loop.run_in_executor(executor, is_junk_batch, paths)
-        for p, is_junk in zip(clean_photos, junk_res):
-            if is_junk:
-                p.is_rejected = True
-                p.rejected_reason = "AI Detected Junk"
-                p.score = 0.0
+        # STEP 3: Junk Detection
+        clean_photos = [p for p in valid_inputs if not p.is_rejected]
+        if clean_photos:
+            paths = [p.local_path for p in clean_photos]
+            with stage_timer("junk"):
+                junk_res = await loop.run_in_executor(get_pool(INFERENCE), is_junk_batch, paths)
+            for p, is_junk in zip(clean_photos, junk_res):
+                if is_junk:
+                    p.is_rejected = True
+                    p.rejected_reason = "AI Detected Junk"
+                    p.score = 0.0
+        mem_profile.checkpoint("junk")
+
+        PHOTOS_PROCESSED.inc(len(valid_inputs))
+        for p in valid_inputs:
+            if p.is_rejected:
+                PHOTOS_REJECTED.inc(reason=rejection_reason_label(p.rejected_reason))
 
-    try:
         # STEP 4: Clustering
         logger.info("🧩 Clustering photos into albums...")
-        raw_albums = ClusteringService.dispatch(valid_inputs)
-        original_map = {p.filename: p for p in valid_inputs}
+        with stage_timer("clustering"):
+            # Cột numpy cho thuật toán; model Pydantic chỉ dựng lại ở bước trả response
+            # ♻️ Cùng bộ ảnh đã cluster trước đó -> lấy kết quả từ cache; chạy ngoài event loop (có thể gọi Mongo)
+            raw_albums = await loop.run_in_executor(
+                get_pool(CPU), ClusteringService.dispatch_batch, PhotoBatch.from_inputs(valid_inputs), clustering_cache
+            )
+        album_members = [album.photos(valid_inputs) for album in raw_albums]
+        mem_profile.checkpoint("clustering")
+
+        # 🗺️ Đặt tên album theo địa điểm: tra bảng offline, cả batch một lần (không gọi mạng)
+        place_labels = [None] * len(raw_albums)
+        if PLACE_TITLES:
+            with stage_timer("place_titles"):
+                centroids = [
+                    None if album.method in NO_PLACE_METHODS else album_centroid(
+                        (p.latitude, p.longitude) for p in members
+                    )
+                    for album, members in zip(raw_albums, album_members)
+                ]
+                place_labels = [m.label if m else None for m in place_index.resolve_many(centroids)]
+
+        # 🧩 Contact sheets: ghép thumbnail mỗi album thành vài sprite, chạy song song với upload
+        album_ids = [str(uuid.uuid4()) for _ in raw_albums]
+        sheet_futures = [
+            loop.run_in_executor(
+                get_pool(CPU), build_contact_sheets, sheet_store, album_id,
+                [(p.id, contact_sheet_source(renditions, p)) for p in members]
+            ) if CONTACT_SHEETS_ENABLED else None
+            for album_id, members in zip(album_ids, album_members)
+        ]
         
         # STEP 5: Wait for Uploads
         logger.info("⏳ Waiting for Cloudinary upload...")
         uploaded_map = await upload_task
+        rendition_map = await rendition_upload if rendition_upload else {}
+        mem_profile.checkpoint("upload_wait")
         
         logger.info(f"✅ Cloudinary upload complete. Items: {len(uploaded_map)}")
         
@@ -295,19 +587,16 @@ async def create_album(
         final_albums = []
         db_inserts = []
         
-        for album in raw_albums:
-            album_id = str(uuid.uuid4())
+        for album, members, place_label, album_id, sheet_future in zip(raw_albums, album_members, place_labels, album_ids, sheet_futures):
             safe_tag = "".join(c for c in album.title if c.isalnum() or c in ('-', '_')) + f"_{uuid.uuid4().hex[:4]}"
             
             output_photos = []
             album_public_ids = [] 
             has_cloud_photo = False
             
-            for photo in album.photos:
-                orig = original_map.get(photo.filename)
-                if not orig: continue
-                
+            for orig in members:
                 img_url = None
+                size, crc32 = checksums.get(orig.local_path, (None, None))
                 
                 if orig.local_path in uploaded_map:
                     data = uploaded_map[orig.local_path]
@@ -317,16 +606,22 @@ async def create_album(
                         album_public_ids.append(pid)
                     has_cloud_photo = True
                 elif orig.local_path:
-                    img_url = f"/images/{os.path.basename(orig.local_path)}"
+                    img_url = "/images/" + os.path.relpath(orig.local_path, PROCESSED_DIR).replace(os.sep, "/")
                 
                 p_out = PhotoOutput(
-                    id=photo.id, 
-                    filename=photo.filename, 
-                    timestamp=photo.timestamp,
+                    id=orig.id, 
+                    filename=orig.filename, 
+                    timestamp=orig.timestamp,
                     score=orig.score,
                     image_url=img_url, 
                     lat=orig.latitude, 
-                    lon=orig.longitude
+                    lon=orig.longitude,
+                    width=orig.width,
+                    height=orig.height,
+                    blurhash=orig.blurhash,
+                    renditions=rendition_map.get(orig.local_path),
+                    size=size,
+                    crc32=crc32
                 )
                 output_photos.append(p_out)
             
@@ -334,19 +629,21 @@ async def create_album(
             zip_url = None
             if has_cloud_photo and album_public_ids:
                 # A. Apply the specific album tag
-                await loop.run_in_executor(
-                    executor, 
-                    cloud_service.add_tags, 
-                    album_public_ids, 
-                    safe_tag
-                )
+                with stage_timer("tagging"):
+                    await loop.run_in_executor(
+                        get_pool(NETWORK), 
+                        cloud_service.add_tags, 
+                        album_public_ids, 
+                        safe_tag
+                    )
                 
                 # B. Generate Dynamic Zip Link (His Feature)
-                zip_url = await loop.run_in_executor(
-                    executor,
-                    cloud_service.create_album_zip_link,
-                    safe_tag 
-                )
+                with stage_timer("zip"):
+                    zip_url = await loop.run_in_executor(
+                        get_pool(NETWORK),
+                        cloud_service.create_album_zip_link,
+                        safe_tag 
+                    )
             
             cover_url = None
             for photo in output_photos:
@@ -359,7 +656,7 @@ async def create_album(
             album_out = Album(
                 id=album_id,
                 user_id=current_user_id,
-                title=album.title,
+                title=place_title(album.title, place_label),
                 method=album.method,
                 download_zip_url=zip_url,
                 cover_photo_url=cover_url,
@@ -371,23 +668,26 @@ async def create_album(
             
             doc = album_out.dict()
             doc['_id'] = album_id
+            contact_sheets = await publish_contact_sheets(sheet_store, await sheet_future) if sheet_future else {}
+            if contact_sheets:
+                doc['contact_sheets'] = contact_sheets
             db_inserts.append(doc)
         
-        if db_inserts:
-            album_collection.insert_many(db_inserts)
+        mem_profile.checkpoint("build_albums")
         
-        # 🚀 YOUR CLEANUP LOGIC
-        logger.info("🧹 Cleaning up local temp files...")
-        for file_path in saved_paths_map.values():
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete {file_path}: {e}")
+        if db_inserts:
+            with stage_timer("db_insert"):
+                await album_repo.insert_albums(db_inserts)
+        mem_profile.checkpoint("db_insert")
         
+        mem_profile.finish(photos=len(files), albums=len(final_albums))
+        if format != FORMAT_JSON:
+            accept_encoding = request.headers.get("accept-encoding") if request else None
+            return album_response(final_albums, format, accept_encoding)
         return {"albums": final_albums}
 
     except Exception as e:
+        mem_profile.finish(photos=len(files), error=str(e))
         logger.error(f"Logic Error: {e}")
         import traceback
         traceback.print_exc()
@@ -395,30 +695,232 @@ async def create_album(
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "executors": pool_stats(), "shared_album_cache": shared_album_cache.stats(),
+            "clustering_cache": clustering_cache.stats(), "hierarchy_cache": hierarchy_cache.stats(),
+            "temp_dir": temp_janitor.stats()}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 cho đến khi warm-up (model, MediaPipe, sklearn) xong, hoặc khi MediaPipe khởi tạo lỗi."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    """
+    Prometheus text exposition by default; ?format=json returns a local
+    snapshot (with derived cache hit rates) for use without a Prometheus server.
+    """
+    if format == "json":
+        snapshot = REGISTRY.snapshot()
+        snapshot["cache_hit_rates"] = cache_hit_rates()
+        return snapshot
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.websocket("/ws/{user_id}")
+async def websocket_endpoint(websocket: WebSocket, user_id: str, token: str = ""):
+    """Kênh đẩy kết quả (trip summary) tới mọi tab đang mở của user."""
+    # 🔒 Trình duyệt không gửi được header Authorization khi mở WebSocket nên token đi qua ?token=
+    try:
+        token_user_id = get_current_user_id(token)
+    except HTTPException:
+        token_user_id = None
+    if token_user_id != user_id:
+        await websocket.close(code=1008)
+        return
+
+    await manager.connect(websocket, user_id)
+    try:
+        while True:
+            await websocket.receive_text()    # client không gửi gì, chỉ giữ kết nối
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket, user_id)
+
+@app.get("/admin/memory-reports")
+async def get_memory_reports(limit: int = 5, admin_id: str = Depends(require_admin)):
+    """Latest per-request memory reports (requires MEMORY_PROFILING=1)."""
+    return {"enabled": config.MEMORY_PROFILING, "reports": load_latest_reports(max(1, min(limit, 50)))}
+
+@app.get("/admin/memory-reports/{request_id}")
+async def get_memory_report(request_id: str, admin_id: str = Depends(require_admin)):
+    report = load_report(request_id)
+    if not report:
+        raise HTTPException(404, "Report not found")
+    return report
 
 @app.delete("/cleanup")
 async def cleanup_images():
     _processed_cache.clear()
-    files = glob.glob(os.path.join(PROCESSED_DIR, "*"))
-    count = 0
-    for f in files:
-        try:
-            os.remove(f)
-            count += 1
-        except Exception:
-            pass
+    # Bỏ qua workspace của các request đang chạy
+    count = await asyncio.get_running_loop().run_in_executor(get_pool(IO), temp_janitor.purge)
     return {"status": "cleaned", "disk_files_removed": count}
 
 @app.get("/my-albums", response_model=List[Album])
-async def get_my_albums(current_user_id: str = Depends(get_current_user_id)):
+async def get_my_albums(
+    current_user_id: str = Depends(get_current_user_id),
+    format: str = FORMAT_JSON,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    request: Request = None
+):
+    """
+    ?limit=N[&cursor=...] -> {"albums": [summary...], "next_cursor": ...}
+                             (no photo arrays; use /albums/{id}/photos)
+    ?format=compact -> orjson body with templated Cloudinary URLs
+    ?format=ndjson  -> same, streamed one album per line
+    Both honour Accept-Encoding (br / gzip).
+    """
+    if format not in FORMATS:
+        raise HTTPException(400, f"Unknown format. Use one of: {', '.join(FORMATS)}")
+
+    if limit is not None or cursor:
+        try:
+            albums, next_cursor = await album_repo.list_album_summaries(current_user_id, limit, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(400, str(e))
+        page = AlbumSummaryPage(albums=albums, next_cursor=next_cursor)
+        return JSONResponse(jsonable_encoder(page))
+
     try:
         # Tìm các album có user_id tương ứng
-        cursor = album_collection.find({"user_id": current_user_id}).sort("created_at", -1)
-        return [doc for doc in cursor]
+        albums = await album_repo.list_albums(current_user_id)
+        if format != FORMAT_JSON:
+            accept_encoding = request.headers.get("accept-encoding") if request else None
+            return album_response(albums, format, accept_encoding)
+        return albums
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/albums/{album_id}/photos", response_model=PhotoPage)
+async def get_album_photos(
+    album_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Ảnh của 1 album, phân trang bằng cursor (chỉ đọc đúng đoạn cần từ Mongo)."""
+    try:
+        result = await album_repo.list_album_photos(album_id, current_user_id, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Album không tìm thấy")
+    photos, next_cursor, total = result
+    return {"photos": photos, "next_cursor": next_cursor, "total": total}
+
+@app.get("/albums/{album_id}/download")
+async def download_album_zip(
+    album_id: str,
+    request: Request,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Tải album dạng ZIP (stored, không nén) được ghép trực tiếp khi stream:
+    - Content-Length tính trước từ size + CRC lưu lúc upload (không tải trước ảnh nào)
+    - Range / If-Range: tải tiếp từ byte đang dở, chỉ đọc lại phần còn thiếu
+    - Ảnh cũ chưa có size / CRC: entry có data descriptor, stream cả file, không hỗ trợ Range
+    """
+    album = await album_repo.get_album(album_id, current_user_id, with_photos=True)
+    if not album:
+        raise HTTPException(404, "Album không tìm thấy")
+
+    loop = asyncio.get_running_loop()
+    archive = await loop.run_in_executor(
+        get_pool(IO), build_album_zip, album.get("photos", []), zip_local_source, zip_remote_source
+    )
+    if not archive.entries:
+        raise HTTPException(404, "Album không có ảnh nào tải được")
+
+    disposition = content_disposition(f"{album.get('title') or album_id}.zip")
+    if not archive.ranged:
+        headers = {"Accept-Ranges": "none", "Content-Disposition": disposition}
+        return StreamingResponse(iter(archive), media_type="application/zip", headers=headers)
+
+    total = archive.content_length
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": archive.etag,
+        "Content-Disposition": disposition,
+    }
+    # If-Range khác ETag -> nội dung đã đổi, gửi lại toàn bộ
+    if_range = request.headers.get("if-range")
+    range_header = request.headers.get("range") if not if_range or if_range == archive.etag else None
+    try:
+        byte_range = parse_range(range_header, total)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(total)
+        return StreamingResponse(archive.iter_range(0, total), media_type="application/zip", headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{total}"
+    headers["Content-Length"] = str(end - start)
+    return StreamingResponse(
+        archive.iter_range(start, end), status_code=206, media_type="application/zip", headers=headers
+    )
+
+@app.get("/albums/{album_id}/contact-sheets")
+async def get_album_contact_sheets(
+    album_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Sprite của album: vẽ cả lưới ảnh chỉ với vài request.
+    tiles[photo_id] = [sheet, x, y]; ảnh không có trong tiles thì dùng renditions.grid.
+    """
+    album = await album_repo.get_album(album_id, current_user_id)
+    if not album:
+        raise HTTPException(404, "Album không tìm thấy")
+    return offset_map(album.get("contact_sheets"))
+
+def stored_photo_input(photo: dict, rejected: bool) -> PhotoInput:
+    return PhotoInput(
+        id=photo["id"], filename=photo.get("filename", ""), timestamp=photo.get("timestamp"),
+        latitude=photo.get("lat"), longitude=photo.get("lon"), score=photo.get("score") or 0.0,
+        is_rejected=rejected,
+    )
+
+@app.post("/albums/recluster")
+async def recluster_albums(
+    request: ReclusterRequest,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Xem trước cách chia album ở độ phân giải khác (dist_m / gap_min) cho ảnh đã lưu.
+    - Cây single-linkage của các toạ độ GPS dựng 1 lần rồi cache: đổi ngưỡng chỉ cắt lại cây
+    - Kết quả giống hệt chạy lại ST-DBSCAN với cùng tham số
+    - Chỉ trả về bản xem trước, KHÔNG ghi đè album đã lưu
+    """
+    if request.album_ids is None:
+        albums = await album_repo.list_albums(current_user_id)
+    else:
+        albums = []
+        for album_id in dict.fromkeys(request.album_ids):
+            album = await album_repo.get_album(album_id, current_user_id, with_photos=True)
+            if not album:
+                raise HTTPException(status_code=404, detail=f"Album không tìm thấy: {album_id}")
+            albums.append(album)
+
+    # Ảnh ở album "Review Needed" vẫn giữ nguyên trạng thái bị loại
+    stored = [(p, a.get("method") == "filters_rejected") for a in albums for p in a.get("photos", [])]
+    inputs = [stored_photo_input(p, rejected) for p, rejected in stored]
+
+    loop = asyncio.get_running_loop()
+    groups = await loop.run_in_executor(
+        get_pool(CPU), ClusteringService.recluster, PhotoBatch.from_inputs(inputs),
+        request.dist_m, request.gap_min, hierarchy_cache
+    )
+    preview = [
+        Album(title=g.title, method=g.method, user_id=current_user_id,
+              photos=[PhotoOutput(**{"timestamp": None, **stored[i][0]}) for i in g.index])
+        for g in groups
+    ]
+    return {"dist_m": request.dist_m, "gap_min": request.gap_min, "albums": preview}
+
 @app.post("/swagger-login")
 async def swagger_login_proxy(form_data: OAuth2PasswordRequestForm = Depends()):
     auth_url = "http://localhost:8000/auth/login"
@@ -468,7 +970,7 @@ async def create_trip_summary(
         summary_doc["user_id"] = current_user_id
         
         try:
-            summary_collection.insert_one(summary_doc)
+            await summary_repo.insert(summary_doc)
             logger.info(f"✅ Saved trip summary to MongoDB")
         except Exception as e:
             logger.error(f"MongoDB save failed: {e}")
@@ -491,19 +993,22 @@ async def create_trip_summary(
 @app.get("/summary/history")
 async def get_summary_history(current_user_id: str = Depends(get_current_user_id)):
     try:
-        cursor = summary_collection.find({"user_id": current_user_id}, {"_id": 0}).sort("created_at", -1)
-        return list(cursor)
+        return await summary_repo.history(current_user_id)
     except Exception as e:
         logger.error(f"Error fetching history: {e}")
         return []
     
-@app.delete("/albums/{album_id}")
+@app.delete("/albums/{album_id}", status_code=202)
 async def delete_album(
     album_id: str,
     current_user_id: str = Depends(get_current_user_id)
 ):
+    """
+    Album biến mất ngay (soft delete); ảnh trên Cloudinary được xóa bởi job chạy nền
+    (từng lô 100 ảnh, có retry). Theo dõi tiến độ qua GET /deletion-jobs/{job_id}.
+    """
     # 1. Tìm album trước để lấy danh sách ảnh
-    album = album_collection.find_one({"_id": album_id, "user_id": current_user_id})
+    album = await album_repo.get_album(album_id, current_user_id, with_photos=True)
     
     if not album:
         raise HTTPException(status_code=404, detail="Album không tồn tại")
@@ -516,26 +1021,41 @@ async def delete_album(
         for photo in album["photos"]:
             img_url = photo.get("image_url")
             
+            # A. Ảnh gốc + renditions trên Cloudinary -> Lấy Public ID
+            cloud_public_ids.extend(photo_public_ids(photo))
+            
             if img_url:
-                # A. Nếu là ảnh Cloudinary -> Lấy Public ID
-                if "cloudinary" in img_url:
-                    pid = cloud_service.get_public_id_from_url(img_url)
-                    if pid: cloud_public_ids.append(pid)
-                
                 # B. Xóa file Local (Thumbnail/Original)
                 # Dù đã up lên cloud hay chưa, file gốc vẫn có thể nằm trong folder uploads
                 delete_local_file(photo.get("filename")) 
                 # Hoặc nếu img_url là local path (/images/abc.jpg)
                 delete_local_file(img_url)
 
-    # 3. Gửi lệnh xóa lên Cloudinary (Chạy ngầm/Async cũng được)
-    if cloud_public_ids:
-        cloud_service.delete_resources(cloud_public_ids)
+    # C. Contact sheets của album (sprite trên Cloudinary)
+    for sheet in (album.get("contact_sheets") or {}).get("sheets", []):
+        pid = cloud_service.get_public_id_from_url(sheet["url"])
+        if pid: cloud_public_ids.append(pid)
 
-    # 4. Xóa trong Database
-    album_collection.delete_one({"_id": album_id})
+    # 3. Đánh dấu đã xóa (ẩn khỏi mọi API) rồi giao việc cho job nền
+    if not await album_repo.mark_deleted(album_id, current_user_id):
+        raise HTTPException(status_code=404, detail="Album không tồn tại")
+    shared_album_cache.invalidate_album(album_id)
+    job_id = await deletion_jobs.enqueue(KIND_ALBUM, current_user_id, cloud_public_ids, album_id=album_id)
     
-    return {"message": f"Đã xóa album {album_id} và dọn dẹp {len(cloud_public_ids)} ảnh trên cloud"}
+    return {
+        "message": f"Đã xóa album {album_id}, đang dọn dẹp {len(cloud_public_ids)} ảnh trên cloud",
+        "job_id": job_id
+    }
+
+@app.get("/deletion-jobs/{job_id}")
+async def get_deletion_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    job = await deletion_jobs.get(job_id, current_user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job không tồn tại")
+    return job_progress(job)
 
 # 2. ĐỔI TÊN ALBUM
 @app.patch("/albums/{album_id}/rename")
@@ -550,13 +1070,9 @@ async def rename_album(
     if not request.title.strip():
         raise HTTPException(status_code=400, detail="Tên album không được để trống")
 
-    result = album_collection.update_one(
-        {"_id": album_id, "user_id": current_user_id},
-        {"$set": {"title": request.title}} # Lệnh update của MongoDB
-    )
-
-    if result.matched_count == 0:
+    if not await album_repo.rename(album_id, current_user_id, request.title):
         raise HTTPException(status_code=404, detail="Album không tìm thấy")
+    shared_album_cache.invalidate_album(album_id)
 
     return {"message": "Đổi tên thành công", "new_title": request.title}
 
@@ -567,41 +1083,42 @@ async def delete_photo_from_album(
     photo_id: str,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    # 1. Tìm album
-    album = album_collection.find_one({"_id": album_id, "user_id": current_user_id})
+    # 1. Tìm album (không đọc mảng photos)
+    album = await album_repo.get_album(album_id, current_user_id)
     if not album:
         raise HTTPException(status_code=404, detail="Album không tìm thấy")
     
-    # 2. Tìm ảnh trong mảng photos
-    target_photo = None
-    for p in album.get("photos", []):
-        if p.get("id") == photo_id:
-            target_photo = p
-            break
+    # 2. Tìm ảnh (mảng photos hoặc collection Photos)
+    target_photo = await album_repo.find_photo(album, photo_id)
             
     if not target_photo:
         raise HTTPException(404, "Ảnh không tồn tại trong album")
 
     # 3. Xử lý xóa file vật lý
+    job_id = None
+    # Xóa trên Cloudinary: ảnh gốc + renditions (job nền, có retry)
+    public_ids = photo_public_ids(target_photo)
+    if public_ids:
+        job_id = await deletion_jobs.enqueue(KIND_PHOTOS, current_user_id, public_ids, album_id=album_id)
+
     img_url = target_photo.get("image_url")
     if img_url:
-        # Xóa trên Cloudinary
-        if "cloudinary" in img_url:
-            pid = cloud_service.get_public_id_from_url(img_url)
-            if pid:
-                cloud_service.delete_resources([pid]) # Xóa 1 cái
-        
         # Xóa dưới Local
         delete_local_file(target_photo.get("filename"))
         delete_local_file(img_url)
 
-    # 4. Xóa khỏi Database (MongoDB $pull)
-    result = album_collection.update_one(
-        {"_id": album_id},
-        {"$pull": {"photos": {"id": photo_id}}} 
-    )
+    # 4. Xóa khỏi Database ($pull hoặc xóa 1 document trong Photos)
+    await album_repo.delete_photo(album, target_photo)
 
-    return {"message": f"Đã xóa ảnh {photo_id} vĩnh viễn"}
+    # 5. Contact sheet: chỉ ghép lại sprite chứa ảnh vừa xóa, các sprite khác giữ nguyên URL
+    if album.get("contact_sheets"):
+        sheets, stale_ids = await remove_from_contact_sheets(album_id, album["contact_sheets"], [target_photo["id"]])
+        await album_repo.set_contact_sheets(album_id, sheets)
+        if stale_ids:
+            await deletion_jobs.enqueue(KIND_PHOTOS, current_user_id, stale_ids, album_id=album_id)
+    shared_album_cache.invalidate_album(album_id)
+
+    return {"message": f"Đã xóa ảnh {photo_id} vĩnh viễn", "job_id": job_id}
 
 # --- [SHARE ALBUM FEATURE] ---
 
@@ -614,26 +1131,17 @@ async def create_share_link(
     """
     Sinh ra một URL công khai cho album.
     """
-    # Tìm album
-    album = album_collection.find_one({"_id": album_id, "user_id": current_user_id})
-    if not album:
+    # Tìm album (chỉ cần share_token)
+    found, share_token = await album_repo.get_share_token(album_id, current_user_id)
+    if not found:
         raise HTTPException(404, "Album không tìm thấy")
     
     # Kiểm tra xem đã có token chưa, nếu chưa thì tạo mới
-    share_token = album.get("share_token")
     if not share_token:
         share_token = str(uuid.uuid4()) # Sinh mã ngẫu nhiên duy nhất
         
         # Cập nhật vào DB
-        album_collection.update_one(
-            {"_id": album_id},
-            {
-                "$set": {
-                    "share_token": share_token,
-                    "is_public": True
-                }
-            }
-        )
+        await album_repo.enable_share(album_id, share_token)
     
     # Trả về đường dẫn (Frontend sẽ ghép thêm domain của web vào)
     # Ví dụ Frontend sẽ hiển thị: https://my-app.com/shared/abc-xyz-123
@@ -653,16 +1161,10 @@ async def revoke_share_link(
     """
     Hủy bỏ link chia sẻ. Người ngoài sẽ không xem được nữa.
     """
-    result = album_collection.update_one(
-        {"_id": album_id, "user_id": current_user_id},
-        {
-            "$unset": {"share_token": ""}, # Xóa trường token
-            "$set": {"is_public": False}
-        }
-    )
-    
-    if result.matched_count == 0:
+    # Xóa trường token, is_public = False
+    if not await album_repo.revoke_share(album_id, current_user_id):
         raise HTTPException(404, "Album không tìm thấy")
+    shared_album_cache.invalidate_album(album_id)
         
     return {"message": "Đã tắt tính năng chia sẻ cho album này"}
 
@@ -670,33 +1172,43 @@ async def revoke_share_link(
 # 3. API: XEM ALBUM CÔNG KHAI (KHÔNG CẦN LOGIN)
 # Lưu ý: Không có 'Depends(get_current_user_id)' ở đây
 @app.get("/shared-albums/{share_token}")
-async def view_shared_album(share_token: str):
+async def view_shared_album(share_token: str, request: Request = None):
     """
     API dành cho người lạ (Guest). 
     Chỉ cần có share_token là xem được ảnh.
+    Payload đã serialise được cache theo token (TTL/LRU) và trả về kèm ETag;
+    If-None-Match khớp -> 304 không body.
+    🔒 Cache chỉ giữ body: mỗi lần hit vẫn kiểm tra token còn hiệu lực trong DB,
+    nên link bị thu hồi / album bị xóa ở worker khác không còn xem được.
     """
-    # Tìm album dựa vào token và cờ is_public
-    album = album_collection.find_one({
-        "share_token": share_token,
-        "is_public": True
-    })
-    
-    if not album:
-        raise HTTPException(404, "Album không tồn tại hoặc link đã hết hạn")
-    
-    # Chuẩn hóa dữ liệu trả về (Ẩn thông tin nhạy cảm nếu cần)
-    # Ở đây ta trả về giống hệt cấu trúc Album bình thường
-    
-    # Chuyển đổi timestamp sang string nếu cần thiết cho frontend
-    photos = album.get("photos", [])
-    
-    return {
-        "title": album.get("title"),
-        "cover_photo_url": album.get("cover_photo_url"),
-        "download_zip_url": album.get("download_zip_url"),
-        "photos": photos,
-        "owner_id": album.get("user_id") # (Tùy chọn) Cho biết ai là chủ
-    }
+    entry = await shared_album_cache.get_verified(share_token, album_repo.shared_album_id)
+    if entry is None:
+        # Tìm album dựa vào token và cờ is_public
+        album = await album_repo.find_shared(share_token)
+        
+        if not album:
+            raise HTTPException(404, "Album không tồn tại hoặc link đã hết hạn")
+        
+        # Chuẩn hóa dữ liệu trả về (Ẩn thông tin nhạy cảm nếu cần)
+        # Ở đây ta trả về giống hệt cấu trúc Album bình thường
+        photos = await album_repo.get_photos(album)
+        
+        body = dumps({
+            "title": album.get("title"),
+            "cover_photo_url": album.get("cover_photo_url"),
+            "download_zip_url": album.get("download_zip_url"),
+            "photos": photos,
+            "contact_sheets": offset_map(album.get("contact_sheets")) or None,
+            "owner_id": album.get("user_id") # (Tùy chọn) Cho biết ai là chủ
+        })
+        entry = shared_album_cache.put(share_token, album["_id"], body)
+
+    # no-cache: trình duyệt luôn hỏi lại, nhưng chỉ tốn 1 lượt 304
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match") if request else None
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
 
 @app.delete("/summary/{summary_id}")
 async def delete_trip_summary(
@@ -704,12 +1216,7 @@ async def delete_trip_summary(
     current_user_id: str = Depends(get_current_user_id)
 ):
     try:
-        result = summary_collection.delete_one({
-            "_id": ObjectId(summary_id),
-            "user_id": current_user_id
-        })
-
-        if result.deleted_count == 0:
+        if not await summary_repo.delete(summary_id, current_user_id):
             raise HTTPException(
                 status_code=404,
                 detail="Trip summary không tồn tại hoặc không có quyền xóa"
@@ -728,38 +1235,39 @@ async def geocode_osm(
     payload: OSMGeocodeRequest,
     current_user_id: str = Depends(get_current_user_id)
 ):
+    """
+    Proxy tới Nominatim: cache bền (SQLite), giới hạn 1 req/s cho cả process,
+    gộp các truy vấn trùng nhau, trả kết quả cũ khi OSM lỗi.
+    """
     address = payload.address.strip()
     if not address:
         raise HTTPException(400, "Address is required")
 
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        "q": address,
-        "format": "json",
-        "limit": 5,
-        "countrycodes": "vn",
-        "accept-language": "vi"
-    }
-
-    headers = {
-        # ⚠️ bắt buộc theo rule OSM
-        "User-Agent": "photo-trip-app/1.0 (contact@yourdomain.com)"
-    }
-
-    resp = requests.get(url, params=params, headers=headers, timeout=5)
-    results = resp.json()
+    try:
+        results = await geocoder.search(address)
+    except GeocoderUnavailable as e:
+        raise HTTPException(503, f"Geocoding service unavailable: {e}")
 
     if not results:
         raise HTTPException(404, "Address not found")
 
-    return [
-        {
-            "lat": float(r["lat"]),
-            "lon": float(r["lon"]),
-            "display_name": r["display_name"]
-        }
-        for r in results
-    ]
+    return results
+
+@app.get("/geocode/osm/reverse")
+async def reverse_geocode_osm(
+    lat: float,
+    lon: float,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(400, "Invalid coordinates")
+    try:
+        result = await geocoder.reverse(lat, lon)
+    except GeocoderUnavailable as e:
+        raise HTTPException(503, f"Geocoding service unavailable: {e}")
+    if not result:
+        raise HTTPException(404, "Location not found")
+    return result
 
  
 if __name__ == "__main__":
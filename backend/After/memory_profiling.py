@@ -0,0 +1,189 @@
+import glob
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from typing import List, Optional
+
+from config import (
+    MEMORY_PROFILING,
+    MEMORY_REPORT_DIR,
+    MEMORY_REPORT_TOP_N,
+    MEMORY_REPORTS_KEEP,
+    MEMORY_TRACE_FRAMES,
+)
+from logger_config import logger
+
+# Allocations made by tracemalloc itself or this module are noise in the report
+_NOISE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _mb(n_bytes: int) -> float:
+    return round(n_bytes / (1024 * 1024), 3)
+
+
+def _top_sites(snapshot, baseline, limit: int) -> List[dict]:
+    snapshot = snapshot.filter_traces(_NOISE_FILTERS)
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline.filter_traces(_NOISE_FILTERS), "lineno")
+        stats = [s for s in stats if s.size_diff > 0]
+        stats.sort(key=lambda s: s.size_diff, reverse=True)
+        return [
+            {
+                "site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                "size_mb": _mb(s.size),
+                "size_diff_mb": _mb(s.size_diff),
+                "count_diff": s.count_diff,
+            }
+            for s in stats[:limit]
+        ]
+    return [
+        {
+            "site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+            "size_mb": _mb(s.size),
+            "count": s.count,
+        }
+        for s in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+class RequestMemoryProfile:
+    """
+    Collects per-stage memory usage for one create_album request.
+
+    tracemalloc is process-wide, so numbers are only attributable to a single
+    request when requests do not overlap; run the profiling mode with low
+    concurrency (e.g. the benchmark runner with --concurrency 1).
+    """
+
+    def __init__(self, label: str, top_n: int = MEMORY_REPORT_TOP_N, report_dir: str = MEMORY_REPORT_DIR):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+        self.request_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        self.label = label
+        self.top_n = top_n
+        self.report_dir = report_dir
+        self.stages: List[dict] = []
+        self.started_at = time.time()
+        self._start_current, _ = tracemalloc.get_traced_memory()
+        self._start_snapshot = tracemalloc.take_snapshot()
+        self._last_snapshot = self._start_snapshot
+        self._last_current = self._start_current
+        self._last_time = time.perf_counter()
+        self._overall_peak = self._start_current
+        tracemalloc.reset_peak()
+
+    def checkpoint(self, stage: str):
+        """
+        Closes the stage that started at the previous checkpoint (or at
+        request start) and records its peak and retained memory.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        now = time.perf_counter()
+        self._overall_peak = max(self._overall_peak, peak)
+        self.stages.append({
+            "stage": stage,
+            "seconds": round(now - self._last_time, 4),
+            "peak_mb": _mb(peak),
+            "peak_over_start_mb": _mb(max(0, peak - self._last_current)),
+            "retained_mb": _mb(current - self._last_current),
+            "top_sites": _top_sites(snapshot, self._last_snapshot, self.top_n),
+        })
+        self._last_snapshot = snapshot
+        self._last_current = current
+        self._last_time = time.perf_counter()
+        tracemalloc.reset_peak()
+
+    def finish(self, **extra) -> dict:
+        current, _ = tracemalloc.get_traced_memory()
+        final_snapshot = tracemalloc.take_snapshot()
+        report = {
+            "request_id": self.request_id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "peak_mb": _mb(self._overall_peak),
+            "retained_mb": _mb(current - self._start_current),
+            "stages": self.stages,
+            "top_retained_sites": _top_sites(final_snapshot, self._start_snapshot, self.top_n),
+            **extra,
+        }
+        save_report(report, self.report_dir)
+        # Drop references to the snapshots; they can be large
+        self._start_snapshot = self._last_snapshot = None
+        return report
+
+
+class _NullProfile:
+    """Used when profiling is disabled: every stage is a no-op."""
+
+    request_id = None
+
+    def checkpoint(self, stage: str):
+        pass
+
+    def finish(self, **extra) -> Optional[dict]:
+        return None
+
+
+def start_profile(label: str, enabled: Optional[bool] = None):
+    if enabled is None:
+        enabled = MEMORY_PROFILING
+    if not enabled:
+        return _NullProfile()
+    try:
+        return RequestMemoryProfile(label)
+    except Exception as e:
+        logger.warning(f"Memory profiling disabled for this request: {e}")
+        return _NullProfile()
+
+
+def save_report(report: dict, report_dir: str = MEMORY_REPORT_DIR):
+    try:
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{report['request_id']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        _prune_reports(report_dir)
+        logger.info(f"🧠 Memory report saved: {path} (peak {report['peak_mb']} MB)")
+    except Exception as e:
+        logger.warning(f"Failed to save memory report: {e}")
+
+
+def _report_paths(report_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(report_dir, "*.json")), key=os.path.getmtime, reverse=True)
+
+
+def _prune_reports(report_dir: str):
+    for old in _report_paths(report_dir)[MEMORY_REPORTS_KEEP:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+
+def load_latest_reports(limit: int = 5, report_dir: str = MEMORY_REPORT_DIR) -> List[dict]:
+    reports = []
+    for path in _report_paths(report_dir)[:limit]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except Exception as e:
+            logger.warning(f"Unreadable memory report {path}: {e}")
+    return reports
+
+
+def load_report(request_id: str, report_dir: str = MEMORY_REPORT_DIR) -> Optional[dict]:
+    safe_id = os.path.basename(request_id)
+    path = os.path.join(report_dir, f"{safe_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
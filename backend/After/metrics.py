@@ -0,0 +1,301 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Tiny in-process metrics collector.
+# Renders the Prometheus text exposition format for /metrics, and a JSON
+# snapshot for local use, so no Prometheus server or client library is needed.
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[k]) for k in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {",".join(k) or "": v for k, v in self._values.items()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class _HistogramState:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * n_buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = _HistogramState(len(self.buckets) + 1)
+            state.counts[idx] += 1
+            state.sum += value
+            state.count += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        bounds = self.buckets + (float("inf"),)
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(bounds, state.counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state.sum)}")
+                lines.append(f"{self.name}_count{labels} {state.count}")
+        return lines
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                ",".join(k) or "": {
+                    "count": s.count,
+                    "sum": round(s.sum, 6),
+                    "avg": round(s.sum / s.count, 6) if s.count else 0.0,
+                }
+                for k, s in self._values.items()
+            }
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, fn: Callable[[], None]):
+        """Callback run before each scrape (e.g. to refresh gauges)."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def _collect(self):
+        for fn in list(self._collectors):
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def render(self) -> str:
+        self._collect()
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        self._collect()
+        return {name: m.snapshot() for name, m in list(self._metrics.items())}
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ---------------------------------------------------------
+# After pipeline metrics
+# ---------------------------------------------------------
+STAGE_LATENCY = histogram(
+    "album_stage_duration_seconds",
+    "Time spent in each create_album pipeline stage",
+    ("stage",),
+)
+PHOTOS_PROCESSED = counter(
+    "album_photos_processed_total",
+    "Photos that went through the create_album pipeline",
+)
+PHOTOS_REJECTED = counter(
+    "album_photos_rejected_total",
+    "Photos rejected by the filters, by reason",
+    ("reason",),
+)
+CACHE_REQUESTS = counter(
+    "album_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ("cache", "result"),
+)
+EXECUTOR_QUEUE_DEPTH = gauge(
+    "album_executor_queue_depth",
+    "Jobs waiting for a worker, per executor pool",
+    ("pool",),
+)
+EXECUTOR_ACTIVE = gauge(
+    "album_executor_active_jobs",
+    "Jobs currently running, per executor pool",
+    ("pool",),
+)
+EXECUTOR_UTILISATION = gauge(
+    "album_executor_utilisation_ratio",
+    "Busy worker-seconds / available worker-seconds since pool start",
+    ("pool",),
+)
+REQUESTS_IN_FLIGHT = gauge(
+    "album_http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Records the duration of a create_album stage. Usable in sync and async code."""
+    with STAGE_LATENCY.time(stage=stage):
+        yield
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_rates() -> Dict[str, float]:
+    totals: Dict[str, List[float]] = {}
+    for key, value in CACHE_REQUESTS.snapshot().items():
+        cache, result = key.split(",")
+        hits_misses = totals.setdefault(cache, [0.0, 0.0])
+        hits_misses[0 if result == "hit" else 1] += value
+    return {
+        cache: round(h / (h + m), 4) if (h + m) else 0.0
+        for cache, (h, m) in totals.items()
+    }
+
+
+def rejection_reason_label(reason: str) -> str:
+    """'Glare Detected (42%)' -> 'Glare Detected' to keep label cardinality bounded."""
+    return (reason or "Unknown").split(" (")[0].strip() or "Unknown"
+
+
+def _collect_executor_stats():
+    from executors import pool_stats
+
+    for pool, stats in pool_stats().items():
+        EXECUTOR_QUEUE_DEPTH.set(stats["queued"], pool=pool)
+        EXECUTOR_ACTIVE.set(stats["active"], pool=pool)
+        EXECUTOR_UTILISATION.set(stats["utilisation"], pool=pool)
+
+
+REGISTRY.add_collector(_collect_executor_stats)
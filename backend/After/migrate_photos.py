@@ -0,0 +1,83 @@
+"""
+Online migration: embedded album photo arrays -> Photos collection.
+
+Safe to run while the service is up (reads handle both layouts, see
+AlbumRepository.migrate_album) and safe to re-run: it resumes from the
+albums that still have the legacy layout.
+
+Usage (from the After/ directory):
+    python migrate_photos.py --batch-size 200 --pause 0.5
+    python migrate_photos.py --dry-run
+"""
+
+import argparse
+import time
+
+from album_repository import AlbumRepository, STORAGE_COLLECTION
+from logger_config import logger
+
+# Albums still using the embedded layout
+PENDING_QUERY = {"photo_storage": {"$ne": STORAGE_COLLECTION}, "photos": {"$exists": True}}
+
+
+def migrate(repo: AlbumRepository, batch_size: int = 200, pause: float = 0.0,
+            max_albums: int = 0, keep_embedded: bool = False, dry_run: bool = False) -> dict:
+    stats = {"albums": 0, "photos": 0, "skipped": 0, "failed": 0, "batches": 0}
+    last_id = None
+
+    while True:
+        query = dict(PENDING_QUERY)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = [d["_id"] for d in repo.albums.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+        if not batch:
+            break
+        stats["batches"] += 1
+
+        for album_id in batch:
+            last_id = album_id
+            if dry_run:
+                stats["albums"] += 1
+                continue
+            try:
+                moved = repo.migrate_album(album_id, keep_embedded=keep_embedded)
+            except Exception as e:
+                logger.error(f"❌ Migration failed for album {album_id}: {e}")
+                stats["failed"] += 1
+                continue
+            if moved is None:
+                stats["skipped"] += 1
+            else:
+                stats["albums"] += 1
+                stats["photos"] += moved
+            if max_albums and stats["albums"] >= max_albums:
+                return stats
+
+        logger.info(f"📦 Batch {stats['batches']}: {stats['albums']} albums / {stats['photos']} photos migrated")
+        if pause:
+            time.sleep(pause)   # leave headroom for live traffic
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move embedded album photos to the Photos collection")
+    parser.add_argument("--batch-size", type=int, default=200, help="albums per batch")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--max-albums", type=int, default=0, help="stop after N albums (0 = all)")
+    parser.add_argument("--keep-embedded", action="store_true",
+                        help="leave the old photos array in place (rollback safety; it is no longer read)")
+    parser.add_argument("--dry-run", action="store_true", help="only count pending albums")
+    args = parser.parse_args(argv)
+
+    from db import album_collection, photo_collection
+
+    repo = AlbumRepository(album_collection, photo_collection, storage=STORAGE_COLLECTION)
+    repo.ensure_indexes()
+    start = time.perf_counter()
+    stats = migrate(repo, args.batch_size, args.pause, args.max_albums, args.keep_embedded, args.dry_run)
+    logger.info(f"✅ Done in {time.perf_counter() - start:.1f}s: {stats}")
+
+
+if __name__ == "__main__":
+    main()
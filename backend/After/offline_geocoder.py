@@ -0,0 +1,148 @@
+import csv
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import (
+    PLACE_TABLE_PATH, PLACE_POI_RADIUS_KM, PLACE_DISTRICT_RADIUS_KM, PLACE_PROVINCE_RADIUS_KM,
+)
+from logger_config import logger
+
+EARTH_RADIUS_KM = 6371.0088
+
+KIND_POI = "poi"
+KIND_DISTRICT = "district"
+KIND_PROVINCE = "province"
+# Most specific first: a centroid near a POI is named after it, otherwise its district, otherwise its province
+KIND_ORDER = (KIND_POI, KIND_DISTRICT, KIND_PROVINCE)
+
+TITLE_SEPARATOR = " · "
+
+# Catch-all albums are not one trip stop, so they keep their plain title
+NO_PLACE_METHODS = {"cleanup_collection", "gps_hdbscan_noise", "no_metadata_fallback", "filters_rejected"}
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    kind: str
+    province: str
+    lat: float
+    lon: float
+    landmark_id: Optional[int] = None   # Before service destination id, when the POI is one of them
+
+    @property
+    def label(self) -> str:
+        if self.kind == KIND_DISTRICT and self.name != self.province:
+            return f"{self.name}, {self.province}"
+        return self.name
+
+
+@dataclass(frozen=True)
+class PlaceMatch:
+    place: Place
+    distance_km: float
+
+    @property
+    def label(self) -> str:
+        return self.place.label
+
+
+def load_place_table(path: str = PLACE_TABLE_PATH) -> List[Place]:
+    places = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            landmark_id = (row.get("landmark_id") or "").strip()
+            places.append(Place(
+                name=row["name"].strip(),
+                kind=row["kind"].strip(),
+                province=row["province"].strip(),
+                lat=float(row["lat"]),
+                lon=float(row["lon"]),
+                landmark_id=int(landmark_id) if landmark_id else None,
+            ))
+    return places
+
+
+def album_centroid(points: Iterable[Tuple[Optional[float], Optional[float]]]) -> Optional[Tuple[float, float]]:
+    """Mean (lat, lon) of the photos that have GPS; None if none do. Fine at Vietnam's scale (no antimeridian)."""
+    coords = [(lat, lon) for lat, lon in points if lat is not None and lon is not None]
+    if not coords:
+        return None
+    arr = np.asarray(coords, dtype=np.float64)
+    return float(arr[:, 0].mean()), float(arr[:, 1].mean())
+
+
+def place_title(time_title: str, label: Optional[str]) -> str:
+    """'Hồ Hoàn Kiếm · 2025-02-17 14:30'; unchanged when no place was found."""
+    return f"{label}{TITLE_SEPARATOR}{time_title}" if label else time_title
+
+
+class OfflineReverseGeocoder:
+    """
+    Reverse geocoding without the network: the place table is split by kind
+    into haversine BallTrees, and a batch of album centroids costs one tree
+    query per kind. Built once at startup (load()), read-only afterwards.
+    """
+
+    def __init__(self, places: Optional[List[Place]] = None, path: str = PLACE_TABLE_PATH,
+                 radii_km: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.radii_km = radii_km or {
+            KIND_POI: PLACE_POI_RADIUS_KM,
+            KIND_DISTRICT: PLACE_DISTRICT_RADIUS_KM,
+            KIND_PROVINCE: PLACE_PROVINCE_RADIUS_KM,
+        }
+        self._places = places
+        self._trees: Optional[Dict[str, Tuple["BallTree", List[Place]]]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> "OfflineReverseGeocoder":
+        with self._lock:
+            if self._trees is not None:
+                return self
+            from sklearn.neighbors import BallTree     # sklearn costs ~1.5 s to import; only load() needs it
+
+            source = "memory" if self._places is not None else self.path
+            places = self._places if self._places is not None else load_place_table(self.path)
+            trees = {}
+            for kind in KIND_ORDER:
+                members = [p for p in places if p.kind == kind]
+                if members:
+                    coords = np.radians([[p.lat, p.lon] for p in members])
+                    trees[kind] = (BallTree(coords, metric="haversine"), members)
+            self._places = places
+            self._trees = trees
+            logger.info(f"🗺️ Offline geocoder loaded {len(places)} places from {source}")
+        return self
+
+    def __len__(self) -> int:
+        return len(self._places or [])
+
+    def resolve_many(self, centroids: Sequence[Optional[Tuple[float, float]]]) -> List[Optional[PlaceMatch]]:
+        """Names each (lat, lon); None entries and points too far from every place resolve to None."""
+        if self._trees is None:
+            self.load()
+        results: List[Optional[PlaceMatch]] = [None] * len(centroids)
+        pending = np.array([i for i, c in enumerate(centroids) if c is not None], dtype=np.intp)
+        if pending.size == 0:
+            return results
+        queries = np.radians(np.asarray([centroids[i] for i in pending], dtype=np.float64))
+
+        for kind in KIND_ORDER:
+            if pending.size == 0 or kind not in self._trees:
+                continue
+            tree, members = self._trees[kind]
+            dist, idx = tree.query(queries, k=1)
+            dist_km = dist[:, 0] * EARTH_RADIUS_KM
+            hit = dist_km <= self.radii_km[kind]
+            for row in np.flatnonzero(hit):
+                results[pending[row]] = PlaceMatch(members[idx[row, 0]], float(dist_km[row]))
+            pending = pending[~hit]
+            queries = queries[~hit]
+        return results
+
+    def resolve(self, lat: float, lon: float) -> Optional[PlaceMatch]:
+        return self.resolve_many([(lat, lon)])[0]
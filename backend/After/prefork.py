@@ -0,0 +1,38 @@
+import gc
+
+from executors import configure_thread_budget
+from logger_config import logger
+
+
+def preload_shared_state(place_index, warmup):
+    """
+    Runs once in the gunicorn master (preload_app) before any worker is forked.
+
+    Shares what is fork-safe: the framework imports (TensorFlow / tf_keras,
+    MediaPipe, OpenCV, sklearn, hdbscan), the native thread settings and the
+    offline place index. The junk model and MediaPipe graphs are NOT built
+    here: both start native thread pools when a model is created, and a
+    forked worker inherits their locks without the threads and hangs on its
+    first call (reproduced with tf_keras 2.17 / mediapipe 0.10). Workers
+    build them in their own warm-up, which is now the only slow step.
+    """
+    with warmup.step("prefork_imports"):
+        import cv2
+        import mediapipe
+        import tf_keras.models
+        import tf_keras.preprocessing.image
+        from clustering.algorithms import warm_up as warm_up_clustering
+        warm_up_clustering()
+    with warmup.step("prefork_thread_budget"):
+        configure_thread_budget()    # TF accepts this until its runtime starts, which is after the fork
+    with warmup.step("prefork_place_index"):
+        place_index.load()
+
+
+def freeze():
+    """
+    Moves every object tracked so far into the permanent generation, so
+    collections in the workers never write to (and un-share) their pages.
+    """
+    gc.freeze()
+    logger.info(f"🧊 gc.freeze(): {gc.get_freeze_count()} objects shared with workers")
@@ -0,0 +1,236 @@
+"""
+Pub/sub backends that carry WebSocket pushes between workers.
+
+ConnectionManager publishes every message on the user's channel and only
+delivers to its own sockets from the subscription, so all workers behave
+the same whichever one produced the message.
+
+    memory  - InMemoryPubSub, single process (uvicorn --workers 1, tests)
+    socket  - SocketPubSub: each worker keeps one TCP connection to a
+              SocketBroker that echoes every frame to all connected workers.
+              A stand-in for Redis pub/sub with no extra dependency; run it
+              next to gunicorn with `python pubsub.py`.
+
+Frames on the wire are newline-delimited JSON: {"c": channel, "m": message}.
+"""
+import argparse
+import asyncio
+import json
+from typing import Callable, Optional, Set
+
+from config import PUBSUB_BACKEND, PUBSUB_BROKER_HOST, PUBSUB_BROKER_PORT
+from logger_config import logger
+from metrics import counter
+
+PUBSUB_MESSAGES = counter(
+    "pubsub_messages_total",
+    "Messages through the WebSocket pub/sub backend, by direction (published/received/local_fallback)",
+    ("direction",),
+)
+
+Handler = Callable[[str, dict], None]
+
+BROKER_MAX_BUFFER = 4 * 1024 * 1024    # a worker this far behind is disconnected by the broker
+FRAME_LIMIT = 16 * 1024 * 1024
+
+
+def encode_frame(channel: str, message: dict) -> bytes:
+    return json.dumps({"c": channel, "m": message}, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def decode_frame(line: bytes):
+    frame = json.loads(line)
+    return frame["c"], frame["m"]
+
+
+class PubSubBackend:
+    """start(handler) subscribes to every channel; publish() reaches the handler of every worker."""
+
+    async def start(self, handler: Handler):
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: dict):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class InMemoryPubSub(PubSubBackend):
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def publish(self, channel: str, message: dict):
+        PUBSUB_MESSAGES.inc(direction="published")
+        if self._handler is not None:
+            PUBSUB_MESSAGES.inc(direction="received")
+            self._handler(channel, message)
+
+    async def stop(self):
+        self._handler = None
+
+
+class SocketBroker:
+    """Fans every frame a worker sends out to all connected workers, the sender included."""
+
+    def __init__(self, host: str = PUBSUB_BROKER_HOST, port: int = PUBSUB_BROKER_PORT):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, limit=FRAME_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"📡 Pub/sub broker listening on {self.host}:{self.port}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for client in list(self._clients):
+                    if client.transport.get_write_buffer_size() > BROKER_MAX_BUFFER:
+                        logger.warning("⚠️ Pub/sub broker: dropping a worker that stopped reading")
+                        self._clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for client in list(self._clients):
+                client.close()
+            self._clients.clear()
+            await self._server.wait_closed()
+            self._server = None
+
+
+class SocketPubSub(PubSubBackend):
+    """
+    Worker side of SocketBroker. Reconnects with backoff if the broker goes
+    away; while disconnected, publish() delivers to this worker's own
+    sockets so single-worker users keep getting their pushes.
+    """
+
+    def __init__(self, host: str = PUBSUB_BROKER_HOST, port: int = PUBSUB_BROKER_PORT,
+                 reconnect_delay: float = 0.5, max_reconnect_delay: float = 5.0):
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._handler: Optional[Handler] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self.connected = asyncio.Event()
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=FRAME_LIMIT)
+            except OSError as e:
+                logger.warning(f"⚠️ Pub/sub broker {self.host}:{self.port} unreachable ({e}), retry in {delay:.1f} s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            delay = self.reconnect_delay
+            self._writer = writer
+            self.connected.set()
+            logger.info(f"📡 Connected to pub/sub broker {self.host}:{self.port}")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._dispatch(line)
+            except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                pass
+            finally:
+                self.connected.clear()
+                self._writer = None
+                writer.close()
+            logger.warning("⚠️ Lost pub/sub broker connection, reconnecting")
+
+    def _dispatch(self, line: bytes):
+        try:
+            channel, message = decode_frame(line)
+        except (ValueError, KeyError) as e:
+            logger.error(f"❌ Bad pub/sub frame: {e}")
+            return
+        PUBSUB_MESSAGES.inc(direction="received")
+        if self._handler is not None:
+            self._handler(channel, message)
+
+    async def publish(self, channel: str, message: dict):
+        frame = encode_frame(channel, message)
+        writer = self._writer
+        if writer is not None:
+            try:
+                writer.write(frame)
+                await writer.drain()
+                PUBSUB_MESSAGES.inc(direction="published")
+                return
+            except ConnectionError as e:
+                logger.warning(f"⚠️ Pub/sub publish failed: {e}")
+        PUBSUB_MESSAGES.inc(direction="local_fallback")
+        if self._handler is not None:
+            self._handler(channel, message)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._handler = None
+
+
+def make_pubsub(kind: str = PUBSUB_BACKEND) -> PubSubBackend:
+    if kind == "memory":
+        return InMemoryPubSub()
+    if kind == "socket":
+        return SocketPubSub()
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {kind!r} (expected memory or socket)")
+
+
+async def _serve_forever(host: str, port: int):
+    broker = SocketBroker(host, port)
+    await broker.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await broker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pub/sub broker for multi-worker WebSocket pushes")
+    parser.add_argument("--host", default=PUBSUB_BROKER_HOST)
+    parser.add_argument("--port", type=int, default=PUBSUB_BROKER_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import RENDITION_SIZES, RENDITION_FORMATS, RENDITION_QUALITY, BLURHASH_COMPONENTS
+from logger_config import logger
+
+RENDITIONS_URL_PREFIX = "/renditions"
+
+# Keys of generate()'s result that are stored on PhotoInput / PhotoOutput
+PHOTO_FIELDS = ("width", "height", "blurhash", "renditions")
+
+# Per-format encoder settings: WebP method 2 / AVIF speed 8 cost a few % of size but encode
+# 2-4x faster than the defaults, which matters on the upload path
+_SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "method": 2},
+    "avif": {"format": "AVIF", "speed": 8},
+    "jpeg": {"format": "JPEG", "optimize": True, "progressive": True},
+}
+
+# EXIF Orientation -> transpose(s) that make the pixels upright
+_ORIENTATION = {
+    2: [Image.Transpose.FLIP_LEFT_RIGHT],
+    3: [Image.Transpose.ROTATE_180],
+    4: [Image.Transpose.FLIP_TOP_BOTTOM],
+    5: [Image.Transpose.TRANSPOSE],
+    6: [Image.Transpose.ROTATE_270],
+    7: [Image.Transpose.TRANSVERSE],
+    8: [Image.Transpose.ROTATE_90],
+}
+
+
+def parse_sizes(spec: str) -> Dict[str, int]:
+    """'grid:256,preview:1024' -> {'grid': 256, 'preview': 1024}"""
+    sizes = {}
+    for part in spec.split(","):
+        if part.strip():
+            name, edge = part.split(":")
+            sizes[name.strip()] = int(edge)
+    return sizes
+
+
+def parse_formats(spec: str) -> List[str]:
+    formats = [f.strip().lower() for f in spec.split(",") if f.strip()]
+    return [f for f in formats if f in _SAVE_OPTIONS]
+
+
+def exif_orientation(img: Image.Image) -> int:
+    try:
+        return int(img.getexif().get(0x0112, 1))
+    except Exception:
+        return 1
+
+
+# ---------------------------------------------------------
+# BlurHash (https://blurha.sh) - pure numpy encoder / decoder
+# ---------------------------------------------------------
+_B83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _b83_encode(value: int, length: int) -> str:
+    return "".join(_B83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _b83_decode(text: str) -> int:
+    value = 0
+    for c in text:
+        value = value * 83 + _B83.index(c)
+    return value
+
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    v = values / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(max(value, 0.0), 1.0)
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash_encode(img: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    """BlurHash of an image; it is downscaled to 32 px first, which is all the DCT needs."""
+    small = img.convert("RGB")
+    small.thumbnail((32, 32), Image.Resampling.BOX)
+    linear = _srgb_to_linear(np.asarray(small, dtype=np.float64))
+    height, width = linear.shape[:2]
+
+    cos_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)     # (x, w)
+    cos_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)   # (y, h)
+    # factors[j, i, c] = sum over pixels of basis_ij * linear
+    factors = np.einsum("jh,iw,hwc->jic", cos_y, cos_x, linear) / (width * height)
+    factors[1:, :, :] *= 2
+    factors[0, 1:, :] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _b83_encode((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quant_max = int(max(0, min(82, math.floor(np.abs(ac).max() * 166 - 0.5))))
+        max_value = (quant_max + 1) / 166
+        result += _b83_encode(quant_max, 1)
+    else:
+        max_value = 1.0
+        result += _b83_encode(0, 1)
+    result += _b83_encode((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for r, g, b in ac:
+        q = [int(max(0, min(18, math.floor(_sign_pow(v / max_value, 0.5) * 9 + 9.5)))) for v in (r, g, b)]
+        result += _b83_encode(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
+
+
+def blurhash_decode(blurhash: str, width: int, height: int) -> np.ndarray:
+    """(height, width, 3) uint8 placeholder; what clients paint before the grid rendition arrives."""
+    size_flag = _b83_decode(blurhash[0])
+    x_components, y_components = size_flag % 9 + 1, size_flag // 9 + 1
+    max_value = (_b83_decode(blurhash[1]) + 1) / 166
+    dc = _b83_decode(blurhash[2:6])
+    colors = [_srgb_to_linear(np.array([dc >> 16, (dc >> 8) & 255, dc & 255], dtype=np.float64))]
+    for k in range(1, x_components * y_components):
+        value = _b83_decode(blurhash[4 + 2 * k:6 + 2 * k])
+        quant = (value // (19 * 19), (value // 19) % 19, value % 19)
+        colors.append(np.array([_sign_pow((q - 9) / 9, 2.0) * max_value for q in quant]))
+    colors = np.array(colors).reshape(y_components, x_components, 3)
+
+    cos_x = np.cos(np.pi * np.outer(np.arange(width), np.arange(x_components)) / width)     # (w, x)
+    cos_y = np.cos(np.pi * np.outer(np.arange(height), np.arange(y_components)) / height)   # (h, y)
+    linear = np.einsum("hj,wi,jic->hwc", cos_y, cos_x, colors)
+    return np.vectorize(_linear_to_srgb, otypes=[np.uint8])(linear)
+
+
+# ---------------------------------------------------------
+# Rendition store
+# ---------------------------------------------------------
+class RenditionStore:
+    """
+    Writes grid / preview / full renditions of a decoded photo, largest
+    first, each smaller one resized from the previous (cheap) rather than
+    from the original. Files are named by the upload's content hash plus a
+    settings fingerprint, so duplicates within root are encoded once.
+
+    root is a staging directory (create_album uses its request workspace):
+    the URLs generate() returns are handles for local_path(), and the
+    service uploads the files to Cloudinary before anything is stored.
+    """
+
+    def __init__(self, root: str, url_prefix: str = RENDITIONS_URL_PREFIX,
+                 sizes: str = RENDITION_SIZES, formats: str = RENDITION_FORMATS,
+                 quality: int = RENDITION_QUALITY, blurhash_components: str = BLURHASH_COMPONENTS):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.sizes = parse_sizes(sizes)
+        self.formats = parse_formats(formats)
+        self.quality = quality
+        x, y = blurhash_components.lower().split("x")
+        self.blurhash_components = (int(x), int(y))
+        fingerprint = json.dumps([sorted(self.sizes.items()), self.formats, quality, blurhash_components])
+        self.version = hashlib.sha1(fingerprint.encode()).hexdigest()[:6]
+
+    def _relpath(self, key: str, suffix: str) -> str:
+        return f"{key[:2]}/{key}-{self.version}{suffix}"
+
+    def _url_key(self, name: str, fmt: str) -> str:
+        # Primary format keeps the bare size name: {"grid": ..., "grid_avif": ...}
+        return name if fmt == self.formats[0] else f"{name}_{fmt}"
+
+    def local_path(self, url: Optional[str]) -> Optional[str]:
+        """File behind one of this store's rendition URLs (None for anything else)."""
+        if not url or not url.startswith(self.url_prefix + "/"):
+            return None
+        return os.path.join(self.root, url[len(self.url_prefix) + 1:])
+
+    def _load_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.root, self._relpath(key, ".json")), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        files = [os.path.join(self.root, self._relpath(key, f"-{n}.{fmt}")) for n in self.sizes for fmt in self.formats]
+        return meta if all(os.path.exists(p) for p in files) else None
+
+    def _write(self, relpath: str, save):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            save(tmp)
+            os.replace(tmp, path)    # readers never see a half-written file
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return os.path.getsize(path)
+
+    def generate(self, img: Image.Image, key: str) -> dict:
+        """
+        Returns {"width", "height", "blurhash", "renditions": {name[_fmt]: url}, "bytes": {...}}
+        for PhotoInput / PhotoOutput; {} if the image cannot be rendered.
+        """
+        if not self.formats or not self.sizes:
+            return {}
+        cached = self._load_meta(key)
+        if cached is not None:
+            return cached
+        try:
+            return self._generate(img, key)
+        except Exception as e:
+            logger.warning(f"⚠️ Rendition failed for {key}: {e}")
+            return {}
+
+    def _generate(self, img: Image.Image, key: str) -> dict:
+        orientation = exif_orientation(img)
+        current = img if img.mode == "RGB" else img.convert("RGB")
+        renditions, sizes = {}, {}
+        for i, (name, edge) in enumerate(sorted(self.sizes.items(), key=lambda kv: -kv[1])):
+            frame = current.copy()
+            # BICUBIC with a reducing gap: box-reduce by whole factors first, then resample the rest
+            frame.thumbnail((edge, edge), Image.Resampling.BICUBIC, reducing_gap=2.0)
+            if i == 0:
+                # Rotate the largest (already downscaled) frame once; smaller frames inherit it
+                for op in _ORIENTATION.get(orientation, []):
+                    frame = frame.transpose(op)
+            for fmt in self.formats:
+                relpath = self._relpath(key, f"-{name}.{fmt}")
+                options = dict(_SAVE_OPTIONS[fmt])
+                sizes[self._url_key(name, fmt)] = self._write(
+                    relpath, lambda p: frame.save(p, options.pop("format"), quality=self.quality, **options)
+                )
+                renditions[self._url_key(name, fmt)] = f"{self.url_prefix}/{relpath}"
+            current = frame
+
+        width, height = img.size
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+        meta = {
+            "width": width,
+            "height": height,
+            "blurhash": blurhash_encode(current, *self.blurhash_components),
+            "renditions": renditions,
+            "bytes": sizes,
+        }
+        self._write(self._relpath(key, ".json"), lambda p: _dump_json(meta, p))
+        return meta
+
+
+def photo_fields(meta: Optional[dict]) -> dict:
+    return {k: meta[k] for k in PHOTO_FIELDS if meta and k in meta}
+
+
+def _dump_json(data: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
@@ -13,6 +13,11 @@ class PhotoInput(BaseModel):
     is_rejected: bool = False
     rejected_reason: str = ""
     score: float = 0.0
+    # Renditions + placeholder (renditions.py), kept here so analysis-cache hits reuse them
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+    renditions: Optional[Dict[str, str]] = None
 
 # --- OUTPUT MODEL (Dữ liệu trả về cho client) ---
 class PhotoOutput(BaseModel):
@@ -23,6 +28,12 @@ class PhotoOutput(BaseModel):
     image_url: Optional[str] = None
     lat: Optional[float] = None
     lon: Optional[float] = None
+    width: Optional[int] = None          # upright pixel size of the original
+    height: Optional[int] = None
+    blurhash: Optional[str] = None       # placeholder painted before any image loads
+    renditions: Optional[Dict[str, str]] = None   # {"grid": url, "preview": url, "full": url}
+    size: Optional[int] = None           # bytes of the uploaded original, recorded with its CRC-32
+    crc32: Optional[int] = None          # so the ZIP export lays out the archive without reading it
 
 class Album(BaseModel):
     # [QUAN TRỌNG] Sửa id và user_id thành Optional = None
@@ -38,6 +49,28 @@ class Album(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     needs_manual_location: bool = False
 
+# --- PAGINATED LISTING (/my-albums?limit=..., /albums/{id}/photos) ---
+class AlbumSummary(BaseModel):
+    id: str
+    title: str
+    method: str
+    cover_photo_url: Optional[str] = None
+    photo_count: int = 0
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    needs_manual_location: bool = False
+    is_public: bool = False
+
+class AlbumSummaryPage(BaseModel):
+    albums: List[AlbumSummary]
+    next_cursor: Optional[str] = None
+
+class PhotoPage(BaseModel):
+    photos: List[PhotoOutput]
+    next_cursor: Optional[str] = None
+    total: int
+
 # --- MODEL CHO TRIP SUMMARY ---
 class ManualLocationInput(BaseModel):
     album_id: Optional[str] = None
@@ -66,5 +99,11 @@ class TripSummaryResponse(BaseModel):
 
 class AlbumUpdateRequest(BaseModel):
     title: str
+
+# --- RE-CLUSTER PREVIEW (/albums/recluster) ---
+class ReclusterRequest(BaseModel):
+    album_ids: Optional[List[str]] = None                # None -> mọi album của user
+    dist_m: int = Field(700, ge=10, le=100000)            # bán kính gộp địa điểm (mét)
+    gap_min: int = Field(120, ge=1, le=10080)             # khoảng nghỉ tách sự kiện (phút)
 class OSMGeocodeRequest(BaseModel):
     address: str
\ No newline at end of file
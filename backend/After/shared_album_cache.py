@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from config import SHARED_ALBUM_CACHE_SIZE, SHARED_ALBUM_CACHE_TTL
+from metrics import record_cache
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    body: bytes
+    etag: str
+    album_id: str
+    expires_at: float
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag: a hash of the exact bytes served."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison (RFC 9110 13.1.2), so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class SharedAlbumCache:
+    """
+    TTL + LRU cache of serialised shared-album payloads, keyed by share_token.
+    Writers call invalidate_album() on rename / delete / photo removal / revoke.
+
+    The cache is per process, so invalidation only reaches the worker that
+    handled the write. Access is therefore never decided from the cache:
+    get_verified() re-checks the token against the repository on every hit,
+    and only the rendered body is reused.
+    """
+
+    def __init__(self, max_entries: int = SHARED_ALBUM_CACHE_SIZE, ttl_seconds: float = SHARED_ALBUM_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, CachedPayload]" = OrderedDict()
+        self._tokens_by_album: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    async def get_verified(self, token: str,
+                           shared_album_id: Callable[[str], Awaitable[Optional[str]]]) -> Optional[CachedPayload]:
+        """
+        Cached payload for token, or None. A hit counts only while
+        shared_album_id(token) still names the cached album: a link revoked
+        or deleted on another worker is dropped here instead of being served
+        until the TTL runs out.
+        """
+        entry = self._lookup(token)
+        if entry is not None and await shared_album_id(token) != entry.album_id:
+            self.invalidate_album(entry.album_id)
+            entry = None
+        record_cache("shared_album", entry is not None)
+        return entry
+
+    def _lookup(self, token: str) -> Optional[CachedPayload]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry.expires_at <= self._clock():
+                self._drop(token)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(token)
+        return entry
+
+    def put(self, token: str, album_id: str, body: bytes) -> CachedPayload:
+        entry = CachedPayload(body, make_etag(body), album_id, self._clock() + self.ttl_seconds)
+        if not self.enabled:
+            return entry
+        with self._lock:
+            self._drop(token)
+            self._entries[token] = entry
+            self._tokens_by_album.setdefault(album_id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return entry
+
+    def invalidate_album(self, album_id: str):
+        with self._lock:
+            for token in list(self._tokens_by_album.get(album_id, ())):
+                self._drop(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_album.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_album.get(entry.album_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_album[entry.album_id]
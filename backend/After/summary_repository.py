@@ -0,0 +1,29 @@
+from typing import List
+
+from bson import ObjectId
+
+from logger_config import logger
+
+
+class SummaryRepository:
+    """Trip summaries (TripSummaries collection) on the async Mongo client."""
+
+    def __init__(self, collection):
+        self.summaries = collection
+
+    async def ensure_indexes(self):
+        try:
+            await self.summaries.create_index([("user_id", 1), ("created_at", -1)], name="user_created")
+        except Exception as e:
+            logger.warning(f"Summary index creation failed: {e}")
+
+    async def insert(self, doc: dict):
+        return await self.summaries.insert_one(doc)
+
+    async def history(self, user_id: str) -> List[dict]:
+        return await self.summaries.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list()
+
+    async def delete(self, summary_id: str, user_id: str) -> bool:
+        """Raises bson.errors.InvalidId for a malformed id."""
+        result = await self.summaries.delete_one({"_id": ObjectId(summary_id), "user_id": user_id})
+        return result.deleted_count > 0
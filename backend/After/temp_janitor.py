@@ -0,0 +1,231 @@
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import (
+    PROCESSED_DIR, TEMP_TTL, TEMP_SWEEP_INTERVAL, TEMP_MAX_BYTES, TEMP_LOW_WATER, TEMP_DISK_HIGH_WATER,
+)
+from executors import get_pool, IO
+from logger_config import logger
+from metrics import counter, gauge
+
+WORKSPACE_PREFIX = "req-"
+# Present while the request that owns the workspace is running (any worker process)
+ACTIVE_MARKER = ".active"
+
+REASON_FINISHED = "finished"
+REASON_TTL = "ttl"
+REASON_HIGH_WATER = "high_water"
+REASON_MANUAL = "manual"
+
+TEMP_FILES_REMOVED = counter(
+    "temp_files_removed_total",
+    "Files removed from PROCESSED_DIR, by reason (finished/ttl/high_water/manual)",
+    ("reason",),
+)
+TEMP_BYTES_FREED = counter(
+    "temp_bytes_freed_total",
+    "Bytes freed in PROCESSED_DIR, by reason (finished/ttl/high_water/manual)",
+    ("reason",),
+)
+TEMP_DIR_BYTES = gauge("temp_dir_bytes", "Bytes in PROCESSED_DIR after the last janitor sweep")
+
+
+@dataclass
+class TempEntry:
+    """A top-level item of PROCESSED_DIR: a request workspace or a loose (legacy) file."""
+    path: str
+    mtime: float
+    size: int
+    files: int
+    marked: bool = False     # has an .active marker
+    active: bool = False     # ... younger than the TTL
+
+
+def measure(path: str) -> TempEntry:
+    st = os.stat(path)
+    if not os.path.isdir(path):
+        return TempEntry(path, st.st_mtime, st.st_size, 1)
+    size = files = 0
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            if name == ACTIVE_MARKER:
+                continue
+            try:
+                size += os.stat(os.path.join(dirpath, name)).st_size
+                files += 1
+            except OSError:
+                pass
+    return TempEntry(path, st.st_mtime, size, files)
+
+
+class TempJanitor:
+    """
+    Owns PROCESSED_DIR. Every create_album request saves its uploads in its
+    own workspace (req-<hex>/) holding an .active marker until finish();
+    the marker is a file so every worker process sees it.
+
+    sweep() removes, in order:
+    - finished workspaces (marker gone, e.g. finish() could not delete them)
+    - anything whose marker / mtime is older than the TTL: requests that
+      crashed or were killed, and loose files from the old flat layout
+    - oldest-first, non-active entries while the directory is over
+      max_bytes (down to low_water * max_bytes) or its filesystem is over
+      disk_high_water
+    """
+
+    def __init__(self, root: str = PROCESSED_DIR, ttl: float = TEMP_TTL, max_bytes: int = TEMP_MAX_BYTES,
+                 low_water: float = TEMP_LOW_WATER, disk_high_water: float = TEMP_DISK_HIGH_WATER,
+                 clock=time.time, disk_usage=shutil.disk_usage):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.disk_high_water = disk_high_water
+        self._clock = clock
+        self._disk_usage = disk_usage
+        self._task: Optional[asyncio.Task] = None
+        self.last_sweep: Dict[str, object] = {}
+
+    # --- request side ---
+    def open_workspace(self) -> str:
+        name = uuid.uuid4().hex
+        staging = os.path.join(self.root, f".new-{name}")
+        path = os.path.join(self.root, f"{WORKSPACE_PREFIX}{name}")
+        os.makedirs(staging)
+        open(os.path.join(staging, ACTIVE_MARKER), "w").close()
+        os.rename(staging, path)    # a sweep never sees the workspace without its marker
+        return path
+
+    def finish(self, path: str):
+        """The request is done (successfully or not); its files are no longer needed."""
+        try:
+            os.remove(os.path.join(path, ACTIVE_MARKER))
+        except OSError:
+            pass
+        try:
+            self._remove(measure(path), REASON_FINISHED)
+        except OSError:
+            pass    # already gone, or left for the next sweep (marker removed)
+
+    # --- janitor side ---
+    def _scan(self) -> List[TempEntry]:
+        now = self._clock()
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                entry = measure(path)
+            except OSError:
+                continue    # removed meanwhile
+            try:
+                marker = os.stat(os.path.join(path, ACTIVE_MARKER))
+                entry.marked = True
+                entry.active = now - marker.st_mtime <= self.ttl
+            except OSError:
+                pass
+            entries.append(entry)
+        return entries
+
+    def _remove(self, entry: TempEntry, reason: str) -> bool:
+        try:
+            if os.path.isdir(entry.path):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"⚠️ Janitor could not remove {entry.path}: {e}")
+            return False
+        TEMP_FILES_REMOVED.inc(entry.files, reason=reason)
+        TEMP_BYTES_FREED.inc(entry.size, reason=reason)
+        return True
+
+    def _disk_over(self) -> bool:
+        try:
+            usage = self._disk_usage(self.root)
+        except OSError:
+            return False
+        return usage.total > 0 and usage.used / usage.total > self.disk_high_water
+
+    def sweep(self) -> dict:
+        now = self._clock()
+        removed: Dict[str, int] = {}
+        freed: Dict[str, int] = {}
+
+        def drop(entry: TempEntry, reason: str):
+            if self._remove(entry, reason):
+                removed[reason] = removed.get(reason, 0) + entry.files
+                freed[reason] = freed.get(reason, 0) + entry.size
+
+        kept = []
+        for entry in self._scan():
+            if entry.active:
+                kept.append(entry)
+            elif entry.marked:
+                drop(entry, REASON_TTL)         # request crashed or was killed
+            elif os.path.basename(entry.path).startswith(WORKSPACE_PREFIX):
+                drop(entry, REASON_FINISHED)
+            elif now - entry.mtime > self.ttl:
+                drop(entry, REASON_TTL)         # loose file from the old flat layout
+            else:
+                kept.append(entry)
+
+        total = sum(e.size for e in kept)
+        over_dir = total > self.max_bytes
+        if over_dir or self._disk_over():
+            target = self.max_bytes * self.low_water
+            for entry in sorted((e for e in kept if not e.active), key=lambda e: e.mtime):
+                if not ((over_dir and total > target) or self._disk_over()):
+                    break
+                drop(entry, REASON_HIGH_WATER)
+                total -= entry.size
+            if total > self.max_bytes:
+                logger.warning(f"⚠️ PROCESSED_DIR still at {total} bytes: only active requests left")
+
+        TEMP_DIR_BYTES.set(total)
+        self.last_sweep = {"at": now, "bytes": total, "files_removed": removed, "bytes_freed": freed}
+        return self.last_sweep
+
+    def purge(self) -> int:
+        """Manual /cleanup: every file not owned by a running request. Returns the file count."""
+        count = 0
+        for entry in self._scan():
+            if not entry.active and self._remove(entry, REASON_MANUAL):
+                count += entry.files
+        return count
+
+    def stats(self) -> dict:
+        return dict(self.last_sweep)
+
+    # --- background task (started from the app lifespan) ---
+    async def _worker(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(get_pool(IO), self.sweep)
+            except Exception as e:
+                logger.error(f"Temp janitor error: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = TEMP_SWEEP_INTERVAL):
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
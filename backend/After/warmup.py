@@ -0,0 +1,120 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from executors import get_pool, IO
+from logger_config import logger
+from metrics import gauge
+
+STARTUP_STEP_SECONDS = gauge(
+    "startup_step_seconds",
+    "Duration of each startup / warm-up step of this process",
+    ("step",),
+)
+
+
+@dataclass
+class WarmUpStep:
+    name: str
+    fn: Callable[[], object]
+    pool: str = IO
+    after: Optional[str] = None    # name of a step that must finish first
+    required: bool = False         # the service cannot work if this step fails
+
+
+class WarmUp:
+    """
+    Startup of the After service in two parts:
+    - cheap steps run inline in the lifespan, timed with step()
+    - heavy ones (TensorFlow model, MediaPipe, sklearn/hdbscan) are add()ed
+      and run in the background on the executor pools, concurrently unless
+      one names another in `after`
+
+    The process serves /health at once; /ready is 503 until every background
+    step has finished. A failing step is logged and reported but does not
+    keep the service unready, since most components degrade on their own;
+    a step added with required=True that fails keeps /ready at 503.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._started = clock()
+        self._steps: List[WarmUpStep] = []
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._done: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.ready_after: Optional[float] = None
+
+    def _record(self, name: str, seconds: float):
+        self.timings[name] = seconds
+        STARTUP_STEP_SECONDS.set(seconds, step=name)
+        logger.info(f"⏱️ Startup step {name}: {seconds * 1000:.0f} ms")
+
+    @contextmanager
+    def step(self, name: str):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self._record(name, self._clock() - start)
+
+    def add(self, name: str, fn: Callable[[], object], pool: str = IO, after: Optional[str] = None,
+            required: bool = False):
+        self._steps.append(WarmUpStep(name, fn, pool, after, required))
+
+    async def _run_step(self, step: WarmUpStep, finished: Dict[str, asyncio.Event]):
+        if step.after:
+            await finished[step.after].wait()
+        start = self._clock()
+        try:
+            await asyncio.get_running_loop().run_in_executor(get_pool(step.pool), step.fn)
+        except Exception as e:
+            self.errors[step.name] = str(e)
+            logger.error(f"❌ Warm-up step {step.name} failed: {e}")
+        finally:
+            self._record(step.name, self._clock() - start)
+            finished[step.name].set()
+
+    async def _run(self):
+        finished = {s.name: asyncio.Event() for s in self._steps}
+        await asyncio.gather(*(self._run_step(s, finished) for s in self._steps))
+        self.ready_after = self._clock() - self._started
+        logger.info(f"✅ Warm-up complete, ready {self.ready_after:.1f} s after start")
+        self._done.set()
+
+    def start(self):
+        if self._task is None:
+            self._done = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def ready(self) -> bool:
+        if self._done is None or not self._done.is_set():
+            return False
+        return not any(s.required and s.name in self.errors for s in self._steps)
+
+    async def wait(self):
+        """Blocks requests that need the warmed-up components; no-op if warm-up never started."""
+        if self._done is not None:
+            await self._done.wait()
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "pending": [s.name for s in self._steps if s.name not in self.timings],
+            "steps_ms": {name: round(sec * 1000, 1) for name, sec in self.timings.items()},
+            "errors": dict(self.errors),
+            "ready_after_s": round(self.ready_after, 2) if self.ready_after is not None else None,
+        }
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
@@ -0,0 +1,423 @@
+import bisect
+import hashlib
+import os
+import re
+import struct
+import threading
+import unicodedata
+import zipfile
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from config import PROCESSED_DIR, ZIP_READ_CHUNK_SIZE, ZIP_FETCH_TIMEOUT
+from logger_config import logger
+
+DOS_EPOCH = (1980, 1, 1, 0, 0, 0)
+DATA_DESCRIPTOR = 0x08            # general purpose flag bit 3: CRC and sizes follow the member data
+DATA_DESCRIPTOR_SIGNATURE = 0x08074b50
+
+
+class MemberUnavailable(Exception):
+    """A photo could not be read from its source."""
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+# ---------------------------------------------------------
+# Member sources
+# ---------------------------------------------------------
+class LocalFileSource:
+    """Photos still in the local processed cache (PROCESSED_DIR), referenced by path relative to it."""
+
+    def __init__(self, root: str = PROCESSED_DIR, chunk_size: int = ZIP_READ_CHUNK_SIZE):
+        self.root = os.path.realpath(root)
+        self.chunk_size = chunk_size
+
+    def path(self, ref: str) -> str:
+        path = os.path.realpath(os.path.join(self.root, ref))
+        if os.path.commonpath([path, self.root]) != self.root or path == self.root:
+            raise MemberUnavailable(f"{ref} is outside the local cache")
+        return path
+
+    def exists(self, ref: str) -> bool:
+        try:
+            return os.path.isfile(self.path(ref))
+        except MemberUnavailable:
+            return False
+
+    def read(self, ref: str, offset: int, length: int) -> Iterator[bytes]:
+        try:
+            with open(self.path(ref), "rb") as f:
+                f.seek(offset)
+                while length > 0:
+                    chunk = f.read(min(self.chunk_size, length))
+                    if not chunk:
+                        raise MemberUnavailable(f"{ref} is shorter than expected")
+                    length -= len(chunk)
+                    yield chunk
+        except OSError as e:
+            raise MemberUnavailable(str(e)) from e
+
+    def read_all(self, ref: str) -> Iterator[bytes]:
+        try:
+            with open(self.path(ref), "rb") as f:
+                while chunk := f.read(self.chunk_size):
+                    yield chunk
+        except OSError as e:
+            raise MemberUnavailable(str(e)) from e
+
+
+class HttpSource:
+    """
+    Storage stand-in: members fetched over HTTP (Cloudinary delivery URLs),
+    referenced by URL. Reads use Range requests so a resumed download only
+    pulls the bytes it still needs.
+    """
+
+    def __init__(self, client: Optional[httpx.Client] = None, timeout: float = ZIP_FETCH_TIMEOUT,
+                 chunk_size: int = ZIP_READ_CHUNK_SIZE):
+        self._client = client
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, follow_redirects=True)
+            return self._client
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def read(self, url: str, offset: int, length: int) -> Iterator[bytes]:
+        if length <= 0:
+            return
+        headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+        try:
+            with self.client.stream("GET", url, headers=headers) as resp:
+                resp.raise_for_status()
+                skip = offset if resp.status_code == 200 else 0   # server ignored Range
+                for chunk in resp.iter_bytes(self.chunk_size):
+                    if skip:
+                        if len(chunk) <= skip:
+                            skip -= len(chunk)
+                            continue
+                        chunk, skip = chunk[skip:], 0
+                    chunk = chunk[:length]
+                    length -= len(chunk)
+                    yield chunk
+                    if length == 0:
+                        return
+        except httpx.HTTPError as e:
+            raise MemberUnavailable(f"{url}: {e}") from e
+        if length:
+            raise MemberUnavailable(f"{url} is shorter than expected")
+
+    def read_all(self, url: str) -> Iterator[bytes]:
+        try:
+            with self.client.stream("GET", url) as resp:
+                resp.raise_for_status()
+                yield from resp.iter_bytes(self.chunk_size)
+        except httpx.HTTPError as e:
+            raise MemberUnavailable(f"{url}: {e}") from e
+
+
+# ---------------------------------------------------------
+# Archive layout
+# ---------------------------------------------------------
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    source: Any          # LocalFileSource / HttpSource / anything with read() and read_all()
+    ref: Any
+    size: Optional[int]  # size / crc32 recorded at upload; None -> data descriptor entry
+    crc32: Optional[int]
+    date_time: Tuple[int, int, int, int, int, int] = DOS_EPOCH
+
+    @property
+    def known(self) -> bool:
+        return self.size is not None and self.crc32 is not None
+
+
+def _zipinfo(entry: ZipEntry) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(entry.name, entry.date_time)
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    if entry.known:
+        info.file_size = info.compress_size = entry.size
+        info.CRC = entry.crc32
+    else:
+        info.flag_bits |= DATA_DESCRIPTOR     # FileHeader() then writes zero CRC / sizes
+    return info
+
+
+def _central_record(info: zipfile.ZipInfo, header_offset: int) -> bytes:
+    """Central directory entry, laid out exactly as ZipFile writes it (zip64 extra when needed)."""
+    dt = info.date_time
+    dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+    dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+    zip64 = []
+    file_size = compress_size = info.file_size
+    if info.file_size > zipfile.ZIP64_LIMIT:
+        zip64 += [info.file_size, info.compress_size]
+        file_size = compress_size = 0xFFFFFFFF
+    if header_offset > zipfile.ZIP64_LIMIT:
+        zip64.append(header_offset)
+        header_offset = 0xFFFFFFFF
+    extra = b""
+    min_version = 0
+    if zip64:
+        extra = struct.pack("<HH" + "Q" * len(zip64), 1, 8 * len(zip64), *zip64)
+        min_version = zipfile.ZIP64_VERSION
+    try:
+        filename, flag_bits = info.filename.encode("ascii"), info.flag_bits
+    except UnicodeEncodeError:
+        filename, flag_bits = info.filename.encode("utf-8"), info.flag_bits | 0x800
+    record = struct.pack(
+        zipfile.structCentralDir, zipfile.stringCentralDir,
+        max(min_version, info.create_version), info.create_system,
+        max(min_version, info.extract_version), info.reserved, flag_bits,
+        info.compress_type, dostime, dosdate, info.CRC, compress_size, file_size,
+        len(filename), len(extra), 0, 0, info.internal_attr, info.external_attr, header_offset,
+    )
+    return record + filename + extra
+
+
+def _end_records(count: int, cd_offset: int, cd_size: int) -> bytes:
+    out = b""
+    if count > zipfile.ZIP_FILECOUNT_LIMIT or cd_offset > zipfile.ZIP64_LIMIT or cd_size > zipfile.ZIP64_LIMIT:
+        out += struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64,
+                           44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+        out += struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator,
+                           0, cd_offset + cd_size, 1)
+        count = min(count, 0xFFFF)
+        cd_size = min(cd_size, 0xFFFFFFFF)
+        cd_offset = min(cd_offset, 0xFFFFFFFF)
+    return out + struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive,
+                             0, 0, count, count, cd_size, cd_offset, 0)
+
+
+class StreamedZip:
+    """
+    A stored-mode (uncompressed) ZIP whose member bytes are read from their
+    source only while streaming.
+
+    When every member's size and CRC are known, the byte layout is fixed up
+    front: headers are built in memory, which gives an exact Content-Length
+    and lets any byte range be served without producing the bytes before
+    it. Otherwise members without them are written with a data descriptor
+    (CRC and sizes after the data, as zipfile does on unseekable output):
+    the archive can then only be streamed whole and content_length is None.
+    """
+
+    def __init__(self, entries: List[ZipEntry]):
+        self.entries = entries
+        self._starts: List[int] = []
+        self._segments: List[Tuple[Optional[bytes], Optional[ZipEntry], int]] = []   # (bytes | entry, length)
+        self.content_length: Optional[int] = None
+        if all(e.known for e in entries):
+            self._layout()
+
+    def _layout(self):
+        offset = 0
+        central = []
+        for entry in self.entries:
+            info = _zipinfo(entry)
+            header = info.FileHeader()
+            central.append(_central_record(info, offset))
+            offset = self._add(offset, header, None, len(header))
+            offset = self._add(offset, None, entry, entry.size)
+        cd = b"".join(central)
+        cd_offset = offset
+        offset = self._add(offset, cd + _end_records(len(self.entries), cd_offset, len(cd)), None, 0)
+        self.content_length = offset
+
+    def _add(self, offset: int, data: Optional[bytes], entry: Optional[ZipEntry], length: int) -> int:
+        length = len(data) if data is not None else length
+        if length:
+            self._starts.append(offset)
+            self._segments.append((data, entry, length))
+        return offset + length
+
+    @property
+    def ranged(self) -> bool:
+        return self.content_length is not None
+
+    @property
+    def etag(self) -> Optional[str]:
+        """Strong validator over everything that determines the bytes (names, sizes, CRCs, dates)."""
+        if not self.ranged:
+            return None
+        h = hashlib.sha256()
+        for e in self.entries:
+            h.update(f"{e.name}\0{e.size}\0{e.crc32}\0{e.date_time}\n".encode())
+        return '"' + h.hexdigest()[:32] + '"'
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes [start, end) of the archive (fixed layout only)."""
+        if not self.ranged:
+            raise ValueError("archive has data descriptor entries; stream it whole")
+        end = self.content_length if end is None else min(end, self.content_length)
+        if start >= end:
+            return
+        i = bisect.bisect_right(self._starts, start) - 1
+        pos = start
+        while pos < end and i < len(self._segments):
+            seg_start = self._starts[i]
+            data, entry, length = self._segments[i]
+            lo = pos - seg_start
+            hi = min(length, end - seg_start)
+            if data is not None:
+                yield data[lo:hi]
+            else:
+                yield from entry.source.read(entry.ref, lo, hi - lo)
+            pos = seg_start + hi
+            i += 1
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.ranged:
+            return self.iter_range(0, self.content_length)
+        return self._stream()
+
+    def _stream(self) -> Iterator[bytes]:
+        """Whole archive, offsets and data descriptors worked out as members are read."""
+        offset = 0
+        central = []
+        for entry in self.entries:
+            info = _zipinfo(entry)
+            chunks = entry.source.read(entry.ref, 0, entry.size) if entry.known else entry.source.read_all(entry.ref)
+            try:
+                first = next(chunks, b"")
+            except MemberUnavailable as e:
+                # Nothing of this member is out yet, so it can still be left out
+                logger.warning(f"⚠️ ZIP: {e}, skipped")
+                continue
+            header = info.FileHeader()
+            yield header
+            size, crc = len(first), zlib.crc32(first)
+            if first:
+                yield first
+            for chunk in chunks:
+                size += len(chunk)
+                crc = zlib.crc32(chunk, crc)
+                yield chunk
+            header_offset, offset = offset, offset + len(header) + size
+            if not entry.known:
+                if size > zipfile.ZIP64_LIMIT:
+                    raise MemberUnavailable(f"{entry.ref} is too large for an entry without a recorded size")
+                info.CRC, info.file_size, info.compress_size = crc, size, size
+                descriptor = struct.pack("<LLLL", DATA_DESCRIPTOR_SIGNATURE, crc, size, size)
+                yield descriptor
+                offset += len(descriptor)
+            central.append(_central_record(info, header_offset))
+        cd = b"".join(central)
+        yield cd + _end_records(len(central), offset, len(cd))
+
+
+# ---------------------------------------------------------
+# HTTP helpers
+# ---------------------------------------------------------
+def parse_range(header: Optional[str], total: int) -> Optional[Tuple[int, int]]:
+    """
+    Single 'bytes=' range -> (start, end) with end exclusive; None means
+    "send the whole archive" (no header, or a multi-range we don't split).
+    Raises RangeNotSatisfiable when the range starts past the end.
+    """
+    if not header:
+        return None
+    m = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header)
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    first, last = m.group(1), m.group(2)
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, total - suffix), total
+    start = int(first)
+    end = min(int(last) + 1, total) if last else total
+    if start >= total or (last and int(last) < start):
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def content_disposition(filename: str) -> str:
+    """attachment header with an ASCII fallback and the UTF-8 name (RFC 6266 / 5987)."""
+    ascii_name = unicodedata.normalize("NFKD", filename.replace("Đ", "D").replace("đ", "d"))
+    ascii_name = "".join(c for c in ascii_name if not unicodedata.combining(c))
+    fallback = re.sub(r'[^A-Za-z0-9._ -]', "_", ascii_name).strip() or "album.zip"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+# ---------------------------------------------------------
+# Album -> entries
+# ---------------------------------------------------------
+def member_name(filename: Optional[str], fallback: str, taken: set) -> str:
+    """Base name only (no directories from the client), de-duplicated as 'a (2).jpg'."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip() or fallback
+    if name not in taken:
+        taken.add(name)
+        return name
+    stem, ext = os.path.splitext(name)
+    n = 2
+    while f"{stem} ({n}){ext}" in taken:
+        n += 1
+    name = f"{stem} ({n}){ext}"
+    taken.add(name)
+    return name
+
+
+def dos_date_time(value: Any) -> Tuple[int, int, int, int, int, int]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = None
+    if not isinstance(value, datetime) or value.year < 1980:
+        return DOS_EPOCH
+    return value.year, value.month, value.day, value.hour, value.minute, value.second
+
+
+def photo_locator(photo: dict, local: LocalFileSource, remote: HttpSource) -> Optional[Tuple[Any, str]]:
+    """Local copy first (no egress), otherwise the stored URL."""
+    url = photo.get("image_url") or ""
+    ref = url[len("/images/"):]
+    if url.startswith("/images/") and local.exists(ref):
+        return local, ref
+    if url.startswith(("http://", "https://")):
+        return remote, url
+    return None
+
+
+def build_album_zip(photos: List[dict], local: LocalFileSource, remote: HttpSource) -> StreamedZip:
+    """
+    Lays out the archive from the album document alone: the size / crc32
+    recorded at upload fix the layout; photos stored before those existed
+    become data descriptor entries. Nothing is read from storage here.
+    """
+    taken: set = set()
+    entries = []
+    for photo in photos:
+        loc = photo_locator(photo, local, remote)
+        if loc is None:
+            logger.warning(f"⚠️ ZIP: photo {photo.get('id')} has no readable source, skipped")
+            continue
+        source, ref = loc
+        fallback = f"{photo.get('id', 'photo')}.jpg"
+        entries.append(ZipEntry(
+            name=member_name(photo.get("filename"), fallback, taken),
+            source=source, ref=ref, size=photo.get("size"), crc32=photo.get("crc32"),
+            date_time=dos_date_time(photo.get("timestamp")),
+        ))
+    return StreamedZip(entries)
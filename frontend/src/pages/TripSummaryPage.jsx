@@ -65,7 +65,9 @@ function TripSummaryPage() {
       if (wsRef.current?.readyState === WebSocket.OPEN) return;
       
       try {
-        const ws = new WebSocket(`ws://localhost:8000/ws/${USER_ID}`);
+        // Browsers cannot set an Authorization header on WebSocket, so the token goes in the query
+        const token = localStorage.getItem('auth_token') || sessionStorage.getItem('auth_token');
+        const ws = new WebSocket(`ws://localhost:8000/ws/${USER_ID}?token=${encodeURIComponent(token || '')}`);
         wsRef.current = ws;
 
         ws.onopen = () => { 
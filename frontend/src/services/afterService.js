@@ -121,7 +121,9 @@ export const geocodeAddress = async (address) => {
  */
 export const connectWebSocket = (userId, onMessage) => {
     const wsUrl = AFTER_API_URL.replace('http', 'ws').replace('https', 'wss');
-    const ws = new WebSocket(`${wsUrl}/ws/${userId}`);
+    // Browsers cannot set an Authorization header on WebSocket, so the token goes in the query
+    const token = localStorage.getItem('auth_token') || sessionStorage.getItem('auth_token');
+    const ws = new WebSocket(`${wsUrl}/ws/${userId}?token=${encodeURIComponent(token || '')}`);
 
     ws.onmessage = (event) => {
         try {